@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+♻️ CACHE DE PLANOS - LUNA
+=========================
+
+Reaproveita os planos salvos em Luna/planos/ quando uma tarefa parecida
+volta, em vez de planejar do zero (várias chamadas à API):
+
+- Impressão digital: hash dos termos normalizados da tarefa (sem acento,
+  caixa, pontuação, stopwords e ordem) - mesma tarefa escrita de outro
+  jeito cai no mesmo plano
+- Vetor léxico: termos + trigramas de caracteres, normalizado (cosseno);
+  calculado localmente, sem embeddings nem API
+- Resultado: cada execução do plano é registrada no índice; só planos
+  cuja ÚLTIMA execução deu certo são candidatos
+- Adaptação leve: se as tarefas diferem só por entidades trocadas 1:1
+  (nomes de arquivo, caminhos, números, textos entre aspas: "vendas.csv"
+  → "compras.csv"), a troca é aplicada no texto do plano; qualquer outra
+  diferença (verbo, requisito a mais/a menos) não reaproveita nada
+- Ferramentas: plano que usa ferramenta que não existe mais é ignorado
+
+O índice fica em Luna/planos/indice_planos.json e é sincronizado com os
+arquivos do diretório ao abrir (planos antigos entram no índice).
+"""
+
+import difflib
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from typing import Any, Collection, Dict, List, Optional, Set
+
+
+ARQUIVO_INDICE = "indice_planos.json"
+VERSAO_INDICE = 1
+
+# Cosseno mínimo entre os vetores das tarefas para reaproveitar um plano
+LIMIAR_SIMILARIDADE = 0.75
+
+# Palavras que não mudam o que a tarefa pede ("sem" e "não" ficam de fora de propósito)
+STOPWORDS = frozenset(
+    "a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela para pra "
+    "com e ou que se ao aos me meu minha favor the an and of to in for on with please".split()
+)
+
+# Palavras da tarefa original, preservando nomes de arquivo/caminhos ("dados.csv", "src/app")
+PADRAO_PALAVRA = re.compile(r"\w+(?:[./\-]\w+)*")
+
+# Trechos entre aspas na tarefa ("relatório final", 'x', `y`, “z”): entidades, não pedido
+PADRAO_CITACAO = re.compile(r'"([^"]+)"|\'([^\']+)\'|`([^`]+)`|“([^”]+)”')
+
+# Campos do plano que são identificadores, não texto
+CHAVES_SEM_TEXTO = frozenset({"id", "dependencias", "prioridade", "numero"})
+
+
+# ============================================================================
+# TEXTO → IMPRESSÃO DIGITAL / VETOR
+# ============================================================================
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos e com pontuação trocada por espaço."""
+    sem_acento = unicodedata.normalize("NFKD", texto.lower())
+    sem_acento = "".join(c for c in sem_acento if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", sem_acento).split())
+
+
+def termos(texto: str) -> List[str]:
+    return [t for t in normalizar(texto).split() if t not in STOPWORDS]
+
+
+def impressao_digital(texto: str) -> str:
+    """Hash dos termos (conjunto ordenado): ignora ordem, caixa e repetições."""
+    return hashlib.sha1(" ".join(sorted(set(termos(texto)))).encode()).hexdigest()[:16]
+
+
+def vetor_lexico(texto: str) -> Dict[str, float]:
+    """Termos (peso 1) + trigramas de caracteres (peso 0.5), norma 1."""
+    contagem: Counter = Counter()
+    for termo in termos(texto):
+        contagem["p:" + termo] += 1.0
+        marcado = f"#{termo}#"
+        for i in range(len(marcado) - 2):
+            contagem["t:" + marcado[i:i + 3]] += 0.5
+    norma = math.sqrt(sum(v * v for v in contagem.values()))
+    return {chave: round(v / norma, 6) for chave, v in contagem.items()} if norma else {}
+
+
+def similaridade(a: Dict[str, float], b: Dict[str, float]) -> float:
+    """Cosseno entre dois vetores léxicos (já normalizados)."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(peso * b[chave] for chave, peso in a.items() if chave in b)
+
+
+def _variacao(antiga: str, nova: str) -> bool:
+    """Flexão da mesma palavra ("crie"/"criar", "venda"/"vendas"): não precisa de troca."""
+    a, b = normalizar(antiga), normalizar(nova)
+    if not (a.isalpha() and b.isalpha()):
+        return False  # Números/nomes de arquivo: "arquivo1" ≠ "arquivo2"
+    comum = len(os.path.commonprefix([a, b]))
+    return comum >= 3 and comum >= min(len(a), len(b)) - 2
+
+
+def _citadas(texto: str) -> Set[str]:
+    """Palavras que aparecem entre aspas no texto."""
+    return {palavra for trecho in PADRAO_CITACAO.findall(texto)
+            for palavra in PADRAO_PALAVRA.findall("".join(trecho))}
+
+
+def _entidade(palavra: str, citadas: Set[str]) -> bool:
+    """Nome de arquivo, caminho, número ou texto citado - pode ser trocado sem mudar o pedido."""
+    return palavra in citadas or any(c.isdigit() or c in "./" for c in palavra)
+
+
+def substituicoes(origem: str, destino: str) -> Optional[Dict[str, str]]:
+    """
+    Trocas entidade → entidade que transformam a tarefa `origem` em `destino`.
+
+    Só entidades (_entidade) são trocadas: uma palavra comum diferente
+    ("instalar" → "desinstalar", "criar" → "remover") muda o que a tarefa
+    pede, e o plano antigo não serve.
+
+    Returns:
+        {antiga: nova} (vazio = mesmas palavras), ou None se as tarefas
+        diferem por outras palavras ou por palavras inseridas/removidas
+    """
+    # Só palavras com conteúdo: stopwords a mais/a menos não mudam a tarefa
+    antigas = [p for p in PADRAO_PALAVRA.findall(origem) if termos(p)]
+    novas = [p for p in PADRAO_PALAVRA.findall(destino) if termos(p)]
+    comparador = difflib.SequenceMatcher(
+        None, [normalizar(p) for p in antigas], [normalizar(p) for p in novas], autojunk=False
+    )
+
+    citadas_origem, citadas_destino = _citadas(origem), _citadas(destino)
+    trocas: Dict[str, str] = {}
+    for operacao, i1, i2, j1, j2 in comparador.get_opcodes():
+        if operacao == "equal":
+            continue
+        if operacao == "replace" and i2 - i1 == j2 - j1:
+            for antiga, nova in zip(antigas[i1:i2], novas[j1:j2]):
+                if _variacao(antiga, nova):
+                    continue
+                if not (_entidade(antiga, citadas_origem) and _entidade(nova, citadas_destino)):
+                    return None  # Verbo/objeto diferente: outro pedido
+                if trocas.setdefault(antiga, nova) != nova:
+                    return None  # Mesma palavra virando duas diferentes
+            continue
+        return None  # Palavra inserida/removida: outro pedido
+    return trocas
+
+
+def aplicar_substituicoes(valor: Any, trocas: Dict[str, str]) -> Any:
+    """Aplica as trocas (palavra inteira, sem diferenciar caixa) em todo texto do plano."""
+    if not trocas:
+        return valor
+    padrao = re.compile(
+        r"(?<![\w./\-])(" + "|".join(re.escape(p) for p in sorted(trocas, key=len, reverse=True)) + r")(?![\w/\-]|\.\w)",
+        re.IGNORECASE
+    )
+    por_chave = {antiga.lower(): nova for antiga, nova in trocas.items()}
+
+    def visitar(valor: Any) -> Any:
+        if isinstance(valor, str):
+            return padrao.sub(lambda m: por_chave[m.group(0).lower()], valor)
+        if isinstance(valor, list):
+            return [visitar(item) for item in valor]
+        if isinstance(valor, dict):
+            return {k: v if k in CHAVES_SEM_TEXTO else visitar(v) for k, v in valor.items()}
+        return valor
+
+    return visitar(valor)
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class CachePlanos:
+    """
+    Índice dos planos salvos, com busca por similaridade e o resultado de
+    cada execução.
+
+    Uso:
+        cache = CachePlanos("Luna/planos")
+        acerto = cache.buscar("gerar relatório de vendas.csv")
+        if acerto:
+            dados = cache.carregar(acerto)   # dict no formato de Plano.salvar
+        ...
+        cache.registrar(caminho, tarefa)               # plano novo salvo
+        cache.registrar_resultado(caminho, sucesso)    # depois de executar
+    """
+
+    def __init__(self, diretorio: str = "Luna/planos", limiar: float = LIMIAR_SIMILARIDADE):
+        """
+        Args:
+            diretorio: Onde os planos são salvos (Plano.salvar)
+            limiar: Cosseno mínimo entre as tarefas para reaproveitar
+        """
+        self.diretorio = diretorio
+        self.limiar = limiar
+        self.caminho_indice = os.path.join(diretorio, ARQUIVO_INDICE)
+        self.entradas: Dict[str, Dict[str, Any]] = {}  # nome do arquivo → entrada
+        self._lock = threading.Lock()
+        self._carregar_indice()
+        self.sincronizar()
+
+    # ==================== ÍNDICE ====================
+
+    def _carregar_indice(self) -> None:
+        try:
+            with open(self.caminho_indice, encoding="utf-8") as f:
+                dados = json.load(f)
+            if dados.get("versao") == VERSAO_INDICE:
+                self.entradas = dados.get("planos", {})
+        except (OSError, ValueError):
+            self.entradas = {}  # Sem índice (ou corrompido): reconstruído pela sincronização
+
+    def _gravar_indice(self) -> None:
+        os.makedirs(self.diretorio, exist_ok=True)
+        temporario = self.caminho_indice + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"versao": VERSAO_INDICE, "planos": self.entradas}, f, ensure_ascii=False,
+                      separators=(",", ":"))
+        os.replace(temporario, self.caminho_indice)
+
+    @staticmethod
+    def _nova_entrada(tarefa: str, subtarefas: int, mtime: float) -> Dict[str, Any]:
+        return {
+            "tarefa": tarefa,
+            "impressao": impressao_digital(tarefa),
+            "vetor": vetor_lexico(tarefa),
+            "subtarefas": subtarefas,
+            "mtime": mtime,
+            "execucoes": 0,
+            "sucessos": 0,
+            "ultimo_sucesso": None,
+            "ultima_execucao": None,
+            "reaproveitamentos": 0,
+        }
+
+    @staticmethod
+    def _contar_subtarefas(dados: Dict[str, Any]) -> int:
+        return sum(len(onda.get("subtarefas", [])) for onda in dados.get("ondas", []))
+
+    def sincronizar(self) -> int:
+        """
+        Indexa planos do diretório que ainda não estão no índice (ou mudaram)
+        e esquece os que foram apagados.
+
+        Returns:
+            Quantidade de planos (re)indexados
+        """
+        try:
+            nomes = {n for n in os.listdir(self.diretorio) if n.endswith(".json") and n != ARQUIVO_INDICE}
+        except OSError:
+            nomes = set()
+
+        with self._lock:
+            alterados = 0
+            for nome in set(self.entradas) - nomes:
+                del self.entradas[nome]
+                alterados += 1
+
+            indexados = 0
+            for nome in sorted(nomes):
+                caminho = os.path.join(self.diretorio, nome)
+                try:
+                    mtime = os.path.getmtime(caminho)
+                    entrada = self.entradas.get(nome)
+                    if entrada is not None and entrada["mtime"] == mtime:
+                        continue
+                    with open(caminho, encoding="utf-8") as f:
+                        dados = json.load(f)
+                    tarefa = dados["tarefa_original"]
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue  # Arquivo ilegível não entra no cache
+
+                nova = self._nova_entrada(tarefa, self._contar_subtarefas(dados), mtime)
+                if entrada is not None:
+                    # Arquivo regravado: histórico de execuções continua valendo
+                    for chave in ("execucoes", "sucessos", "ultimo_sucesso", "ultima_execucao", "reaproveitamentos"):
+                        nova[chave] = entrada[chave]
+                elif isinstance(dados.get("resultado"), dict):
+                    # Plano antigo salvo já com resultado
+                    sucesso = bool(dados["resultado"].get("sucesso"))
+                    nova.update(execucoes=1, sucessos=int(sucesso), ultimo_sucesso=sucesso,
+                                ultima_execucao=dados.get("executado_em"))
+                self.entradas[nome] = nova
+                indexados += 1
+
+            if indexados or alterados:
+                self._gravar_indice()
+            return indexados
+
+    def registrar(self, caminho: str, tarefa: str, subtarefas: int = 0) -> None:
+        """Indexa um plano recém-salvo (ainda sem execução)."""
+        nome = os.path.basename(caminho)
+        with self._lock:
+            self.entradas[nome] = self._nova_entrada(tarefa, subtarefas, os.path.getmtime(caminho))
+            self._gravar_indice()
+
+    def registrar_resultado(self, caminho: str, sucesso: bool) -> None:
+        """Registra o resultado de uma execução do plano salvo em `caminho`."""
+        with self._lock:
+            entrada = self.entradas.get(os.path.basename(caminho))
+            if entrada is None:
+                return
+            entrada["execucoes"] += 1
+            entrada["sucessos"] += int(bool(sucesso))
+            entrada["ultimo_sucesso"] = bool(sucesso)
+            entrada["ultima_execucao"] = datetime.now().isoformat()
+            self._gravar_indice()
+
+    # ==================== BUSCA ====================
+
+    def buscar(self, tarefa: str, ferramentas: Optional[Collection[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Plano bem-sucedido mais parecido com `tarefa`.
+
+        Args:
+            tarefa: Tarefa a planejar
+            ferramentas: Ferramentas disponíveis; planos que usam alguma fora
+                delas são ignorados (None = não verificar)
+
+        Returns:
+            {'arquivo', 'caminho', 'tarefa', 'similaridade', 'modo' ('reuso' ou
+            'adaptacao'), 'substituicoes'} ou None se nenhum plano serve
+        """
+        impressao = impressao_digital(tarefa)
+        vetor = vetor_lexico(tarefa)
+
+        with self._lock:
+            candidatos = []
+            for nome, entrada in self.entradas.items():
+                if not entrada["ultimo_sucesso"] or not entrada["subtarefas"]:
+                    continue
+                valor = 1.0 if entrada["impressao"] == impressao else similaridade(vetor, entrada["vetor"])
+                if valor >= self.limiar:
+                    candidatos.append((valor, entrada["sucessos"], entrada["mtime"], nome, entrada))
+
+        # Mais parecido primeiro; empate → mais sucessos, depois o mais recente
+        for valor, _, _, nome, entrada in sorted(candidatos, reverse=True):
+            trocas = substituicoes(entrada["tarefa"], tarefa)
+            if trocas is None:
+                continue
+            if ferramentas is not None:
+                usadas = self._ferramentas_do_plano(nome)
+                if usadas is None or not usadas <= set(ferramentas):
+                    continue  # Ferramenta removida/renomeada desde a execução (ou plano ilegível)
+            return {
+                "arquivo": nome,
+                "caminho": os.path.join(self.diretorio, nome),
+                "tarefa": entrada["tarefa"],
+                "similaridade": round(valor, 3),
+                "modo": "adaptacao" if trocas else "reuso",
+                "substituicoes": trocas,
+            }
+        return None
+
+    def _ferramentas_do_plano(self, nome: str) -> Optional[Set[str]]:
+        """Ferramentas citadas nas subtarefas do plano salvo (None = arquivo ilegível)."""
+        try:
+            with open(os.path.join(self.diretorio, nome), encoding="utf-8") as f:
+                dados = json.load(f)
+            return {ferramenta for onda in dados.get("ondas", []) for st in onda.get("subtarefas", [])
+                    for ferramenta in st.get("ferramentas") or []}
+        except (OSError, ValueError, AttributeError, TypeError):
+            return None
+
+    def carregar(self, acerto: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Conteúdo do plano encontrado por buscar(), já com as substituições
+        aplicadas e sem o estado da execução anterior.
+
+        Raises:
+            OSError/ValueError: Arquivo do plano ilegível
+        """
+        with open(acerto["caminho"], encoding="utf-8") as f:
+            dados = json.load(f)
+
+        with self._lock:
+            entrada = self.entradas.get(acerto["arquivo"])
+            if entrada is not None:
+                entrada["reaproveitamentos"] += 1
+                self._gravar_indice()
+
+        plano = {chave: dados.get(chave) or {} for chave in ("analise", "estrategia", "decomposicao")}
+        plano["ondas"] = [
+            {**onda, "concluida": False,
+             "subtarefas": [{**st, "concluida": False, "resultado": None} for st in onda.get("subtarefas", [])]}
+            for onda in dados.get("ondas", [])
+        ]
+        return aplicar_substituicoes(plano, acerto["substituicoes"])
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "planos": len(self.entradas),
+                "reaproveitaveis": sum(1 for e in self.entradas.values() if e["ultimo_sucesso"]),
+                "reaproveitamentos": sum(e["reaproveitamentos"] for e in self.entradas.values()),
+            }
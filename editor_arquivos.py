@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+✏️ EDITOR DE ARQUIVOS - LUNA
+============================
+
+Edições pontuais em arquivos existentes, usadas por editar_arquivo, sem
+reenviar o conteúdo inteiro (como criar_arquivo exige):
+
+- edicoes: lista de substituições exatas {buscar, substituir, todas}
+- diff: patch no formato unified diff (hunks @@ ... @@)
+
+Regras:
+- Cada trecho de busca precisa aparecer UMA vez (ou todas=true); âncora
+  ausente ou ambígua recusa a edição inteira, com a linha onde está o
+  trecho mais parecido ou as linhas das ocorrências
+- Tudo ou nada: as edições são aplicadas em memória e o arquivo só é
+  trocado no final, via arquivo temporário + fsync + os.replace
+- Quebras de linha (CRLF), BOM e permissões do arquivo são preservados
+- A resposta é um diff compacto do que mudou (não o arquivo)
+"""
+
+import codecs
+import difflib
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+# Linhas de contexto e tamanho máximo do diff devolvido
+CONTEXTO_DIFF = 2
+LIMITE_DIFF = 3000
+
+# Cabeçalho de hunk; os números são opcionais ("@@ @@" localiza só pelo contexto)
+PADRAO_HUNK = re.compile(r"^@@(?: -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))?)? @@")
+
+
+class ErroEdicao(Exception):
+    """Edição recusada; o arquivo não foi alterado."""
+
+
+# ============================================================================
+# SUBSTITUIÇÕES EXATAS
+# ============================================================================
+
+def _linha_do_offset(texto: str, offset: int) -> int:
+    return texto.count("\n", 0, offset) + 1
+
+
+def _dica_trecho_ausente(texto: str, buscar: str) -> str:
+    """Aponta onde está o trecho mais parecido (costuma ser indentação/espaços)."""
+    linhas = texto.split("\n")
+    procuradas = [l.strip() for l in buscar.strip("\n").split("\n")]
+
+    # Mesmas linhas, só com espaços diferentes
+    for inicio in range(len(linhas) - len(procuradas) + 1):
+        if all(linhas[inicio + i].strip() == p for i, p in enumerate(procuradas)):
+            return f" (linha {inicio + 1} tem o mesmo texto com espaços/indentação diferentes)"
+
+    primeira = next((p for p in procuradas if p), "")
+    parecidas = difflib.get_close_matches(primeira, [l.strip() for l in linhas], n=1, cutoff=0.6)
+    if parecidas:
+        numero = next(i for i, l in enumerate(linhas, 1) if l.strip() == parecidas[0])
+        return f" (mais parecido na linha {numero}: {linhas[numero - 1].strip()[:120]!r})"
+    return ""
+
+
+def aplicar_substituicoes(texto: str, edicoes: List[Dict]) -> str:
+    """
+    Aplica as substituições em ordem, cada uma sobre o resultado da anterior.
+
+    Raises:
+        ErroEdicao: Trecho vazio, ausente ou ambíguo (sem todas=true)
+    """
+    for numero, edicao in enumerate(edicoes, 1):
+        buscar = edicao.get("buscar") or ""
+        substituir = edicao.get("substituir") or ""
+        todas = bool(edicao.get("todas"))
+        rotulo = f"edição {numero}" if len(edicoes) > 1 else "edição"
+
+        if not buscar:
+            raise ErroEdicao(f"{rotulo}: 'buscar' vazio")
+
+        posicoes = []
+        inicio = texto.find(buscar)
+        while inicio != -1:
+            posicoes.append(inicio)
+            inicio = texto.find(buscar, inicio + len(buscar))
+
+        if not posicoes:
+            raise ErroEdicao(f"{rotulo}: trecho não encontrado{_dica_trecho_ausente(texto, buscar)}")
+        if len(posicoes) > 1 and not todas:
+            linhas = ", ".join(str(_linha_do_offset(texto, p)) for p in posicoes[:10])
+            raise ErroEdicao(
+                f"{rotulo}: trecho aparece {len(posicoes)} vezes (linhas {linhas}); "
+                f"inclua linhas vizinhas para torná-lo único ou use todas=true"
+            )
+
+        texto = texto.replace(buscar, substituir, -1 if todas else 1)
+
+    return texto
+
+
+# ============================================================================
+# UNIFIED DIFF
+# ============================================================================
+
+def _ler_hunks(diff: str) -> List[Tuple[Optional[int], List[str], List[str]]]:
+    """Hunks do diff como (linha inicial antiga ou None, linhas antigas, linhas novas)."""
+    hunks = []
+    atual = None
+
+    for linha in diff.replace("\r\n", "\n").split("\n"):
+        cabecalho = PADRAO_HUNK.match(linha)
+        if cabecalho:
+            atual = (int(cabecalho.group(1)) if cabecalho.group(1) else None, [], [])
+            hunks.append(atual)
+        elif atual is None or linha.startswith("\\"):
+            continue  # Cabeçalhos (diff/index/---/+++) e "\ No newline at end of file"
+        elif linha.startswith("-"):
+            atual[1].append(linha[1:])
+        elif linha.startswith("+"):
+            atual[2].append(linha[1:])
+        elif linha.startswith(" ") or linha == "":
+            # Contexto (linha vazia: editores costumam cortar o espaço inicial)
+            atual[1].append(linha[1:])
+            atual[2].append(linha[1:])
+        else:
+            atual = None  # Texto fora do hunk (ex.: próximo arquivo sem cabeçalho)
+
+    # A quebra final do diff vira uma linha de contexto vazia a mais
+    for _, antigas, novas in hunks:
+        while antigas and novas and antigas[-1] == "" and novas[-1] == "":
+            antigas.pop()
+            novas.pop()
+
+    if not hunks:
+        raise ErroEdicao("diff sem hunks (esperado o formato unified: linhas '@@ -a,b +c,d @@')")
+    return hunks
+
+
+def _localizar(linhas: List[str], antigas: List[str], dica: Optional[int], minimo: int,
+               comparar) -> List[int]:
+    """Posições (a partir de minimo) onde antigas casa, da mais próxima da dica para a mais distante."""
+    ultimo = len(linhas) - len(antigas)
+    posicoes = [
+        p for p in range(minimo, ultimo + 1)
+        if all(comparar(linhas[p + i], a) for i, a in enumerate(antigas))
+    ]
+    if dica is not None:
+        posicoes.sort(key=lambda p: abs(p - dica))
+    return posicoes
+
+
+def aplicar_diff(texto: str, diff: str) -> str:
+    """
+    Aplica um unified diff, hunk a hunk, como o patch: o contexto precisa
+    conferir (espaços no fim da linha são tolerados) e os números de linha
+    servem só de dica, já que o arquivo pode ter se deslocado.
+
+    Raises:
+        ErroEdicao: Diff sem hunks ou hunk cujo contexto não está no arquivo
+    """
+    linhas = texto.split("\n")
+    minimo = 0
+    deslocamento = 0
+
+    for numero, (inicio, antigas, novas) in enumerate(_ler_hunks(diff), 1):
+        dica = None if inicio is None else max(0, inicio - 1 + deslocamento)
+
+        if not antigas:
+            # Só inserção: vale o número de linha (-0,0 = início do arquivo)
+            if dica is None:
+                raise ErroEdicao(f"hunk {numero}: inserção sem contexto precisa do número da linha")
+            posicao = min(max(dica + (1 if inicio else 0), minimo), len(linhas))
+        else:
+            posicoes = _localizar(linhas, antigas, dica, minimo, str.__eq__)
+            if not posicoes:
+                posicoes = _localizar(linhas, antigas, dica, minimo, lambda a, b: a.rstrip() == b.rstrip())
+            if not posicoes:
+                esperado = "\n".join(antigas)
+                raise ErroEdicao(
+                    f"hunk {numero}: contexto/linhas removidas não conferem com o arquivo"
+                    f"{_dica_trecho_ausente(texto, esperado)}"
+                )
+            if dica is None and len(posicoes) > 1:
+                lista = ", ".join(str(p + 1) for p in posicoes[:10])
+                raise ErroEdicao(f"hunk {numero}: contexto aparece {len(posicoes)} vezes (linhas {lista}); "
+                                 f"informe os números de linha no cabeçalho @@")
+            posicao = posicoes[0]
+
+        linhas[posicao:posicao + len(antigas)] = novas
+        deslocamento += len(novas) - len(antigas)
+        minimo = posicao + len(novas)
+
+    return "\n".join(linhas)
+
+
+# ============================================================================
+# GRAVAÇÃO ATÔMICA E RESUMO
+# ============================================================================
+
+def escrever_atomico(caminho: str, dados: bytes) -> None:
+    """
+    Grava via temporário no mesmo diretório + fsync + os.replace: quem lê
+    o arquivo vê a versão antiga ou a nova, nunca uma gravação pela metade.
+    """
+    destino = os.path.realpath(caminho)  # Link simbólico continua apontando para o arquivo
+    descritor, temporario = tempfile.mkstemp(
+        prefix=f".{os.path.basename(destino)}.", suffix=".tmp", dir=os.path.dirname(destino)
+    )
+    try:
+        with os.fdopen(descritor, "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(destino):
+            os.chmod(temporario, os.stat(destino).st_mode & 0o7777)
+        os.replace(temporario, destino)
+    except BaseException:
+        try:
+            os.unlink(temporario)
+        except OSError:
+            pass
+        raise
+
+
+def diff_compacto(antes: str, depois: str, nome: str, contexto: int = CONTEXTO_DIFF,
+                  limite: int = LIMITE_DIFF) -> Tuple[str, int, int]:
+    """Unified diff limitado a `limite` caracteres, com as contagens (+adicionadas, -removidas)."""
+    linhas = list(difflib.unified_diff(
+        antes.splitlines(), depois.splitlines(), f"a/{nome}", f"b/{nome}", n=contexto, lineterm=""
+    ))
+    adicionadas = sum(1 for l in linhas[2:] if l.startswith("+"))
+    removidas = sum(1 for l in linhas[2:] if l.startswith("-"))
+
+    texto = "\n".join(linhas)
+    if len(texto) > limite:
+        corte = texto.rfind("\n", 0, limite)
+        texto = texto[:corte if corte > 0 else limite] + "\n… (diff truncado)"
+    return texto, adicionadas, removidas
+
+
+# ============================================================================
+# EDITOR
+# ============================================================================
+
+class EditorArquivos:
+    """
+    Aplica edições com uma trava por arquivo: subtarefas paralelas que
+    editam o mesmo arquivo não perdem as alterações uma da outra.
+    """
+
+    def __init__(self):
+        self._travas: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _trava(self, caminho: str) -> threading.Lock:
+        with self._lock:
+            return self._travas.setdefault(caminho, threading.Lock())
+
+    def editar(self, caminho: str, edicoes: Optional[List[Dict]] = None, diff: str = "") -> str:
+        """
+        Aplica substituições e/ou um diff e devolve o resumo com o diff do resultado.
+
+        Raises:
+            ErroEdicao: Arquivo inexistente/não UTF-8, nada a aplicar ou edição recusada
+            OSError: Falha ao ler ou gravar
+        """
+        if not edicoes and not diff:
+            raise ErroEdicao("informe 'edicoes' (buscar/substituir) ou 'diff'")
+        if not os.path.isfile(caminho):
+            raise ErroEdicao(f"arquivo não existe: {caminho} (para criar, use criar_arquivo)")
+
+        destino = os.path.realpath(caminho)
+        with self._trava(destino):
+            with open(destino, "rb") as f:
+                dados = f.read()
+
+            bom = codecs.BOM_UTF8 if dados.startswith(codecs.BOM_UTF8) else b""
+            try:
+                original = dados[len(bom):].decode("utf-8")
+            except UnicodeDecodeError:
+                raise ErroEdicao("arquivo não é texto UTF-8; edição recusada")
+
+            # Arquivo todo em CRLF: edita em LF e restaura ao gravar
+            crlf = "\r\n" in original and original.count("\r\n") == original.count("\n")
+            texto = original.replace("\r\n", "\n") if crlf else original
+
+            if edicoes:
+                if crlf:
+                    edicoes = [dict(e, **{c: e[c].replace("\r\n", "\n") for c in ("buscar", "substituir")
+                                          if isinstance(e.get(c), str)}) for e in edicoes]
+                texto = aplicar_substituicoes(texto, edicoes)
+            if diff:
+                texto = aplicar_diff(texto, diff)
+
+            antes = original.replace("\r\n", "\n") if crlf else original
+            if texto == antes:
+                return f"Nenhuma alteração em '{caminho}' (o resultado é igual ao arquivo)"
+
+            escrever_atomico(destino, bom + (texto.replace("\n", "\r\n") if crlf else texto).encode("utf-8"))
+
+        resumo, adicionadas, removidas = diff_compacto(antes, texto, os.path.basename(destino))
+        return f"Arquivo '{caminho}' editado: +{adicionadas} -{removidas} linhas\n{resumo}"
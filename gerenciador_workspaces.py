@@ -31,12 +31,16 @@ Corrigido: 2025-10-15 (Encoding + Windows paths + Espaços)
 
 import os
 import sys
+import re
 import json
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import shutil
 
+from indice_workspace import IndiceWorkspace
+
 # 🆕 FASE 2.2: Import de templates
 try:
     from templates_workspaces import TemplatesWorkspace
@@ -80,6 +84,11 @@ class GerenciadorWorkspaces:
         
         # Arquivo de log
         self.log_file = self.base_dir / "workspace.log"
+
+        # 🆕 Índices persistentes por workspace (evitam rglob a cada operação)
+        self.indices_dir = self.base_dir / ".indices"
+        self._indices: Dict[str, IndiceWorkspace] = {}
+        self._lock_indices = threading.Lock()
         
         # Criar estrutura
         self._inicializar()
@@ -177,14 +186,11 @@ Luna encontra tudo automaticamente aqui!
             total_workspaces = len(self.config["workspaces"])
             total_arquivos = 0
 
-            # Somar arquivos de todos os workspaces
-            for nome, info in self.config["workspaces"].items():
-                workspace_path = Path(info["caminho"])
-                if workspace_path.exists():
-                    # Contar arquivos (mesma lógica do listar_workspaces)
-                    arquivos = list(workspace_path.rglob("*"))
-                    num_arquivos = len([f for f in arquivos if f.is_file()])
-                    total_arquivos += num_arquivos
+            # Somar arquivos de todos os workspaces (🆕 via índice)
+            for nome in self.config["workspaces"]:
+                indice = self._indice(nome)
+                if indice:
+                    total_arquivos += indice.total()[0]
 
             # Atualizar estatísticas
             self.config["estatisticas"]["total_workspaces"] = total_workspaces
@@ -196,6 +202,63 @@ Luna encontra tudo automaticamente aqui!
         except Exception as e:
             self._log(f"Erro ao atualizar estatísticas globais: {e}")
 
+    # ========================================================================
+    # 🆕 ÍNDICE PERSISTENTE DE ARQUIVOS
+    # ========================================================================
+
+    def _indice(self, nome: str) -> Optional[IndiceWorkspace]:
+        """
+        Índice do workspace, sincronizado com o disco.
+
+        A sincronização só relê diretórios cujo mtime mudou (ver
+        indice_workspace.py), então o custo não depende do total de arquivos.
+
+        Returns:
+            IndiceWorkspace ou None se o workspace não existir
+        """
+        info = self.config["workspaces"].get(nome)
+        if not info:
+            return None
+
+        workspace_path = Path(info["caminho"])
+        if not workspace_path.exists():
+            return None
+
+        with self._lock_indices:
+            indice = self._indices.get(nome)
+            if indice is None or indice.raiz != str(workspace_path.resolve()):
+                if indice is not None:
+                    indice.fechar()
+                indice = IndiceWorkspace(
+                    workspace_path,
+                    self.indices_dir / f"{nome}.db",
+                    categorizar=self.categorizar_arquivo,
+                    marcar=self._tecnologias_do_arquivo
+                )
+                self._indices[nome] = indice
+
+        indice.atualizar()
+        return indice
+
+    def _descartar_indice(self, nome: str):
+        """Fecha e apaga o índice de um workspace (deletado/renomeado)."""
+        with self._lock_indices:
+            indice = self._indices.pop(nome, None)
+            if indice is not None:
+                indice.fechar()
+        for sufixo in ("", "-wal", "-shm"):
+            try:
+                (self.indices_dir / f"{nome}.db{sufixo}").unlink()
+            except OSError:
+                pass
+
+    def fechar(self):
+        """Fecha os índices abertos"""
+        with self._lock_indices:
+            for indice in self._indices.values():
+                indice.fechar()
+            self._indices.clear()
+
     # ========================================================================
     # OPERAÇÕES DE WORKSPACE
     # ========================================================================
@@ -376,16 +439,15 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
         if not workspace_path.exists():
             return []
 
+        indice = self._indice(nome)
+        if indice is None:
+            return []
+
         tech_stack = set()
 
         try:
             # Detectar por extensão de arquivos
-            for arquivo in workspace_path.rglob("*"):
-                if not arquivo.is_file():
-                    continue
-
-                ext = arquivo.suffix.lower()
-
+            for ext in indice.extensoes():
                 # Linguagens
                 if ext == ".py":
                     tech_stack.add("Python")
@@ -404,39 +466,9 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
                 elif ext in [".json", ".yaml", ".yml"]:
                     tech_stack.add("Config")
 
-            # Detectar frameworks/bibliotecas por imports e arquivos especiais
-            for arquivo in workspace_path.rglob("*.py"):
-                try:
-                    conteudo = arquivo.read_text(encoding='utf-8', errors='ignore')
-
-                    # Playwright
-                    if "playwright" in conteudo.lower() or "from playwright" in conteudo:
-                        tech_stack.add("Playwright")
-
-                    # Notion
-                    if "notion" in conteudo.lower():
-                        tech_stack.add("Notion API")
-
-                    # Google APIs
-                    if "google" in conteudo.lower() and ("gmail" in conteudo.lower() or "calendar" in conteudo.lower()):
-                        tech_stack.add("Google APIs")
-
-                    # Web frameworks
-                    if "flask" in conteudo.lower():
-                        tech_stack.add("Flask")
-                    if "django" in conteudo.lower():
-                        tech_stack.add("Django")
-                    if "fastapi" in conteudo.lower():
-                        tech_stack.add("FastAPI")
-
-                    # Data science
-                    if "pandas" in conteudo.lower():
-                        tech_stack.add("Pandas")
-                    if "numpy" in conteudo.lower():
-                        tech_stack.add("NumPy")
-
-                except Exception:
-                    continue
+            # Frameworks/bibliotecas por imports (🆕 marcados no índice quando
+            # o arquivo muda, em vez de reler todos os .py a cada chamada)
+            tech_stack.update(indice.marcas())
 
             # Detectar por arquivos especiais
             if (workspace_path / "requirements.txt").exists():
@@ -453,6 +485,54 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
 
         return sorted(list(tech_stack))
 
+    @staticmethod
+    def _tecnologias_do_arquivo(arquivo: Path, conteudo: Optional[str] = None) -> List[str]:
+        """
+        Frameworks/bibliotecas citados em um arquivo .py (usado pelo índice).
+
+        Args:
+            arquivo: Caminho do arquivo
+            conteudo: Texto já lido pelo índice (evita reler o arquivo)
+
+        Returns:
+            Lista de tecnologias encontradas no conteúdo
+        """
+        if arquivo.suffix.lower() != ".py":
+            return []
+
+        if conteudo is None:
+            conteudo = arquivo.read_text(encoding='utf-8', errors='ignore')
+        conteudo = conteudo.lower()
+        tecnologias = []
+
+        # Playwright
+        if "playwright" in conteudo:
+            tecnologias.append("Playwright")
+
+        # Notion
+        if "notion" in conteudo:
+            tecnologias.append("Notion API")
+
+        # Google APIs
+        if "google" in conteudo and ("gmail" in conteudo or "calendar" in conteudo):
+            tecnologias.append("Google APIs")
+
+        # Web frameworks
+        if "flask" in conteudo:
+            tecnologias.append("Flask")
+        if "django" in conteudo:
+            tecnologias.append("Django")
+        if "fastapi" in conteudo:
+            tecnologias.append("FastAPI")
+
+        # Data science
+        if "pandas" in conteudo:
+            tecnologias.append("Pandas")
+        if "numpy" in conteudo:
+            tecnologias.append("NumPy")
+
+        return tecnologias
+
     def categorizar_arquivo(self, caminho: str) -> str:
         """
         Categoriza arquivo por tipo
@@ -628,6 +708,19 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
 
         return resultado
 
+    @staticmethod
+    def _info_arquivo(arquivo: Dict) -> Dict:
+        """Formato público de um arquivo do índice (nome, caminho, tamanho, ...)."""
+        return {
+            "nome": arquivo["nome"],
+            "caminho": arquivo["caminho"],
+            "caminho_completo": arquivo["caminho_completo"],
+            "tamanho_bytes": arquivo["tamanho_bytes"],
+            "tamanho_mb": round(arquivo["tamanho_bytes"] / (1024 * 1024), 2),
+            "modificado_em": datetime.fromtimestamp(arquivo["mtime"]).isoformat(),
+            "categoria": arquivo["categoria"]
+        }
+
     def obter_arquivos_recentes(self, nome: str, limite: int = 10) -> List[Dict]:
         """
         Lista arquivos modificados recentemente no workspace
@@ -651,50 +744,34 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
         arquivos_recentes = []
 
         try:
-            # Obter todos os arquivos com tempo de modificação
-            todos_arquivos = []
-            for arquivo in workspace_path.rglob("*"):
-                if arquivo.is_file():
-                    try:
-                        stat = arquivo.stat()
-                        todos_arquivos.append({
-                            "nome": arquivo.name,
-                            "caminho": str(arquivo.relative_to(workspace_path)),
-                            "caminho_completo": str(arquivo),
-                            "tamanho_bytes": stat.st_size,
-                            "tamanho_mb": round(stat.st_size / (1024 * 1024), 2),
-                            "modificado_em": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                            "timestamp": stat.st_mtime,
-                            "categoria": self.categorizar_arquivo(str(arquivo))
-                        })
-                    except Exception:
-                        continue
-
-            # Ordenar por tempo de modificação (mais recentes primeiro)
-            todos_arquivos.sort(key=lambda x: x["timestamp"], reverse=True)
-
-            # Remover campo timestamp (só foi usado para ordenar)
-            arquivos_recentes = [{k: v for k, v in a.items() if k != "timestamp"}
-                                  for a in todos_arquivos[:limite]]
+            # 🆕 Top-N direto do índice (ORDER BY mtime), sem stat de todos os arquivos
+            indice = self._indice(nome)
+            if indice:
+                arquivos_recentes = [self._info_arquivo(a) for a in indice.arquivos(ordem="recentes", limite=limite)]
 
         except Exception as e:
             self._log(f"Erro ao obter arquivos recentes de '{nome}': {e}")
 
         return arquivos_recentes
 
-    def buscar_arquivos(self, nome: str, query: str, buscar_conteudo: bool = False) -> List[Dict]:
+    def buscar_arquivos(self, nome: str, query: str, buscar_conteudo: bool = False,
+                        regex: bool = False) -> List[Dict]:
         """
         Busca arquivos no workspace por nome ou conteúdo
 
         🆕 FASE 3.1: Busca semântica
+        🆕 Conteúdo via índice de trigramas (só candidatos são verificados) e
+           suporte a expressões regulares
 
         Args:
             nome: Nome do workspace
-            query: Termo de busca
+            query: Termo de busca (ou expressão regular, se regex=True)
             buscar_conteudo: Se True, busca também no conteúdo dos arquivos
+            regex: Interpreta `query` como expressão regular
 
         Returns:
-            Lista de arquivos encontrados
+            Lista de arquivos encontrados, mais relevantes primeiro
+            (score: nome 10, caminho 5, conteúdo 3; empate → mais ocorrências)
         """
         if nome not in self.config["workspaces"]:
             return []
@@ -704,51 +781,63 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
             return []
 
         resultados = []
-        query_lower = query.lower()
 
         try:
-            for arquivo in workspace_path.rglob("*"):
-                if not arquivo.is_file():
-                    continue
+            indice = self._indice(nome)
+            if indice is None:
+                return []
+
+            if regex:
+                padrao = re.compile(query, re.IGNORECASE)
+                casa = lambda texto: padrao.search(texto) is not None
+            else:
+                query_lower = query.lower()
+                casa = lambda texto: query_lower in texto.lower()
 
+            # Candidatos: caminho casa (o nome faz parte do caminho) ∪ conteúdo casa
+            candidatos = {a["caminho"]: a for a in indice.buscar_nome(query, regex=regex)}
+            if buscar_conteudo:
+                for arquivo in indice.buscar_conteudo(query, regex=regex):
+                    candidatos[arquivo["caminho"]] = arquivo
+
+            for arquivo in candidatos.values():
                 match_score = 0
                 match_info = {"tipo": []}
 
                 # Busca no nome do arquivo
-                if query_lower in arquivo.name.lower():
+                if casa(arquivo["nome"]):
                     match_score += 10
                     match_info["tipo"].append("nome")
 
                 # Busca no caminho
-                if query_lower in str(arquivo.relative_to(workspace_path)).lower():
+                if casa(arquivo["caminho"]):
                     match_score += 5
                     match_info["tipo"].append("caminho")
 
-                # Busca no conteúdo (apenas arquivos de texto)
-                if buscar_conteudo and arquivo.suffix.lower() in [".py", ".js", ".md", ".txt", ".json", ".yaml"]:
-                    try:
-                        conteudo = arquivo.read_text(encoding='utf-8', errors='ignore')
-                        if query_lower in conteudo.lower():
-                            match_score += 3
-                            match_info["tipo"].append("conteúdo")
-                    except Exception:
-                        pass
+                # Busca no conteúdo (resultado do índice)
+                ocorrencias = arquivo.get("ocorrencias", 0)
+                if ocorrencias:
+                    match_score += 3
+                    match_info["tipo"].append("conteúdo")
 
                 if match_score > 0:
-                    stat = arquivo.stat()
                     resultados.append({
-                        "nome": arquivo.name,
-                        "caminho": str(arquivo.relative_to(workspace_path)),
-                        "caminho_completo": str(arquivo),
-                        "tamanho_mb": round(stat.st_size / (1024 * 1024), 2),
-                        "categoria": self.categorizar_arquivo(str(arquivo)),
+                        "nome": arquivo["nome"],
+                        "caminho": arquivo["caminho"],
+                        "caminho_completo": arquivo["caminho_completo"],
+                        "tamanho_mb": round(arquivo["tamanho_bytes"] / (1024 * 1024), 2),
+                        "categoria": arquivo["categoria"],
                         "match_score": match_score,
-                        "match_tipo": ", ".join(match_info["tipo"])
+                        "match_tipo": ", ".join(match_info["tipo"]),
+                        "ocorrencias": ocorrencias,
+                        "trechos": arquivo.get("trechos", [])
                     })
 
-            # Ordenar por relevância (score)
-            resultados.sort(key=lambda x: x["match_score"], reverse=True)
+            # Ordenar por relevância (score, depois ocorrências no conteúdo)
+            resultados.sort(key=lambda x: (x["match_score"], x["ocorrencias"]), reverse=True)
 
+        except re.error as e:
+            self._log(f"Regex inválida na busca em '{nome}': {e}")
         except Exception as e:
             self._log(f"Erro ao buscar em '{nome}': {e}")
 
@@ -786,27 +875,14 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
         }
 
         try:
-            total_arquivos = 0
-            total_bytes = 0
-            categorias = {}
-            extensoes = {}
-
-            # Analisar todos os arquivos
-            for arquivo in workspace_path.rglob("*"):
-                if not arquivo.is_file():
-                    continue
+            # 🆕 Totais e distribuições agregados pelo índice (GROUP BY)
+            indice = self._indice(nome)
+            if indice is None:
+                return {"erro": "Caminho do workspace não existe"}
 
-                total_arquivos += 1
-                tamanho = arquivo.stat().st_size
-                total_bytes += tamanho
-
-                # Categorias
-                categoria = self.categorizar_arquivo(str(arquivo))
-                categorias[categoria] = categorias.get(categoria, 0) + 1
-
-                # Extensões
-                ext = arquivo.suffix.lower() or "sem extensão"
-                extensoes[ext] = extensoes.get(ext, 0) + 1
+            total_arquivos, total_bytes = indice.total()
+            categorias = indice.contagem_por("categoria")
+            extensoes = {(ext or "sem extensão"): qtd for ext, qtd in indice.contagem_por("extensao").items()}
 
             # Estatísticas
             analise["estatisticas"] = {
@@ -824,7 +900,7 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
             analise["tech_stack_detectado"] = self.detectar_tech_stack(nome)
 
             # Arquivos maiores (top 5)
-            analise["arquivos_maiores"] = self.obter_arquivos_recentes(nome, limite=5)
+            analise["arquivos_maiores"] = [self._info_arquivo(a) for a in indice.arquivos(ordem="maiores", limite=5)]
 
             # Arquivos recentes (top 5)
             analise["arquivos_recentes"] = self.obter_arquivos_recentes(nome, limite=5)
@@ -872,57 +948,41 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
         }
 
         try:
+            indice = self._indice(nome)
+            if indice is None:
+                return {"erro": "Workspace não existe"}
+
             # 1. Arquivos temporários
-            for arquivo in workspace_path.rglob("*"):
-                if not arquivo.is_file():
-                    continue
-
-                categoria = self.categorizar_arquivo(str(arquivo))
-                if categoria == "temp":
-                    tamanho_mb = arquivo.stat().st_size / (1024 * 1024)
-                    sugestoes["temporarios"].append({
-                        "nome": arquivo.name,
-                        "caminho": str(arquivo.relative_to(workspace_path)),
-                        "tamanho_mb": round(tamanho_mb, 2)
-                    })
-                    sugestoes["total_economizado_mb"] += tamanho_mb
+            for arquivo in indice.arquivos(categoria="temp"):
+                tamanho_mb = arquivo["tamanho_bytes"] / (1024 * 1024)
+                sugestoes["temporarios"].append({
+                    "nome": arquivo["nome"],
+                    "caminho": arquivo["caminho"],
+                    "tamanho_mb": round(tamanho_mb, 2)
+                })
+                sugestoes["total_economizado_mb"] += tamanho_mb
 
             # 2. Arquivos duplicados (mesmo nome e tamanho)
-            arquivos_por_nome = {}
-            for arquivo in workspace_path.rglob("*"):
-                if not arquivo.is_file():
-                    continue
-
-                chave = (arquivo.name, arquivo.stat().st_size)
-                if chave not in arquivos_por_nome:
-                    arquivos_por_nome[chave] = []
-                arquivos_por_nome[chave].append(arquivo)
-
-            for (nome_arq, tamanho), caminhos in arquivos_por_nome.items():
-                if len(caminhos) > 1:
-                    tamanho_mb = tamanho / (1024 * 1024)
-                    sugestoes["duplicados"].append({
-                        "nome": nome_arq,
-                        "ocorrencias": len(caminhos),
-                        "caminhos": [str(c.relative_to(workspace_path)) for c in caminhos],
-                        "tamanho_mb": round(tamanho_mb, 2),
-                        "economia_mb": round(tamanho_mb * (len(caminhos) - 1), 2)
-                    })
-                    sugestoes["total_economizado_mb"] += tamanho_mb * (len(caminhos) - 1)
+            for grupo in indice.duplicados():
+                tamanho_mb = grupo["tamanho_bytes"] / (1024 * 1024)
+                caminhos = grupo["caminhos"]
+                sugestoes["duplicados"].append({
+                    "nome": grupo["nome"],
+                    "ocorrencias": len(caminhos),
+                    "caminhos": caminhos,
+                    "tamanho_mb": round(tamanho_mb, 2),
+                    "economia_mb": round(tamanho_mb * (len(caminhos) - 1), 2)
+                })
+                sugestoes["total_economizado_mb"] += tamanho_mb * (len(caminhos) - 1)
 
             # 3. Arquivos grandes (> 10MB)
-            for arquivo in workspace_path.rglob("*"):
-                if not arquivo.is_file():
-                    continue
-
-                tamanho_mb = arquivo.stat().st_size / (1024 * 1024)
-                if tamanho_mb > 10:
-                    sugestoes["grandes"].append({
-                        "nome": arquivo.name,
-                        "caminho": str(arquivo.relative_to(workspace_path)),
-                        "tamanho_mb": round(tamanho_mb, 2),
-                        "categoria": self.categorizar_arquivo(str(arquivo))
-                    })
+            for arquivo in indice.arquivos(ordem="maiores", tamanho_minimo=10 * 1024 * 1024):
+                sugestoes["grandes"].append({
+                    "nome": arquivo["nome"],
+                    "caminho": arquivo["caminho"],
+                    "tamanho_mb": round(arquivo["tamanho_bytes"] / (1024 * 1024), 2),
+                    "categoria": arquivo["categoria"]
+                })
 
             # Ordenar por tamanho
             sugestoes["grandes"].sort(key=lambda x: x["tamanho_mb"], reverse=True)
@@ -954,15 +1014,10 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
             if "status" not in info:
                 info["status"] = "ativo"
 
-            # Atualizar informações
-            workspace_path = Path(info["caminho"])
-            if workspace_path.exists():
-                # Contar arquivos
-                arquivos = list(workspace_path.rglob("*"))
-                info["arquivos"] = len([f for f in arquivos if f.is_file()])
-
-                # Calcular tamanho
-                tamanho = sum(f.stat().st_size for f in arquivos if f.is_file())
+            # Atualizar informações (🆕 contagem e tamanho vêm do índice)
+            indice = self._indice(nome)
+            if indice:
+                info["arquivos"], tamanho = indice.total()
                 info["tamanho_bytes"] = tamanho
                 info["tamanho_mb"] = round(tamanho / (1024 * 1024), 2)
 
@@ -1058,6 +1113,7 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
         
         # Remover do config
         del self.config["workspaces"][nome]
+        self._descartar_indice(nome)
         
         # Se era o atual, limpar
         if self.config.get("workspace_atual") == nome:
@@ -1106,6 +1162,7 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
         
         self.config["workspaces"][nome_novo] = info
         del self.config["workspaces"][nome_antigo]
+        self._descartar_indice(nome_antigo)  # Recriado sob o novo nome no próximo uso
         
         # Se era o atual, atualizar
         if self.config.get("workspace_atual") == nome_antigo:
@@ -1218,7 +1275,11 @@ Criado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}
         
         try:
             if recursivo:
-                return [f for f in caminho_ws.rglob("*") if f.is_file()]
+                nome = workspace or self.config.get("workspace_atual")
+                indice = self._indice(nome)
+                if indice is None:
+                    return []
+                return [Path(a["caminho_completo"]) for a in indice.arquivos()]
             else:
                 return [f for f in caminho_ws.glob("*") if f.is_file()]
         except Exception as e:
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🗂️ ÍNDICE PERSISTENTE DE WORKSPACE - LUNA
+==========================================
+
+Mantém, por workspace, um índice SQLite com caminho, tamanho, mtime,
+extensão e categoria de cada arquivo. O GerenciadorWorkspaces responde
+listagens, estatísticas, arquivos recentes/maiores, duplicados e tech stack
+a partir dele em vez de percorrer a árvore com rglob() a cada chamada.
+
+Atualização incremental:
+- Cada diretório conhecido guarda seu mtime. Se o mtime não mudou, o
+  conteúdo do diretório (entradas criadas, removidas ou renomeadas) também
+  não mudou: a varredura custa um stat() por diretório, sem listar arquivos
+- Diretórios com mtime novo são relidos com os.scandir() e só os arquivos
+  com (tamanho, mtime) diferentes são reindexados
+- Edições no lugar (mesmo inode) não alteram o mtime do diretório; para
+  elas há uma verificação completa a cada `intervalo_verificacao` segundos
+  (ou atualizar(completa=True))
+
+Busca de conteúdo (🆕):
+- Arquivos de texto entram numa tabela FTS5 com tokenizer trigram (índice
+  invertido de trigramas), atualizada junto com o arquivo
+- A consulta (literal ou regex) vira uma interseção de trigramas que filtra
+  os candidatos; só eles são verificados com `re`, sem reler a árvore
+- Sem trigram no SQLite (< 3.34), a busca lê os arquivos de texto do disco
+
+Arquivo: <base_dir>/.indices/<workspace>.db (fora do workspace).
+"""
+
+import functools
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse as _sre_parse
+
+
+# Versão do esquema: mudança força reindexação completa
+VERSAO_INDICE = 2
+
+# Segundos entre verificações completas (detecta edições no lugar)
+INTERVALO_VERIFICACAO_COMPLETA = 30.0
+
+# Arquivos cujo conteúdo entra no índice de trigramas
+EXTENSOES_TEXTO = {
+    ".py", ".js", ".ts", ".jsx", ".tsx", ".java", ".c", ".cpp", ".h", ".go", ".rs", ".rb", ".php",
+    ".md", ".txt", ".rst", ".json", ".yaml", ".yml", ".toml", ".ini", ".cfg", ".conf", ".env",
+    ".html", ".htm", ".css", ".xml", ".csv", ".sql", ".sh", ".bat", ".ps1"
+}
+TAMANHO_MAXIMO_TEXTO = 1024 * 1024  # Arquivos maiores não têm o conteúdo indexado
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS arquivos (
+    id INTEGER PRIMARY KEY,         -- rowid estável (também é o rowid em `conteudo`)
+    caminho TEXT NOT NULL UNIQUE,   -- relativo ao workspace, separador '/'
+    diretorio TEXT NOT NULL,        -- '' para a raiz
+    nome TEXT NOT NULL,
+    extensao TEXT NOT NULL,         -- minúscula, com ponto ('' se não houver)
+    categoria TEXT NOT NULL,
+    tamanho INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    marcas TEXT NOT NULL DEFAULT '' -- tecnologias detectadas no conteúdo (separadas por ',')
+);
+CREATE INDEX IF NOT EXISTS idx_arquivos_diretorio ON arquivos(diretorio);
+CREATE INDEX IF NOT EXISTS idx_arquivos_mtime ON arquivos(mtime_ns);
+CREATE INDEX IF NOT EXISTS idx_arquivos_tamanho ON arquivos(tamanho);
+CREATE INDEX IF NOT EXISTS idx_arquivos_nome_tamanho ON arquivos(nome, tamanho);
+CREATE INDEX IF NOT EXISTS idx_arquivos_categoria ON arquivos(categoria);
+
+CREATE TABLE IF NOT EXISTS diretorios (
+    caminho TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS estado (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+# Índice invertido de trigramas (exige SQLite >= 3.34)
+ESQUEMA_CONTEUDO = """
+CREATE VIRTUAL TABLE IF NOT EXISTS conteudo USING fts5(texto, tokenize='trigram');
+
+CREATE TRIGGER IF NOT EXISTS arquivos_ad AFTER DELETE ON arquivos BEGIN
+    DELETE FROM conteudo WHERE rowid = old.id;
+END;
+"""
+
+
+def literais_obrigatorios(padrao: str) -> List[str]:
+    """
+    Trechos literais que toda ocorrência de uma regex precisa conter.
+
+    Percorre a árvore do parser de `re`: sequências de LITERAL formam um
+    trecho; grupos e repetições com mínimo >= 1 contribuem com os próprios
+    trechos; alternativas, classes e repetições opcionais interrompem.
+
+    Args:
+        padrao: Expressão regular
+
+    Returns:
+        Trechos com 3+ caracteres (os demais não geram trigramas)
+    """
+    try:
+        arvore = _sre_parse.parse(padrao)
+    except re.error:
+        return []
+
+    literais: List[str] = []
+
+    def percorrer(sequencia):
+        atual: List[str] = []
+        for op, valor in sequencia:
+            if op is _sre_parse.LITERAL:
+                atual.append(chr(valor))
+                continue
+            literais.append("".join(atual))
+            atual = []
+            if op is _sre_parse.SUBPATTERN:
+                percorrer(valor[-1])
+            elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT) and valor[0] >= 1:
+                percorrer(valor[2])
+        literais.append("".join(atual))
+
+    percorrer(arvore)
+    return [literal for literal in literais if len(literal) >= 3]
+
+
+@functools.lru_cache(maxsize=64)
+def _compilar(padrao: str) -> "re.Pattern":
+    return re.compile(padrao, re.IGNORECASE)
+
+
+class IndiceWorkspace:
+    """
+    Índice de arquivos de um workspace, atualizado por varreduras podadas por mtime.
+
+    Thread-safe (uma conexão + lock): ferramentas do agente podem rodar em
+    threads do despachante.
+    """
+
+    def __init__(self, raiz, arquivo_db, categorizar: Callable[[str], str],
+                 marcar: Optional[Callable[[Path, Optional[str]], List[str]]] = None,
+                 intervalo_verificacao: float = INTERVALO_VERIFICACAO_COMPLETA):
+        """
+        Args:
+            raiz: Pasta do workspace
+            arquivo_db: Banco SQLite do índice
+            categorizar: Função caminho → categoria (code, doc, config, ...)
+            marcar: Função opcional (caminho, texto) → tecnologias encontradas
+                no conteúdo; chamada só para arquivos novos ou alterados
+                (texto já lido quando o arquivo é indexado, senão None)
+            intervalo_verificacao: Segundos entre verificações completas
+        """
+        self.raiz = str(Path(raiz).resolve())
+        self.arquivo_db = str(arquivo_db)
+        self.categorizar = categorizar
+        self.marcar = marcar
+        self.intervalo_verificacao = intervalo_verificacao
+        self.metricas = {"atualizacoes": 0, "diretorios_lidos": 0, "arquivos_indexados": 0}
+
+        Path(self.arquivo_db).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.arquivo_db, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.create_function("minusculas", 1, lambda s: s.lower() if s else s, deterministic=True)
+        self._conn.create_function(
+            "regexp", 2, lambda padrao, texto: texto is not None and _compilar(padrao).search(texto) is not None,
+            deterministic=True
+        )
+        self._validar_estado()
+
+        self._diretorios: Dict[str, int] = {
+            linha["caminho"]: linha["mtime_ns"]
+            for linha in self._conn.execute("SELECT caminho, mtime_ns FROM diretorios")
+        }
+        self._ultima_completa = float("-inf")
+
+    def _validar_estado(self):
+        """Cria o esquema; índice de outra raiz ou versão é descartado."""
+        estado = {}
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'estado'").fetchone():
+            estado = dict(self._conn.execute("SELECT chave, valor FROM estado").fetchall())
+        valido = estado.get("raiz") == self.raiz and estado.get("versao") == str(VERSAO_INDICE)
+
+        with self._conn:
+            if not valido:
+                for tabela in ("conteudo", "arquivos", "diretorios", "estado"):
+                    self._conn.execute(f"DROP TABLE IF EXISTS {tabela}")
+            self._conn.executescript(ESQUEMA)
+            try:
+                self._conn.executescript(ESQUEMA_CONTEUDO)
+                self.busca_indexada = True
+            except sqlite3.OperationalError:
+                self.busca_indexada = False  # SQLite sem tokenizer trigram
+            if not valido:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO estado (chave, valor) VALUES (?, ?)",
+                    [("raiz", self.raiz), ("versao", str(VERSAO_INDICE))]
+                )
+
+    def fechar(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conn.close()
+
+    # ========================================================================
+    # ATUALIZAÇÃO INCREMENTAL
+    # ========================================================================
+
+    def atualizar(self, completa: bool = False) -> Dict[str, int]:
+        """
+        Sincroniza o índice com o disco.
+
+        Args:
+            completa: Relê todos os diretórios (também ocorre sozinha a cada
+                intervalo_verificacao segundos)
+
+        Returns:
+            Contadores desta atualização (novos, alterados, removidos,
+            diretorios_lidos)
+        """
+        with self._lock:
+            agora = time.monotonic()
+            completa = completa or (agora - self._ultima_completa) >= self.intervalo_verificacao
+            stats = {"novos": 0, "alterados": 0, "removidos": 0, "diretorios_lidos": 0}
+
+            filhos: Dict[str, List[str]] = {}
+            for caminho in self._diretorios:
+                if caminho:
+                    filhos.setdefault(self._pai(caminho), []).append(caminho)
+
+            with self._conn:
+                visitados = set()
+                pilha = [""]
+                while pilha:
+                    relativo = pilha.pop()
+                    try:
+                        mtime_ns = os.stat(self._absoluto(relativo)).st_mtime_ns
+                    except OSError:
+                        continue
+                    visitados.add(relativo)
+
+                    if not completa and self._diretorios.get(relativo) == mtime_ns:
+                        pilha.extend(filhos.get(relativo, ()))
+                        continue
+
+                    stats["diretorios_lidos"] += 1
+                    pilha.extend(self._reindexar_diretorio(relativo, mtime_ns, stats))
+
+                for relativo in set(self._diretorios) - visitados:
+                    stats["removidos"] += self._conn.execute(
+                        "DELETE FROM arquivos WHERE diretorio = ?", (relativo,)
+                    ).rowcount
+                    self._conn.execute("DELETE FROM diretorios WHERE caminho = ?", (relativo,))
+                    del self._diretorios[relativo]
+
+            if completa:
+                self._ultima_completa = agora
+            self.metricas["atualizacoes"] += 1
+            self.metricas["diretorios_lidos"] += stats["diretorios_lidos"]
+            self.metricas["arquivos_indexados"] += stats["novos"] + stats["alterados"]
+            return stats
+
+    def _reindexar_diretorio(self, relativo: str, mtime_ns: int, stats: Dict[str, int]) -> List[str]:
+        """Relê um diretório, atualiza seus arquivos e devolve os subdiretórios."""
+        existentes: Dict[str, Tuple[int, int]] = {
+            linha["nome"]: (linha["tamanho"], linha["mtime_ns"])
+            for linha in self._conn.execute(
+                "SELECT nome, tamanho, mtime_ns FROM arquivos WHERE diretorio = ?", (relativo,)
+            )
+        }
+        subdiretorios: List[str] = []
+        presentes = set()
+
+        try:
+            with os.scandir(self._absoluto(relativo)) as entradas:
+                for entrada in entradas:
+                    try:
+                        if entrada.is_dir(follow_symlinks=False):
+                            subdiretorios.append(self._juntar(relativo, entrada.name))
+                            continue
+                        if not entrada.is_file():
+                            continue
+                        st = entrada.stat()
+                    except OSError:
+                        continue
+
+                    presentes.add(entrada.name)
+                    anterior = existentes.get(entrada.name)
+                    if anterior == (st.st_size, st.st_mtime_ns):
+                        continue
+                    self._indexar_arquivo(relativo, entrada.name, st.st_size, st.st_mtime_ns)
+                    stats["novos" if anterior is None else "alterados"] += 1
+        except OSError:
+            # Sem permissão/corrida: mantém o que já estava indexado
+            return [d for d in self._diretorios if d and self._pai(d) == relativo]
+
+        for nome in set(existentes) - presentes:
+            self._conn.execute("DELETE FROM arquivos WHERE caminho = ?", (self._juntar(relativo, nome),))
+            stats["removidos"] += 1
+
+        self._diretorios[relativo] = mtime_ns
+        self._conn.execute(
+            "INSERT OR REPLACE INTO diretorios (caminho, mtime_ns) VALUES (?, ?)", (relativo, mtime_ns)
+        )
+        return subdiretorios
+
+    def _indexar_arquivo(self, diretorio: str, nome: str, tamanho: int, mtime_ns: int):
+        caminho = self._juntar(diretorio, nome)
+        absoluto = Path(self._absoluto(caminho))
+        extensao = absoluto.suffix.lower()
+        texto = self._ler_texto(absoluto, extensao, tamanho)
+
+        marcas = ""
+        if self.marcar:
+            try:
+                marcas = ",".join(sorted(set(self.marcar(absoluto, texto))))
+            except Exception:
+                marcas = ""
+
+        # Upsert mantém o id (rowid do conteúdo) estável entre versões do arquivo
+        self._conn.execute(
+            "INSERT INTO arquivos "
+            "(caminho, diretorio, nome, extensao, categoria, tamanho, mtime_ns, marcas) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(caminho) DO UPDATE SET tamanho = excluded.tamanho, "
+            "mtime_ns = excluded.mtime_ns, categoria = excluded.categoria, marcas = excluded.marcas",
+            (caminho, diretorio, nome, extensao, self.categorizar(str(absoluto)),
+             tamanho, mtime_ns, marcas)
+        )
+
+        if self.busca_indexada:
+            id_arquivo = self._conn.execute(
+                "SELECT id FROM arquivos WHERE caminho = ?", (caminho,)
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM conteudo WHERE rowid = ?", (id_arquivo,))
+            if texto:
+                self._conn.execute("INSERT INTO conteudo (rowid, texto) VALUES (?, ?)", (id_arquivo, texto))
+
+    @staticmethod
+    def _ler_texto(absoluto: Path, extensao: str, tamanho: int) -> Optional[str]:
+        """Conteúdo de arquivos de texto indexáveis (None para binários/grandes)."""
+        if extensao not in EXTENSOES_TEXTO or tamanho > TAMANHO_MAXIMO_TEXTO:
+            return None
+        try:
+            texto = absoluto.read_text(encoding="utf-8", errors="ignore")
+        except OSError:
+            return None
+        return None if "\x00" in texto[:8192] else texto
+
+    @staticmethod
+    def _juntar(diretorio: str, nome: str) -> str:
+        return f"{diretorio}/{nome}" if diretorio else nome
+
+    @staticmethod
+    def _pai(caminho: str) -> str:
+        return caminho.rpartition("/")[0]
+
+    def _absoluto(self, relativo: str) -> str:
+        return os.path.join(self.raiz, *relativo.split("/")) if relativo else self.raiz
+
+    # ========================================================================
+    # CONSULTAS
+    # ========================================================================
+
+    def _linha_para_dict(self, linha: sqlite3.Row) -> Dict:
+        return {
+            "nome": linha["nome"],
+            "caminho": linha["caminho"].replace("/", os.sep),
+            "caminho_completo": self._absoluto(linha["caminho"]),
+            "extensao": linha["extensao"],
+            "categoria": linha["categoria"],
+            "tamanho_bytes": linha["tamanho"],
+            "mtime": linha["mtime_ns"] / 1e9,
+        }
+
+    def _consultar(self, sql: str, parametros: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, parametros).fetchall()
+
+    def total(self) -> Tuple[int, int]:
+        """(quantidade de arquivos, bytes totais)"""
+        linha = self._consultar("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM arquivos")[0]
+        return linha[0], linha[1]
+
+    def arquivos(self, ordem: str = "caminho", limite: Optional[int] = None,
+                 categoria: Optional[str] = None, tamanho_minimo: Optional[int] = None,
+                 extensoes: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Lista arquivos indexados.
+
+        Args:
+            ordem: 'caminho', 'recentes' (mtime desc) ou 'maiores' (tamanho desc)
+            limite: Máximo de resultados
+            categoria: Filtra por categoria
+            tamanho_minimo: Filtra por tamanho (bytes, exclusivo)
+            extensoes: Filtra por extensão ('.py', ...)
+        """
+        ordenacao = {"caminho": "caminho", "recentes": "mtime_ns DESC", "maiores": "tamanho DESC"}[ordem]
+        filtros, parametros = [], []
+        if categoria is not None:
+            filtros.append("categoria = ?")
+            parametros.append(categoria)
+        if tamanho_minimo is not None:
+            filtros.append("tamanho > ?")
+            parametros.append(tamanho_minimo)
+        if extensoes:
+            filtros.append(f"extensao IN ({','.join('?' * len(extensoes))})")
+            parametros.extend(extensoes)
+
+        sql = "SELECT * FROM arquivos"
+        if filtros:
+            sql += " WHERE " + " AND ".join(filtros)
+        sql += f" ORDER BY {ordenacao}"
+        if limite is not None:
+            sql += " LIMIT ?"
+            parametros.append(limite)
+        return [self._linha_para_dict(l) for l in self._consultar(sql, tuple(parametros))]
+
+    def contagem_por(self, coluna: str) -> Dict[str, int]:
+        """Quantidade de arquivos por 'categoria' ou 'extensao' (maior primeiro)."""
+        if coluna not in ("categoria", "extensao"):
+            raise ValueError(f"Coluna não agregável: {coluna}")
+        linhas = self._consultar(
+            f"SELECT {coluna}, COUNT(*) FROM arquivos GROUP BY {coluna} ORDER BY COUNT(*) DESC, {coluna}"
+        )
+        return {linha[0]: linha[1] for linha in linhas}
+
+    def duplicados(self) -> List[Dict]:
+        """Grupos de arquivos com mesmo nome e tamanho."""
+        grupos: Dict[Tuple[str, int], List[str]] = {}
+        linhas = self._consultar(
+            "SELECT a.nome, a.tamanho, a.caminho FROM arquivos a "
+            "JOIN (SELECT nome, tamanho FROM arquivos GROUP BY nome, tamanho HAVING COUNT(*) > 1) d "
+            "ON a.nome = d.nome AND a.tamanho = d.tamanho ORDER BY a.nome, a.caminho"
+        )
+        for linha in linhas:
+            grupos.setdefault((linha["nome"], linha["tamanho"]), []).append(
+                linha["caminho"].replace("/", os.sep)
+            )
+        return [{"nome": nome, "tamanho_bytes": tamanho, "caminhos": caminhos}
+                for (nome, tamanho), caminhos in grupos.items()]
+
+    def extensoes(self) -> List[str]:
+        """Extensões presentes no workspace."""
+        return [l[0] for l in self._consultar("SELECT DISTINCT extensao FROM arquivos")]
+
+    def marcas(self) -> List[str]:
+        """Tecnologias encontradas no conteúdo de algum arquivo."""
+        encontradas = set()
+        for linha in self._consultar("SELECT DISTINCT marcas FROM arquivos WHERE marcas != ''"):
+            encontradas.update(linha[0].split(","))
+        return sorted(encontradas)
+
+    def buscar_nome(self, termo: str, regex: bool = False) -> List[Dict]:
+        """
+        Arquivos cujo caminho relativo contém `termo` (sem diferenciar maiúsculas).
+
+        Args:
+            termo: Texto procurado, ou expressão regular se regex=True
+            regex: Interpreta `termo` como regex (re.search)
+        """
+        if regex:
+            _compilar(termo)  # re.error sobe aqui, não dentro do SQLite
+            linhas = self._consultar("SELECT * FROM arquivos WHERE caminho REGEXP ? ORDER BY caminho", (termo,))
+        else:
+            linhas = self._consultar(
+                "SELECT * FROM arquivos WHERE instr(minusculas(caminho), ?) > 0 ORDER BY caminho",
+                (termo.lower(),)
+            )
+        return [self._linha_para_dict(l) for l in linhas]
+
+    def buscar_conteudo(self, consulta: str, regex: bool = False, limite: Optional[int] = None,
+                        max_trechos: int = 3) -> List[Dict]:
+        """
+        Busca no conteúdo dos arquivos de texto (sem diferenciar maiúsculas).
+
+        Os trigramas dos trechos obrigatórios da consulta selecionam os
+        candidatos no índice; cada candidato é verificado com `re` sobre o
+        texto indexado. Consultas sem trecho de 3+ caracteres verificam
+        todos os arquivos de texto.
+
+        Args:
+            consulta: Texto procurado, ou expressão regular se regex=True
+            regex: Interpreta `consulta` como regex
+            limite: Máximo de resultados
+            max_trechos: Linhas de exemplo por arquivo
+
+        Returns:
+            Arquivos (mesmo formato de arquivos()) com 'ocorrencias' e
+            'trechos' [(linha, texto)], mais relevantes primeiro: mais
+            ocorrências, depois maior densidade (arquivo menor)
+
+        Raises:
+            re.error: Regex inválida
+        """
+        expressao = _compilar(consulta if regex else re.escape(consulta))
+        literais = literais_obrigatorios(consulta) if regex else [consulta]
+        literais = [literal for literal in literais if len(literal) >= 3]
+
+        resultados = []
+        for linha, texto in self._candidatos(literais):
+            ocorrencias = 0
+            trechos = []
+            inicio_anterior = -1
+            for encontrado in expressao.finditer(texto):
+                ocorrencias += 1
+                inicio = texto.rfind("\n", 0, encontrado.start()) + 1
+                if len(trechos) < max_trechos and inicio != inicio_anterior:  # Um trecho por linha
+                    inicio_anterior = inicio
+                    fim = texto.find("\n", encontrado.start())
+                    trechos.append((texto.count("\n", 0, encontrado.start()) + 1,
+                                    texto[inicio:fim if fim != -1 else len(texto)].strip()[:200]))
+            if ocorrencias:
+                resultado = self._linha_para_dict(linha)
+                resultado["ocorrencias"] = ocorrencias
+                resultado["trechos"] = trechos
+                resultados.append(resultado)
+
+        resultados.sort(key=lambda r: (-r["ocorrencias"], r["tamanho_bytes"], r["caminho"]))
+        return resultados[:limite] if limite is not None else resultados
+
+    def _candidatos(self, literais: List[str]):
+        """(linha de arquivos, texto) dos arquivos que podem conter a consulta."""
+        if not self.busca_indexada:
+            # Sem trigram: lê do disco os arquivos de texto indexáveis
+            extensoes = sorted(EXTENSOES_TEXTO)
+            linhas = self._consultar(
+                f"SELECT * FROM arquivos WHERE extensao IN ({','.join('?' * len(extensoes))}) "
+                "AND tamanho <= ?", (*extensoes, TAMANHO_MAXIMO_TEXTO)
+            )
+            for linha in linhas:
+                texto = self._ler_texto(Path(self._absoluto(linha["caminho"])), linha["extensao"], 0)
+                if texto:
+                    yield linha, texto
+            return
+
+        sql = "SELECT a.*, c.texto AS texto FROM conteudo c JOIN arquivos a ON a.id = c.rowid"
+        parametros: tuple = ()
+        if literais:
+            # Frase FTS5 por trecho ("" escapa aspas); AND = interseção das listas de trigramas
+            sql += " WHERE conteudo MATCH ?"
+            parametros = (" AND ".join('"' + literal.replace('"', '""') + '"' for literal in literais),)
+        for linha in self._consultar(sql, parametros):
+            yield linha, linha["texto"]
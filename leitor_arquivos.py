@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📖 LEITOR DE ARQUIVOS PAGINADO - LUNA
+=====================================
+
+Leitura de trechos de arquivos grandes sem carregá-los inteiros, usada
+por ler_arquivo:
+
+- offset/limite: bytes a partir de um offset (páginas consecutivas)
+- linha_inicio/linha_fim: intervalo de linhas, numeradas
+- buscar: grep dentro do arquivo (literal ou regex, com linhas de contexto)
+
+O arquivo é aberto com mmap (o sistema operacional só traz para a memória
+as páginas tocadas). Para ir direto a uma linha há um índice esparso com
+o offset de cada PASSO_INDICE-ésima linha, montado uma vez por versão do
+arquivo (tamanho + mtime) e mantido num cache LRU.
+"""
+
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate, islice
+from typing import Dict, List, Optional, Tuple
+
+
+# Uma entrada no índice a cada N linhas (8 bytes por entrada)
+PASSO_INDICE = 64
+
+# Bytes lidos por vez ao montar o índice
+BLOCO_INDICE = 4 * 1024 * 1024
+
+# Padrões da ferramenta
+LIMITE_PADRAO = 5000
+MAX_RESULTADOS_BUSCA = 50
+MAX_CARACTERES_LINHA = 500
+
+
+class IndiceLinhas:
+    """
+    Offsets de início das linhas 1, 1+PASSO, 1+2·PASSO, ... de um arquivo.
+
+    Atributos:
+        pontos: array('Q') com os offsets (pontos[i] = início da linha i·PASSO + 1)
+        total_linhas: Linhas do arquivo (a última pode não terminar em \\n)
+        assinatura: (tamanho, mtime_ns) da versão indexada
+    """
+
+    __slots__ = ("pontos", "total_linhas", "assinatura")
+
+    def __init__(self, dados, assinatura: Tuple[int, int]):
+        self.assinatura = assinatura
+        self.pontos = array("Q", [0])
+        tamanho = len(dados)
+        quebras = 0
+        inicio = 0
+
+        while inicio < tamanho:
+            # Blocos terminam logo após um \n (linha longa estende o bloco)
+            fim = dados.rfind(b"\n", inicio, min(inicio + BLOCO_INDICE, tamanho)) + 1
+            if fim <= inicio:
+                proxima = dados.find(b"\n", inicio + BLOCO_INDICE)
+                fim = tamanho if proxima == -1 else proxima + 1
+            partes = dados[inicio:fim].split(b"\n")
+            partes.pop()  # Depois do último \n (vazio, ou a linha final sem \n)
+
+            # A j-ésima quebra do bloco (1-based) inicia a linha quebras+j+1, no
+            # offset inicio + (soma dos j primeiros comprimentos) + j. Só as
+            # quebras múltiplas de PASSO entram no índice; islice/accumulate em C.
+            primeira = PASSO_INDICE - quebras % PASSO_INDICE
+            acumulados = islice(accumulate(map(len, partes)), primeira - 1, None, PASSO_INDICE)
+            self.pontos.extend(inicio + soma + j for j, soma in zip(
+                range(primeira, len(partes) + 1, PASSO_INDICE), acumulados
+            ))
+            quebras += len(partes)
+            inicio = fim
+
+        termina_sem_quebra = tamanho > 0 and dados[tamanho - 1:tamanho] != b"\n"
+        self.total_linhas = quebras + (1 if termina_sem_quebra else 0)
+        if not termina_sem_quebra and quebras and quebras % PASSO_INDICE == 0:
+            self.pontos.pop()  # Ponto no fim do arquivo (não há linha ali)
+
+    def offset_da_linha(self, dados, numero: int) -> int:
+        """Offset do início da linha `numero` (1-based)."""
+        ponto = (numero - 1) // PASSO_INDICE
+        posicao = self.pontos[ponto]
+        for _ in range((numero - 1) - ponto * PASSO_INDICE):
+            posicao = dados.find(b"\n", posicao) + 1
+        return posicao
+
+    def linha_do_offset(self, dados, offset: int) -> int:
+        """Número (1-based) da linha que contém `offset`."""
+        ponto = bisect_right(self.pontos, offset) - 1
+        return ponto * PASSO_INDICE + 1 + dados[self.pontos[ponto]:offset].count(b"\n")
+
+
+class LeitorArquivos:
+    """
+    Leituras paginadas e busca em arquivos, com cache dos índices de linha.
+
+    Uso:
+        leitor = LeitorArquivos()
+        leitor.ler_linhas("app.log", 1000, 1050)     # [(1000, "..."), ...]
+        leitor.buscar("app.log", r"ERRO \\d+", regex=True, contexto=2)
+        leitor.consultar("app.log", offset=5000)      # texto pronto para o modelo
+    """
+
+    def __init__(self, max_indices: int = 32):
+        """
+        Args:
+            max_indices: Arquivos com índice de linhas mantido em memória
+        """
+        self.max_indices = max_indices
+        self._indices: "OrderedDict[str, IndiceLinhas]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ==================== ACESSO ====================
+
+    @staticmethod
+    def _abrir(caminho: str):
+        """(arquivo, mmap ou b"" se vazio, (tamanho, mtime_ns))."""
+        arquivo = open(caminho, "rb")
+        stat = os.fstat(arquivo.fileno())
+        if stat.st_size == 0:
+            return arquivo, b"", (0, stat.st_mtime_ns)
+        return arquivo, mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ), (stat.st_size, stat.st_mtime_ns)
+
+    @staticmethod
+    def _fechar(arquivo, dados) -> None:
+        if isinstance(dados, mmap.mmap):
+            dados.close()
+        arquivo.close()
+
+    def _indice(self, caminho: str, dados, assinatura: Tuple[int, int]) -> IndiceLinhas:
+        """Índice de linhas do arquivo (reconstruído se o arquivo mudou)."""
+        chave = os.path.realpath(caminho)
+        with self._lock:
+            indice = self._indices.get(chave)
+            if indice is not None and indice.assinatura == assinatura:
+                self._indices.move_to_end(chave)
+                return indice
+
+        indice = IndiceLinhas(dados, assinatura)
+        with self._lock:
+            self._indices[chave] = indice
+            self._indices.move_to_end(chave)
+            while len(self._indices) > self.max_indices:
+                self._indices.popitem(last=False)
+        return indice
+
+    @staticmethod
+    def _decodificar(dados: bytes) -> str:
+        return dados.decode("utf-8", errors="replace")
+
+    # ==================== LEITURAS ====================
+
+    def info(self, caminho: str) -> Dict[str, int]:
+        """Tamanho em bytes e total de linhas."""
+        arquivo, dados, assinatura = self._abrir(caminho)
+        try:
+            return {"tamanho": assinatura[0], "total_linhas": self._indice(caminho, dados, assinatura).total_linhas}
+        finally:
+            self._fechar(arquivo, dados)
+
+    def ler(self, caminho: str, offset: int = 0, limite: int = LIMITE_PADRAO) -> Tuple[str, int, int]:
+        """
+        Até `limite` bytes a partir de `offset`.
+
+        O fim do trecho recua até uma fronteira de caractere UTF-8, para que
+        a página seguinte (a partir do offset devolvido) não comece no meio
+        de um caractere.
+
+        Returns:
+            (texto, próximo offset, tamanho do arquivo)
+        """
+        arquivo, dados, (tamanho, _) = self._abrir(caminho)
+        try:
+            offset = max(0, min(offset, tamanho))
+            fim = min(tamanho, offset + max(1, limite))
+            if fim < tamanho:
+                recuo = fim
+                while recuo > offset and recuo > fim - 4 and (dados[recuo] & 0xC0) == 0x80:
+                    recuo -= 1
+                if recuo > offset:
+                    fim = recuo
+            return self._decodificar(dados[offset:fim]), fim, tamanho
+        finally:
+            self._fechar(arquivo, dados)
+
+    def ler_linhas(self, caminho: str, inicio: int, fim: Optional[int] = None,
+                   limite: int = LIMITE_PADRAO) -> Tuple[List[Tuple[int, str]], int]:
+        """
+        Linhas `inicio`..`fim` (1-based, inclusivo), até ~`limite` caracteres.
+
+        Returns:
+            ([(número, linha)], total de linhas do arquivo)
+        """
+        arquivo, dados, assinatura = self._abrir(caminho)
+        try:
+            indice = self._indice(caminho, dados, assinatura)
+            inicio = max(1, inicio)
+            fim = min(indice.total_linhas, fim if fim else indice.total_linhas)
+            if inicio > fim:
+                return [], indice.total_linhas
+
+            linhas: List[Tuple[int, str]] = []
+            posicao = indice.offset_da_linha(dados, inicio)
+            usados = 0
+            for numero in range(inicio, fim + 1):
+                quebra = dados.find(b"\n", posicao)
+                final = len(dados) if quebra == -1 else quebra
+                texto = self._decodificar(dados[posicao:min(final, posicao + MAX_CARACTERES_LINHA * 4)])
+                texto = texto.rstrip("\r")
+                if len(texto) > MAX_CARACTERES_LINHA:
+                    texto = texto[:MAX_CARACTERES_LINHA] + "…"
+                if linhas and usados + len(texto) > limite:
+                    break
+                linhas.append((numero, texto))
+                usados += len(texto) + 1
+                posicao = final + 1
+            return linhas, indice.total_linhas
+        finally:
+            self._fechar(arquivo, dados)
+
+    def buscar(self, caminho: str, padrao: str, regex: bool = False, contexto: int = 0,
+               max_resultados: int = MAX_RESULTADOS_BUSCA) -> Dict:
+        """
+        Linhas do arquivo que contêm `padrao` (sem diferenciar maiúsculas ASCII).
+
+        A regex roda direto sobre o mmap; depois de cada ocorrência a busca
+        continua na linha seguinte (uma entrada por linha).
+
+        Args:
+            caminho: Arquivo
+            padrao: Texto, ou expressão regular se regex=True
+            regex: Interpreta `padrao` como regex
+            contexto: Linhas antes/depois de cada ocorrência
+            max_resultados: Ocorrências detalhadas (as demais só são contadas)
+
+        Returns:
+            {'total': linhas com ocorrência, 'total_linhas': linhas do arquivo,
+             'trechos': [[(número, linha, é_ocorrência), ...], ...]}
+
+        Raises:
+            re.error: Regex inválida
+        """
+        expressao = re.compile(padrao.encode("utf-8") if regex else re.escape(padrao.encode("utf-8")),
+                               re.IGNORECASE | re.MULTILINE)
+        arquivo, dados, assinatura = self._abrir(caminho)
+        try:
+            indice = self._indice(caminho, dados, assinatura)
+            ocorrencias: List[int] = []
+            total = 0
+            posicao = 0
+            while True:
+                encontrado = expressao.search(dados, posicao)
+                if encontrado is None:
+                    break
+                total += 1
+                if len(ocorrencias) < max_resultados:
+                    ocorrencias.append(indice.linha_do_offset(dados, encontrado.start()))
+                quebra = dados.find(b"\n", max(encontrado.start(), encontrado.end() - 1))
+                if quebra == -1:
+                    break
+                posicao = quebra + 1
+        finally:
+            self._fechar(arquivo, dados)
+
+        # Agrupa ocorrências cujos contextos se encostam em um único trecho
+        intervalos: List[List[int]] = []
+        for numero in ocorrencias:
+            inicio, fim = max(1, numero - contexto), numero + contexto
+            if intervalos and inicio <= intervalos[-1][1] + 1:
+                intervalos[-1][1] = max(intervalos[-1][1], fim)
+            else:
+                intervalos.append([inicio, fim])
+
+        marcadas = set(ocorrencias)
+        trechos = []
+        for inicio, fim in intervalos:
+            linhas, _ = self.ler_linhas(caminho, inicio, fim, limite=(fim - inicio + 1) * (MAX_CARACTERES_LINHA + 1))
+            trechos.append([(numero, texto, numero in marcadas) for numero, texto in linhas])
+        return {"total": total, "total_linhas": indice.total_linhas, "trechos": trechos}
+
+    # ==================== SAÍDA PARA O MODELO ====================
+
+    def consultar(self, caminho: str, linha_inicio: int = 0, linha_fim: int = 0, offset: int = 0,
+                  limite: int = LIMITE_PADRAO, buscar: str = "", regex: bool = False,
+                  contexto: int = 0) -> str:
+        """
+        Resposta de ler_arquivo: busca, intervalo de linhas ou página por offset.
+
+        Sem parâmetros de navegação devolve o começo do arquivo, como antes;
+        quando o arquivo não cabe, um rodapé diz como pedir o restante.
+        """
+        limite = limite if limite and limite > 0 else LIMITE_PADRAO
+
+        if buscar:
+            resultado = self.buscar(caminho, buscar, regex=regex, contexto=max(0, contexto))
+            if not resultado["total"]:
+                return f"Nenhuma ocorrência de '{buscar}' ({resultado['total_linhas']} linhas)"
+            partes = [f"{resultado['total']} linha(s) com '{buscar}' de {resultado['total_linhas']}:"]
+            for trecho in resultado["trechos"]:
+                partes.append("\n".join(
+                    f"{numero:>6}{':' if ocorrencia else '-'} {texto}" for numero, texto, ocorrencia in trecho
+                ))
+            if resultado["total"] > sum(1 for t in resultado["trechos"] for _, _, o in t if o):
+                partes.append(f"… (mostradas as primeiras {MAX_RESULTADOS_BUSCA}; refine a busca)")
+            return "\n--\n".join(partes)
+
+        if linha_inicio or linha_fim:
+            linhas, total = self.ler_linhas(caminho, linha_inicio or 1, linha_fim or None, limite=limite)
+            if not linhas:
+                return f"[Sem linhas nesse intervalo: o arquivo tem {total} linhas]"
+            texto = "\n".join(f"{numero:>6}| {linha}" for numero, linha in linhas)
+            ultima = linhas[-1][0]
+            if ultima < (linha_fim or total):
+                texto += (f"\n[… parou na linha {ultima} de {total} pelo limite de caracteres; "
+                          f"continue com linha_inicio={ultima + 1}]")
+            elif ultima < total:
+                texto += f"\n[linhas {linhas[0][0]}-{ultima} de {total}]"
+            return texto
+
+        texto, proximo, tamanho = self.ler(caminho, offset=offset, limite=limite)
+        if offset == 0 and proximo >= tamanho:
+            return texto  # Arquivo inteiro: saída igual à de antes
+        total_linhas = self.info(caminho)["total_linhas"]
+        rodape = f"\n[bytes {offset}-{proximo} de {tamanho} ({total_linhas} linhas)"
+        if proximo < tamanho:
+            rodape += (f"; próxima página: offset={proximo}. Também: linha_inicio/linha_fim "
+                       f"para um intervalo de linhas, buscar='texto' para localizar]")
+        else:
+            rodape += "; fim do arquivo]"
+        return texto + rodape
@@ -41,16 +41,26 @@ import os
 import sys
 import subprocess
 import json
+import re
+import heapq
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 import getpass
 from pathlib import Path
 import time
+import random
 import signal
 import atexit
+import asyncio
+import contextvars
+import functools
+import types
+import weakref
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional, Tuple, Callable, Union
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple, Callable, Union, Deque, Set
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, Future, wait, FIRST_COMPLETED
 import threading
 
 # ════════════════════════════════════════════════════════════════════════════
@@ -270,10 +280,383 @@ except ImportError:
     TELEMETRIA_DISPONIVEL = False
     print_realtime("⚠️  telemetria_manager.py não encontrado")
 
+# 🆕 Sessões bash persistentes (cwd/variáveis mantidos entre comandos)
+try:
+    from sessao_bash import GerenciadorSessoesBash
+    SESSAO_BASH_DISPONIVEL = True
+except ImportError:
+    SESSAO_BASH_DISPONIVEL = False
+    print_realtime("⚠️  sessao_bash.py não encontrado")
+
+# 🆕 Leitura paginada de arquivos (mmap + índice de linhas + grep)
+try:
+    from leitor_arquivos import LeitorArquivos
+    LEITOR_ARQUIVOS_DISPONIVEL = True
+except ImportError:
+    LEITOR_ARQUIVOS_DISPONIVEL = False
+    print_realtime("⚠️  leitor_arquivos.py não encontrado")
+
+# 🆕 Edição pontual de arquivos (buscar/substituir, unified diff, gravação atômica)
+try:
+    from editor_arquivos import EditorArquivos
+    EDITOR_ARQUIVOS_DISPONIVEL = True
+except ImportError:
+    EDITOR_ARQUIVOS_DISPONIVEL = False
+    print_realtime("⚠️  editor_arquivos.py não encontrado")
+
+# 🆕 Cache de planos (reaproveita planos bem-sucedidos de tarefas parecidas)
+try:
+    from cache_planos import CachePlanos
+    CACHE_PLANOS_DISPONIVEL = True
+except ImportError:
+    CACHE_PLANOS_DISPONIVEL = False
+    print_realtime("⚠️  cache_planos.py não encontrado")
+
 # Carregar configuração
 load_dotenv()
 
 
+# ════════════════════════════════════════════════════════════════════════════
+# RASTREAMENTO DE SPANS (🆕 LUNA_TRACE=1 → Chrome trace-event JSON)
+# ════════════════════════════════════════════════════════════════════════════
+
+# Span aberto mais interno da execução atual. ContextVar acompanha threads
+# (via contextvars.copy_context) e tasks asyncio sem estado global por thread.
+_SPAN_ATUAL: contextvars.ContextVar = contextvars.ContextVar("luna_span_atual", default=None)
+
+
+class Span:
+    """
+    Intervalo rastreado (tarefa, fase, onda, subtarefa, iteração, API, ferramenta).
+
+    Criado por RastreadorSpans.iniciar()/span(). Fechar um span fecha antes
+    os filhos que ainda estiverem abertos, então spans "soltos" (ex.: a
+    iteração corrente quando a tarefa retorna no meio do laço) não vazam.
+    """
+
+    __slots__ = ('rastreador', 'id', 'nome', 'categoria', 'pai', 'raiz', 'tid',
+                 'inicio', 'fim', 'args', 'filhos_abertos')
+
+    def __init__(self, rastreador: 'RastreadorSpans', id: int, nome: str, categoria: str,
+                 pai: Optional['Span'], tid: int, args: Dict[str, Any]):
+        self.rastreador = rastreador
+        self.id = id
+        self.nome = nome
+        self.categoria = categoria
+        self.pai = pai
+        self.raiz = pai.raiz if pai is not None else id
+        self.tid = tid
+        self.inicio = time.perf_counter_ns()
+        self.fim: Optional[int] = None
+        self.args = args
+        self.filhos_abertos: List['Span'] = []
+
+    def anotar(self, **args) -> None:
+        """Adiciona argumentos exibidos no trace (ex.: tokens, status)."""
+        self.args.update(args)
+
+    def finalizar(self, **args) -> None:
+        """Fecha o span (e filhos abertos); idempotente."""
+        self.rastreador._finalizar(self, args)
+
+    def __enter__(self) -> 'Span':
+        return self
+
+    def __exit__(self, tipo, valor, tb) -> bool:
+        if valor is not None:
+            self.args['erro'] = f"{tipo.__name__}: {str(valor)[:200]}"
+        self.finalizar()
+        return False
+
+
+class _SpanNulo:
+    """Span sem efeito usado quando o rastreador está desligado."""
+
+    __slots__ = ()
+
+    def anotar(self, **args) -> None:
+        pass
+
+    def finalizar(self, **args) -> None:
+        pass
+
+    def __enter__(self) -> '_SpanNulo':
+        return self
+
+    def __exit__(self, tipo, valor, tb) -> bool:
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+class RastreadorSpans:
+    """
+    Rastreador opt-in de spans aninhados exportável como Chrome trace-event JSON.
+
+    Hierarquia registrada: tarefa → fase de planejamento → onda → subtarefa →
+    iteração → chamada de API / ferramenta. Cada span guarda a thread (ou a
+    task asyncio, como thread virtual), o span pai e os argumentos anotados
+    (tokens, ferramenta, erro). O arquivo gerado abre direto em
+    chrome://tracing ou https://ui.perfetto.dev como flame chart; filhos que
+    rodam em outra thread são ligados ao pai por eventos de fluxo.
+
+    Desligado (padrão), span()/iniciar() devolvem um span nulo compartilhado
+    e o custo é de uma checagem de atributo.
+
+    Uso:
+        >>> rastreador = RastreadorSpans(ativo=True)
+        >>> with rastreador.span("executar_plano", "plano"):
+        ...     with rastreador.span("onda 1", "onda", subtarefas=3):
+        ...         ...
+        >>> rastreador.exportar_chrome("trace.json")
+    """
+
+    def __init__(self, ativo: bool = False, diretorio: Optional[str] = None,
+                 max_spans: int = 200_000):
+        """
+        Args:
+            ativo: Se False, nada é registrado
+            diretorio: Se definido, cada span raiz concluído (ex.: a tarefa
+                principal) é exportado automaticamente para
+                diretorio/trace_AAAAMMDD_HHMMSS_<id>.json
+            max_spans: Limite de spans concluídos em memória (excedentes são
+                descartados e contados)
+        """
+        self.ativo = ativo
+        self.diretorio = Path(diretorio) if diretorio else None
+        self.max_spans = max_spans
+        self.spans_descartados = 0
+        self.ultimo_arquivo: Optional[str] = None
+        self._lock = threading.Lock()
+        self._proximo_id = 0
+        self._concluidos: List[Span] = []
+        self._nomes_threads: Dict[int, str] = {}
+        self._tids_tasks: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+        self._proximo_tid_virtual = 1_000_000_000
+        self._origem = time.perf_counter_ns()
+
+    # ── API de instrumentação ──────────────────────────────────────────────
+
+    def iniciar(self, nome: str, categoria: str = "luna", **args) -> Union[Span, _SpanNulo]:
+        """Abre um span filho do span atual e o torna o atual neste contexto."""
+        if not self.ativo:
+            return _SPAN_NULO
+
+        pai = _SPAN_ATUAL.get()
+        tid = self._tid_atual()
+        with self._lock:
+            self._proximo_id += 1
+            span = Span(self, self._proximo_id, nome, categoria, pai, tid, args)
+            if pai is not None and pai.fim is None:
+                pai.filhos_abertos.append(span)
+        _SPAN_ATUAL.set(span)
+        return span
+
+    def span(self, nome: str, categoria: str = "luna", **args) -> Union[Span, _SpanNulo]:
+        """Igual a iniciar(), para uso com `with` (erros viram o argumento 'erro')."""
+        return self.iniciar(nome, categoria, **args)
+
+    def anotar(self, **args) -> None:
+        """Anota argumentos no span atual."""
+        if not self.ativo:
+            return
+        span = _SPAN_ATUAL.get()
+        if span is not None:
+            with self._lock:
+                span.args.update(args)
+
+    def somar(self, **valores: float) -> None:
+        """Soma contadores (ex.: tokens) no span atual e em todos os ancestrais."""
+        if not self.ativo:
+            return
+        span = _SPAN_ATUAL.get()
+        with self._lock:
+            while span is not None:
+                for chave, valor in valores.items():
+                    span.args[chave] = span.args.get(chave, 0) + valor
+                span = span.pai
+
+    def _finalizar(self, span: Span, args: Dict[str, Any]) -> None:
+        with self._lock:
+            if span.fim is not None:
+                return
+            pendentes = list(span.filhos_abertos)
+
+        for filho in pendentes:
+            filho.finalizar()
+
+        exportar = False
+        with self._lock:
+            if span.fim is not None:
+                return
+            span.args.update(args)
+            span.fim = time.perf_counter_ns()
+            span.filhos_abertos = []
+            if span.pai is not None and span in span.pai.filhos_abertos:
+                span.pai.filhos_abertos.remove(span)
+            if len(self._concluidos) < self.max_spans:
+                self._concluidos.append(span)
+            else:
+                self.spans_descartados += 1
+            exportar = span.pai is None and self.diretorio is not None
+
+        # Span atual volta para o ancestral aberto mais próximo
+        atual = _SPAN_ATUAL.get()
+        if atual is not None and atual.fim is not None:
+            while atual is not None and atual.fim is not None:
+                atual = atual.pai
+            _SPAN_ATUAL.set(atual)
+
+        if exportar:
+            nome = f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{span.id}.json"
+            try:
+                self.ultimo_arquivo = self.exportar_chrome(self.diretorio / nome, raiz=span.id)
+                print_realtime(f"🔬 Trace salvo: {self.ultimo_arquivo}")
+            except Exception as e:
+                print_realtime(f"⚠️  Erro ao salvar trace: {e}")
+
+    def _tid_atual(self) -> int:
+        """Thread real, ou thread virtual por task asyncio (pilhas independentes)."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+
+        if task is None:
+            tid = threading.get_ident()
+            if tid not in self._nomes_threads:
+                self._nomes_threads[tid] = threading.current_thread().name
+            return tid
+
+        tid = self._tids_tasks.get(task)
+        if tid is None:
+            with self._lock:
+                self._proximo_tid_virtual += 1
+                tid = self._proximo_tid_virtual
+            self._tids_tasks[task] = tid
+            self._nomes_threads[tid] = f"asyncio {task.get_name()}"
+        return tid
+
+    # ── Exportação ────────────────────────────────────────────────────────
+
+    @property
+    def spans(self) -> List[Span]:
+        """Spans concluídos ainda não exportados (ordem de término)."""
+        with self._lock:
+            return list(self._concluidos)
+
+    def eventos_chrome(self, raiz: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Converte os spans concluídos em eventos do formato Chrome trace.
+
+        Args:
+            raiz: Se definido, só os spans dessa árvore
+
+        Returns:
+            Eventos "X" (duração completa), "M" (nome das threads) e "s"/"f"
+            (fluxo pai → filho quando estão em threads diferentes)
+        """
+        pid = os.getpid()
+        spans = [s for s in self.spans if raiz is None or s.raiz == raiz]
+        spans.sort(key=lambda s: (s.inicio, -(s.fim or 0)))
+
+        def us(ns: int) -> float:
+            return (ns - self._origem) / 1000
+
+        eventos: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": nome}}
+            for tid, nome in sorted(self._nomes_threads.items())
+            if any(s.tid == tid for s in spans)
+        ]
+
+        for s in spans:
+            args = dict(s.args)
+            args["span_id"] = s.id
+            if s.pai is not None:
+                args["pai_id"] = s.pai.id
+            eventos.append({
+                "name": s.nome, "cat": s.categoria, "ph": "X",
+                "ts": us(s.inicio), "dur": (s.fim - s.inicio) / 1000,
+                "pid": pid, "tid": s.tid, "args": args
+            })
+
+            if s.pai is not None and s.pai.tid != s.tid:
+                fluxo = {"name": "filho", "cat": "fluxo", "id": s.id, "pid": pid}
+                eventos.append({**fluxo, "ph": "s", "ts": us(s.inicio), "tid": s.pai.tid})
+                eventos.append({**fluxo, "ph": "f", "bp": "e", "ts": us(s.inicio), "tid": s.tid})
+
+        return eventos
+
+    def exportar_chrome(self, caminho, raiz: Optional[int] = None) -> str:
+        """
+        Salva os spans concluídos em JSON (chrome://tracing / Perfetto).
+
+        Os spans exportados saem da memória do rastreador.
+
+        Args:
+            caminho: Arquivo de saída
+            raiz: Se definido, exporta só a árvore desse span raiz
+
+        Returns:
+            Caminho do arquivo gravado
+        """
+        caminho = Path(caminho)
+        documento = {
+            "traceEvents": self.eventos_chrome(raiz),
+            "displayTimeUnit": "ms",
+            "otherData": {"gerado_por": "Luna V3", "spans_descartados": self.spans_descartados}
+        }
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(documento, f, ensure_ascii=False, default=str)
+
+        with self._lock:
+            self._concluidos = [s for s in self._concluidos if raiz is not None and s.raiz != raiz]
+        return str(caminho)
+
+
+# Rastreador desligado usado por quem não recebeu um (ex.: planificador de testes)
+_RASTREADOR_INATIVO = RastreadorSpans(ativo=False)
+
+
+def rastrear(categoria: str, nome: Union[str, Callable[..., str], None] = None,
+             argumentos: Optional[Callable[..., Dict[str, Any]]] = None):
+    """
+    Decorador de método: envolve a chamada em um span de self.rastreador.
+
+    Args:
+        categoria: Categoria do span (tarefa, fase, onda, api, ferramenta, ...)
+        nome: Nome fixo, função (*args, **kwargs) → nome, ou None (nome do método)
+        argumentos: Função (*args, **kwargs) → dict de argumentos do span
+
+    Funciona com métodos síncronos e corrotinas.
+    """
+    def decorador(metodo):
+        def abrir(self, args, kwargs):
+            rastreador = getattr(self, 'rastreador', None) or _RASTREADOR_INATIVO
+            if not rastreador.ativo:
+                return _SPAN_NULO
+            rotulo = nome(*args, **kwargs) if callable(nome) else (nome or metodo.__name__)
+            extras = argumentos(*args, **kwargs) if argumentos else {}
+            return rastreador.span(rotulo, categoria, **extras)
+
+        if asyncio.iscoroutinefunction(metodo):
+            @functools.wraps(metodo)
+            async def envoltorio_async(self, *args, **kwargs):
+                with abrir(self, args, kwargs):
+                    return await metodo(self, *args, **kwargs)
+            return envoltorio_async
+
+        @functools.wraps(metodo)
+        def envoltorio(self, *args, **kwargs):
+            with abrir(self, args, kwargs):
+                return metodo(self, *args, **kwargs)
+        return envoltorio
+
+    return decorador
+
+
 # ════════════════════════════════════════════════════════════════════════════
 # CLASSES DE DADOS PARA PLANEJAMENTO (Futuro)
 # ════════════════════════════════════════════════════════════════════════════
@@ -320,7 +703,36 @@ class Plano:
     criado_em: datetime = field(default_factory=datetime.now)
     executado_em: Optional[datetime] = None
     resultado: Optional[Dict[str, Any]] = None
-    
+    arquivo: Optional[str] = None  # 🆕 Onde o plano está salvo (Luna/planos/...)
+    origem: Optional[Dict[str, Any]] = None  # 🆕 Acerto do CachePlanos, se reaproveitado
+
+    @classmethod
+    def de_dict(cls, tarefa: str, dados: Dict[str, Any]) -> 'Plano':
+        """
+        🆕 Reconstrói um plano no formato de salvar() (usado pelo cache de planos).
+
+        Args:
+            tarefa: Tarefa a que o plano vai atender
+            dados: analise, estrategia, decomposicao e ondas (dicts)
+        """
+        campos = set(Subtarefa.__dataclass_fields__)
+        ondas = [
+            Onda(
+                numero=onda['numero'],
+                descricao=onda['descricao'],
+                subtarefas=[Subtarefa(**{k: v for k, v in st.items() if k in campos}) for st in onda['subtarefas']],
+                pode_executar_paralelo=onda['pode_executar_paralelo']
+            )
+            for onda in dados.get('ondas', [])
+        ]
+        return cls(
+            tarefa_original=tarefa,
+            analise=dados.get('analise', {}),
+            estrategia=dados.get('estrategia', {}),
+            decomposicao=dados.get('decomposicao', {}),
+            ondas=ondas
+        )
+
     def salvar(self, caminho: str) -> None:
         """
         Salva o plano em arquivo JSON.
@@ -347,8 +759,347 @@ class Plano:
                 'ondas': ondas_dict,  # 🆕 Agora serializa corretamente
                 'criado_em': self.criado_em.isoformat(),
                 'executado_em': self.executado_em.isoformat() if self.executado_em else None,
-                'resultado': self.resultado
-            }, f, indent=2, ensure_ascii=False)
+                'resultado': self.resultado,
+                'origem': self.origem
+            }, f, indent=2, ensure_ascii=False, default=str)
+
+
+class ErroPlanoEstruturado(Exception):
+    """🆕 O plano devolvido pelo modelo não segue o JSON schema (mesmo após o reparo)."""
+
+    def __init__(self, erros: List[str]):
+        super().__init__("; ".join(erros[:5]))
+        self.erros = erros
+
+
+_TIPOS_ESQUEMA = {
+    "object": dict, "array": list, "string": str, "boolean": bool,
+    "integer": int, "number": (int, float),
+}
+
+
+def _erros_esquema(valor: Any, esquema: Dict[str, Any], caminho: str = "plano", limite: int = 20) -> List[str]:
+    """
+    🆕 Valida `valor` contra o subconjunto de JSON schema usado pelo planejamento
+    estruturado (type, properties, required, items, enum, minItems).
+
+    Returns:
+        Lista de problemas "caminho: descrição" (vazia = válido), no máximo `limite`
+    """
+    erros: List[str] = []
+
+    def visitar(valor: Any, esquema: Dict[str, Any], caminho: str) -> None:
+        if len(erros) >= limite:
+            return
+        tipo = esquema.get("type")
+        if tipo:
+            esperado = _TIPOS_ESQUEMA[tipo]
+            # bool é subclasse de int: true não vale como número
+            if not isinstance(valor, esperado) or (tipo in ("integer", "number") and isinstance(valor, bool)):
+                erros.append(f"{caminho}: esperado {tipo}, recebido {type(valor).__name__}")
+                return
+        if "enum" in esquema and valor not in esquema["enum"]:
+            erros.append(f"{caminho}: {valor!r} não é um de {esquema['enum']}")
+        if isinstance(valor, dict):
+            for chave in esquema.get("required", []):
+                if chave not in valor:
+                    erros.append(f"{caminho}.{chave}: campo obrigatório ausente")
+            for chave, sub in esquema.get("properties", {}).items():
+                if chave in valor:
+                    visitar(valor[chave], sub, f"{caminho}.{chave}")
+        elif isinstance(valor, list):
+            if len(valor) < esquema.get("minItems", 0):
+                erros.append(f"{caminho}: mínimo de {esquema['minItems']} item(ns)")
+            if "items" in esquema:
+                for i, item in enumerate(valor):
+                    visitar(item, esquema["items"], f"{caminho}[{i}]")
+
+    visitar(valor, esquema, caminho)
+    return erros[:limite]
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# AGENDADOR DE SUBTAREFAS (🆕 DAG de dependências + caminho crítico)
+# ════════════════════════════════════════════════════════════════════════════
+
+# "30s", "2 min", "5-10 minutos", "1h" → segundos (faixas viram a média)
+_PADRAO_TEMPO_ESTIMADO = re.compile(
+    r"(\d+(?:[.,]\d+)?)\s*(?:-|a|até)?\s*(\d+(?:[.,]\d+)?)?\s*(h|min|m|s)?", re.IGNORECASE
+)
+
+
+class AgendadorPlano:
+    """
+    🆕 Executa as subtarefas de um plano como um DAG: cada uma começa assim
+    que suas dependências terminam, sem esperar a onda inteira.
+
+    Arestas do grafo:
+        - Subtarefa.dependencias (ids inexistentes ou a própria subtarefa são ignorados)
+        - Sem dependências (válidas) declaradas, fora da primeira onda: a onda anterior
+          inteira (o prompt de decomposição diz "onda N depende de onda N-1")
+        - Onda com pode_executar_paralelo=False: cada subtarefa também espera
+          a anterior da mesma onda
+
+    Entre as prontas, sai primeiro a de maior caminho restante (soma dos
+    tempo_estimado até o fim do grafo), que é quem define a duração do
+    plano. Ciclos não travam a execução: sem nada rodando e nada pronto,
+    a pendente mais antiga é liberada.
+
+    Uso:
+        agendador = AgendadorPlano(plano.ondas)
+        resultados = agendador.executar(executar_subtarefa, max_workers=8)
+        agendador.tempos["2.1"]  # {'espera_fila', 'duracao', 'inicio', 'fim'}
+    """
+
+    def __init__(self, ondas: List[Onda]):
+        """
+        Monta o grafo e as prioridades.
+
+        Args:
+            ondas: Ondas do plano, na ordem
+        """
+        self.subtarefas: Dict[str, Subtarefa] = {}
+        self.onda_de: Dict[str, int] = {}
+        self.dependencias: Dict[str, List[str]] = {}
+        self.tempos: Dict[str, Dict[str, float]] = {}
+
+        ids_por_onda: List[List[str]] = []
+        for onda in ondas:
+            ids = []
+            for st in onda.subtarefas:
+                chave = st.id or f"{onda.numero}.{len(ids) + 1}"
+                while chave in self.subtarefas:  # ids repetidos não se sobrescrevem
+                    chave += "'"
+                self.subtarefas[chave] = st
+                self.onda_de[chave] = onda.numero
+                ids.append(chave)
+            ids_por_onda.append(ids)
+
+        onda_anterior: List[str] = []
+        for onda, ids in zip(ondas, ids_por_onda):
+            for posicao, chave in enumerate(ids):
+                st = self.subtarefas[chave]
+                deps = [d for d in (st.dependencias or []) if d in self.subtarefas and d != chave]
+                if not deps:
+                    deps = list(onda_anterior)
+                if not onda.pode_executar_paralelo and posicao > 0:
+                    deps.append(ids[posicao - 1])
+                self.dependencias[chave] = list(dict.fromkeys(deps))
+            if ids:
+                onda_anterior = ids
+
+        self.dependentes: Dict[str, List[str]] = {chave: [] for chave in self.subtarefas}
+        for chave, deps in self.dependencias.items():
+            for dep in deps:
+                self.dependentes[dep].append(chave)
+
+        self.peso = {chave: self.estimar_segundos(st.tempo_estimado) for chave, st in self.subtarefas.items()}
+        self.prioridade = self._caminho_restante(self.peso)
+        self.caminho_critico = self._caminho_mais_longo(self.prioridade)
+
+    def __len__(self) -> int:
+        return len(self.subtarefas)
+
+    @staticmethod
+    def estimar_segundos(tempo_estimado: Any, padrao: float = 30.0) -> float:
+        """Converte tempo_estimado ("30s", "2 min", "5-10 minutos") em segundos."""
+        if isinstance(tempo_estimado, (int, float)):
+            return float(tempo_estimado) if tempo_estimado > 0 else padrao
+        achado = _PADRAO_TEMPO_ESTIMADO.search(str(tempo_estimado or ""))
+        if not achado:
+            return padrao
+        valores = [float(v.replace(",", ".")) for v in achado.groups()[:2] if v]
+        unidade = (achado.group(3) or "s").lower()
+        multiplicador = 3600 if unidade == "h" else 60 if unidade.startswith("m") else 1
+        segundos = sum(valores) / len(valores) * multiplicador
+        return segundos if segundos > 0 else padrao
+
+    def _caminho_restante(self, duracoes: Dict[str, float]) -> Dict[str, float]:
+        """Para cada subtarefa: duração dela + a maior cadeia de dependentes depois dela."""
+        restante: Dict[str, float] = {}
+        em_calculo = set()
+
+        def calcular(chave: str) -> float:
+            if chave in restante:
+                return restante[chave]
+            em_calculo.add(chave)
+            seguintes = [calcular(d) for d in self.dependentes[chave] if d not in em_calculo]
+            em_calculo.discard(chave)
+            restante[chave] = duracoes.get(chave, 0.0) + max(seguintes, default=0.0)
+            return restante[chave]
+
+        for chave in self.subtarefas:
+            calcular(chave)
+        return restante
+
+    def _caminho_mais_longo(self, restante: Dict[str, float]) -> List[str]:
+        """Cadeia de dependências que domina a duração do plano."""
+        if not restante:
+            return []
+        raizes = [c for c in self.subtarefas if not self.dependencias[c]] or list(self.subtarefas)
+        caminho = [max(raizes, key=lambda c: restante[c])]
+        while self.dependentes[caminho[-1]]:
+            proxima = max(self.dependentes[caminho[-1]], key=lambda c: restante[c])
+            if proxima in caminho:
+                break
+            caminho.append(proxima)
+        return caminho
+
+    def caminho_critico_real(self) -> Tuple[List[str], float]:
+        """Caminho crítico com as durações medidas (limite inferior da duração do plano)."""
+        duracoes = {chave: t.get("duracao", 0.0) for chave, t in self.tempos.items()}
+        restante = self._caminho_restante(duracoes)
+        caminho = self._caminho_mais_longo(restante)
+        return caminho, (restante[caminho[0]] if caminho else 0.0)
+
+    # ═══ Estado da execução (compartilhado pelos modos thread e asyncio) ═══
+
+    def _iniciar_execucao(self) -> None:
+        self._inicio = time.time()
+        self._faltam = {chave: len(deps) for chave, deps in self.dependencias.items()}
+        self._prontas: List[Tuple[float, int, str]] = []
+        self._ordem = {chave: i for i, chave in enumerate(self.subtarefas)}
+        self.tempos = {}
+        for chave, faltam in list(self._faltam.items()):
+            if not faltam:
+                self._marcar_pronta(chave)
+
+    def _marcar_pronta(self, chave: str) -> None:
+        del self._faltam[chave]
+        self.tempos[chave] = {"pronta": time.time() - self._inicio}
+        heapq.heappush(self._prontas, (-self.prioridade[chave], self._ordem[chave], chave))
+
+    def _limite(self, max_workers: int, controlador: Optional['ControladorConcorrencia']) -> int:
+        return controlador.atual if controlador is not None else max(1, max_workers)
+
+    def _proxima(self, controlador: Optional['ControladorConcorrencia'] = None) -> str:
+        _, _, chave = heapq.heappop(self._prontas)
+        tempos = self.tempos[chave]
+        tempos["inicio"] = time.time() - self._inicio
+        tempos["espera_fila"] = tempos["inicio"] - tempos["pronta"]
+        if controlador is not None:
+            controlador.iniciar()
+        return chave
+
+    def _concluir(self, chave: str, resultado: Dict, controlador: Optional['ControladorConcorrencia'] = None) -> None:
+        tempos = self.tempos[chave]
+        tempos["fim"] = time.time() - self._inicio
+        tempos["duracao"] = tempos["fim"] - tempos["inicio"]
+        resultado.setdefault("espera_fila", round(tempos["espera_fila"], 3))
+        resultado.setdefault("duracao", round(tempos["duracao"], 3))
+        if controlador is not None:
+            controlador.registrar_conclusao(
+                tempos["duracao"], self.subtarefas[chave].tokens_estimados, bool(resultado.get('sucesso'))
+            )
+        for dependente in self.dependentes[chave]:
+            if dependente in self._faltam:
+                self._faltam[dependente] -= 1
+                if self._faltam[dependente] == 0:
+                    self._marcar_pronta(dependente)
+
+    def _destravar(self) -> bool:
+        """Nada rodando nem pronto com pendentes: dependência circular; libera a mais antiga."""
+        if not self._faltam:
+            return False
+        chave = min(self._faltam, key=self._ordem.get)
+        print_realtime(f"   ⚠️  Dependência circular: liberando {chave} sem esperar {self._faltam[chave]} dependência(s)")
+        self._marcar_pronta(chave)
+        return True
+
+    @staticmethod
+    def _falha(e: Exception) -> Dict:
+        return {'sucesso': False, 'erro': str(e), 'output': ''}
+
+    def executar(
+        self,
+        executar_subtarefa: Callable[[Subtarefa], Dict],
+        max_workers: int = 15,
+        ao_concluir: Optional[Callable[[str, Dict], None]] = None,
+        controlador: Optional['ControladorConcorrencia'] = None
+    ) -> Dict[str, Dict]:
+        """
+        Executa o grafo num pool de threads.
+
+        Args:
+            executar_subtarefa: Função (subtarefa) -> resultado dict
+            max_workers: Máximo de subtarefas simultâneas
+            ao_concluir: Chamado (na thread do agendador) a cada subtarefa concluída
+            controlador: 🆕 Limite adaptativo (substitui max_workers; consultado a cada despacho)
+
+        Returns:
+            Dicionário subtarefa_id -> resultado, na ordem de conclusão
+        """
+        resultados: Dict[str, Dict] = {}
+        self._iniciar_execucao()
+
+        tamanho_pool = controlador.maximo if controlador is not None else max(1, max_workers)
+        with ThreadPoolExecutor(max_workers=tamanho_pool) as executor:
+            rodando: Dict[Future, str] = {}
+            while True:
+                # Só sai da fila própria o que cabe no limite: a prioridade vale até o fim
+                while self._prontas and len(rodando) < self._limite(max_workers, controlador):
+                    chave = self._proxima(controlador)
+                    # Cópia do contexto: spans das subtarefas ficam sob o plano
+                    futuro = executor.submit(contextvars.copy_context().run, executar_subtarefa, self.subtarefas[chave])
+                    rodando[futuro] = chave
+                if not rodando:
+                    if self._destravar():
+                        continue
+                    break
+
+                concluidos, _ = wait(rodando, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    chave = rodando.pop(futuro)
+                    try:
+                        resultado = futuro.result()
+                    except Exception as e:
+                        resultado = self._falha(e)
+                    self._concluir(chave, resultado, controlador)
+                    resultados[chave] = resultado
+                    if ao_concluir:
+                        ao_concluir(chave, resultado)
+
+        return resultados
+
+    async def executar_async(
+        self,
+        executar_subtarefa: Callable[[Subtarefa], Any],
+        max_concorrencia: int = 15,
+        ao_concluir: Optional[Callable[[str, Dict], None]] = None,
+        controlador: Optional['ControladorConcorrencia'] = None
+    ) -> Dict[str, Dict]:
+        """
+        Igual a executar(), com executar_subtarefa sendo uma corrotina.
+
+        Returns:
+            Dicionário subtarefa_id -> resultado, na ordem de conclusão
+        """
+        resultados: Dict[str, Dict] = {}
+        self._iniciar_execucao()
+        rodando: Dict[asyncio.Task, str] = {}
+
+        while True:
+            while self._prontas and len(rodando) < self._limite(max_concorrencia, controlador):
+                chave = self._proxima(controlador)
+                rodando[asyncio.ensure_future(executar_subtarefa(self.subtarefas[chave]))] = chave
+            if not rodando:
+                if self._destravar():
+                    continue
+                break
+
+            concluidos, _ = await asyncio.wait(rodando, return_when=asyncio.FIRST_COMPLETED)
+            for tarefa in concluidos:
+                chave = rodando.pop(tarefa)
+                try:
+                    resultado = tarefa.result()
+                except Exception as e:
+                    resultado = self._falha(e)
+                self._concluir(chave, resultado, controlador)
+                resultados[chave] = resultado
+                if ao_concluir:
+                    ao_concluir(chave, resultado)
+
+        return resultados
 
 
 # ════════════════════════════════════════════════════════════════════════════
@@ -385,34 +1136,99 @@ class PlanificadorAvancado:
         resultado = planificador.executar_plano(plano)
     """
 
-    def __init__(self, agente, max_workers_paralelos: int = 15):
+    # 🆕 Prazo por subtarefa: estimativas do plano são otimistas ("30s" para algo
+    # com várias iterações e chamadas de ferramenta), então o prazo é folgado -
+    # ele existe para cortar subtarefas travadas, não as apenas lentas
+    PRAZO_MINIMO_SUBTAREFA = 600.0
+    FATOR_PRAZO_SUBTAREFA = 10.0
+
+    # 🆕 Planejamento estruturado: ferramenta que o modelo é obrigado a chamar
+    FERRAMENTA_PLANO = "registrar_plano"
+    MAX_TOKENS_PLANO = 8192
+
+    DIRETRIZES_DECOMPOSICAO = """DIRETRIZES IMPORTANTES:
+1. Subtarefas devem ser ATÔMICAS (uma única ação)
+2. Critérios de sucesso devem ser MENSURÁVEIS
+3. Agrupar em ondas lógicas (onda N depende de onda N-1)
+4. Marcar pode_executar_paralelo=true APENAS se tarefas são independentes
+5. Em "dependencias", liste SÓ os ids de que a subtarefa realmente precisa: ela começa assim que
+   eles terminam, sem esperar o resto da onda anterior (sem dependências = espera a onda anterior)"""
+
+    def __init__(
+        self,
+        agente,
+        max_workers_paralelos: int = 15,
+        usar_dag: Optional[bool] = None,
+        controlador: Optional['ControladorConcorrencia'] = None,
+        fator_prazo: Optional[float] = None,
+        estruturado: Optional[bool] = None,
+        cache: Optional['CachePlanos'] = None
+    ):
         """
         Inicializa o planificador.
 
         Args:
             agente: Instância do AgenteCompletoV3
             max_workers_paralelos: Número máximo de workers para execução paralela (default: 15 para Tier 2)
+            usar_dag: 🆕 Agendar subtarefas por dependências (AgendadorPlano) em vez
+                de onda por onda. Padrão: LUNA_PLANO_DAG (ligado; '0' volta às ondas)
+            controlador: 🆕 Limite de concorrência adaptativo (AIMD); sem ele vale
+                max_workers_paralelos fixo
+            fator_prazo: 🆕 Prazo de cada subtarefa = tempo_estimado × fator (mínimo
+                PRAZO_MINIMO_SUBTAREFA, 10 min). Padrão: LUNA_PRAZO_SUBTAREFA_FATOR (10); 0 = sem prazo
+            estruturado: 🆕 Análise, estratégia e decomposição em UMA chamada com
+                tool_use forçado e JSON schema. Padrão: LUNA_PLANEJAMENTO_ESTRUTURADO
+                (ligado; '0' volta às três fases em texto)
+            cache: 🆕 CachePlanos consultado antes de planejar (None = sempre planejar)
         """
         self.agente = agente
         self.max_workers_paralelos = max_workers_paralelos
+        self.usar_dag = os.getenv('LUNA_PLANO_DAG', '1') == '1' if usar_dag is None else usar_dag
+        self.controlador = controlador
+        self.fator_prazo = (
+            float(os.getenv('LUNA_PRAZO_SUBTAREFA_FATOR', str(self.FATOR_PRAZO_SUBTAREFA)))
+            if fator_prazo is None else fator_prazo
+        )
+        self.estruturado = (
+            os.getenv('LUNA_PLANEJAMENTO_ESTRUTURADO', '1') == '1' if estruturado is None else estruturado
+        )
+        self.cache = cache
         self.historico_planos: List[Plano] = []
         self.metricas = {
             'planos_criados': 0,
+            'planos_reaproveitados': 0,
             'planos_executados': 0,
             'taxa_sucesso': 0.0,
             'tempo_medio_economizado': 0.0
         }
 
+    @property
+    def rastreador(self) -> 'RastreadorSpans':
+        """🆕 Rastreador de spans do agente (inativo se o agente não tiver um)."""
+        return getattr(self.agente, 'rastreador', None) or _RASTREADOR_INATIVO
+
+    @rastrear("planejamento", "planejar", lambda tarefa, *a, **k: {"tarefa": tarefa[:200]})
     def planejar(self, tarefa: str, contexto: Optional[Dict] = None) -> Plano:
         """
         Cria um plano detalhado de execução em 3 fases.
 
+        🆕 Com `estruturado` (padrão), as 3 fases saem de uma única chamada
+        com tool_use forçado; o JSON é validado pelo schema antes de virar
+        Onda/Subtarefa (erro de formato gera uma rodada de reparo e, se
+        persistir, ErroPlanoEstruturado em vez de um plano padrão).
+
+        🆕 Com cache, um plano bem-sucedido de tarefa parecida é reaproveitado
+        (ou adaptado por troca de palavras) sem nenhuma chamada à API.
+
         Args:
             tarefa: Descrição da tarefa complexa
             contexto: Contexto adicional (opcional)
 
         Returns:
             Plano estruturado com análise, estratégia e decomposição
+
+        Raises:
+            ErroPlanoEstruturado: Modo estruturado sem um plano válido
         """
         print_realtime("\n" + "="*70)
         print_realtime("🧠 SISTEMA DE PLANEJAMENTO AVANÇADO ATIVADO")
@@ -420,25 +1236,24 @@ class PlanificadorAvancado:
 
         tempo_inicio = time.time()
 
-        # Fase 1: ANÁLISE PROFUNDA (~30-40k tokens)
-        print_realtime("\n📊 FASE 1/3: Análise Profunda da Tarefa...")
-        analise = self._analisar_tarefa(tarefa, contexto)
-        print_realtime(f"   ✓ Requisitos explícitos: {len(analise.get('requisitos_explicitos', []))}")
-        print_realtime(f"   ✓ Requisitos implícitos: {len(analise.get('requisitos_implicitos', []))}")
-        print_realtime(f"   ✓ Riscos identificados: {len(analise.get('riscos', []))}")
-        print_realtime(f"   ✓ Complexidade: {analise.get('estimativa_complexidade', 'desconhecida')}")
-
-        # Fase 2: ESTRATÉGIA (~20-30k tokens)
-        print_realtime("\n🎯 FASE 2/3: Criação de Estratégia Otimizada...")
-        estrategia = self._criar_estrategia(tarefa, analise)
-        print_realtime(f"   ✓ Abordagem: {estrategia.get('abordagem', 'N/A')[:60]}...")
-        print_realtime(f"   ✓ Sequência de ações: {len(estrategia.get('sequencia_otima', []))}")
-        print_realtime(f"   ✓ Oportunidades de paralelização: {len(estrategia.get('oportunidades_paralelizacao', []))}")
-        print_realtime(f"   ✓ Pontos de validação: {len(estrategia.get('pontos_validacao', []))}")
+        plano = self._plano_do_cache(tarefa)
+        if plano is not None:
+            print_realtime(f"\n✅ PLANO REAPROVEITADO! (tempo: {time.time() - tempo_inicio:.1f}s)")
+            print_realtime("="*70)
+            return plano
 
-        # Fase 3: DECOMPOSIÇÃO (~15-20k tokens)
-        print_realtime("\n📋 FASE 3/3: Decomposição em Subtarefas Executáveis...")
-        decomposicao = self._decompor_em_subtarefas(estrategia)
+        if self.estruturado:
+            print_realtime("\n📐 FASES 1-3: Análise, estratégia e decomposição (uma chamada estruturada)...")
+            analise, estrategia, decomposicao = self._planejar_estruturado(tarefa, contexto)
+            print_realtime(
+                f"   ✓ Requisitos: {len(analise.get('requisitos_explicitos', []))} explícitos, "
+                f"{len(analise.get('requisitos_implicitos', []))} implícitos | "
+                f"Riscos: {len(analise.get('riscos', []))} | "
+                f"Complexidade: {analise.get('estimativa_complexidade', 'desconhecida')}"
+            )
+            print_realtime(f"   ✓ Abordagem: {estrategia.get('abordagem', 'N/A')[:60]}...")
+        else:
+            analise, estrategia, decomposicao = self._planejar_em_fases(tarefa, contexto)
 
         # Criar ondas de execução
         ondas = self._criar_ondas(decomposicao)
@@ -482,48 +1297,296 @@ class PlanificadorAvancado:
 
         return plano
 
-    def _analisar_tarefa(self, tarefa: str, contexto: Optional[Dict]) -> Dict:
+    def _plano_do_cache(self, tarefa: str) -> Optional[Plano]:
         """
-        Fase 1: Análise profunda da tarefa.
+        🆕 Plano bem-sucedido de uma tarefa parecida (None = planejar do zero).
 
-        Identifica:
-            - Requisitos explícitos e implícitos
-            - Dependências (ferramentas, bibliotecas, arquivos)
-            - Riscos e sua probabilidade/impacto
-            - Complexidade estimada
-            - Conhecimento prévio relevante
+        Plano ilegível no disco não interrompe: só cai no planejamento normal.
+        Planos que usam ferramentas que o agente não tem mais são ignorados.
+        """
+        if self.cache is None:
+            return None
+        sistema = getattr(self.agente, 'sistema_ferramentas', None)
+        ferramentas = getattr(sistema, 'ferramentas_codigo', None)
+        try:
+            acerto = self.cache.buscar(tarefa, ferramentas)
+            if acerto is None:
+                return None
+            plano = Plano.de_dict(tarefa, self.cache.carregar(acerto))
+        except Exception as e:
+            print_realtime(f"   ⚠️  Cache de planos indisponível: {e}")
+            return None
 
-        Args:
-            tarefa: Descrição da tarefa
-            contexto: Contexto adicional
+        plano.origem = acerto
+        print_realtime(f"\n♻️  Plano de tarefa parecida (similaridade {acerto['similaridade']:.2f}): {acerto['arquivo']}")
+        print_realtime(f"   Tarefa original: {acerto['tarefa'][:80]}")
+        if acerto['substituicoes']:
+            trocas = ", ".join(f"{a} → {n}" for a, n in acerto['substituicoes'].items())
+            print_realtime(f"   ✏️  Adaptado: {trocas}")
+        print_realtime(f"   ✓ Ondas: {len(plano.ondas)} | Subtarefas: {sum(len(o.subtarefas) for o in plano.ondas)}")
+
+        self.historico_planos.append(plano)
+        self.metricas['planos_reaproveitados'] += 1
+        return plano
+
+    def _esquema_plano(self) -> Dict[str, Any]:
+        """
+        🆕 JSON schema do plano completo (análise + estratégia + decomposição).
+
+        Mesmas chaves dos prompts das fases em texto; nomes de ferramentas
+        restritos às existentes quando o agente as expõe.
+        """
+        texto = {"type": "string"}
+        lista_texto = {"type": "array", "items": texto}
+        sistema = getattr(self.agente, 'sistema_ferramentas', None)
+        nomes = sorted(getattr(sistema, 'ferramentas_codigo', None) or [])
+        ferramenta = {"type": "string", "enum": nomes} if nomes else texto
+
+        def objeto(propriedades: Dict[str, Any], opcionais: Tuple[str, ...] = ()) -> Dict[str, Any]:
+            return {
+                "type": "object",
+                "properties": propriedades,
+                "required": [chave for chave in propriedades if chave not in opcionais],
+            }
+
+        analise = objeto({
+            "requisitos_explicitos": lista_texto,
+            "requisitos_implicitos": lista_texto,
+            "dependencias": objeto({"ferramentas": lista_texto, "bibliotecas": lista_texto, "arquivos": lista_texto}),
+            "riscos": {"type": "array", "items": objeto({
+                "descricao": texto,
+                "probabilidade": {"type": "string", "enum": ["alta", "media", "baixa"]},
+                "impacto": {"type": "string", "enum": ["alto", "medio", "baixo"]},
+                "mitigacao": texto,
+            })},
+            "estimativa_complexidade": {"type": "string", "enum": ["simples", "media", "complexa", "muito_complexa"]},
+            "tempo_estimado": texto,
+            "conhecimento_previo_relevante": lista_texto,
+        }, opcionais=("conhecimento_previo_relevante",))
+
+        estrategia = objeto({
+            "abordagem": texto,
+            "justificativa": texto,
+            "sequencia_otima": {"type": "array", "items": objeto(
+                {"ordem": {"type": "integer"}, "acao": texto, "razao": texto})},
+            "oportunidades_paralelizacao": {"type": "array", "items": objeto(
+                {"acoes": lista_texto, "ganho_estimado": texto})},
+            "pontos_validacao": {"type": "array", "items": objeto(
+                {"apos": texto, "validar": texto, "criterio_sucesso": texto})},
+            "planos_contingencia": lista_texto,
+        })
+
+        subtarefa = objeto({
+            "id": texto,
+            "titulo": texto,
+            "descricao": texto,
+            "ferramentas": {"type": "array", "items": ferramenta},
+            "input": texto,
+            "output_esperado": texto,
+            "criterio_sucesso": texto,
+            "tokens_estimados": {"type": "integer"},
+            "tempo_estimado": {"type": "string", "description": "ex.: 30s, 2 min, 5-10 minutos"},
+            "prioridade": {"type": "string", "enum": ["critica", "importante", "nice-to-have"]},
+            "dependencias": lista_texto,
+        }, opcionais=("input",))
+
+        decomposicao = objeto({
+            "ondas": {"type": "array", "minItems": 1, "items": objeto({
+                "numero": {"type": "integer"},
+                "descricao": texto,
+                "subtarefas": {"type": "array", "minItems": 1, "items": subtarefa},
+                "pode_executar_paralelo": {"type": "boolean"},
+            })},
+            "tempo_estimado_sequencial": texto,
+            "tempo_estimado_paralelo": texto,
+        })
+
+        return objeto({"analise": analise, "estrategia": estrategia, "decomposicao": decomposicao})
+
+    @rastrear("fase", "plano_estruturado")
+    def _planejar_estruturado(self, tarefa: str, contexto: Optional[Dict]) -> Tuple[Dict, Dict, Dict]:
+        """
+        🆕 Fases 1-3 numa única chamada com tool_use forçado.
+
+        O input da ferramenta é validado pelo schema; se vier inválido (ou
+        truncado por max_tokens), os problemas voltam ao modelo como
+        tool_result com is_error para UMA correção.
 
         Returns:
-            Dicionário com análise detalhada
+            (analise, estrategia, decomposicao)
+
+        Raises:
+            ErroPlanoEstruturado: Plano ainda inválido após o reparo
         """
-        prompt = f"""ANÁLISE PROFUNDA DA TAREFA
+        esquema = self._esquema_plano()
+        ferramenta = {
+            "name": self.FERRAMENTA_PLANO,
+            "description": "Registra o plano de execução completo: análise, estratégia e decomposição em ondas.",
+            "input_schema": esquema,
+        }
+        prompt = f"""PLANEJAMENTO COMPLETO DA TAREFA
 
 Tarefa solicitada pelo usuário:
 {tarefa}
 
 Contexto adicional disponível:
-{json.dumps(contexto, indent=2) if contexto else 'Nenhum contexto adicional'}
+{json.dumps(contexto, indent=2, ensure_ascii=False) if contexto else 'Nenhum contexto adicional'}
 
-Faça uma análise EXTREMAMENTE detalhada e retorne JSON estruturado:
+Planeje a execução e registre o resultado chamando {self.FERRAMENTA_PLANO} com:
+- analise: requisitos explícitos e implícitos, dependências, riscos (com mitigação) e complexidade
+- estrategia: melhor abordagem e justificativa, sequência ótima, paralelização, pontos de
+  validação e planos de contingência
+- decomposicao: ondas de subtarefas CONCRETAS, EXECUTÁVEIS e ATÔMICAS que seguem a estratégia
 
-{{
-    "requisitos_explicitos": [
-        "requisito mencionado diretamente pelo usuário",
-        "outro requisito explícito"
-    ],
-    "requisitos_implicitos": [
-        "requisito não mencionado mas necessário para sucesso",
-        "outro requisito implícito importante"
-    ],
-    "dependencias": {{
-        "ferramentas": ["ferramenta1", "ferramenta2"],
-        "bibliotecas": ["biblioteca1", "biblioteca2"],
-        "arquivos": ["arquivo1", "arquivo2"]
-    }},
+{self.DIRETRIZES_DECOMPOSICAO}"""
+
+        mensagens: List[Dict[str, Any]] = [{"role": "user", "content": prompt}]
+        erros: List[str] = []
+        for tentativa in range(2):
+            response = self._chamar_ferramenta_plano(mensagens, ferramenta)
+            bloco = next((b for b in response.content
+                          if getattr(b, 'type', None) == 'tool_use' and b.name == self.FERRAMENTA_PLANO), None)
+
+            if bloco is None:
+                erros = [f"a resposta não chamou {self.FERRAMENTA_PLANO}"]
+            else:
+                erros = _erros_esquema(bloco.input, esquema)
+                if getattr(response, 'stop_reason', None) == "max_tokens":
+                    erros.insert(0, "plano truncado (max_tokens): use menos subtarefas e textos mais curtos")
+                if not erros:
+                    dados = bloco.input
+                    decomposicao = dict(dados["decomposicao"])
+                    decomposicao['total_subtarefas'] = sum(len(onda['subtarefas']) for onda in decomposicao['ondas'])
+                    return dados["analise"], dados["estrategia"], decomposicao
+
+            print_realtime(f"   ⚠️  Plano fora do schema ({len(erros)} problema(s)): {erros[0]}")
+            if tentativa == 0:
+                correcao = "Corrija e chame a ferramenta de novo com o plano COMPLETO:\n- " + "\n- ".join(erros)
+                mensagens = mensagens + [
+                    {"role": "assistant", "content": response.content},
+                    {"role": "user", "content": [
+                        {"type": "tool_result", "tool_use_id": bloco.id, "is_error": True, "content": correcao}
+                    ] if bloco is not None else correcao},
+                ]
+
+        raise ErroPlanoEstruturado(erros)
+
+    def _chamar_ferramenta_plano(self, mensagens: List[Dict[str, Any]], ferramenta: Dict[str, Any]) -> Any:
+        """🆕 Chamada com tool_use forçado (rate limit e retentativas do agente quando disponíveis)."""
+        if not hasattr(self.agente, '_executar_requisicao_estruturada'):
+            # Fallback: client do agente, com reserva e retentativas
+            return self._requisicao_api({
+                "model": self.agente.model_name,
+                "max_tokens": self.MAX_TOKENS_PLANO,
+                "messages": mensagens,
+                "tools": [ferramenta],
+                "tool_choice": {"type": "tool", "name": ferramenta["name"]},
+            })
+
+        return self.agente._executar_requisicao_estruturada(mensagens, ferramenta, max_tokens=self.MAX_TOKENS_PLANO)
+
+    def _requisicao_api(self, api_params: Dict[str, Any]) -> Any:
+        """
+        🆕 messages.create() para agentes sem os métodos de requisição: mesma
+        reserva de rate limit (liberada em caso de erro), PoliticaRetentativa e
+        token de cancelamento do loop principal, com o que o agente tiver.
+        """
+        requisitar = getattr(self.agente, '_requisicao_com_retentativa', None)
+        if requisitar is not None:
+            return requisitar(api_params)
+
+        gerenciador = getattr(self.agente, 'rate_limit_manager', None)
+        politica = getattr(self.agente, 'politica_retentativa', None) or PoliticaRetentativa(gerenciador)
+        cancelamento = getattr(_CONTEXTO_EXECUCAO.get(), 'cancelamento', None)
+
+        def tentativa():
+            if cancelamento is not None:
+                cancelamento.verificar()
+            reserva = gerenciador.aguardar_se_necessario(cancelamento=cancelamento) if gerenciador else None
+            try:
+                response = self.agente.client.messages.create(**api_params)
+            except Exception:
+                if gerenciador:
+                    gerenciador.liberar_reserva(reserva)
+                raise
+            if gerenciador:
+                gerenciador.registrar_uso(response.usage.input_tokens, response.usage.output_tokens, reserva)
+            return response
+
+        return politica.executar(tentativa, cancelamento=cancelamento)
+
+    def _planejar_em_fases(self, tarefa: str, contexto: Optional[Dict]) -> Tuple[Dict, Dict, Dict]:
+        """
+        Fases 1-3 em chamadas separadas (modo clássico, LUNA_PLANEJAMENTO_ESTRUTURADO=0).
+
+        Returns:
+            (analise, estrategia, decomposicao)
+        """
+        # Fase 1: ANÁLISE PROFUNDA (~30-40k tokens)
+        print_realtime("\n📊 FASE 1/3: Análise Profunda da Tarefa...")
+        analise = self._analisar_tarefa(tarefa, contexto)
+        print_realtime(f"   ✓ Requisitos explícitos: {len(analise.get('requisitos_explicitos', []))}")
+        print_realtime(f"   ✓ Requisitos implícitos: {len(analise.get('requisitos_implicitos', []))}")
+        print_realtime(f"   ✓ Riscos identificados: {len(analise.get('riscos', []))}")
+        print_realtime(f"   ✓ Complexidade: {analise.get('estimativa_complexidade', 'desconhecida')}")
+
+        # Fase 2: ESTRATÉGIA (~20-30k tokens)
+        print_realtime("\n🎯 FASE 2/3: Criação de Estratégia Otimizada...")
+        estrategia = self._criar_estrategia(tarefa, analise)
+        print_realtime(f"   ✓ Abordagem: {estrategia.get('abordagem', 'N/A')[:60]}...")
+        print_realtime(f"   ✓ Sequência de ações: {len(estrategia.get('sequencia_otima', []))}")
+        print_realtime(f"   ✓ Oportunidades de paralelização: {len(estrategia.get('oportunidades_paralelizacao', []))}")
+        print_realtime(f"   ✓ Pontos de validação: {len(estrategia.get('pontos_validacao', []))}")
+
+        # Fase 3: DECOMPOSIÇÃO (~15-20k tokens)
+        print_realtime("\n📋 FASE 3/3: Decomposição em Subtarefas Executáveis...")
+        decomposicao = self._decompor_em_subtarefas(estrategia)
+
+        return analise, estrategia, decomposicao
+
+    @rastrear("fase", "analise")
+    def _analisar_tarefa(self, tarefa: str, contexto: Optional[Dict]) -> Dict:
+        """
+        Fase 1: Análise profunda da tarefa.
+
+        Identifica:
+            - Requisitos explícitos e implícitos
+            - Dependências (ferramentas, bibliotecas, arquivos)
+            - Riscos e sua probabilidade/impacto
+            - Complexidade estimada
+            - Conhecimento prévio relevante
+
+        Args:
+            tarefa: Descrição da tarefa
+            contexto: Contexto adicional
+
+        Returns:
+            Dicionário com análise detalhada
+        """
+        prompt = f"""ANÁLISE PROFUNDA DA TAREFA
+
+Tarefa solicitada pelo usuário:
+{tarefa}
+
+Contexto adicional disponível:
+{json.dumps(contexto, indent=2) if contexto else 'Nenhum contexto adicional'}
+
+Faça uma análise EXTREMAMENTE detalhada e retorne JSON estruturado:
+
+{{
+    "requisitos_explicitos": [
+        "requisito mencionado diretamente pelo usuário",
+        "outro requisito explícito"
+    ],
+    "requisitos_implicitos": [
+        "requisito não mencionado mas necessário para sucesso",
+        "outro requisito implícito importante"
+    ],
+    "dependencias": {{
+        "ferramentas": ["ferramenta1", "ferramenta2"],
+        "bibliotecas": ["biblioteca1", "biblioteca2"],
+        "arquivos": ["arquivo1", "arquivo2"]
+    }},
     "riscos": [
         {{
             "descricao": "descrição do risco",
@@ -589,6 +1652,7 @@ IMPORTANTE: Responda APENAS com o JSON válido, sem texto adicional antes ou dep
                 "conhecimento_previo_relevante": []
             }
 
+    @rastrear("fase", "estrategia")
     def _criar_estrategia(self, tarefa: str, analise: Dict) -> Dict:
         """
         Fase 2: Criação de estratégia otimizada.
@@ -692,6 +1756,7 @@ IMPORTANTE: Responda APENAS com o JSON válido, sem texto adicional."""
                 "planos_contingencia": []
             }
 
+    @rastrear("fase", "decomposicao")
     def _decompor_em_subtarefas(self, estrategia: Dict) -> Dict:
         """
         Fase 3: Decomposição em subtarefas executáveis.
@@ -743,11 +1808,7 @@ Decomponha em subtarefas CONCRETAS, EXECUTÁVEIS e ATÔMICAS. Retorne JSON:
     "tempo_estimado_paralelo": "tempo se executar em paralelo onde possível"
 }}
 
-DIRETRIZES IMPORTANTES:
-1. Subtarefas devem ser ATÔMICAS (uma única ação)
-2. Critérios de sucesso devem ser MENSURÁVEIS
-3. Agrupar em ondas lógicas (onda N depende de onda N-1)
-4. Marcar pode_executar_paralelo=true APENAS se tarefas são independentes
+{self.DIRETRIZES_DECOMPOSICAO}
 
 Responda APENAS com o JSON válido, sem texto adicional."""
 
@@ -851,6 +1912,7 @@ Responda APENAS com o JSON válido, sem texto adicional."""
 
         return ondas
 
+    @rastrear("fase", "validacao")
     def _validar_plano(
         self,
         ondas: List[Onda],
@@ -1029,19 +2091,21 @@ Responda APENAS com o JSON válido, sem texto adicional."""
         """
         # Verificar se método existe
         if not hasattr(self.agente, '_executar_requisicao_simples'):
-            # Fallback: usar client diretamente
-            response = self.agente.client.messages.create(
-                model=self.agente.model_name,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            # Fallback: client do agente, com reserva e retentativas
+            response = self._requisicao_api({
+                "model": self.agente.model_name,
+                "max_tokens": max_tokens,
+                "messages": [{"role": "user", "content": prompt}]
+            })
             return response.content[0].text
 
         return self.agente._executar_requisicao_simples(prompt, max_tokens=max_tokens)
 
+    @rastrear("plano", "executar_plano", lambda plano: {"ondas": len(plano.ondas)})
     def executar_plano(self, plano: Plano) -> Dict:
         """
-        Executa o plano criado, onda por onda.
+        Executa o plano criado: 🆕 pelo grafo de dependências (AgendadorPlano)
+        ou, com usar_dag=False, onda por onda.
 
         ✅ CORREÇÃO CRÍTICA APLICADA:
         - Usa _executar_com_iteracoes() ao invés de _executar_requisicao_simples()
@@ -1063,7 +2127,21 @@ Responda APENAS com o JSON válido, sem texto adicional."""
         falhas = []
 
         total_subtarefas = sum(len(onda.subtarefas) for onda in plano.ondas)
-        concluidas = 0
+
+        if self.usar_dag:
+            agendador = self._criar_agendador(plano)
+            agendador.executar(
+                self._executar_subtarefa,
+                max_workers=self.max_workers_paralelos,
+                ao_concluir=lambda chave, resultado: self._registrar_resultado(
+                    chave, resultado, agendador.onda_de[chave], resultados, falhas, total_subtarefas
+                ),
+                controlador=self.controlador
+            )
+            return self._consolidar_resultado_plano(
+                plano, resultados, falhas, len(resultados), total_subtarefas, tempo_inicio,
+                agendamento=self._resumo_agendamento(agendador)
+            )
 
         for onda in plano.ondas:
             print_realtime(f"\n🌊 ONDA {onda.numero}/{len(plano.ondas)}: {onda.descricao}")
@@ -1073,25 +2151,96 @@ Responda APENAS com o JSON válido, sem texto adicional."""
             # 🆕 Escolher entre execução paralela ou sequencial
             if onda.pode_executar_paralelo and len(onda.subtarefas) > 1:
                 # Execução PARALELA (15-20 tarefas simultâneas, speedup de até 20x)
-                resultados_onda = self._executar_onda_paralela(onda, max_workers=self.max_workers_paralelos)
+                resultados_onda = self._executar_onda_paralela(onda, max_workers=self._limite_paralelo())
             else:
                 # Execução SEQUENCIAL (tarefas dependentes ou onda com 1 subtarefa)
                 resultados_onda = self._executar_onda_sequencial(onda)
 
             # Processar resultados
             for subtarefa_id, resultado in resultados_onda.items():
-                if resultado.get('sucesso'):
-                    resultados[subtarefa_id] = resultado
-                    concluidas += 1
-                    print_realtime(f"   ✅ {subtarefa_id}: Concluída ({concluidas}/{total_subtarefas})")
-                else:
-                    falhas.append({
-                        'subtarefa_id': subtarefa_id,
-                        'erro': resultado.get('erro', 'erro desconhecido'),
-                        'onda': onda.numero
-                    })
-                    print_realtime(f"   ❌ {subtarefa_id}: Falhou - {resultado.get('erro', 'erro desconhecido')}")
+                self._registrar_resultado(subtarefa_id, resultado, onda.numero, resultados, falhas, total_subtarefas)
+
+        return self._consolidar_resultado_plano(
+            plano, resultados, falhas, len(resultados), total_subtarefas, tempo_inicio
+        )
+
+    def _registrar_resultado(
+        self,
+        subtarefa_id: str,
+        resultado: Dict,
+        numero_onda: int,
+        resultados: Dict[str, Dict],
+        falhas: List[Dict],
+        total_subtarefas: int
+    ) -> None:
+        """Acumula o resultado de uma subtarefa (sucessos em resultados, o resto em falhas)."""
+        if resultado.get('sucesso'):
+            resultados[subtarefa_id] = resultado
+            print_realtime(f"   ✅ {subtarefa_id}: Concluída ({len(resultados)}/{total_subtarefas})")
+        else:
+            falhas.append({
+                'subtarefa_id': subtarefa_id,
+                'erro': resultado.get('erro', 'erro desconhecido'),
+                'onda': numero_onda,
+                'cancelada': resultado.get('cancelada', False)
+            })
+            print_realtime(f"   ❌ {subtarefa_id}: Falhou - {resultado.get('erro', 'erro desconhecido')}")
+
+    def _limite_paralelo(self) -> int:
+        """🆕 Subtarefas simultâneas agora: limite do controlador adaptativo ou o fixo."""
+        return self.controlador.atual if self.controlador is not None else self.max_workers_paralelos
+
+    def _criar_agendador(self, plano: Plano) -> AgendadorPlano:
+        """🆕 Monta o DAG do plano e mostra o caminho crítico estimado."""
+        agendador = AgendadorPlano(plano.ondas)
+        estimado = agendador.prioridade[agendador.caminho_critico[0]] if agendador.caminho_critico else 0
+        if self.controlador is not None:
+            simultaneas = f"{self.controlador.atual} simultâneas (adaptativo, teto {self.controlador.maximo})"
+        else:
+            simultaneas = f"até {self.max_workers_paralelos} simultâneas"
+        print_realtime(f"\n🕸️  Agendamento por dependências: {len(agendador)} subtarefas, {simultaneas}")
+        print_realtime(f"   Caminho crítico: {' → '.join(agendador.caminho_critico)} (~{estimado:.0f}s estimados)")
+        return agendador
+
+    def _resumo_agendamento(self, agendador: AgendadorPlano) -> Dict[str, Any]:
+        """🆕 Tempos de fila/execução por subtarefa e o caminho crítico medido."""
+        caminho, duracao = agendador.caminho_critico_real()
+        esperas = [t['espera_fila'] for t in agendador.tempos.values() if 'espera_fila' in t]
+        resumo = {
+            'modo': 'dag',
+            'caminho_critico': caminho,
+            'duracao_caminho_critico': round(duracao, 2),
+            'caminho_critico_estimado': agendador.caminho_critico,
+            'espera_fila_media': round(sum(esperas) / len(esperas), 3) if esperas else 0.0,
+            'espera_fila_max': round(max(esperas, default=0.0), 3),
+            'subtarefas': {
+                chave: {k: round(v, 3) for k, v in tempos.items()}
+                for chave, tempos in agendador.tempos.items()
+            }
+        }
+        if self.controlador is not None:
+            resumo['concorrencia'] = self.controlador.estado()
+        return resumo
+
+    def _consolidar_resultado_plano(
+        self,
+        plano: Plano,
+        resultados: Dict[str, Dict],
+        falhas: List[Dict],
+        concluidas: int,
+        total_subtarefas: int,
+        tempo_inicio: float,
+        agendamento: Optional[Dict[str, Any]] = None
+    ) -> Dict:
+        """
+        Calcula métricas, atualiza o plano e exibe o resumo da execução.
 
+        Compartilhado por executar_plano() e executar_plano_async().
+        🆕 agendamento: resumo do AgendadorPlano (modo DAG), vai para metricas.
+
+        Returns:
+            Dicionário com resultado da execução
+        """
         tempo_total = time.time() - tempo_inicio
 
         # 🆕 Cálculos de métricas detalhadas
@@ -1121,9 +2270,12 @@ Responda APENAS com o JSON válido, sem texto adicional."""
                 'ondas_paralelas': ondas_paralelas,
                 'ondas_sequenciais': ondas_sequenciais,
                 'total_ondas': len(plano.ondas),
-                'paralelismo_usado': ondas_paralelas > 0
+                'paralelismo_usado': ondas_paralelas > 0,
+                'canceladas': sum(1 for f in falhas if f.get('cancelada'))  # 🆕 Prazo/Ctrl+C
             }
         }
+        if agendamento:
+            resultado_final['metricas']['agendamento'] = agendamento
 
         # Atualizar métricas
         self.metricas['planos_executados'] += 1
@@ -1150,35 +2302,41 @@ Responda APENAS com o JSON válido, sem texto adicional."""
         print_realtime(f"   ⚡ Tempo médio/tarefa: {metricas['tempo_medio_por_tarefa']:.1f}s")
         print_realtime(f"   ✅ Taxa de sucesso: {metricas['taxa_sucesso_percentual']:.0f}% ({concluidas}/{total_subtarefas})")
         print_realtime(f"   🔄 Iterações médias: {metricas['iteracoes_media']:.1f}")
+        if metricas['canceladas']:
+            print_realtime(f"   ⏹️  Canceladas (prazo/interrupção): {metricas['canceladas']}")
         print_realtime(f"   🌊 Ondas: {metricas['total_ondas']} ({metricas['ondas_paralelas']} paralelas, {metricas['ondas_sequenciais']} sequenciais)")
         if metricas['paralelismo_usado']:
             print_realtime(f"   🚀 Paralelismo: USADO ({self.max_workers_paralelos} workers)")
+        if agendamento:
+            print_realtime(
+                f"   🕸️  Caminho crítico: {agendamento['duracao_caminho_critico']:.1f}s "
+                f"({' → '.join(agendamento['caminho_critico'])})"
+            )
+            print_realtime(
+                f"   ⏳ Espera na fila: média {agendamento['espera_fila_media']:.1f}s, "
+                f"máx {agendamento['espera_fila_max']:.1f}s"
+            )
+            if 'concorrencia' in agendamento:
+                concorrencia = agendamento['concorrencia']
+                print_realtime(
+                    f"   🎚️  Concorrência adaptativa: limite {concorrencia['limite']} "
+                    f"(teto {concorrencia['maximo']}, {len(concorrencia['ajustes'])} ajuste(s))"
+                )
         print_realtime("="*70)
 
         return resultado_final
 
-    def _executar_onda_sequencial(self, onda: Onda) -> Dict[str, Dict]:
+    def _montar_prompt_subtarefa(self, st: Subtarefa) -> str:
         """
-        Executa subtarefas de uma onda sequencialmente.
-
-        ✅ CORREÇÃO CRÍTICA:
-        Substitui _executar_requisicao_simples() por _executar_com_iteracoes()
-        para garantir que Claude tem acesso às ferramentas.
+        Monta o prompt de execução de uma subtarefa (mesmo texto em todos os modos).
 
         Args:
-            onda: Onda com subtarefas a executar
+            st: Subtarefa a executar
 
         Returns:
-            Dicionário mapeando subtarefa_id -> resultado
+            Prompt com instruções explícitas para EXECUTAR a subtarefa
         """
-        resultados = {}
-
-        for st in onda.subtarefas:
-            print_realtime(f"\n   🎯 Executando: {st.titulo}")
-
-            try:
-                # ✅ CORREÇÃO: Prompt com instruções EXPLÍCITAS para executar
-                prompt = f"""SUBTAREFA {st.id}: {st.titulo}
+        return f"""SUBTAREFA {st.id}: {st.titulo}
 
 DESCRIÇÃO DETALHADA:
 {st.descricao}
@@ -1198,32 +2356,75 @@ FERRAMENTAS RECOMENDADAS:
 ⚠️  IMPORTANTE - LEIA ATENTAMENTE:
 1. Você DEVE EXECUTAR esta subtarefa de forma COMPLETA e PRÁTICA
 2. NÃO apenas descreva o que fazer - REALMENTE EXECUTE usando as ferramentas disponíveis
-3. Use as ferramentas necessárias para realizar a tarefa (criar_arquivo, bash_avancado, etc.)
+3. Use as ferramentas necessárias para realizar a tarefa (criar_arquivo, editar_arquivo, bash_avancado, etc.)
 4. Valide que o critério de sucesso foi atingido antes de finalizar
 5. Se encontrar erro, tente corrigi-lo automaticamente
 
 Execute esta subtarefa AGORA de forma completa!"""
 
+    def _extrair_resultado_subtarefa(self, resultado_exec: Any) -> Dict[str, Any]:
+        """
+        Normaliza o retorno de executar_tarefa() para o formato de resultado de subtarefa.
+
+        Args:
+            resultado_exec: String (resposta final), dict ou None
+
+        Returns:
+            Dicionário com sucesso, output, iteracoes_usadas e tempo_execucao
+        """
+        if isinstance(resultado_exec, dict):
+            return {
+                'sucesso': resultado_exec.get('concluido', False),
+                'output': resultado_exec.get('resposta', str(resultado_exec)),
+                'iteracoes_usadas': resultado_exec.get('iteracoes_usadas', 0),
+                'tempo_execucao': resultado_exec.get('tempo_execucao', 0)
+            }
+        return {
+            'sucesso': resultado_exec is not None,
+            'output': str(resultado_exec),
+            'iteracoes_usadas': 0,
+            'tempo_execucao': 0
+        }
+
+    @rastrear("onda", lambda onda, *a, **k: f"onda {onda.numero}", lambda onda, *a, **k: {"subtarefas": len(onda.subtarefas), "modo": "sequencial"})
+    def _executar_onda_sequencial(self, onda: Onda) -> Dict[str, Dict]:
+        """
+        Executa subtarefas de uma onda sequencialmente.
+
+        ✅ CORREÇÃO CRÍTICA:
+        Substitui _executar_requisicao_simples() por _executar_com_iteracoes()
+        para garantir que Claude tem acesso às ferramentas.
+
+        Args:
+            onda: Onda com subtarefas a executar
+
+        Returns:
+            Dicionário mapeando subtarefa_id -> resultado
+        """
+        resultados = {}
+
+        for st in onda.subtarefas:
+            print_realtime(f"\n   🎯 Executando: {st.titulo}")
+
+            try:
+                # ✅ CORREÇÃO: Prompt com instruções EXPLÍCITAS para executar
+                prompt = self._montar_prompt_subtarefa(st)
+
                 # ✅ CORREÇÃO: Usar executar_tarefa() COM ferramentas
                 # Limitar iterações para evitar loops infinitos em subtarefas
-                resultado_exec = self.agente.executar_tarefa(
-                    prompt,
-                    max_iteracoes=15  # Limite razoável para uma subtarefa
-                )
+                # 🆕 Contexto próprio: histórico isolado, sem input() e sem re-planejar
+                token = self._token_subtarefa(st)
+                with self.rastreador.span(st.id, "subtarefa", titulo=st.titulo):
+                    resultado_exec = self.agente.executar_tarefa(
+                        prompt,
+                        max_iteracoes=15,  # Limite razoável para uma subtarefa
+                        contexto=ExecucaoContexto(interativo=False, usar_planejamento=False, cancelamento=token)
+                    )
 
                 # Extrair informações do resultado
-                sucesso = resultado_exec.get('concluido', False) if isinstance(resultado_exec, dict) else (resultado_exec is not None)
-                output = resultado_exec.get('resposta', str(resultado_exec)) if isinstance(resultado_exec, dict) else str(resultado_exec)
-                iteracoes = resultado_exec.get('iteracoes_usadas', 0) if isinstance(resultado_exec, dict) else 0
+                resultados[st.id] = self._resultado_subtarefa(resultado_exec, token)
 
-                resultados[st.id] = {
-                    'sucesso': sucesso,
-                    'output': output,
-                    'iteracoes_usadas': iteracoes,
-                    'tempo_execucao': resultado_exec.get('tempo_execucao', 0) if isinstance(resultado_exec, dict) else 0
-                }
-
-                print_realtime(f"      ✓ Concluída em {iteracoes} iterações")
+                print_realtime(f"      ✓ Concluída em {resultados[st.id]['iteracoes_usadas']} iterações")
 
             except Exception as e:
                 print_realtime(f"      ✗ Erro: {str(e)[:100]}")
@@ -1235,6 +2436,66 @@ Execute esta subtarefa AGORA de forma completa!"""
 
         return resultados
 
+    def _token_subtarefa(self, st: Subtarefa) -> 'TokenCancelamento':
+        """
+        🆕 Token de cancelamento da subtarefa: filho do token do agente (Ctrl+C
+        cancela todas) com prazo tirado da estimativa do plano.
+        """
+        prazo = None
+        if self.fator_prazo > 0:
+            prazo = max(
+                self.PRAZO_MINIMO_SUBTAREFA,
+                AgendadorPlano.estimar_segundos(st.tempo_estimado) * self.fator_prazo
+            )
+        pai = getattr(self.agente, 'cancelamento', None)
+        return pai.filho(prazo) if pai is not None else TokenCancelamento(prazo)
+
+    def _resultado_subtarefa(self, resultado_exec: Any, token: 'TokenCancelamento') -> Dict[str, Any]:
+        """Resultado normalizado; 🆕 subtarefa que não concluiu por cancelamento fica marcada."""
+        resultado = self._extrair_resultado_subtarefa(resultado_exec)
+        if not resultado['sucesso'] and token.cancelado:
+            resultado['erro'] = f"Cancelada: {token.motivo}"
+            resultado['cancelada'] = True
+        return resultado
+
+    def _executar_subtarefa(self, st: Subtarefa) -> Dict:
+        """
+        Executa uma subtarefa com contexto próprio (modo paralelo e DAG).
+
+        🆕 O contexto leva o token da subtarefa: no prazo (ou com Ctrl+C) ela
+        para na próxima iteração e volta como falha com 'cancelada': True.
+
+        Args:
+            st: Subtarefa a executar
+
+        Returns:
+            Resultado normalizado; exceções viram {'sucesso': False, 'erro': ...}
+        """
+        token = self._token_subtarefa(st)
+        try:
+            # Mesmo prompt usado no modo sequencial
+            prompt = self._montar_prompt_subtarefa(st)
+
+            # Executar com iterações (mesma chamada do modo sequencial)
+            # 🆕 Cada worker tem seu ExecucaoContexto → nada de histórico compartilhado
+            with self.rastreador.span(st.id, "subtarefa", titulo=st.titulo):
+                resultado_exec = self.agente.executar_tarefa(
+                    prompt,
+                    max_iteracoes=15,
+                    contexto=ExecucaoContexto(interativo=False, usar_planejamento=False, cancelamento=token)
+                )
+
+            return self._resultado_subtarefa(resultado_exec, token)
+
+        except Exception as e:
+            return {
+                'sucesso': False,
+                'erro': str(e),
+                'output': '',
+                'cancelada': token.cancelado
+            }
+
+    @rastrear("onda", lambda onda, *a, **k: f"onda {onda.numero}", lambda onda, *a, **k: {"subtarefas": len(onda.subtarefas), "modo": "paralelo"})
     def _executar_onda_paralela(self, onda: Onda, max_workers: int = 15) -> Dict[str, Dict]:
         """
         🚀 Executa subtarefas de uma onda em PARALELO usando ThreadPoolExecutor.
@@ -1244,10 +2505,12 @@ Execute esta subtarefa AGORA de forma completa!"""
 
         Características:
             - Pool de workers configurável (default: 15 para Tier 2)
-            - Timeout por subtarefa (60s)
+            - 🆕 Prazo por subtarefa (estimativa do plano): a subtarefa atrasada é
+              cancelada e para na próxima iteração, sem derrubar a contabilidade da onda
             - Coleta de resultados à medida que ficam prontos
             - Tratamento individual de erros por worker
             - Thread-safe com rate limit manager
+            - 🆕 Um ExecucaoContexto por subtarefa (histórico e recuperação isolados)
 
         Args:
             onda: Onda com subtarefas a executar
@@ -1266,73 +2529,15 @@ Execute esta subtarefa AGORA de forma completa!"""
         print_realtime(f"\n   🚀 Modo PARALELO: {total_subtarefas} subtarefas com {max_workers} workers")
 
         def executar_subtarefa(st: Subtarefa) -> Tuple[str, Dict]:
-            """
-            Worker function: executa uma subtarefa e retorna (id, resultado).
-
-            Args:
-                st: Subtarefa a executar
-
-            Returns:
-                Tupla (subtarefa_id, resultado_dict)
-            """
-            try:
-                # Mesmo prompt usado no modo sequencial
-                prompt = f"""SUBTAREFA {st.id}: {st.titulo}
-
-DESCRIÇÃO DETALHADA:
-{st.descricao}
-
-INPUT DISPONÍVEL:
-{st.input_esperado}
-
-OUTPUT ESPERADO:
-{st.output_esperado}
-
-CRITÉRIO DE SUCESSO:
-{st.criterio_sucesso}
-
-FERRAMENTAS RECOMENDADAS:
-{', '.join(st.ferramentas) if st.ferramentas else 'Nenhuma ferramenta específica'}
-
-⚠️  IMPORTANTE - LEIA ATENTAMENTE:
-1. Você DEVE EXECUTAR esta subtarefa de forma COMPLETA e PRÁTICA
-2. NÃO apenas descreva o que fazer - REALMENTE EXECUTE usando as ferramentas disponíveis
-3. Use as ferramentas necessárias para realizar a tarefa (criar_arquivo, bash_avancado, etc.)
-4. Valide que o critério de sucesso foi atingido antes de finalizar
-5. Se encontrar erro, tente corrigi-lo automaticamente
-
-Execute esta subtarefa AGORA de forma completa!"""
-
-                # Executar com iterações (mesma chamada do modo sequencial)
-                resultado_exec = self.agente.executar_tarefa(
-                    prompt,
-                    max_iteracoes=15
-                )
-
-                # Extrair informações
-                sucesso = resultado_exec.get('concluido', False) if isinstance(resultado_exec, dict) else (resultado_exec is not None)
-                output = resultado_exec.get('resposta', str(resultado_exec)) if isinstance(resultado_exec, dict) else str(resultado_exec)
-                iteracoes = resultado_exec.get('iteracoes_usadas', 0) if isinstance(resultado_exec, dict) else 0
-
-                return (st.id, {
-                    'sucesso': sucesso,
-                    'output': output,
-                    'iteracoes_usadas': iteracoes,
-                    'tempo_execucao': resultado_exec.get('tempo_execucao', 0) if isinstance(resultado_exec, dict) else 0
-                })
-
-            except Exception as e:
-                return (st.id, {
-                    'sucesso': False,
-                    'erro': str(e),
-                    'output': ''
-                })
+            """Worker function: executa uma subtarefa e retorna (id, resultado)."""
+            return (st.id, self._executar_subtarefa(st))
 
         # Criar pool de workers
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # Submeter todas as subtarefas
+            # 🆕 Cópia do contexto por worker: spans das subtarefas ficam sob a onda
             futures = {
-                executor.submit(executar_subtarefa, st): st
+                executor.submit(contextvars.copy_context().run, executar_subtarefa, st): st
                 for st in onda.subtarefas
             }
 
@@ -1341,10 +2546,11 @@ Execute esta subtarefa AGORA de forma completa!"""
             sucessos = 0
             tempo_inicio_onda = time.time()
 
-            for future in as_completed(futures, timeout=120):  # Timeout global de 2 minutos
+            # 🆕 Sem timeout global: cada subtarefa respeita o próprio prazo (TokenCancelamento)
+            for future in as_completed(futures):
                 st = futures[future]
                 try:
-                    subtarefa_id, resultado = future.result(timeout=60)  # Timeout por subtarefa: 60s
+                    subtarefa_id, resultado = future.result()
                     resultados[subtarefa_id] = resultado
 
                     concluidas += 1
@@ -1369,13 +2575,6 @@ Execute esta subtarefa AGORA de forma completa!"""
                         f"{st.titulo[:40]}"
                     )
 
-                except TimeoutError:
-                    print_realtime(f"      ⏱️  TIMEOUT: {st.titulo} (>60s)")
-                    resultados[st.id] = {
-                        'sucesso': False,
-                        'erro': 'Timeout: subtarefa excedeu 60 segundos',
-                        'output': ''
-                    }
                 except Exception as e:
                     print_realtime(f"      ✗ ERRO: {st.titulo} - {str(e)[:50]}")
                     resultados[st.id] = {
@@ -1386,18 +2585,133 @@ Execute esta subtarefa AGORA de forma completa!"""
 
         return resultados
 
+    # ════════════════════════════════════════════════════════════════════════
+    # ⚡ EXECUÇÃO ASYNCIO (LUNA_ASYNC=1)
+    # ════════════════════════════════════════════════════════════════════════
 
-# ════════════════════════════════════════════════════════════════════════════
-# HANDLER DE INTERRUPÇÃO
-# ════════════════════════════════════════════════════════════════════════════
+    @rastrear("plano", "executar_plano_async", lambda plano: {"ondas": len(plano.ondas)})
+    async def executar_plano_async(self, plano: Plano) -> Dict:
+        """
+        ⚡ Versão asyncio de executar_plano().
 
-class InterruptHandler:
-    """
-    Gerencia interrupções (Ctrl+C, SIGTERM) graciosamente.
-    
-    Features:
-        - Detecta Ctrl+C e SIGTERM
-        - Faz cleanup de recursos (navegador, stats)
+        Cada subtarefa é uma corrotina (agente.executar_tarefa_async) com
+        histórico próprio; 🆕 o AgendadorPlano dispara cada uma quando as
+        dependências terminam (ou, com usar_dag=False, ondas paralelas usam
+        asyncio.gather limitado por semáforo).
+
+        Args:
+            plano: Plano criado pelo método planejar()
+
+        Returns:
+            Dicionário com resultado da execução (mesmo formato de executar_plano)
+        """
+        print_realtime("\n" + "="*70)
+        print_realtime("🚀 EXECUTANDO PLANO (async)...")
+        print_realtime("="*70)
+
+        tempo_inicio = time.time()
+        resultados = {}
+        falhas = []
+
+        total_subtarefas = sum(len(onda.subtarefas) for onda in plano.ondas)
+
+        if self.usar_dag:
+            agendador = self._criar_agendador(plano)
+            await agendador.executar_async(
+                self._executar_subtarefa_async,
+                max_concorrencia=self.max_workers_paralelos,
+                ao_concluir=lambda chave, resultado: self._registrar_resultado(
+                    chave, resultado, agendador.onda_de[chave], resultados, falhas, total_subtarefas
+                ),
+                controlador=self.controlador
+            )
+            return self._consolidar_resultado_plano(
+                plano, resultados, falhas, len(resultados), total_subtarefas, tempo_inicio,
+                agendamento=self._resumo_agendamento(agendador)
+            )
+
+        for onda in plano.ondas:
+            print_realtime(f"\n🌊 ONDA {onda.numero}/{len(plano.ondas)}: {onda.descricao}")
+            print_realtime(f"   Subtarefas nesta onda: {len(onda.subtarefas)}")
+
+            limite = self._limite_paralelo() if onda.pode_executar_paralelo else 1
+            resultados_onda = await self._executar_onda_async(onda, limite)
+
+            for subtarefa_id, resultado in resultados_onda.items():
+                self._registrar_resultado(subtarefa_id, resultado, onda.numero, resultados, falhas, total_subtarefas)
+
+        return self._consolidar_resultado_plano(
+            plano, resultados, falhas, len(resultados), total_subtarefas, tempo_inicio
+        )
+
+    async def _executar_subtarefa_async(self, st: Subtarefa) -> Dict:
+        """
+        Versão corrotina de _executar_subtarefa() (modos async por onda e DAG).
+
+        Returns:
+            Resultado normalizado; exceções viram {'sucesso': False, 'erro': ...}
+        """
+        print_realtime(f"\n   🎯 Executando: {st.titulo}")
+        token = self._token_subtarefa(st)
+        try:
+            # Subtarefas nunca re-planejam (evita planos recursivos)
+            with self.rastreador.span(st.id, "subtarefa", titulo=st.titulo):
+                resultado_exec = await self.agente.executar_tarefa_async(
+                    self._montar_prompt_subtarefa(st),
+                    max_iteracoes=15,
+                    usar_planejamento=False,
+                    cancelamento=token
+                )
+            return self._resultado_subtarefa(resultado_exec, token)
+        except Exception as e:
+            print_realtime(f"      ✗ Erro: {str(e)[:100]}")
+            return {
+                'sucesso': False,
+                'erro': str(e),
+                'output': '',
+                'cancelada': token.cancelado
+            }
+
+    @rastrear("onda", lambda onda, *a, **k: f"onda {onda.numero}", lambda onda, *a, **k: {"subtarefas": len(onda.subtarefas), "modo": "async"})
+    async def _executar_onda_async(self, onda: Onda, max_concorrencia: int) -> Dict[str, Dict]:
+        """
+        Executa as subtarefas de uma onda como corrotinas concorrentes.
+
+        Args:
+            onda: Onda com subtarefas a executar
+            max_concorrencia: Máximo de subtarefas simultâneas (1 = sequencial)
+
+        Returns:
+            Dicionário mapeando subtarefa_id -> resultado (ordem da onda)
+        """
+        semaforo = asyncio.Semaphore(max(1, max_concorrencia))
+
+        if max_concorrencia > 1 and len(onda.subtarefas) > 1:
+            print_realtime(
+                f"\n   🚀 Modo PARALELO (async): {len(onda.subtarefas)} subtarefas, "
+                f"até {max_concorrencia} simultâneas"
+            )
+
+        async def executar_subtarefa(st: Subtarefa) -> Tuple[str, Dict]:
+            async with semaforo:
+                return st.id, await self._executar_subtarefa_async(st)
+
+        pares = await asyncio.gather(*(executar_subtarefa(st) for st in onda.subtarefas))
+        return dict(pares)
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# HANDLER DE INTERRUPÇÃO
+# ════════════════════════════════════════════════════════════════════════════
+
+class InterruptHandler:
+    """
+    Gerencia interrupções (Ctrl+C, SIGTERM) graciosamente.
+    
+    Features:
+        - Detecta Ctrl+C e SIGTERM
+        - Faz cleanup de recursos (navegador, stats)
+        - 🆕 Cancela as execuções em andamento (agente.cancelar_execucao)
         - Segunda interrupção força saída
         - Registra eventos em log
     
@@ -1462,6 +2776,11 @@ class InterruptHandler:
                     print_realtime("   ✅ Navegador fechado")
             except Exception as e:
                 print_realtime(f"   ⚠️  Erro ao fechar navegador: {e}")
+
+        # 🆕 Subtarefas em andamento param na próxima iteração (sem novas chamadas à API)
+        if self.agente and hasattr(self.agente, 'cancelar_execucao'):
+            print_realtime("   ⏹️  Cancelando execuções em andamento...")
+            self.agente.cancelar_execucao("interrompido pelo usuário")
         
         # Salvar estatísticas
         if self.agente and hasattr(self.agente, 'rate_limit_manager'):
@@ -1483,6 +2802,21 @@ class InterruptHandler:
             except Exception as e:
                 print_realtime(f"   ⚠️  Erro ao salvar stats: {e}")
         
+        # 🆕 Encerrar sessões bash persistentes
+        sessoes_bash = getattr(self.sistema_ferramentas, 'sessoes_bash', None)
+        if sessoes_bash is not None:
+            sessoes_bash.encerrar_todas()
+
+        # 🆕 Drenar eventos de telemetria ainda na fila do escritor
+        telemetria = getattr(self.sistema_ferramentas, 'telemetria', None)
+        if telemetria is not None:
+            try:
+                print_realtime("   📊 Gravando telemetria pendente...")
+                telemetria.fechar()
+                print_realtime("   ✅ Telemetria gravada")
+            except Exception as e:
+                print_realtime(f"   ⚠️  Erro ao gravar telemetria: {e}")
+        
         self.limpeza_feita = True
         print_realtime("\n✅ Limpeza concluída!")
     
@@ -1645,6 +2979,258 @@ class CacheManager:
             print_realtime(f"   Tokens do cache: {stats['cache_read_tokens']:,}")
 
 
+# ════════════════════════════════════════════════════════════════════════════
+# COMPACTAÇÃO DE HISTÓRICO (ORÇAMENTO DE TOKENS)
+# ════════════════════════════════════════════════════════════════════════════
+
+class CompactadorHistorico:
+    """
+    Mantém o histórico da conversa abaixo de um orçamento de tokens.
+
+    🆕 Sem compactação o histórico inteiro é reenviado a cada iteração e o
+    custo de input cresce quadraticamente ao longo de uma tarefa longa.
+
+    Estratégia (em ordem, parando assim que cabe no orçamento):
+        1. Omite o miolo de tool_results antigos e de inputs grandes de
+           tool_use antigos (o par tool_use/tool_result continua intacto)
+        2. Resume as mensagens antigas com um modelo barato e anexa o resumo
+           à primeira mensagem (a tarefa original)
+
+    Os cortes acontecem sempre antes de uma mensagem do assistente, então
+    nenhum tool_result fica sem o tool_use correspondente.
+
+    Uso:
+        compactador = CompactadorHistorico(orcamento_tokens=80000, resumidor=func)
+        compactador.compactar(historico)  # Altera a lista no lugar
+    """
+
+    MARCADOR_RESUMO = "\n\n📝 RESUMO DO PROGRESSO ANTERIOR (histórico compactado):\n"
+
+    def __init__(
+        self,
+        orcamento_tokens: int = 80000,
+        manter_mensagens_recentes: int = 6,
+        limite_resultado_antigo: int = 600,
+        resumidor: Optional[Callable[[str], str]] = None
+    ):
+        """
+        Args:
+            orcamento_tokens: Limite estimado de tokens do histórico
+            manter_mensagens_recentes: Mensagens finais nunca alteradas
+            limite_resultado_antigo: Caracteres mantidos de cada resultado antigo
+            resumidor: Função texto -> resumo (ex.: chamada a um modelo barato).
+                Se None ou se falhar, usa um resumo extrativo local
+        """
+        self.orcamento_tokens = orcamento_tokens
+        self.manter_mensagens_recentes = max(2, manter_mensagens_recentes)
+        self.limite_resultado_antigo = limite_resultado_antigo
+        self.resumidor = resumidor
+
+        self.metricas = {
+            'compactacoes': 0,
+            'resultados_omitidos': 0,
+            'mensagens_resumidas': 0,
+            'tokens_economizados': 0
+        }
+
+    # ─── Estimativa ────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _campo(bloco: Any, nome: str, padrao: Any = None) -> Any:
+        """Lê um campo de bloco dict ou objeto do SDK."""
+        if isinstance(bloco, dict):
+            return bloco.get(nome, padrao)
+        return getattr(bloco, nome, padrao)
+
+    def _texto_bloco(self, bloco: Any) -> str:
+        """Texto aproximado de um content block (para estimar e resumir)."""
+        if isinstance(bloco, str):
+            return bloco
+        tipo = self._campo(bloco, 'type')
+        if tipo == 'text':
+            return self._campo(bloco, 'text', '') or ''
+        if tipo == 'tool_use':
+            return f"{self._campo(bloco, 'name', '')} {json.dumps(self._campo(bloco, 'input', {}), ensure_ascii=False, default=str)}"
+        if tipo == 'tool_result':
+            conteudo = self._campo(bloco, 'content', '')
+            if isinstance(conteudo, list):
+                return ' '.join(self._texto_bloco(b) for b in conteudo)
+            return str(conteudo)
+        return str(bloco)
+
+    def _texto_mensagem(self, mensagem: Dict) -> str:
+        conteudo = mensagem.get('content', '')
+        if isinstance(conteudo, str):
+            return conteudo
+        return ' '.join(self._texto_bloco(b) for b in conteudo)
+
+    def estimar_tokens(self, historico: List[Dict]) -> int:
+        """Estimativa rápida (~4 caracteres por token + overhead por mensagem)."""
+        return sum(len(self._texto_mensagem(m)) // 4 + 4 for m in historico)
+
+    # ─── Compactação ───────────────────────────────────────────────────────
+
+    def compactar(self, historico: List[Dict]) -> bool:
+        """
+        Compacta o histórico no lugar se exceder o orçamento.
+
+        Args:
+            historico: Lista de mensagens (a primeira é a tarefa original)
+
+        Returns:
+            True se o histórico foi alterado
+        """
+        tokens_antes = self.estimar_tokens(historico)
+        if tokens_antes <= self.orcamento_tokens or len(historico) <= self.manter_mensagens_recentes + 1:
+            return False
+
+        limite_antigas = len(historico) - self.manter_mensagens_recentes
+
+        # Etapa 1: omitir conteúdo volumoso de mensagens antigas
+        for i in range(1, limite_antigas):
+            historico[i] = self._omitir_conteudo_antigo(historico[i])
+
+        # Etapa 2: resumir mensagens antigas
+        if self.estimar_tokens(historico) > self.orcamento_tokens:
+            self._resumir_antigas(historico, limite_antigas)
+
+        tokens_depois = self.estimar_tokens(historico)
+        if tokens_depois >= tokens_antes:
+            return False
+
+        self.metricas['compactacoes'] += 1
+        self.metricas['tokens_economizados'] += tokens_antes - tokens_depois
+        print_realtime(
+            f"🗜️  Histórico compactado: ~{tokens_antes:,} → ~{tokens_depois:,} tokens "
+            f"(orçamento {self.orcamento_tokens:,})"
+        )
+        return True
+
+    def _encurtar(self, texto: str) -> str:
+        """Mantém início e fim de um texto longo."""
+        metade = self.limite_resultado_antigo // 2
+        omitidos = len(texto) - 2 * metade
+        return f"{texto[:metade]}\n[... {omitidos} caracteres omitidos (resultado antigo) ...]\n{texto[-metade:]}"
+
+    def _omitir_conteudo_antigo(self, mensagem: Dict) -> Dict:
+        """Devolve cópia da mensagem com tool_results/inputs grandes encurtados."""
+        conteudo = mensagem.get('content')
+        if not isinstance(conteudo, list):
+            return mensagem
+
+        novos = []
+        alterou = False
+        for bloco in conteudo:
+            tipo = self._campo(bloco, 'type')
+
+            if tipo == 'tool_result':
+                texto = self._texto_bloco(bloco)
+                if len(texto) > self.limite_resultado_antigo and '(resultado antigo)' not in texto:
+                    encurtado = {
+                        'type': 'tool_result',
+                        'tool_use_id': self._campo(bloco, 'tool_use_id'),
+                        'content': self._encurtar(texto)
+                    }
+                    if self._campo(bloco, 'is_error'):
+                        encurtado['is_error'] = True
+                    bloco = encurtado
+                    self.metricas['resultados_omitidos'] += 1
+                    alterou = True
+
+            elif tipo == 'tool_use':
+                entrada = self._campo(bloco, 'input', {}) or {}
+                if isinstance(entrada, dict) and any(
+                    isinstance(v, str) and len(v) > self.limite_resultado_antigo
+                    for v in entrada.values()
+                ):
+                    bloco = {
+                        'type': 'tool_use',
+                        'id': self._campo(bloco, 'id'),
+                        'name': self._campo(bloco, 'name'),
+                        'input': {
+                            k: self._encurtar(v) if isinstance(v, str) and len(v) > self.limite_resultado_antigo else v
+                            for k, v in entrada.items()
+                        }
+                    }
+                    alterou = True
+
+            elif tipo == 'text' and not isinstance(bloco, dict):
+                # Normaliza objetos do SDK para dict (evita reenviar campos extras)
+                bloco = {'type': 'text', 'text': self._campo(bloco, 'text', '')}
+
+            novos.append(bloco)
+
+        if not alterou:
+            return mensagem
+        return {**mensagem, 'content': novos}
+
+    def _ponto_de_corte(self, historico: List[Dict], limite_antigas: int) -> int:
+        """
+        Maior índice <= limite_antigas que começa uma mensagem do assistente.
+
+        Tudo antes dele pode ser removido sem quebrar pares tool_use/tool_result.
+        Retorna 0 se não houver corte possível.
+        """
+        for i in range(limite_antigas, 1, -1):
+            if historico[i].get('role') == 'assistant':
+                return i
+        return 0
+
+    def _resumir_antigas(self, historico: List[Dict], limite_antigas: int) -> None:
+        """Substitui historico[1:corte] por um resumo anexado à primeira mensagem."""
+        corte = self._ponto_de_corte(historico, limite_antigas)
+        if corte <= 1:
+            return
+
+        primeira = historico[0]
+        texto_primeira = primeira['content'] if isinstance(primeira.get('content'), str) else self._texto_mensagem(primeira)
+        tarefa, _, resumo_anterior = texto_primeira.partition(self.MARCADOR_RESUMO)
+
+        linhas = []
+        if resumo_anterior:
+            linhas.append(f"[Resumo anterior]\n{resumo_anterior}")
+        for mensagem in historico[1:corte]:
+            papel = "ASSISTENTE" if mensagem.get('role') == 'assistant' else "USUÁRIO/FERRAMENTAS"
+            linhas.append(f"[{papel}] {self._texto_mensagem(mensagem)[:1500]}")
+        transcricao = '\n'.join(linhas)[-30000:]
+
+        resumo = None
+        if self.resumidor is not None:
+            try:
+                resumo = self.resumidor(transcricao)
+            except Exception as e:
+                print_realtime(f"⚠️  Resumo via modelo falhou ({str(e)[:60]}) - usando resumo local")
+        if not resumo:
+            resumo = self._resumo_extrativo(historico[1:corte], resumo_anterior)
+
+        self.metricas['mensagens_resumidas'] += corte - 1
+        historico[0:corte] = [{
+            'role': 'user',
+            'content': tarefa + self.MARCADOR_RESUMO + resumo.strip()
+        }]
+
+    def _resumo_extrativo(self, mensagens: List[Dict], resumo_anterior: str = "") -> str:
+        """Resumo local sem API: ferramentas usadas e trechos das falas do assistente."""
+        ferramentas: List[str] = []
+        falas: List[str] = []
+        for mensagem in mensagens:
+            conteudo = mensagem.get('content')
+            if mensagem.get('role') != 'assistant' or not isinstance(conteudo, list):
+                continue
+            for bloco in conteudo:
+                tipo = self._campo(bloco, 'type')
+                if tipo == 'tool_use':
+                    ferramentas.append(self._campo(bloco, 'name', '?'))
+                elif tipo == 'text' and self._campo(bloco, 'text'):
+                    falas.append(self._campo(bloco, 'text')[:200])
+
+        partes = [resumo_anterior.strip()] if resumo_anterior.strip() else []
+        if ferramentas:
+            partes.append(f"Ferramentas já executadas: {', '.join(ferramentas)}")
+        partes.extend(f"- {fala}" for fala in falas[-8:])
+        return '\n'.join(partes) or "(sem conteúdo relevante)"
+
+
 # ════════════════════════════════════════════════════════════════════════════
 # SISTEMA DE BATCH PROCESSING MASSIVO
 # ════════════════════════════════════════════════════════════════════════════
@@ -1908,6 +3494,73 @@ class BatchProcessor:
 # SISTEMA DE RATE LIMITING COM VALORES OFICIAIS
 # ════════════════════════════════════════════════════════════════════════════
 
+class BaldeTokens:
+    """
+    🆕 Balde de tokens com reabastecimento contínuo (um por dimensão: RPM/ITPM/OTPM).
+
+    A capacidade se recompõe linearmente ao longo de `periodo` segundos, como
+    no limitador da própria API. O saldo pode ficar negativo: cada reserva
+    entra como "dívida" e a próxima reserva só é liberada quando a dívida
+    anterior for paga. Assim a espera é calculada exatamente, e as reservas
+    são atendidas na ordem de chegada (FIFO) sem acordar todos de uma vez.
+    """
+
+    def __init__(self, capacidade: float, periodo: float = 60.0):
+        self.periodo = periodo
+        self.capacidade = max(1.0, float(capacidade))
+        self.taxa = self.capacidade / periodo  # unidades por segundo
+        self.tokens = self.capacidade
+        self.ultimo = time.monotonic()
+
+    def _reabastecer(self, agora: float) -> None:
+        if agora > self.ultimo:
+            self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+            self.ultimo = agora
+
+    def espera_para(self, quantidade: float, agora: float) -> float:
+        """Segundos até haver `quantidade` disponível (0.0 se já houver)."""
+        self._reabastecer(agora)
+        # Pedidos maiores que a capacidade esperam o balde encher, não para sempre
+        falta = min(quantidade, self.capacidade) - self.tokens
+        return max(0.0, falta / self.taxa)
+
+    def consumir(self, quantidade: float, agora: float) -> None:
+        """Debita `quantidade` (pode deixar o saldo negativo)."""
+        self._reabastecer(agora)
+        self.tokens -= min(quantidade, self.capacidade)
+
+    def ajustar(self, delta: float) -> None:
+        """Corrige o saldo (delta > 0 devolve capacidade reservada a mais)."""
+        self.tokens = min(self.capacidade, self.tokens + delta)
+
+    def limitar(self, maximo: float, agora: float) -> None:
+        """Nunca considera disponível mais do que `maximo` (valor informado pelo servidor)."""
+        self._reabastecer(agora)
+        self.tokens = min(self.tokens, maximo)
+
+    def redimensionar(self, capacidade: float) -> None:
+        """Ajusta capacidade e taxa (ex.: limite real do servidor difere do tier local)."""
+        self.capacidade = max(1.0, float(capacidade))
+        self.taxa = self.capacidade / self.periodo
+        self.tokens = min(self.tokens, self.capacidade)
+
+
+@dataclass(eq=False)
+class ReservaRateLimit:
+    """
+    🆕 Capacidade reservada para UMA requisição.
+
+    Devolvida por reservar()/aguardar_se_necessario() e entregue de volta
+    por quem fez a requisição (registrar_uso ou liberar_reserva), para que
+    workers concorrentes nunca acertem a reserva um do outro.
+    """
+
+    tokens_input: int
+    tokens_output: int
+    espera: float = 0.0
+    motivo: Optional[str] = None
+
+
 class RateLimitManager:
     """
     Gerencia rate limits com valores OFICIAIS da Anthropic.
@@ -1918,16 +3571,17 @@ class RateLimitManager:
     Features:
         - Limites corretos para todos os tiers
         - 3 modos de operação (conservador, balanceado, agressivo)
-        - Janela deslizante de 1 minuto
+        - Janela deslizante de 1 minuto (🆕 deques + totais acumulados: O(1) amortizado)
+        - 🆕 Baldes de tokens com espera exata e reservas em ordem FIFO
         - Prevenção proativa de erros 429
         - Estatísticas detalhadas
         - Barras de progresso visuais
     
     Uso:
         manager = RateLimitManager(tier="tier2", modo="balanceado")
-        manager.aguardar_se_necessario()
-        # ... fazer requisição ...
-        manager.registrar_uso(input_tokens, output_tokens)
+        reserva = manager.aguardar_se_necessario()
+        # ... fazer requisição (se falhar: manager.liberar_reserva(reserva)) ...
+        manager.registrar_uso(input_tokens, output_tokens, reserva)
     """
     
     def __init__(self, tier: str = "tier1", modo: str = "balanceado"):
@@ -1962,10 +3616,19 @@ class RateLimitManager:
         self.threshold = self.modos[modo]["threshold"]
         
         # Tracking com janela deslizante
+        # 🆕 Deques de timestamps monotônicos (time.monotonic) + totais acumulados:
+        # registrar e consultar uso custam O(1) amortizado, sem refazer listas
         self.janela_tempo = timedelta(minutes=1)
-        self.historico_requisicoes: List[datetime] = []
-        self.historico_tokens_input: List[Tuple[datetime, int]] = []
-        self.historico_tokens_output: List[Tuple[datetime, int]] = []
+        self.janela_segundos = self.janela_tempo.total_seconds()
+        self.historico_requisicoes: Deque[float] = deque()
+        self.historico_tokens_input: Deque[Tuple[float, int]] = deque()
+        self.historico_tokens_output: Deque[Tuple[float, int]] = deque()
+        self._soma_tokens_input = 0
+        self._soma_tokens_output = 0
+
+        # Últimas 5 requisições (para estimar a próxima)
+        self._ultimos_input: Deque[int] = deque(maxlen=5)
+        self._ultimos_output: Deque[int] = deque(maxlen=5)
         
         # Estatísticas globais
         self.total_requisicoes = 0
@@ -1976,43 +3639,82 @@ class RateLimitManager:
         # 🆕 Thread-safety para processamento paralelo
         self.lock = threading.Lock()
 
+        # 🆕 Baldes de tokens (capacidade = limite × threshold, recompostos em 60s)
+        # A janela deslizante acima continua servindo para status/estatísticas;
+        # a admissão de novas requisições é decidida pelos baldes.
+        self.balde_rpm = BaldeTokens(self.limite_rpm * self.threshold, self.janela_segundos)
+        self.balde_itpm = BaldeTokens(self.limite_itpm * self.threshold, self.janela_segundos)
+        self.balde_otpm = BaldeTokens(self.limite_otpm * self.threshold, self.janela_segundos)
+        # Reservas ainda sem uso registrado (corrigidas em registrar_uso pelo dono)
+        self._reservas_pendentes: Set[ReservaRateLimit] = set()
+
+        # 🆕 Quota informada pelo servidor (cabeçalhos anthropic-ratelimit-*)
+        self._pausa_ate = 0.0  # retry-after de um 429 vale para todos os workers
+        self.sincronizacoes_servidor = 0
+
+        # 🆕 Interessados nos sinais de limite (ex.: ControladorConcorrencia)
+        self._observadores: List[Callable[[str, float], None]] = []
+
         print_realtime(f"🛡️  Rate Limit Manager: {tier.upper()} - Modo {modo.upper()}")
         print_realtime(f"   Limites: {self.limite_itpm:,} ITPM | {self.limite_otpm:,} OTPM | {self.limite_rpm} RPM")
         print_realtime(f"   Threshold: {self.threshold*100:.0f}%")
     
-    def registrar_uso(self, tokens_input: int, tokens_output: int) -> None:
+    def registrar_uso(
+        self,
+        tokens_input: int,
+        tokens_output: int,
+        reserva: Optional[ReservaRateLimit] = None
+    ) -> None:
         """
         Registra uso de tokens e requisição. (Thread-safe)
 
         Args:
             tokens_input: Quantidade de tokens de input
             tokens_output: Quantidade de tokens de output
+            reserva: 🆕 Reserva feita para esta requisição (None = sem reserva prévia)
         """
         with self.lock:  # 🔒 Thread-safe
-            agora = datetime.now()
+            agora = time.monotonic()
 
             self.historico_requisicoes.append(agora)
             self.historico_tokens_input.append((agora, tokens_input))
             self.historico_tokens_output.append((agora, tokens_output))
+            self._soma_tokens_input += tokens_input
+            self._soma_tokens_output += tokens_output
+            self._ultimos_input.append(tokens_input)
+            self._ultimos_output.append(tokens_output)
 
             self.total_requisicoes += 1
             self.total_tokens += (tokens_input + tokens_output)
 
             self._limpar_historico_antigo(agora)
+
+            # 🆕 Acerto dos baldes: troca a estimativa reservada pelo uso real
+            if reserva is not None and reserva in self._reservas_pendentes:
+                self._reservas_pendentes.discard(reserva)
+                self.balde_itpm.ajustar(reserva.tokens_input - tokens_input)
+                self.balde_otpm.ajustar(reserva.tokens_output - tokens_output)
+            else:
+                # Requisição feita sem reserva prévia (ou já liberada): debita o uso real
+                self.balde_rpm.consumir(1, agora)
+                self.balde_itpm.consumir(tokens_input, agora)
+                self.balde_otpm.consumir(tokens_output, agora)
     
-    def _limpar_historico_antigo(self, agora: datetime) -> None:
-        """Remove entradas antigas da janela deslizante."""
-        limite_tempo = agora - self.janela_tempo
-        
-        self.historico_requisicoes = [
-            t for t in self.historico_requisicoes if t > limite_tempo
-        ]
-        self.historico_tokens_input = [
-            (t, tokens) for t, tokens in self.historico_tokens_input if t > limite_tempo
-        ]
-        self.historico_tokens_output = [
-            (t, tokens) for t, tokens in self.historico_tokens_output if t > limite_tempo
-        ]
+    def _limpar_historico_antigo(self, agora: float) -> None:
+        """
+        Remove entradas antigas da janela deslizante.
+
+        Entradas chegam em ordem de tempo, então basta descartar pela esquerda
+        (cada entrada sai uma única vez → O(1) amortizado).
+        """
+        limite_tempo = agora - self.janela_segundos
+
+        while self.historico_requisicoes and self.historico_requisicoes[0] <= limite_tempo:
+            self.historico_requisicoes.popleft()
+        while self.historico_tokens_input and self.historico_tokens_input[0][0] <= limite_tempo:
+            self._soma_tokens_input -= self.historico_tokens_input.popleft()[1]
+        while self.historico_tokens_output and self.historico_tokens_output[0][0] <= limite_tempo:
+            self._soma_tokens_output -= self.historico_tokens_output.popleft()[1]
     
     def calcular_uso_atual(self) -> Dict[str, Any]:
         """
@@ -2022,12 +3724,11 @@ class RateLimitManager:
             Dicionário com métricas de uso atual
         """
         with self.lock:  # 🔒 Thread-safe
-            agora = datetime.now()
-            self._limpar_historico_antigo(agora)
+            self._limpar_historico_antigo(time.monotonic())
 
             rpm_atual = len(self.historico_requisicoes)
-            itpm_atual = sum(tokens for _, tokens in self.historico_tokens_input)
-            otpm_atual = sum(tokens for _, tokens in self.historico_tokens_output)
+            itpm_atual = self._soma_tokens_input
+            otpm_atual = self._soma_tokens_output
 
             return {
                 "rpm_atual": rpm_atual,
@@ -2055,31 +3756,55 @@ class RateLimitManager:
             Tupla (tokens_input_estimados, tokens_output_estimados)
         """
         if tokens_input_estimados is None:
-            if self.historico_tokens_input:
-                ultimos = self.historico_tokens_input[-5:]
+            if self._ultimos_input:
                 tokens_input_estimados = int(
-                    sum(t for _, t in ultimos) / len(ultimos)
+                    sum(self._ultimos_input) / len(self._ultimos_input)
                 )
             else:
                 tokens_input_estimados = 1000
         
-        if self.historico_tokens_output:
-            ultimos = self.historico_tokens_output[-5:]
+        if self._ultimos_output:
             tokens_output_estimados = int(
-                sum(t for _, t in ultimos) / len(ultimos)
+                sum(self._ultimos_output) / len(self._ultimos_output)
             )
         else:
             tokens_output_estimados = 1000
         
         return tokens_input_estimados, tokens_output_estimados
     
+    def _esperas_por_balde(
+        self,
+        tokens_input_est: int,
+        tokens_output_est: int,
+        agora: float
+    ) -> Dict[str, float]:
+        """Espera exata (segundos) de cada dimensão para a requisição estimada."""
+        return {
+            "RPM": self.balde_rpm.espera_para(1, agora),
+            "ITPM": self.balde_itpm.espera_para(tokens_input_est, agora),
+            "OTPM": self.balde_otpm.espera_para(tokens_output_est, agora),
+            "SERVIDOR": max(0.0, self._pausa_ate - agora),
+        }
+
+    def _estimar(
+        self,
+        tokens_input_estimados: Optional[int],
+        tokens_output_estimados: Optional[int]
+    ) -> Tuple[int, int]:
+        tokens_input_est, tokens_output_est = self.estimar_tokens_proxima_req(
+            tokens_input_estimados
+        )
+        if tokens_output_estimados is not None:
+            tokens_output_est = tokens_output_estimados
+        return tokens_input_est, tokens_output_est
+
     def precisa_esperar(
         self, 
         tokens_input_estimados: Optional[int] = None,
         tokens_output_estimados: Optional[int] = None
-    ) -> Tuple[bool, int, Optional[str]]:
+    ) -> Tuple[bool, float, Optional[str]]:
         """
-        Verifica se precisa esperar antes de fazer requisição.
+        Verifica se precisa esperar antes de fazer requisição (sem reservar).
         
         Args:
             tokens_input_estimados: Estimativa de tokens de input
@@ -2088,76 +3813,235 @@ class RateLimitManager:
         Returns:
             Tupla (precisa_esperar, segundos, motivo)
         """
-        uso = self.calcular_uso_atual()
-        
-        tokens_input_est, tokens_output_est = self.estimar_tokens_proxima_req(
-            tokens_input_estimados
-        )
-        
-        if tokens_output_estimados is not None:
-            tokens_output_est = tokens_output_estimados
-        
-        # Verificar se ultrapassaria thresholds
-        rpm_ultrapassaria = (uso["rpm_atual"] + 1) > (self.limite_rpm * self.threshold)
-        itpm_ultrapassaria = (uso["itpm_atual"] + tokens_input_est) > (
-            self.limite_itpm * self.threshold
-        )
-        otpm_ultrapassaria = (uso["otpm_atual"] + tokens_output_est) > (
-            self.limite_otpm * self.threshold
+        with self.lock:
+            tokens_input_est, tokens_output_est = self._estimar(
+                tokens_input_estimados, tokens_output_estimados
+            )
+            esperas = self._esperas_por_balde(
+                tokens_input_est, tokens_output_est, time.monotonic()
+            )
+
+        segundos = max(esperas.values())
+        if segundos <= 0:
+            return False, 0.0, None
+        motivo = ", ".join(f"{nome}: {espera:.2f}s" for nome, espera in esperas.items() if espera > 0)
+        return True, segundos, motivo
+
+    def reservar(
+        self,
+        tokens_input_estimados: Optional[int] = None,
+        tokens_output_estimados: Optional[int] = None
+    ) -> ReservaRateLimit:
+        """
+        🆕 Reserva capacidade para a próxima requisição. (Thread-safe)
+
+        A reserva é feita imediatamente (debitando os baldes) e o retorno diz
+        quanto tempo o chamador deve esperar até poder usá-la. Reservas
+        posteriores herdam a dívida das anteriores, então cada worker acorda
+        no seu próprio instante, em ordem de chegada, em vez de todos juntos.
+
+        Args:
+            tokens_input_estimados: Estimativa de tokens de input
+            tokens_output_estimados: Estimativa de tokens de output
+
+        Returns:
+            ReservaRateLimit com espera (segundos) e motivo; o chamador a
+            devolve em registrar_uso() ou liberar_reserva()
+        """
+        with self.lock:
+            agora = time.monotonic()
+            tokens_input_est, tokens_output_est = self._estimar(
+                tokens_input_estimados, tokens_output_estimados
+            )
+            esperas = self._esperas_por_balde(tokens_input_est, tokens_output_est, agora)
+
+            self.balde_rpm.consumir(1, agora)
+            self.balde_itpm.consumir(tokens_input_est, agora)
+            self.balde_otpm.consumir(tokens_output_est, agora)
+            reserva = ReservaRateLimit(tokens_input_est, tokens_output_est)
+            self._reservas_pendentes.add(reserva)
+
+        segundos = max(esperas.values())
+        if segundos <= 0:
+            return reserva
+        self._notificar("espera", segundos)
+        reserva.espera = segundos
+        reserva.motivo = ", ".join(f"{nome}: {espera:.2f}s" for nome, espera in esperas.items() if espera > 0)
+        return reserva
+
+    def liberar_reserva(self, reserva: Optional[ReservaRateLimit]) -> None:
+        """
+        🆕 Devolve os tokens da reserva de uma requisição que falhou. (Thread-safe)
+
+        A requisição rejeitada não consome tokens no servidor; o slot de RPM
+        permanece consumido (a tentativa conta como requisição). Reserva já
+        acertada/liberada (ou None) é ignorada.
+        """
+        with self.lock:
+            if reserva is None or reserva not in self._reservas_pendentes:
+                return
+            self._reservas_pendentes.discard(reserva)
+            self.balde_itpm.ajustar(reserva.tokens_input)
+            self.balde_otpm.ajustar(reserva.tokens_output)
+
+    def pausar(self, segundos: float) -> None:
+        """🆕 Bloqueia novas reservas por `segundos` (retry-after de um 429). (Thread-safe)"""
+        with self.lock:
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + segundos)
+        self._notificar("429", segundos)
+
+    def adicionar_observador(self, observador: Callable[[str, float], None]) -> None:
+        """
+        🆕 Registra quem quer saber dos sinais de limite.
+
+        O observador recebe (motivo, segundos): "429" quando o servidor
+        recusou por rate limit, "espera" quando os baldes locais mandaram
+        aguardar antes de uma requisição.
+        """
+        self._observadores.append(observador)
+
+    def _notificar(self, motivo: str, segundos: float) -> None:
+        """Avisa os observadores (fora do lock; falha de um não afeta a requisição)."""
+        for observador in self._observadores:
+            try:
+                observador(motivo, segundos)
+            except Exception as e:
+                print_realtime(f"⚠️  Observador de rate limit falhou: {e}")
+
+    def sincronizar_com_servidor(self, headers) -> None:
+        """
+        🆕 Alinha os baldes locais com a quota informada pelo servidor. (Thread-safe)
+
+        Lê anthropic-ratelimit-{requests,input-tokens,output-tokens}-{limit,remaining}.
+        Se o limite real difere do tier configurado, adota o do servidor.
+        O "remaining" só restringe o saldo local. 🆕 O servidor ainda não vê
+        as requisições em andamento: as reservas pendentes são descontadas
+        dele, porque ao serem acertadas (registrar_uso/liberar_reserva) elas
+        devolvem a diferença estimada ao balde.
+
+        As respostas bem-sucedidas sincronizam depois de acertar a própria
+        reserva (_registrar_resposta_api), então a requisição que trouxe os
+        cabeçalhos não é descontada duas vezes.
+
+        Args:
+            headers: Cabeçalhos HTTP da resposta (httpx.Headers ou dict)
+        """
+        if not headers:
+            return
+
+        dimensoes = (
+            ("requests", self.balde_rpm, "limite_rpm"),
+            ("input-tokens", self.balde_itpm, "limite_itpm"),
+            ("output-tokens", self.balde_otpm, "limite_otpm"),
         )
-        
-        if rpm_ultrapassaria or itpm_ultrapassaria or otpm_ultrapassaria:
-            if self.historico_requisicoes:
-                tempo_mais_antigo = min(self.historico_requisicoes)
-                tempo_passado = (datetime.now() - tempo_mais_antigo).total_seconds()
-                tempo_espera = max(1, int(60 - tempo_passado + 1))
-                
-                motivos = []
-                if rpm_ultrapassaria:
-                    motivos.append(f"RPM: {uso['rpm_atual']+1}/{self.limite_rpm}")
-                if itpm_ultrapassaria:
-                    motivos.append(
-                        f"ITPM: {uso['itpm_atual']+tokens_input_est:,}/{self.limite_itpm:,}"
-                    )
-                if otpm_ultrapassaria:
-                    motivos.append(
-                        f"OTPM: {uso['otpm_atual']+tokens_output_est:,}/{self.limite_otpm:,}"
-                    )
-                
-                return True, tempo_espera, ", ".join(motivos)
-            
-            return True, 5, "Preventivo"
-        
-        return False, 0, None
-    
+
+        with self.lock:
+            agora = time.monotonic()
+            em_andamento = {
+                "requests": len(self._reservas_pendentes),
+                "input-tokens": sum(r.tokens_input for r in self._reservas_pendentes),
+                "output-tokens": sum(r.tokens_output for r in self._reservas_pendentes),
+            }
+            sincronizou = False
+            for chave, balde, atributo in dimensoes:
+                limite = _ler_cabecalho_int(headers, f"anthropic-ratelimit-{chave}-limit")
+                restante = _ler_cabecalho_int(headers, f"anthropic-ratelimit-{chave}-remaining")
+
+                if limite and limite != getattr(self, atributo):
+                    setattr(self, atributo, limite)
+                    balde.redimensionar(limite * self.threshold)
+                    sincronizou = True
+
+                if restante is not None:
+                    # Mesma margem do threshold aplicada sobre o saldo do servidor
+                    reserva_seguranca = getattr(self, atributo) * (1 - self.threshold)
+                    balde.limitar(restante - reserva_seguranca - em_andamento[chave], agora)
+                    sincronizou = True
+
+            if sincronizou:
+                self.sincronizacoes_servidor += 1
+
+    def _registrar_espera(self, segundos: float) -> None:
+        with self.lock:
+            self.total_esperas += 1
+            self.tempo_total_espera += segundos
+
     def aguardar_se_necessario(
         self,
         tokens_input_estimados: Optional[int] = None,
-        tokens_output_estimados: Optional[int] = None
-    ) -> None:
+        tokens_output_estimados: Optional[int] = None,
+        cancelamento: Optional['TokenCancelamento'] = None
+    ) -> ReservaRateLimit:
         """
-        Espera se necessário para respeitar rate limits.
+        Reserva capacidade e espera (bloqueando a thread) até o instante exato liberado.
         
         Args:
             tokens_input_estimados: Estimativa de tokens de input
             tokens_output_estimados: Estimativa de tokens de output
+            cancelamento: 🆕 Interrompe a espera se a execução for cancelada
+
+        Returns:
+            🆕 Reserva da requisição (para registrar_uso / liberar_reserva)
+
+        Raises:
+            TarefaCancelada: Token acionado durante a espera (reserva devolvida)
         """
-        precisa, segundos, motivo = self.precisa_esperar(
-            tokens_input_estimados, tokens_output_estimados
-        )
+        reserva = self.reservar(tokens_input_estimados, tokens_output_estimados)
+        segundos, motivo = reserva.espera, reserva.motivo
         
-        if precisa:
+        if segundos > 0:
             uso = self.calcular_uso_atual()
-            print_realtime(f"\n⏳ Aguardando {segundos}s para respeitar rate limit")
+            print_realtime(f"\n⏳ Aguardando {segundos:.1f}s para respeitar rate limit")
             print_realtime(f"   Motivo: {motivo}")
             print_realtime(
                 f"   Uso atual: ITPM {uso['itpm_percent']:.1f}% | "
                 f"OTPM {uso['otpm_percent']:.1f}% | RPM {uso['rpm_percent']:.1f}%"
             )
-            time.sleep(segundos)
-            self.total_esperas += 1
-            self.tempo_total_espera += segundos
-    
+            if cancelamento is not None:
+                if cancelamento.aguardar(segundos):
+                    self.liberar_reserva(reserva)
+                    raise TarefaCancelada(cancelamento.motivo)
+            else:
+                time.sleep(segundos)
+            self._registrar_espera(segundos)
+        return reserva
+
+    async def aguardar_se_necessario_async(
+        self,
+        tokens_input_estimados: Optional[int] = None,
+        tokens_output_estimados: Optional[int] = None,
+        cancelamento: Optional['TokenCancelamento'] = None
+    ) -> ReservaRateLimit:
+        """
+        Versão awaitable de aguardar_se_necessario() para o loop asyncio.
+
+        Suspende apenas a corrotina chamadora (asyncio.sleep), sem bloquear
+        o event loop nem as demais tarefas em andamento. Compartilha os
+        mesmos baldes e a mesma fila de reservas da versão bloqueante.
+
+        Args:
+            tokens_input_estimados: Estimativa de tokens de input
+            tokens_output_estimados: Estimativa de tokens de output
+            cancelamento: 🆕 Interrompe a espera se a execução for cancelada
+
+        Returns:
+            🆕 Reserva da requisição (para registrar_uso / liberar_reserva)
+        """
+        reserva = self.reservar(tokens_input_estimados, tokens_output_estimados)
+        segundos, motivo = reserva.espera, reserva.motivo
+
+        if segundos > 0:
+            print_realtime(f"\n⏳ Aguardando {segundos:.1f}s para respeitar rate limit (async)")
+            print_realtime(f"   Motivo: {motivo}")
+            if cancelamento is not None:
+                if await cancelamento.aguardar_async(segundos):
+                    self.liberar_reserva(reserva)
+                    raise TarefaCancelada(cancelamento.motivo)
+            else:
+                await asyncio.sleep(segundos)
+            self._registrar_espera(segundos)
+        return reserva
+
     def exibir_status(self) -> None:
         """Mostra status atual com barras de progresso visuais."""
         uso = self.calcular_uso_atual()
@@ -2204,12 +4088,808 @@ class RateLimitManager:
             "total_esperas": self.total_esperas,
             "tempo_total_espera": self.tempo_total_espera,
             "media_tokens_req": self.total_tokens / max(1, self.total_requisicoes),
+            "sincronizacoes_servidor": self.sincronizacoes_servidor,
+        }
+
+
+def _ler_cabecalho_int(headers, nome: str) -> Optional[int]:
+    """Lê um cabeçalho numérico (None se ausente ou inválido)."""
+    valor = headers.get(nome)
+    if valor is None:
+        return None
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return None
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# CONCORRÊNCIA ADAPTATIVA DOS PLANOS (🆕 AIMD)
+# ════════════════════════════════════════════════════════════════════════════
+
+class ControladorConcorrencia:
+    """
+    🆕 Limite de subtarefas simultâneas ajustado pelo que a conta aguenta,
+    no estilo AIMD (aumento aditivo, redução multiplicativa) do TCP.
+
+    A cada "janela" (tantas conclusões quanto o limite atual):
+        - Vazão (tokens_estimados concluídos por segundo) subiu, latência
+          normalizada (segundos por 1k tokens, mediana) estável e o limite
+          estava todo ocupado → cresce: dobra até o limiar (partida lenta),
+          depois +1
+        - Latência acima de tolerancia_latencia × a menor já vista → ×0.75
+        - Vazão parada → mantém
+
+    Sinais do RateLimitManager (adicionar_observador) reduzem na hora:
+    429 → ×fator_reducao; espera local ≥ 1s nos baldes → ×0.75. Reduções
+    seguidas dentro de intervalo_reducao contam uma vez só (os workers
+    recebem o mesmo 429 quase juntos).
+
+    Uso:
+        controlador = ControladorConcorrencia(maximo=30, limiar=15)
+        rate_limit_manager.adicionar_observador(controlador.sinalizar_limite)
+        agendador.executar(executar_subtarefa, controlador=controlador)
+    """
+
+    def __init__(
+        self,
+        maximo: int,
+        inicial: Optional[int] = None,
+        minimo: int = 1,
+        limiar: Optional[int] = None,
+        fator_reducao: float = 0.5,
+        tolerancia_latencia: float = 1.5,
+        intervalo_reducao: float = 5.0,
+        ao_mudar: Optional[Callable[[Dict[str, Any]], None]] = None,
+        relogio: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            maximo: Teto absoluto de subtarefas simultâneas
+            inicial: Limite de partida (padrão: min(4, maximo))
+            minimo: Piso do limite
+            limiar: Até aqui o limite dobra por janela; acima, +1 (padrão: maximo)
+            fator_reducao: Multiplicador aplicado num 429
+            tolerancia_latencia: Latência/base acima disso conta como congestionamento
+            intervalo_reducao: Segundos em que novas reduções são ignoradas
+            ao_mudar: Chamado com estado() a cada ajuste (ex.: telemetria)
+            relogio: Fonte de tempo (injetável nos testes)
+        """
+        self.maximo = max(1, maximo)
+        self.minimo = max(1, min(minimo, self.maximo))
+        self.limite = float(max(self.minimo, min(self.maximo, inicial or 4)))
+        self.limiar = float(limiar or self.maximo)
+        self.fator_reducao = fator_reducao
+        self.tolerancia_latencia = tolerancia_latencia
+        self.intervalo_reducao = intervalo_reducao
+        self.ao_mudar = ao_mudar
+        self.relogio = relogio
+
+        self.em_execucao = 0
+        self.latencia_base: Optional[float] = None
+        self.vazao: Optional[float] = None
+        self.sinais = {"429": 0, "espera": 0, "latencia": 0}
+        self.ajustes: Deque[Dict[str, Any]] = deque(maxlen=20)
+
+        self._lock = threading.Lock()
+        self._amostras: List[Tuple[float, int]] = []
+        self._inicio_janela = relogio()
+        self._pico_janela = 0
+        self._ultima_reducao = float("-inf")
+
+    @property
+    def atual(self) -> int:
+        """Limite em vigor (inteiro entre minimo e maximo)."""
+        return max(self.minimo, min(self.maximo, int(self.limite)))
+
+    def iniciar(self) -> None:
+        """Uma subtarefa começou."""
+        with self._lock:
+            self.em_execucao += 1
+            self._pico_janela = max(self._pico_janela, self.em_execucao)
+
+    def registrar_conclusao(self, duracao: float, tokens: int = 0, sucesso: bool = True) -> None:
+        """
+        Uma subtarefa terminou; fecha a janela e ajusta o limite quando ela enche.
+
+        Args:
+            duracao: Segundos de execução
+            tokens: Tamanho da subtarefa (tokens_estimados), normaliza a latência
+            sucesso: Falhas liberam a vaga mas não entram nas medidas
+        """
+        mudou = None
+        with self._lock:
+            self.em_execucao = max(0, self.em_execucao - 1)
+            if not sucesso:
+                return
+            self._amostras.append((max(duracao, 0.0), max(tokens, 1)))
+            if len(self._amostras) < max(2, self.atual):
+                return
+
+            agora = self.relogio()
+            vazao = sum(t for _, t in self._amostras) / max(agora - self._inicio_janela, 1e-6)
+            latencias = sorted(d / t * 1000 for d, t in self._amostras)
+            latencia = latencias[len(latencias) // 2]
+            saturado = self._pico_janela >= self.atual
+            vazao_anterior = self.vazao
+
+            self._amostras = []
+            self._inicio_janela = agora
+            self._pico_janela = self.em_execucao
+            self.vazao = vazao
+
+            if self.latencia_base is not None and latencia > self.latencia_base * self.tolerancia_latencia:
+                self.sinais["latencia"] += 1
+                mudou = self._reduzir(0.75, "latência", agora)
+            elif saturado and (vazao_anterior is None or vazao > vazao_anterior * 1.05):
+                anterior = self.atual
+                self.limite = min(self.maximo, self.limite * 2 if self.limite < self.limiar else self.limite + 1)
+                mudou = self._anotar(anterior, "vazão subiu")
+            self.latencia_base = latencia if self.latencia_base is None else min(self.latencia_base, latencia)
+
+        if mudou and self.ao_mudar:
+            self.ao_mudar(mudou)
+
+    def sinalizar_limite(self, motivo: str, segundos: float = 0.0) -> None:
+        """
+        Observador do RateLimitManager: '429' (pausa do servidor) ou 'espera'
+        (baldes locais mandaram aguardar).
+        """
+        if motivo == "espera" and segundos < 1.0:
+            return
+        with self._lock:
+            self.sinais[motivo] = self.sinais.get(motivo, 0) + 1
+            fator = self.fator_reducao if motivo == "429" else 0.75
+            mudou = self._reduzir(fator, motivo, self.relogio())
+        if mudou and self.ao_mudar:
+            self.ao_mudar(mudou)
+
+    def _reduzir(self, fator: float, motivo: str, agora: float) -> Optional[Dict[str, Any]]:
+        """Redução multiplicativa (chamado com o lock). Sai da partida lenta."""
+        if agora - self._ultima_reducao < self.intervalo_reducao:
+            return None
+        self._ultima_reducao = agora
+        anterior = self.atual
+        self.limite = max(float(self.minimo), self.limite * fator)
+        self.limiar = self.limite
+        # Medidas da janela valiam para o limite antigo
+        self._amostras = []
+        self._inicio_janela = agora
+        self._pico_janela = self.em_execucao
+        self.vazao = None
+        return self._anotar(anterior, motivo)
+
+    def _anotar(self, anterior: int, motivo: str) -> Optional[Dict[str, Any]]:
+        if self.atual == anterior:
+            return None
+        self.ajustes.append({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "de": anterior, "para": self.atual, "motivo": motivo
+        })
+        return self._estado()
+
+    def _estado(self) -> Dict[str, Any]:
+        return {
+            "limite": self.atual,
+            "minimo": self.minimo,
+            "maximo": self.maximo,
+            "limiar": round(self.limiar, 2),
+            "em_execucao": self.em_execucao,
+            "vazao_tokens_s": round(self.vazao, 1) if self.vazao is not None else None,
+            "latencia_base_s_por_1k": round(self.latencia_base, 3) if self.latencia_base is not None else None,
+            "sinais": dict(self.sinais),
+            "ajustes": list(self.ajustes),
         }
 
+    def estado(self) -> Dict[str, Any]:
+        """Instantâneo para telemetria/métricas do plano. (Thread-safe)"""
+        with self._lock:
+            return self._estado()
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# RETENTATIVAS COM BACKOFF GUIADO PELOS CABEÇALHOS DA API (🆕)
+# ════════════════════════════════════════════════════════════════════════════
+
+class PoliticaRetentativa:
+    """
+    Retenta chamadas à API em erros transitórios (429, 529, 5xx, conexão).
+
+    Ordem de decisão da espera:
+        1. retry-after / retry-after-ms do servidor (+ jitter pequeno, para
+           os workers não voltarem todos no mesmo instante)
+        2. Backoff exponencial com "full jitter": uniforme em [0, base × 2^n],
+           limitado a `espera_maxima`
+
+    Cabeçalhos anthropic-ratelimit-* das respostas de erro alimentam o
+    RateLimitManager; um 429 pausa as novas reservas de todos os workers.
+
+    Uso:
+        politica = PoliticaRetentativa(rate_limit_manager)
+        response = politica.executar(lambda: client.messages.create(**params))
+    """
+
+    STATUS_RETENTAVEIS = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+    def __init__(
+        self,
+        rate_limit_manager: Optional['RateLimitManager'] = None,
+        max_tentativas: int = 5,
+        espera_base: float = 1.0,
+        espera_maxima: float = 60.0
+    ):
+        """
+        Args:
+            rate_limit_manager: Recebe a quota informada nos erros (opcional)
+            max_tentativas: Total de tentativas (incluindo a primeira)
+            espera_base: Espera base do backoff exponencial (segundos)
+            espera_maxima: Teto de cada espera (segundos)
+        """
+        self.rate_limit_manager = rate_limit_manager
+        self.max_tentativas = max(1, max_tentativas)
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+
+        self.metricas = {
+            'retentativas': 0,
+            'tempo_espera': 0.0,
+            'por_status': {},
+            'esgotadas': 0,
+        }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _status(erro: Exception) -> Optional[int]:
+        return getattr(erro, 'status_code', None)
+
+    @staticmethod
+    def _headers(erro: Exception):
+        response = getattr(erro, 'response', None)
+        return getattr(response, 'headers', None) or {}
+
+    def e_retentavel(self, erro: Exception) -> bool:
+        """Erros transitórios: status retentável ou falha de conexão/timeout."""
+        if getattr(erro, 'luna_sem_retentativa', False):
+            return False
+
+        deve = self._headers(erro).get('x-should-retry')
+        if deve in ('true', 'false'):
+            return deve == 'true'
+
+        if isinstance(erro, anthropic.APIConnectionError):
+            return True
+        status = self._status(erro)
+        return status is not None and (status in self.STATUS_RETENTAVEIS or status >= 500)
+
+    @staticmethod
+    def _retry_after(headers) -> Optional[float]:
+        """Segundos pedidos pelo servidor (retry-after-ms, retry-after em segundos ou data HTTP)."""
+        valor_ms = headers.get('retry-after-ms')
+        if valor_ms is not None:
+            try:
+                return max(0.0, float(valor_ms) / 1000)
+            except ValueError:
+                pass
+
+        valor = headers.get('retry-after')
+        if valor is None:
+            return None
+        try:
+            return max(0.0, float(valor))
+        except ValueError:
+            pass
+        try:
+            data = parsedate_to_datetime(valor)
+        except (TypeError, ValueError):
+            return None
+        if data.tzinfo is None:
+            data = data.replace(tzinfo=timezone.utc)
+        return max(0.0, (data - datetime.now(timezone.utc)).total_seconds())
+
+    def calcular_espera(self, tentativa: int, erro: Exception) -> float:
+        """
+        Espera antes da próxima tentativa.
+
+        Args:
+            tentativa: Número da tentativa que falhou (0 = primeira)
+            erro: Exceção recebida
+        """
+        retry_after = self._retry_after(self._headers(erro))
+        if retry_after is not None:
+            return min(self.espera_maxima, retry_after + random.uniform(0, min(1.0, retry_after * 0.1 + 0.1)))
+
+        teto = min(self.espera_maxima, self.espera_base * (2 ** tentativa))
+        return random.uniform(0, teto)
+
+    def _registrar_falha(self, tentativa: int, erro: Exception) -> Optional[float]:
+        """Processa a falha; retorna a espera ou None se não deve retentar."""
+        headers = self._headers(erro)
+        if self.rate_limit_manager and headers:
+            self.rate_limit_manager.sincronizar_com_servidor(headers)
+
+        if not self.e_retentavel(erro):
+            return None
+        if tentativa + 1 >= self.max_tentativas:
+            with self._lock:
+                self.metricas['esgotadas'] += 1
+            return None
+
+        espera = self.calcular_espera(tentativa, erro)
+        status = self._status(erro)
+
+        if status == 429 and self.rate_limit_manager:
+            self.rate_limit_manager.pausar(espera)
+
+        with self._lock:
+            self.metricas['retentativas'] += 1
+            self.metricas['tempo_espera'] += espera
+            chave = str(status) if status is not None else 'conexao'
+            self.metricas['por_status'][chave] = self.metricas['por_status'].get(chave, 0) + 1
+
+        print_realtime(
+            f"\n⚠️  API indisponível ({status or type(erro).__name__}) - "
+            f"tentativa {tentativa + 2}/{self.max_tentativas} em {espera:.1f}s"
+        )
+        return espera
+
+    def executar(self, funcao: Callable[[], Any], cancelamento: Optional['TokenCancelamento'] = None) -> Any:
+        """
+        Executa `funcao` retentando erros transitórios (bloqueante).
+
+        Args:
+            funcao: Uma tentativa
+            cancelamento: 🆕 Interrompe o backoff (e não retenta) se acionado
+
+        Raises:
+            A última exceção, se não for retentável ou se as tentativas acabarem;
+            TarefaCancelada se o token for acionado entre tentativas
+        """
+        tentativa = 0
+        while True:
+            try:
+                return funcao()
+            except TarefaCancelada:
+                raise
+            except Exception as erro:
+                espera = self._registrar_falha(tentativa, erro)
+                if espera is None:
+                    raise
+            if cancelamento is None:
+                time.sleep(espera)
+            elif cancelamento.aguardar(espera):
+                raise TarefaCancelada(cancelamento.motivo)
+            tentativa += 1
+
+    async def executar_async(
+        self,
+        fabrica: Callable[[], Any],
+        cancelamento: Optional['TokenCancelamento'] = None
+    ) -> Any:
+        """
+        Versão awaitable de executar(): `fabrica` cria uma nova corrotina por tentativa.
+
+        Raises:
+            A última exceção, se não for retentável ou se as tentativas acabarem;
+            TarefaCancelada se o token for acionado entre tentativas
+        """
+        tentativa = 0
+        while True:
+            try:
+                return await fabrica()
+            except TarefaCancelada:
+                raise
+            except Exception as erro:
+                espera = self._registrar_falha(tentativa, erro)
+                if espera is None:
+                    raise
+            if cancelamento is None:
+                await asyncio.sleep(espera)
+            elif await cancelamento.aguardar_async(espera):
+                raise TarefaCancelada(cancelamento.motivo)
+            tentativa += 1
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# CANCELAMENTO COOPERATIVO (🆕)
+# ════════════════════════════════════════════════════════════════════════════
+
+class TarefaCancelada(Exception):
+    """🆕 A execução foi cancelada (prazo esgotado ou cancelamento explícito)."""
+
+    def __init__(self, motivo: str):
+        super().__init__(motivo)
+        self.motivo = motivo
+
+
+class TokenCancelamento:
+    """
+    🆕 Cancelamento cooperativo de uma execução (tarefa ou subtarefa de plano).
+
+    O token é acionado por cancelar() (ex.: Ctrl+C) ou pelo prazo. Quem faz
+    trabalho caro consulta o token: o loop de executar_tarefa a cada
+    iteração, as esperas de rate limit e de backoff, o streaming da resposta
+    e SistemaFerramentasCompleto.executar(). Assim uma execução cancelada
+    para de consumir quota da API em no máximo uma iteração.
+
+    Cancelar um token cancela os filhos (filho()); o prazo do filho nunca
+    passa do prazo do pai. Callbacks de ao_cancelar() rodam na thread que
+    cancelou (ex.: encerrar a sessão bash da subtarefa).
+
+    Uso:
+        token = TokenCancelamento(prazo=120)
+        ctx = ExecucaoContexto(interativo=False, cancelamento=token)
+        ...
+        token.cancelar("interrompido pelo usuário")
+    """
+
+    def __init__(
+        self,
+        prazo: Optional[float] = None,
+        pai: Optional['TokenCancelamento'] = None,
+        relogio: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            prazo: Segundos até o cancelamento automático (None = sem prazo)
+            pai: Token cujo cancelamento também cancela este
+            relogio: Fonte de tempo (injetável em testes)
+        """
+        self.prazo = prazo
+        self.pai = pai
+        self._relogio = relogio
+        self.limite = relogio() + prazo if prazo is not None else None
+        self._evento = threading.Event()
+        self._motivo: Optional[str] = None
+        self._callbacks: List[Callable[[], None]] = []
+        self._filhos: 'weakref.WeakSet[TokenCancelamento]' = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+        if pai is not None:
+            with pai._lock:
+                pai._filhos.add(self)
+            if pai._evento.is_set():
+                self.cancelar(pai.motivo)
+
+    def filho(self, prazo: Optional[float] = None) -> 'TokenCancelamento':
+        """Token cancelado junto com este (ex.: subtarefa dentro da tarefa)."""
+        return TokenCancelamento(prazo, pai=self, relogio=self._relogio)
+
+    @property
+    def motivo(self) -> Optional[str]:
+        return self._motivo
+
+    @property
+    def cancelado(self) -> bool:
+        """True após cancelar() ou depois do prazo (o próprio ou o de um ancestral)."""
+        if self._evento.is_set():
+            return True
+        token = self
+        while token is not None:
+            if token.limite is not None and self._relogio() >= token.limite:
+                self.cancelar(f"prazo de {token.prazo:.0f}s esgotado")
+                return True
+            token = token.pai
+        return False
+
+    def restante(self) -> Optional[float]:
+        """Segundos até o prazo mais próximo na cadeia (None = sem prazo)."""
+        limites = []
+        token = self
+        while token is not None:
+            if token.limite is not None:
+                limites.append(token.limite)
+            token = token.pai
+        if not limites:
+            return None
+        return max(0.0, min(limites) - self._relogio())
+
+    def limitar(self, segundos: float) -> float:
+        """`segundos` reduzido ao tempo que resta (timeouts de ferramentas e da API)."""
+        restante = self.restante()
+        return segundos if restante is None else max(0.1, min(segundos, restante))
+
+    def cancelar(self, motivo: str = "cancelada") -> None:
+        """Cancela este token e os filhos. Chamadas repetidas são ignoradas. (Thread-safe)"""
+        with self._lock:
+            if self._evento.is_set():
+                return
+            self._motivo = motivo
+            self._evento.set()
+            callbacks, self._callbacks = self._callbacks, []
+            filhos = list(self._filhos)
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print_realtime(f"⚠️  Erro ao cancelar: {e}")
+        for filho in filhos:
+            filho.cancelar(motivo)
+
+    def ao_cancelar(self, callback: Callable[[], None]) -> None:
+        """Registra `callback` para o cancelamento (chamado já, se cancelado)."""
+        with self._lock:
+            if not self._evento.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def verificar(self) -> None:
+        """Levanta TarefaCancelada se o token foi acionado."""
+        if self.cancelado:
+            raise TarefaCancelada(self.motivo)
+
+    def aguardar(self, segundos: float) -> bool:
+        """
+        Dorme até `segundos`, acordando no cancelamento ou no prazo.
+
+        Returns:
+            True se o token foi acionado (quem chamou deve parar)
+        """
+        self._evento.wait(self.limitar(segundos))
+        return self.cancelado
+
+    async def aguardar_async(self, segundos: float) -> bool:
+        """Versão asyncio de aguardar() (verifica o token a cada 0,5s)."""
+        fim = time.monotonic() + self.limitar(segundos)
+        while not self.cancelado:
+            falta = fim - time.monotonic()
+            if falta <= 0:
+                return False
+            await asyncio.sleep(min(0.5, falta))
+        return True
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# SISTEMA DE FERRAMENTAS COMPLETO
+# ════════════════════════════════════════════════════════════════════════════
+
+# ═══ ANOTAÇÕES DE SEGURANÇA PARA EXECUÇÃO CONCORRENTE (🆕) ═══
+SEGURANCA_SOMENTE_LEITURA = "somente_leitura"    # Pode rodar junto com outras leituras
+SEGURANCA_ALTERA_WORKSPACE = "altera_workspace"  # Barreira: roda sozinha, na ordem do turno
+SEGURANCA_NAVEGADOR = "exclusiva_navegador"      # Barreira na thread chamadora
+
+# Ferramentas que usam o navegador Playwright (API sync presa à thread que o criou)
+FERRAMENTAS_NAVEGADOR = frozenset({
+    "iniciar_navegador", "navegar_url", "tirar_screenshot",
+    "clicar_elemento", "preencher_campo", "fechar_navegador",
+    "login_automatico",
+})
+
+# Ferramentas que não alteram arquivos nem estado persistido
+# (buscar_aprendizados/obter_credencial atualizam contadores em disco → não entram)
+FERRAMENTAS_SOMENTE_LEITURA = frozenset({
+    "ler_arquivo", "listar_workspaces", "listar_temporarios",
+    "analisar_organizacao_projeto", "ver_metricas_sessao", "analisar_telemetria",
+    "listar_gargalos", "sugerir_otimizacoes", "listar_melhorias_pendentes",
+    "status_auto_evolucao", "dashboard_auto_evolucao",
+})
+
+
+class OrdemTurno:
+    """
+    🆕 Ordem das ferramentas de UM turno (ou lote): as barreiras de
+    altera_workspace/navegador valem só entre chamadas do mesmo turno, então
+    subtarefas paralelas não esperam as escritas umas das outras.
+
+    No máximo `max_simultaneas` ferramentas do turno rodam ao mesmo tempo;
+    as prontas além disso aguardam em `fila`.
+    """
+
+    def __init__(self, max_simultaneas: int = 4):
+        self.leituras_pendentes: List[Future] = []
+        self.barreira: Optional[Future] = None
+        self.max_simultaneas = max(1, max_simultaneas)
+        self.ativas = 0
+        self.fila: Deque[Callable[[], None]] = deque()
+
+
+class DespachanteFerramentas:
+    """
+    🆕 Executa os blocos tool_use de um turno de forma concorrente e segura.
+
+    Regras (pela anotação de segurança de cada ferramenta), dentro do turno:
+        - somente_leitura: roda em paralelo com as leituras vizinhas
+        - altera_workspace: espera tudo que veio antes; o que vem depois espera por ela
+        - exclusiva_navegador: igual à anterior, mas na thread que chamou submeter()
+
+    Cada turno tem sua OrdemTurno: turnos de contextos diferentes (subtarefas
+    paralelas) não se bloqueiam e dividem um pool de max_workers × turnos
+    simultâneos (dimensionar()), com no máximo max_workers por turno.
+
+    Uma ferramenta só entra no pool quando suas dependências terminam
+    (callbacks), então nenhum worker fica parado esperando outra ferramenta
+    e um turno com escrita demorada não ocupa as vagas dos outros.
+
+    Uso:
+        despachante = DespachanteFerramentas(sistema_ferramentas, max_workers=4)
+        resultados = despachante.executar_lote([("ler_arquivo", {...}), ...])
+
+        ordem = despachante.nova_ordem()   # turno submetido em partes (streaming)
+        futuro = despachante.submeter("ler_arquivo", {...}, ordem)
+    """
+
+    def __init__(self, sistema: 'SistemaFerramentasCompleto', max_workers: int = 4):
+        """
+        Args:
+            sistema: Sistema de ferramentas (executar + obter_seguranca)
+            max_workers: Máximo de ferramentas simultâneas por turno
+        """
+        self.sistema = sistema
+        self.max_workers = max(1, max_workers)
+        self.turnos_simultaneos = 1
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._ativas = 0
+        self.pico_concorrencia = 0
+
+    def dimensionar(self, turnos_simultaneos: int) -> None:
+        """
+        🆕 Ajusta o pool para `turnos_simultaneos` contextos chamando ferramentas
+        ao mesmo tempo (ex.: subtarefas paralelas do plano).
+        """
+        turnos_simultaneos = max(1, turnos_simultaneos)
+        with self._lock:
+            if turnos_simultaneos == self.turnos_simultaneos:
+                return
+            self.turnos_simultaneos = turnos_simultaneos
+            if self._executor is not None:
+                # O pool antigo termina o que já recebeu; o próximo envio cria o novo
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def nova_ordem(self) -> OrdemTurno:
+        """OrdemTurno vazia para um turno novo."""
+        return OrdemTurno(self.max_workers)
+
+    def submeter(self, nome: str, parametros: Dict[str, Any], ordem: Optional[OrdemTurno] = None) -> Future:
+        """
+        Agenda uma ferramenta respeitando a ordem das chamadas anteriores do turno.
+
+        Args:
+            nome: Nome da ferramenta
+            parametros: Parâmetros da ferramenta
+            ordem: 🆕 Ordem do turno (None = chamada avulsa, sem ordem com as demais)
+
+        Returns:
+            Future com a string de resultado de SistemaFerramentasCompleto.executar()
+        """
+        if ordem is None:
+            ordem = self.nova_ordem()
+        seguranca = self.sistema.obter_seguranca(nome)
+        futuro: Future = Future()
+
+        with self._lock:
+            anteriores = list(ordem.leituras_pendentes)
+            if ordem.barreira is not None:
+                anteriores.append(ordem.barreira)
+
+            if seguranca == SEGURANCA_SOMENTE_LEITURA:
+                dependencias = [ordem.barreira] if ordem.barreira is not None else []
+                ordem.leituras_pendentes.append(futuro)
+            else:
+                dependencias = anteriores
+                ordem.barreira = futuro
+                ordem.leituras_pendentes = []
+
+        if seguranca == SEGURANCA_NAVEGADOR:
+            # Executa aqui mesmo, após tudo que foi submetido antes
+            if dependencias:
+                wait(dependencias)
+            self._rodar(futuro, ordem, nome, parametros, liberar_vaga=False)
+            return futuro
+
+        # 🆕 Contexto copiado: o span da ferramenta fica sob a chamada que a pediu
+        contexto = contextvars.copy_context()
+        iniciar = functools.partial(self._enfileirar, ordem, contexto, futuro, nome, parametros)
+        self._quando_concluidas(dependencias, iniciar)
+        return futuro
+
+    def executar_lote(self, chamadas: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """
+        Executa uma lista de (nome, parametros) como um turno e devolve os
+        resultados na mesma ordem.
+        """
+        ordem = self.nova_ordem()
+        futuros = [self.submeter(nome, parametros, ordem) for nome, parametros in chamadas]
+        return [futuro.result() for futuro in futuros]
+
+    @staticmethod
+    def _quando_concluidas(dependencias: List[Future], acao: Callable[[], None]) -> None:
+        """Chama `acao` (uma vez) quando todas as dependências terminarem."""
+        if not dependencias:
+            acao()
+            return
+        faltam = [len(dependencias)]
+        lock = threading.Lock()
+
+        def concluida(_):
+            with lock:
+                faltam[0] -= 1
+                ultima = faltam[0] == 0
+            if ultima:
+                acao()
+
+        for dependencia in dependencias:
+            dependencia.add_done_callback(concluida)
+
+    def _enfileirar(self, ordem: OrdemTurno, contexto, futuro: Future, nome: str, parametros: Dict[str, Any]) -> None:
+        """Envia ao pool se o turno tem vaga; senão aguarda na fila do turno."""
+        def enviar():
+            self._obter_executor().submit(contexto.run, self._rodar, futuro, ordem, nome, parametros)
+
+        with self._lock:
+            if ordem.ativas >= ordem.max_simultaneas:
+                ordem.fila.append(enviar)
+                return
+            ordem.ativas += 1
+        enviar()
+
+    def _obter_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers * self.turnos_simultaneos,
+                    thread_name_prefix="luna-ferramenta"
+                )
+            return self._executor
+
+    def _rodar(
+        self,
+        futuro: Future,
+        ordem: OrdemTurno,
+        nome: str,
+        parametros: Dict[str, Any],
+        liberar_vaga: bool = True
+    ) -> None:
+        """Executa a ferramenta, resolve o Future e passa a vaga ao próximo do turno."""
+        with self._lock:
+            self._ativas += 1
+            self.pico_concorrencia = max(self.pico_concorrencia, self._ativas)
+        try:
+            resultado = self.sistema.executar(nome, parametros)
+        except BaseException as erro:
+            resultado, excecao = None, erro
+        else:
+            excecao = None
+        finally:
+            with self._lock:
+                self._ativas -= 1
+
+        proximo = None
+        if liberar_vaga:
+            with self._lock:
+                if ordem.fila:
+                    proximo = ordem.fila.popleft()
+                else:
+                    ordem.ativas -= 1
+
+        # Resolver o Future dispara os dependentes (callbacks) nesta thread
+        if excecao is not None:
+            futuro.set_exception(excecao)
+        else:
+            futuro.set_result(resultado)
+        if proximo is not None:
+            proximo()
+
+
+@dataclass
+class FerramentaCompilada:
+    """
+    🆕 Ferramenta validada e compilada uma única vez (cache por código-fonte).
+
+    `namespace` é o módulo da ferramenta: guarda built-ins do sandbox e as
+    funções definidas. Não é alterado nas chamadas: cada uma executa sobre
+    uma cópia com o estado atual do sistema (_browser, _memoria...).
+    `erro` fica preenchido quando a validação ou a compilação falham, e é
+    devolvido em toda chamada até o código mudar.
+    """
+    codigo: str
+    funcao: Optional[Callable] = None
+    namespace: Dict[str, Any] = field(default_factory=dict)
+    erro: Optional[str] = None
+    bloqueada: bool = False  # Reprovada pela validação AST do sandbox
 
-# ════════════════════════════════════════════════════════════════════════════
-# SISTEMA DE FERRAMENTAS COMPLETO
-# ════════════════════════════════════════════════════════════════════════════
 
 class SistemaFerramentasCompleto:
     """
@@ -2228,6 +4908,15 @@ class SistemaFerramentasCompleto:
         resultado = sistema.executar("bash_avancado", {"comando": "ls -la"})
     """
     
+    # Variáveis do namespace que as ferramentas podem alterar -> atributo do sistema
+    ESTADO_DEVOLVIDO = (
+        ('_browser', 'browser'),
+        ('_page', 'page'),
+        ('_notion_client', 'notion'),
+        ('_notion_disponivel', 'notion_disponivel'),
+        ('_notion_token', 'notion_token'),
+    )
+
     def __init__(
         self, 
         master_password: Optional[str] = None, 
@@ -2242,7 +4931,13 @@ class SistemaFerramentasCompleto:
         """
         self.ferramentas_codigo: Dict[str, str] = {}
         self.ferramentas_descricao: List[Dict] = []
+        self.ferramentas_seguranca: Dict[str, str] = {}  # 🆕 nome -> anotação de segurança
+        # 🆕 Cache de compilação: nome -> FerramentaCompilada (invalidado quando o código muda)
+        self._ferramentas_compiladas: Dict[str, FerramentaCompilada] = {}
+        self._safe_builtins: Optional[Dict[str, Any]] = None
+        self._lock_compilacao = threading.Lock()
         self.historico: List[Dict] = []
+        self.rastreador = _RASTREADOR_INATIVO  # 🆕 Substituído pelo do agente (LUNA_TRACE)
         self.browser = None
         self.page = None
         
@@ -2267,7 +4962,7 @@ class SistemaFerramentasCompleto:
         # Sistema de telemetria
         self.telemetria_disponivel = TELEMETRIA_DISPONIVEL
         self.telemetria = TelemetriaManager() if TELEMETRIA_DISPONIVEL else None
-        self.analisador_telemetria = AnalisadorTelemetria() if TELEMETRIA_DISPONIVEL else None
+        self.analisador_telemetria = AnalisadorTelemetria(telemetria=self.telemetria) if TELEMETRIA_DISPONIVEL else None
 
         # Cofre de credenciais
         self.cofre = None
@@ -2298,8 +4993,29 @@ class SistemaFerramentasCompleto:
             # Token será configurado dinamicamente pelo cofre ou usuário
             print_realtime("📓 Notion disponível (configure token via cofre ou manualmente)")
 
+        # 🆕 editar_arquivo: só o trecho alterado trafega (trava por arquivo; registrada se disponível)
+        self.editor_arquivos = EditorArquivos() if EDITOR_ARQUIVOS_DISPONIVEL else None
+
         # Carregar ferramentas base
         self._carregar_ferramentas_base()
+
+        # 🆕 Uma sessão bash persistente por ExecucaoContexto (LUNA_BASH_PERSISTENTE=0 desliga)
+        # e captura incremental da saída (começo + final + log completo em arquivo)
+        self.sessoes_bash = None
+        if SESSAO_BASH_DISPONIVEL:
+            self.sessoes_bash = GerenciadorSessoesBash(
+                contexto_atual=_CONTEXTO_EXECUCAO.get,
+                max_sessoes=int(os.getenv('LUNA_BASH_MAX_SESSOES', '8')),
+                persistente=os.getenv('LUNA_BASH_PERSISTENTE', '1') == '1'
+            )
+
+        # 🆕 ler_arquivo por páginas/intervalos de linhas (índices de linha em cache)
+        self.leitor_arquivos = LeitorArquivos() if LEITOR_ARQUIVOS_DISPONIVEL else None
+
+        # 🆕 Despachante concorrente de tool_use (LUNA_MAX_FERRAMENTAS_PARALELAS, padrão 4)
+        self.despachante = DespachanteFerramentas(
+            self, max_workers=int(os.getenv('LUNA_MAX_FERRAMENTAS_PARALELAS', '4'))
+        )
     
     def _carregar_ferramentas_bash(self) -> None:
         """Carrega ferramentas de BASH."""
@@ -2310,23 +5026,38 @@ class SistemaFerramentasCompleto:
     import subprocess, os
     print_realtime(f"  ⚡ Bash: {comando[:70]}...")
     try:
-        resultado = subprocess.run(
-            comando, 
-            shell=True, 
-            capture_output=True, 
-            text=True, 
-            timeout=timeout, 
-            cwd=os.getcwd(), 
-            encoding="utf-8",
-            errors="replace"
-        )
+        global _sessoes_bash, _cancelamento
+        if _cancelamento is not None:
+            timeout = _cancelamento.limitar(timeout)  # Não passa do prazo da subtarefa
+        if _sessoes_bash is not None:
+            # Sessão persistente do contexto: cd/export/venv valem para os próximos comandos.
+            # Saída já compactada: começo + final + caminho do log completo
+            resultado = _sessoes_bash.executar(comando, timeout=timeout)
+        else:
+            resultado = subprocess.run(
+                comando, 
+                shell=True, 
+                capture_output=True, 
+                text=True, 
+                timeout=timeout, 
+                cwd=os.getcwd(), 
+                encoding="utf-8",
+                errors="replace"
+            )
         saida = f"STDOUT:\\n{resultado.stdout}\\nSTDERR:\\n{resultado.stderr}\\nCODE: {resultado.returncode}"
         print_realtime(f"  ✓ Concluído (código {resultado.returncode})")
-        return saida[:3000]
+        return saida if _sessoes_bash is not None else saida[:3000]
+    except subprocess.TimeoutExpired as e:
+        print_realtime(f"  ✗ ERRO: {str(e)[:50]}")
+        if e.output or e.stderr:
+            # Saída parcial (o final costuma mostrar onde o comando travou)
+            return f"ERRO: {e}\\nSTDOUT:\\n{e.output or ''}\\nSTDERR:\\n{e.stderr or ''}"
+        return f"ERRO: {e}"
     except Exception as e:
         print_realtime(f"  ✗ ERRO: {str(e)[:50]}")
         return f"ERRO: {e}"''',
-            "Executa comandos bash/terminal com timeout",
+            "Executa comandos bash/terminal com timeout. A sessão é persistente: diretório (cd), "
+            "variáveis exportadas e virtualenv ativado continuam nos comandos seguintes da tarefa",
             {"comando": {"type": "string"}, "timeout": {"type": "integer"}}
         )
 
@@ -2356,13 +5087,66 @@ class SistemaFerramentasCompleto:
             "Cria arquivo. Usa workspace atual se disponível.",
             {"caminho": {"type": "string"}, "conteudo": {"type": "string"}}
         )
-        
+
+        if self.editor_arquivos is not None:
+            self.adicionar_ferramenta(
+                "editar_arquivo",
+                '''def editar_arquivo(caminho: str, buscar: str = "", substituir: str = "", todas: bool = False,
+                   edicoes: list = None, diff: str = "") -> str:
+    from pathlib import Path
+    print_realtime(f"  ✏️  Editando: {Path(caminho).name}")
+    try:
+        global _gerenciador_workspaces, _editor_arquivos
+        if _gerenciador_workspaces:
+            try:
+                caminho_completo = _gerenciador_workspaces.resolver_caminho(caminho)
+            except (ValueError, FileNotFoundError, AttributeError):
+                caminho_completo = caminho
+        else:
+            caminho_completo = caminho
+
+        edicoes = list(edicoes or [])
+        if buscar:
+            edicoes.insert(0, {"buscar": buscar, "substituir": substituir, "todas": todas})
+        # Tudo ou nada: âncora ausente/ambígua recusa a edição e o arquivo fica intacto
+        resultado = _editor_arquivos.editar(caminho_completo, edicoes=edicoes, diff=diff)
+        print_realtime(f"  ✓ {resultado.splitlines()[0][:80]}")
+        return resultado
+    except Exception as e:
+        print_realtime(f"  ✗ ERRO: {str(e)[:50]}")
+        return f"ERRO: {e}"''',
+                "Edita arquivo existente sem reenviar o conteúdo inteiro (prefira a criar_arquivo para "
+                "alterar arquivos). Substituição exata: buscar/substituir (o trecho buscado deve aparecer uma "
+                "única vez; inclua linhas vizinhas para desambiguar ou use todas=true); várias de uma vez em "
+                "edicoes; ou um patch unified diff em diff. Tudo ou nada, gravação atômica; retorna o diff aplicado",
+                {
+                    "caminho": {"type": "string"},
+                    "buscar": {"type": "string"},
+                    "substituir": {"type": "string"},
+                    "todas": {"type": "boolean"},
+                    "edicoes": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "buscar": {"type": "string"},
+                                "substituir": {"type": "string"},
+                                "todas": {"type": "boolean"}
+                            },
+                            "required": ["buscar", "substituir"]
+                        }
+                    },
+                    "diff": {"type": "string"}
+                }
+            )
+
         self.adicionar_ferramenta(
             "ler_arquivo",
-            '''def ler_arquivo(caminho: str) -> str:
+            '''def ler_arquivo(caminho: str, linha_inicio: int = 0, linha_fim: int = 0, offset: int = 0,
+                limite: int = 5000, buscar: str = "", regex: bool = False, contexto: int = 0) -> str:
     print_realtime(f"  📖 Lendo: {caminho}")
     try:
-        global _gerenciador_workspaces
+        global _gerenciador_workspaces, _leitor_arquivos
         if _gerenciador_workspaces:
             try:
                 caminho_completo = _gerenciador_workspaces.resolver_caminho(caminho)
@@ -2372,6 +5156,15 @@ class SistemaFerramentasCompleto:
         else:
             caminho_completo = caminho
 
+        if _leitor_arquivos is not None:
+            # Só o trecho pedido sai do disco (mmap); rodapé indica como continuar
+            conteudo = _leitor_arquivos.consultar(
+                caminho_completo, linha_inicio=linha_inicio, linha_fim=linha_fim, offset=offset,
+                limite=limite, buscar=buscar, regex=regex, contexto=contexto
+            )
+            print_realtime(f"  ✓ Lido ({len(conteudo)} caracteres)")
+            return conteudo
+
         with open(caminho_completo, 'r', encoding='utf-8') as f:
             conteudo = f.read()
         print_realtime(f"  ✓ Lido ({len(conteudo)} caracteres)")
@@ -2379,8 +5172,20 @@ class SistemaFerramentasCompleto:
     except Exception as e:
         print_realtime(f"  ✗ ERRO: {str(e)[:50]}")
         return f"ERRO: {e}"''',
-            "Lê arquivo. Busca no workspace atual se disponível.",
-            {"caminho": {"type": "string"}}
+            "Lê arquivo (busca no workspace atual se disponível). Arquivos grandes: leia por páginas "
+            "(offset/limite em bytes, o rodapé indica o próximo offset), por intervalo de linhas "
+            "(linha_inicio/linha_fim, numeradas) ou localize trechos com buscar (texto ou regex=true; "
+            "contexto = linhas ao redor)",
+            {
+                "caminho": {"type": "string"},
+                "linha_inicio": {"type": "integer"},
+                "linha_fim": {"type": "integer"},
+                "offset": {"type": "integer"},
+                "limite": {"type": "integer"},
+                "buscar": {"type": "string"},
+                "regex": {"type": "boolean"},
+                "contexto": {"type": "integer"}
+            }
         )
 
     def _carregar_ferramentas_navegador(self) -> None:
@@ -2884,6 +5689,10 @@ class SistemaFerramentasCompleto:
         linhas.append(f"💰 Economia (tokens): {metricas['economia_tokens']:,}\\n")
         linhas.append(f"🔧 Ferramentas usadas: {metricas['total_ferramentas']}\\n")
         linhas.append(f"❌ Erros: {metricas['erros']}\\n")
+        if metricas.get('concorrencia'):
+            concorrencia = metricas['concorrencia']
+            linhas.append(f"🎚️  Concorrência dos planos: {concorrencia['limite']} (teto {concorrencia['maximo']}, "
+                          f"sinais {concorrencia['sinais']})\\n")
         linhas.append("="*60 + "\\n")
 
         return ''.join(linhas)
@@ -3425,6 +6234,111 @@ class SistemaFerramentasCompleto:
 
         return safe_builtins
 
+    def _estado_sandbox(self) -> Dict[str, Any]:
+        """
+        Estado do sistema injetado no namespace da ferramenta a cada chamada.
+
+        ✅ VARIÁVEIS NÃO SÃO GLOBAIS - vivem no namespace de cada ferramenta;
+        as que a ferramenta alterar (global _browser etc.) são lidas de volta
+        em executar().
+        """
+        return {
+            '_nova_ferramenta_info': None,
+            '_gerenciador_workspaces': self.gerenciador_workspaces,
+            '_gerenciador_temp': self.gerenciador_temp,  # 🆕 FASE 1.2
+            '_sessoes_bash': self.sessoes_bash,  # 🆕 Sessões bash persistentes
+            '_leitor_arquivos': self.leitor_arquivos,  # 🆕 Leitura paginada
+            '_editor_arquivos': self.editor_arquivos,  # 🆕 Edição pontual
+            '_cancelamento': getattr(_CONTEXTO_EXECUCAO.get(), 'cancelamento', None),  # 🆕 Prazo da execução
+            '_playwright_instance': None,
+            '_browser': self.browser,
+            '_page': self.page,
+            '_cofre': self.cofre,
+            '_memoria': self.memoria,
+            '_notion_client': self.notion,
+            '_notion_disponivel': self.notion_disponivel,
+            '_notion_token': self.notion_token,
+            '_fila_melhorias': self.fila_melhorias,  # ✅ Sistema de auto-evolução
+            '_sistema_evolucao': self.sistema_evolucao,  # ✅ Sistema de auto-evolução
+            '_organizador_projeto': self.organizador_projeto,  # 🆕 Organizador de projeto
+            '_telemetria': self.telemetria,  # 📊 Sistema de telemetria
+            '_analisador_telemetria': self.analisador_telemetria,  # 📊 Analisador de telemetria
+        }
+
+    def _compilar_ferramenta(self, nome: str, codigo: str) -> FerramentaCompilada:
+        """
+        🆕 Valida (AST), compila e executa o código da ferramenta uma única vez.
+
+        Args:
+            nome: Nome da ferramenta
+            codigo: Código-fonte registrado
+
+        Returns:
+            FerramentaCompilada com a função pronta ou a mensagem de erro
+        """
+        eh_seguro, erro_validacao = self._validar_codigo_seguro(codigo, nome)
+        if not eh_seguro:
+            return FerramentaCompilada(
+                codigo=codigo, erro=f"ERRO DE SEGURANÇA: {erro_validacao}", bloqueada=True
+            )
+
+        if self._safe_builtins is None:
+            self._safe_builtins = self._criar_safe_builtins()
+
+        namespace = {
+            '__builtins__': self._safe_builtins,  # ✅ SANDBOX ATIVO
+            'os': __import__('os'),  # Permitido (tools precisam)
+            'print_realtime': print_realtime,
+            'datetime': __import__('datetime').datetime  # Para ferramentas de auto-evolução
+        }
+
+        try:
+            exec(compile(codigo, f"<ferramenta {nome}>", "exec"), namespace)
+        except Exception:
+            import traceback
+            return FerramentaCompilada(codigo=codigo, erro=f"ERRO: {traceback.format_exc()[:1000]}")
+
+        func = namespace.get(nome)
+        if not callable(func):
+            return FerramentaCompilada(codigo=codigo, namespace=namespace, erro="ERRO: Função não encontrada")
+
+        return FerramentaCompilada(codigo=codigo, funcao=func, namespace=namespace)
+
+    @staticmethod
+    def _religar_funcoes(original: Dict[str, Any], namespace: Dict[str, Any]) -> None:
+        """
+        🆕 Recria as funções definidas pela ferramenta com `namespace` como
+        globals (mesmo bytecode, sem recompilar), para que a função principal
+        e suas auxiliares leiam e alterem só o estado da chamada atual.
+        """
+        for chave, valor in original.items():
+            if isinstance(valor, types.FunctionType) and valor.__globals__ is original:
+                funcao = types.FunctionType(
+                    valor.__code__, namespace, valor.__name__, valor.__defaults__, valor.__closure__
+                )
+                funcao.__kwdefaults__ = valor.__kwdefaults__
+                funcao.__dict__.update(valor.__dict__)
+                namespace[chave] = funcao
+
+    def _obter_ferramenta_compilada(self, nome: str) -> FerramentaCompilada:
+        """
+        Retorna a ferramenta do cache, recompilando só se o código-fonte mudou.
+
+        Cobre também alterações feitas direto em ferramentas_codigo
+        (sem passar por adicionar_ferramenta).
+        """
+        codigo = self.ferramentas_codigo[nome]
+        compilada = self._ferramentas_compiladas.get(nome)
+        if compilada is not None and compilada.codigo == codigo:
+            return compilada
+
+        with self._lock_compilacao:
+            compilada = self._ferramentas_compiladas.get(nome)
+            if compilada is None or compilada.codigo != codigo:
+                compilada = self._compilar_ferramenta(nome, codigo)
+                self._ferramentas_compiladas[nome] = compilada
+        return compilada
+
     def _validar_codigo_seguro(self, codigo: str, nome_ferramenta: str) -> Tuple[bool, Optional[str]]:
         """
         Valida código usando AST para detectar operações perigosas.
@@ -3463,6 +6377,7 @@ class SistemaFerramentasCompleto:
 
         return True, None
 
+    @rastrear("ferramenta", lambda nome, parametros: nome)
     def executar(self, nome: str, parametros: Dict[str, Any]) -> str:
         """
         Executa uma ferramenta em ambiente sandboxed.
@@ -3479,7 +6394,8 @@ class SistemaFerramentasCompleto:
             - _memoria, _cofre, _gerenciador_workspaces são locais ao namespace
             - O uso de 'global' nas ferramentas é necessário pelo escopo do exec()
             - Não há poluição do namespace global do Python
-            - Cada execução tem seu próprio contexto isolado
+            - Cada ferramenta tem seu próprio namespace (🆕 compilado uma vez no
+              registro; cada chamada roda sobre uma cópia com o estado atual)
 
         Security:
             - Built-ins restritos (sem eval, exec, compile direto)
@@ -3490,75 +6406,42 @@ class SistemaFerramentasCompleto:
         if nome not in self.ferramentas_codigo:
             return f"ERRO: Ferramenta '{nome}' não existe"
 
-        # Validar código antes de executar
-        eh_seguro, erro_validacao = self._validar_codigo_seguro(
-            self.ferramentas_codigo[nome],
-            nome
-        )
+        # 🆕 Execução cancelada (prazo ou Ctrl+C): não inicia trabalho novo
+        cancelamento = getattr(_CONTEXTO_EXECUCAO.get(), 'cancelamento', None)
+        if cancelamento is not None and cancelamento.cancelado:
+            return f"ERRO: execução cancelada ({cancelamento.motivo}) - '{nome}' não foi executada"
 
-        if not eh_seguro:
+        # 🆕 Validação AST + compilação já feitas no registro (cache por código-fonte)
+        compilada = self._obter_ferramenta_compilada(nome)
+
+        if compilada.bloqueada:
             print_realtime(f"  🚫 SANDBOX BLOQUEOU: {nome}")
-            return f"ERRO DE SEGURANÇA: {erro_validacao}"
+            return compilada.erro
+
+        if compilada.funcao is None:
+            return compilada.erro
 
         # 📊 Telemetria: Medir tempo de execução
-        import time
         tempo_inicio = time.time()
         resultado_str = ""
         erro_msg = None
 
         try:
-            # Criar namespace seguro com built-ins restritos
-            safe_builtins = self._criar_safe_builtins()
-
-            namespace = {
-                '_nova_ferramenta_info': None,
-                '_gerenciador_workspaces': self.gerenciador_workspaces,
-                '_gerenciador_temp': self.gerenciador_temp,  # 🆕 FASE 1.2
-                '_playwright_instance': None,
-                '_browser': self.browser,
-                '_page': self.page,
-                '_cofre': self.cofre,
-                '_memoria': self.memoria,
-                '_notion_client': self.notion,
-                '_notion_disponivel': self.notion_disponivel,
-                '_notion_token': self.notion_token,
-                '_fila_melhorias': self.fila_melhorias,  # ✅ Sistema de auto-evolução
-                '_sistema_evolucao': self.sistema_evolucao,  # ✅ Sistema de auto-evolução
-                '_organizador_projeto': self.organizador_projeto,  # 🆕 Organizador de projeto
-                '_telemetria': self.telemetria,  # 📊 Sistema de telemetria
-                '_analisador_telemetria': self.analisador_telemetria,  # 📊 Analisador de telemetria
-                '__builtins__': safe_builtins,  # ✅ SANDBOX ATIVO
-                'os': __import__('os'),  # Permitido (tools precisam)
-                'print_realtime': print_realtime,
-                'datetime': __import__('datetime').datetime  # Para ferramentas de auto-evolução
-            }
+            # 🆕 Globals próprios desta chamada: chamadas concorrentes da mesma
+            # ferramenta não trocam _cancelamento/_nova_ferramenta_info entre si
+            estado = self._estado_sandbox()
+            namespace = {**compilada.namespace, **estado}
+            self._religar_funcoes(compilada.namespace, namespace)
+            func = namespace[nome]
 
-            exec(self.ferramentas_codigo[nome], namespace)
-            
-            func = None
-            for key, value in namespace.items():
-                if callable(value) and key == nome:
-                    func = value
-                    break
-            
-            if not func:
-                return f"ERRO: Função não encontrada"
-            
             resultado = func(**parametros)
 
-            # Atualizar estado do navegador
-            if '_browser' in namespace:
-                self.browser = namespace['_browser']
-            if '_page' in namespace:
-                self.page = namespace['_page']
-
-            # Atualizar estado do Notion
-            if '_notion_client' in namespace:
-                self.notion = namespace['_notion_client']
-            if '_notion_disponivel' in namespace:
-                self.notion_disponivel = namespace['_notion_disponivel']
-            if '_notion_token' in namespace:
-                self.notion_token = namespace['_notion_token']
+            # Atualizar estado do navegador e do Notion
+            # Só o que a ferramenta alterou: uma chamada concorrente não
+            # sobrescreve o sistema com o valor antigo que recebeu
+            for chave, atributo in self.ESTADO_DEVOLVIDO:
+                if namespace.get(chave) is not estado[chave]:
+                    setattr(self, atributo, namespace.get(chave))
 
             # Processar criação de nova ferramenta
             if nome == "criar_ferramenta" and namespace['_nova_ferramenta_info']:
@@ -3608,7 +6491,8 @@ class SistemaFerramentasCompleto:
         nome: str,
         codigo: str,
         descricao: str = "",
-        parametros: Union[str, Dict, None] = None
+        parametros: Union[str, Dict, None] = None,
+        seguranca: Optional[str] = None
     ) -> None:
         """
         Adiciona uma ferramenta dinamicamente ao sistema.
@@ -3618,9 +6502,15 @@ class SistemaFerramentasCompleto:
             codigo: Código Python da ferramenta (como string)
             descricao: Descrição da ferramenta
             parametros: Parâmetros da ferramenta (JSON string ou dict)
+            seguranca: Anotação para execução concorrente (SEGURANCA_*).
+                Padrão: pelas listas conhecidas, senão altera_workspace
         """
         # Adicionar código
         self.ferramentas_codigo[nome] = codigo
+        self.ferramentas_seguranca[nome] = seguranca or self._seguranca_padrao(nome)
+
+        # 🆕 Validar e compilar agora (não a cada chamada)
+        self._obter_ferramenta_compilada(nome)
 
         # Converter parâmetros se necessário
         if isinstance(parametros, str):
@@ -3653,6 +6543,85 @@ class SistemaFerramentasCompleto:
         """Retorna lista de descrições de todas as ferramentas."""
         return self.ferramentas_descricao
 
+    def _seguranca_padrao(self, nome: str) -> str:
+        """Anotação padrão: navegador/leitura conhecidas, senão a mais restritiva."""
+        if nome in FERRAMENTAS_NAVEGADOR:
+            return SEGURANCA_NAVEGADOR
+        if nome in FERRAMENTAS_SOMENTE_LEITURA:
+            return SEGURANCA_SOMENTE_LEITURA
+        return SEGURANCA_ALTERA_WORKSPACE
+
+    def definir_seguranca(self, nome: str, seguranca: str) -> None:
+        """
+        Altera a anotação de segurança de uma ferramenta registrada.
+
+        Raises:
+            ValueError: Se a anotação não for uma das SEGURANCA_*
+        """
+        if seguranca not in (SEGURANCA_SOMENTE_LEITURA, SEGURANCA_ALTERA_WORKSPACE, SEGURANCA_NAVEGADOR):
+            raise ValueError(f"Anotação de segurança inválida: {seguranca}")
+        self.ferramentas_seguranca[nome] = seguranca
+
+    def obter_seguranca(self, nome: str) -> str:
+        """Retorna a anotação de segurança (desconhecidas contam como altera_workspace)."""
+        return self.ferramentas_seguranca.get(nome, SEGURANCA_ALTERA_WORKSPACE)
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# CONTEXTO DE EXECUÇÃO (ESTADO POR TAREFA)
+# ════════════════════════════════════════════════════════════════════════════
+
+# 🆕 Contexto da tarefa em andamento (definido em iniciar()). Copiado para as
+# threads das ferramentas, escolhe a sessão bash de cada subtarefa
+_CONTEXTO_EXECUCAO: contextvars.ContextVar = contextvars.ContextVar("luna_contexto_execucao", default=None)
+
+
+@dataclass
+class ExecucaoContexto:
+    """
+    🆕 Estado de UMA execução de tarefa (histórico, contadores, recuperação).
+
+    Cada chamada de executar_tarefa() trabalha sobre o próprio contexto, então
+    subtarefas de uma onda paralela não compartilham histórico, scores de
+    qualidade nem modo de recuperação. Contextos não interativos nunca
+    chamam input() (ao atingir o limite de iterações, a execução termina).
+    🆕 `cancelamento` encerra a execução na próxima iteração (prazo da
+    subtarefa ou Ctrl+C); ferramentas e esperas da API também o consultam.
+
+    Uso:
+        ctx = ExecucaoContexto(interativo=False, usar_planejamento=False)
+        agente.executar_tarefa(prompt, max_iteracoes=15, contexto=ctx)
+    """
+
+    interativo: bool = True
+    usar_planejamento: bool = True
+    tarefa: str = ""
+    historico: List[Dict] = field(default_factory=list)
+    prompt_sistema: Optional[str] = None
+    max_iteracoes: int = 100
+    iteracao: int = 0
+    quality_scores: List[float] = field(default_factory=list)
+    modo_recuperacao: bool = False
+    tentativas_recuperacao: int = 0
+    ultimo_tipo_erro: Optional[str] = None
+    erros_recentes: List[Dict] = field(default_factory=list)
+    ferramentas_antecipadas: Dict[str, Any] = field(default_factory=dict)  # tool_use_id -> Future
+    ordem_ferramentas: OrdemTurno = field(default_factory=OrdemTurno)  # 🆕 Ordem do turno atual
+    cancelamento: TokenCancelamento = field(default_factory=TokenCancelamento)  # 🆕 Prazo / cancelamento
+
+    def iniciar(self, tarefa: str, prompt_sistema: str) -> None:
+        """Reinicia histórico e estado de recuperação para uma nova tarefa."""
+        self.tarefa = tarefa
+        self.prompt_sistema = prompt_sistema
+        self.historico = [{"role": "user", "content": prompt_sistema}]
+        self.iteracao = 0
+        self.modo_recuperacao = False
+        self.tentativas_recuperacao = 0
+        self.erros_recentes = []
+        self.ferramentas_antecipadas = {}
+        self.ordem_ferramentas = OrdemTurno()
+        _CONTEXTO_EXECUCAO.set(self)
+
 
 # ════════════════════════════════════════════════════════════════════════════
 # AGENTE PRINCIPAL COM RECUPERAÇÃO COMPLETA
@@ -3673,7 +6642,10 @@ class AgenteCompletoV3:
         agente = AgenteCompletoV3(api_key, tier="tier2")
         agente.executar_tarefa("Criar um script Python...")
     """
-    
+
+    # 🆕 Rastreador de spans (substituído em __init__ quando LUNA_TRACE=1)
+    rastreador = _RASTREADOR_INATIVO
+
     def __init__(
         self,
         api_key: str,
@@ -3705,11 +6677,34 @@ class AgenteCompletoV3:
             max_melhorias_auto: Máximo de melhorias a aplicar por vez (🆕 MELHORIA 1.2)
         """
         self.client = anthropic.Anthropic(api_key=api_key)
+        # Cliente assíncrono: usado pelo loop asyncio (executar_tarefa_async)
+        self.client_async = anthropic.AsyncAnthropic(api_key=api_key)
         self.model_name = model_name
         self.sistema_ferramentas = SistemaFerramentasCompleto(
             master_password, usar_memoria
         )
-        self.historico_conversa: List[Dict] = []
+
+        # ═══ RASTREAMENTO DE SPANS (🆕 LUNA_TRACE=1) ═══
+        # Cada tarefa principal vira um Chrome trace (chrome://tracing, ui.perfetto.dev)
+        if os.getenv('LUNA_TRACE', '0') == '1':
+            self.rastreador = RastreadorSpans(
+                ativo=True, diretorio=os.getenv('LUNA_TRACE_DIR', 'Luna/.traces')
+            )
+            print_realtime(f"🔬 Rastreamento de spans: ATIVADO ({self.rastreador.diretorio}/)")
+        self.sistema_ferramentas.rastreador = self.rastreador
+
+        # 🆕 Estado da execução principal (interativa). Subtarefas paralelas
+        # recebem contextos próprios; historico_conversa, quality_scores etc.
+        # são propriedades que apontam para este contexto.
+        self.contexto = ExecucaoContexto()
+
+        # ═══ COMPACTAÇÃO DE HISTÓRICO (🆕 orçamento de tokens) ═══
+        # LUNA_ORCAMENTO_HISTORICO: tokens estimados; LUNA_MODELO_RESUMO: modelo barato
+        self.modelo_resumo = os.getenv('LUNA_MODELO_RESUMO', 'claude-haiku-4-5-20251001')
+        self.compactador_historico = CompactadorHistorico(
+            orcamento_tokens=int(os.getenv('LUNA_ORCAMENTO_HISTORICO', '80000')),
+            resumidor=self._resumir_historico
+        )
 
         # ═══ SISTEMA DE CACHE (🆕 MODO TURBO) ═══
         self.usar_cache = usar_cache
@@ -3749,17 +6744,22 @@ class AgenteCompletoV3:
             'modo_recuperacao_bonus': 0.5  # +50% se em modo recuperação
         }
 
-        # Limite deprecado (será substituído por cálculo dinâmico em executar_tarefa)
-        self.max_iteracoes_atual = 100
-
         # Rate limit manager
         self.rate_limit_manager = RateLimitManager(tier=tier, modo=modo_rate_limit)
 
+        # 🆕 Retentativas com backoff guiado por retry-after (substitui o sleep fixo de 60s)
+        # O SDK não retenta nas chamadas principais: a política decide (LUNA_MAX_RETENTATIVAS)
+        self.politica_retentativa = PoliticaRetentativa(
+            self.rate_limit_manager,
+            max_tentativas=int(os.getenv('LUNA_MAX_RETENTATIVAS', '5'))
+        )
+
+        # 🆕 Raiz do cancelamento cooperativo: cancelar_execucao() (ex.: Ctrl+C) para a
+        # tarefa em andamento e as subtarefas do plano na próxima iteração
+        self.cancelamento = TokenCancelamento()
+
         # Sistema de recuperação de erros (DINÂMICO)
-        self.modo_recuperacao = False
-        self.erros_recentes: List[Dict] = []
-        self.tentativas_recuperacao = 0
-        self.ultimo_tipo_erro: Optional[str] = None  # Para calcular limite dinâmico
+        # Estado (modo_recuperacao, tentativas, erros_recentes) vive no ExecucaoContexto
 
         # Configuração de limites de recuperação (dinâmicos por tipo de erro)
         self.config_limites_recuperacao = {
@@ -3788,18 +6788,59 @@ class AgenteCompletoV3:
         disable_planning = os.getenv('LUNA_DISABLE_PLANNING', '0') == '1'
         self.usar_planejamento = not disable_planning  # Ativar por padrão, a menos que desabilitado
 
+        self.controlador_concorrencia = None
         if self.usar_planejamento:
             # Calcular max_workers ideal baseado no tier
             max_workers = self._calcular_max_workers_paralelos()
-            self.planificador = PlanificadorAvancado(self, max_workers_paralelos=max_workers)
+
+            # 🆕 Concorrência adaptativa (LUNA_CONCORRENCIA_ADAPTATIVA=0 volta ao valor fixo):
+            # parte de poucas subtarefas, dobra até o valor do tier e depois sobe de 1 em 1
+            # enquanto a vazão cresce; 429/esperas do rate limit e latência alta reduzem
+            if os.getenv('LUNA_CONCORRENCIA_ADAPTATIVA', '1') == '1':
+                telemetria = getattr(self.sistema_ferramentas, 'telemetria', None)
+                self.controlador_concorrencia = ControladorConcorrencia(
+                    maximo=int(os.getenv('LUNA_MAX_WORKERS_PARALELOS', str(max_workers * 2))),
+                    limiar=max_workers,
+                    ao_mudar=telemetria.registrar_concorrencia if telemetria else None
+                )
+                self.rate_limit_manager.adicionar_observador(self.controlador_concorrencia.sinalizar_limite)
+                if telemetria:
+                    telemetria.registrar_concorrencia(self.controlador_concorrencia.estado())
+
+            # 🆕 Cache de planos (LUNA_CACHE_PLANOS=0 desliga): tarefa parecida com uma
+            # que já deu certo reaproveita o plano salvo em vez de planejar de novo
+            cache_planos = None
+            if CACHE_PLANOS_DISPONIVEL and os.getenv('LUNA_CACHE_PLANOS', '1') == '1':
+                try:
+                    cache_planos = CachePlanos("Luna/planos")
+                except Exception as e:
+                    print_realtime(f"⚠️  Cache de planos não iniciado: {e}")
+
+            self.planificador = PlanificadorAvancado(
+                self, max_workers_paralelos=max_workers, controlador=self.controlador_concorrencia,
+                cache=cache_planos
+            )
+            # 🆕 Pool de ferramentas para todas as subtarefas simultâneas (cada uma com a própria ordem)
+            self.sistema_ferramentas.despachante.dimensionar(
+                self.controlador_concorrencia.maximo if self.controlador_concorrencia else max_workers
+            )
             print_realtime(f"✅ Sistema de planejamento avançado: ATIVADO (max_workers={max_workers})")
         else:
             self.planificador = None
             print_realtime("⚠️  Sistema de planejamento avançado: DESABILITADO")
 
+        # ═══ EXECUÇÃO ASSÍNCRONA (🆕 asyncio + AsyncAnthropic) ═══
+        # LUNA_ASYNC=1 executa as ondas do plano como corrotinas em vez de threads
+        self.usar_async = os.getenv('LUNA_ASYNC', '0') == '1'
+        if self.usar_async:
+            print_realtime("⚡ Execução assíncrona: ATIVADA (ondas paralelas via asyncio)")
+
+        # ═══ STREAMING COM DESPACHO ANTECIPADO DE FERRAMENTAS (🆕) ═══
+        # LUNA_DISABLE_STREAMING=1 volta para messages.create() (resposta inteira)
+        self.usar_streaming = os.getenv('LUNA_DISABLE_STREAMING', '0') != '1'
+
         # ═══ SISTEMA DE ITERAÇÃO PROFUNDA (🆕) ═══
         self.usar_iteracao_profunda = usar_iteracao_profunda
-        self.quality_scores: List[float] = []  # Histórico de scores de qualidade (0-100)
         self.quality_threshold = 90.0  # Stop se qualidade >= 90
         self.stagnation_limit = 5  # Stop se não melhorar por 5 iterações
 
@@ -3816,6 +6857,54 @@ class AgenteCompletoV3:
         self.auto_aplicar_melhorias = auto_aplicar_melhorias
         self.max_melhorias_auto = max_melhorias_auto
 
+    # ════════════════════════════════════════════════════════════════════════
+    # COMPATIBILIDADE: estado da execução principal (ExecucaoContexto)
+    # ════════════════════════════════════════════════════════════════════════
+
+    @property
+    def historico_conversa(self) -> List[Dict]:
+        return self.contexto.historico
+
+    @historico_conversa.setter
+    def historico_conversa(self, valor: List[Dict]) -> None:
+        self.contexto.historico = valor
+
+    @property
+    def prompt_sistema_atual(self) -> Optional[str]:
+        return self.contexto.prompt_sistema
+
+    @property
+    def quality_scores(self) -> List[float]:
+        return self.contexto.quality_scores
+
+    @quality_scores.setter
+    def quality_scores(self, valor: List[float]) -> None:
+        self.contexto.quality_scores = valor
+
+    @property
+    def modo_recuperacao(self) -> bool:
+        return self.contexto.modo_recuperacao
+
+    @modo_recuperacao.setter
+    def modo_recuperacao(self, valor: bool) -> None:
+        self.contexto.modo_recuperacao = valor
+
+    @property
+    def tentativas_recuperacao(self) -> int:
+        return self.contexto.tentativas_recuperacao
+
+    @property
+    def erros_recentes(self) -> List[Dict]:
+        return self.contexto.erros_recentes
+
+    @property
+    def ultimo_tipo_erro(self) -> Optional[str]:
+        return self.contexto.ultimo_tipo_erro
+
+    @property
+    def max_iteracoes_atual(self) -> int:
+        return self.contexto.max_iteracoes
+
     def detectar_erro(self, resultado: str) -> Tuple[bool, Optional[str], Optional[str]]:
         """
         Detecta se há erro no resultado de uma ferramenta e identifica o tipo.
@@ -3989,23 +7078,26 @@ class AgenteCompletoV3:
 
         return score
 
-    def _detectar_estagnacao(self) -> bool:
+    def _detectar_estagnacao(self, ctx: ExecucaoContexto) -> bool:
         """
         Detecta se qualidade estagnou (não melhora há N iterações).
 
         🆕 SISTEMA DE ITERAÇÃO PROFUNDA
 
+        Args:
+            ctx: Contexto da execução (quality_scores)
+
         Returns:
             True se estagnado (parar iteração)
         """
         if not self.usar_iteracao_profunda:
             return False
 
-        if len(self.quality_scores) < self.stagnation_limit + 1:
+        if len(ctx.quality_scores) < self.stagnation_limit + 1:
             return False  # Não tem histórico suficiente
 
         # Pegar últimos N scores
-        recent_scores = self.quality_scores[-self.stagnation_limit:]
+        recent_scores = ctx.quality_scores[-self.stagnation_limit:]
 
         # Calcular variação máxima
         max_score = max(recent_scores)
@@ -4018,10 +7110,10 @@ class AgenteCompletoV3:
 
         # Se qualidade está caindo consistentemente = estagnado
         # (últimas 3 são todas piores que a melhor anterior)
-        if len(self.quality_scores) >= 4:  # Precisamos de pelo menos 4 para comparar
+        if len(ctx.quality_scores) >= 4:  # Precisamos de pelo menos 4 para comparar
             # Melhor score antes das últimas 3 iterações
-            best_before_recent = max(self.quality_scores[:-3])
-            last_three = self.quality_scores[-3:]
+            best_before_recent = max(ctx.quality_scores[:-3])
+            last_three = ctx.quality_scores[-3:]
 
             # Todas as últimas 3 são significativamente piores
             all_worse = all(score < best_before_recent - 2 for score in last_three)
@@ -4140,126 +7232,387 @@ TAREFA DO USUÁRIO:
 
 Comece BUSCANDO aprendizados relevantes, depois execute a tarefa!"""
 
-    def _inicializar_estado_execucao(self, prompt_sistema: str) -> None:
-        """Inicializa o estado da execução."""
-        self.historico_conversa = [{"role": "user", "content": prompt_sistema}]
-        self.prompt_sistema_atual = prompt_sistema  # Salvar para usar com cache
-        self.modo_recuperacao = False
-        self.erros_recentes = []
-        self.tentativas_recuperacao = 0
-        self.rate_limit_manager.exibir_status()
+    def _montar_parametros_api(
+        self,
+        historico: Optional[List[Dict]] = None,
+        prompt_sistema: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Monta os parâmetros de messages.create() (system, tools e cache).
+
+        🆕 MODO TURBO: Adiciona cache_control para economizar até 90% em tokens
+
+        Args:
+            historico: Mensagens a enviar (padrão: self.historico_conversa)
+            prompt_sistema: System prompt (padrão: self.prompt_sistema_atual)
+
+        Returns:
+            Dicionário de parâmetros pronto para a API
+        """
+        if prompt_sistema is None:
+            prompt_sistema = getattr(self, 'prompt_sistema_atual', None)
+
+        # Preparar system prompt com cache (se habilitado)
+        system_param = None
+        if self.usar_cache and prompt_sistema:
+            # System como array de content blocks com cache_control
+            system_param = [
+                {
+                    "type": "text",
+                    "text": prompt_sistema,
+                    "cache_control": {"type": "ephemeral"}  # 💎 CACHE: 5 min TTL
+                }
+            ]
+        elif prompt_sistema:
+            # Sem cache: apenas string
+            system_param = prompt_sistema
+
+        # Obter ferramentas
+        tools = self.sistema_ferramentas.obter_descricoes()
+
+        # Adicionar cache_control nas ferramentas (se habilitado e há ferramentas)
+        if self.usar_cache and tools and len(tools) > 0:
+            # Marcar a ÚLTIMA ferramenta para cache (economiza mais)
+            # Anthropic recomenda: marque o final do bloco que muda pouco
+            tools[-1]["cache_control"] = {"type": "ephemeral"}  # 💎 CACHE
+
+        # Criar chamada à API
+        api_params = {
+            "model": self.model_name,
+            "max_tokens": 4096,
+            "messages": historico if historico is not None else self.historico_conversa
+        }
+
+        if system_param:
+            api_params["system"] = system_param
+
+        if tools:
+            api_params["tools"] = tools
+
+        return api_params
+
+    def _registrar_resposta_api(
+        self,
+        response,
+        tempo_latencia: float,
+        reserva: Optional[ReservaRateLimit] = None,
+        modelo: Optional[str] = None
+    ) -> None:
+        """
+        Registra uso de tokens da resposta (rate limit, cache e telemetria).
+
+        Args:
+            response: Resposta retornada por messages.create()
+            tempo_latencia: Latência da chamada em segundos
+            reserva: 🆕 Reserva de rate limit feita para esta requisição
+            modelo: 🆕 Modelo chamado (padrão: self.model_name)
+        """
+        modelo = modelo or self.model_name
+
+        # Registrar uso (rate limit)
+        self.rate_limit_manager.registrar_uso(
+            response.usage.input_tokens,
+            response.usage.output_tokens,
+            reserva
+        )
+        # 🆕 Quota do servidor depois de acertar a reserva (ela já está no "remaining")
+        self.rate_limit_manager.sincronizar_com_servidor(getattr(response, '_cabecalhos_rate_limit', None))
+
+        # 💎 Registrar uso de cache (se habilitado)
+        cache_read = 0
+        cache_creation = 0
+
+        if self.usar_cache and self.cache_manager:
+            # A API retorna usage com campos de cache
+            cache_read = getattr(response.usage, 'cache_read_input_tokens', 0) or 0
+            cache_creation = getattr(response.usage, 'cache_creation_input_tokens', 0) or 0
+
+            usage_dict = {
+                'input_tokens': response.usage.input_tokens,
+                'output_tokens': response.usage.output_tokens,
+                'cache_creation_input_tokens': cache_creation,
+                'cache_read_input_tokens': cache_read
+            }
+            self.cache_manager.registrar_uso(usage_dict)
+
+        # 📊 Telemetria: Registrar requisição API
+        if self.sistema_ferramentas.telemetria_disponivel and self.sistema_ferramentas.telemetria:
+            self.sistema_ferramentas.telemetria.registrar_requisicao_api(
+                tokens_input=response.usage.input_tokens,
+                tokens_output=response.usage.output_tokens,
+                tokens_cache_read=cache_read,
+                tokens_cache_creation=cache_creation,
+                tempo_latencia=tempo_latencia,
+                modelo=modelo
+            )
+
+        # 🔬 Spans: tokens somados na chamada e em todos os ancestrais (iteração, tarefa...)
+        self.rastreador.anotar(latencia_s=round(tempo_latencia, 3), modelo=modelo)
+        self.rastreador.somar(
+            tokens_input=response.usage.input_tokens,
+            tokens_output=response.usage.output_tokens,
+            tokens_cache_read=cache_read,
+            tokens_cache_creation=cache_creation
+        )
 
-    def _executar_chamada_api(self) -> Optional[Any]:
+    @rastrear("api", "chamada_api", lambda ctx: {"iteracao": ctx.iteracao})
+    def _executar_chamada_api(self, ctx: ExecucaoContexto) -> Optional[Any]:
         """
         Executa chamada à API Claude com tratamento de rate limit e cache.
 
-        🆕 MODO TURBO: Adiciona cache_control para economizar até 90% em tokens
+        Args:
+            ctx: Contexto da execução (histórico e system prompt)
 
         Returns:
-            Response object ou None se houver rate limit
+            Response object ou None se o rate limit persistir após as retentativas
+
+        Raises:
+            TarefaCancelada: 🆕 Execução cancelada (antes, durante as esperas ou no prazo da chamada)
         """
         from anthropic import RateLimitError
 
-        self.rate_limit_manager.aguardar_se_necessario()
+        # 🆕 Manter histórico dentro do orçamento de tokens
+        self.compactador_historico.compactar(ctx.historico)
+
+        api_params = self._montar_parametros_api(ctx.historico, ctx.prompt_sistema)
+        cancelamento = ctx.cancelamento
+        # 🆕 Turno novo: barreiras de escrita só valem entre as ferramentas deste turno
+        ctx.ordem_ferramentas = self.sistema_ferramentas.despachante.nova_ordem()
+
+        def tentativa():
+            # Cada tentativa reserva capacidade (e respeita pausas de 429)
+            cancelamento.verificar()
+            reserva = self.rate_limit_manager.aguardar_se_necessario(cancelamento=cancelamento)
+            params = self._aplicar_prazo(api_params, cancelamento)
+            try:
+                # 📊 Telemetria: Medir latência da API
+                tempo_inicio_api = time.time()
+
+                if self.usar_streaming:
+                    response = self._executar_chamada_api_streaming(params, ctx)
+                else:
+                    response = self._criar_mensagem(params)
+            except Exception:
+                self.rate_limit_manager.liberar_reserva(reserva)
+                cancelamento.verificar()  # Timeout pelo prazo não é falha da API
+                raise
+
+            self._registrar_resposta_api(response, time.time() - tempo_inicio_api, reserva)
+            return response
 
         try:
-            # Preparar system prompt com cache (se habilitado)
-            system_param = None
-            if self.usar_cache and hasattr(self, 'prompt_sistema_atual'):
-                # System como array de content blocks com cache_control
-                system_param = [
-                    {
-                        "type": "text",
-                        "text": self.prompt_sistema_atual,
-                        "cache_control": {"type": "ephemeral"}  # 💎 CACHE: 5 min TTL
-                    }
-                ]
-            elif hasattr(self, 'prompt_sistema_atual'):
-                # Sem cache: apenas string
-                system_param = self.prompt_sistema_atual
+            return self.politica_retentativa.executar(tentativa, cancelamento=cancelamento)
 
-            # Obter ferramentas
-            tools = self.sistema_ferramentas.obter_descricoes()
+        except RateLimitError:
+            print_realtime(f"\n⚠️  RATE LIMIT persistente após {self.politica_retentativa.max_tentativas} tentativas")
+            return None
 
-            # Adicionar cache_control nas ferramentas (se habilitado e há ferramentas)
-            if self.usar_cache and tools and len(tools) > 0:
-                # Marcar a ÚLTIMA ferramenta para cache (economiza mais)
-                # Anthropic recomenda: marque o final do bloco que muda pouco
-                tools[-1]["cache_control"] = {"type": "ephemeral"}  # 💎 CACHE
+        except TarefaCancelada:
+            raise
 
-            # Criar chamada à API
-            api_params = {
-                "model": self.model_name,
-                "max_tokens": 4096,
-                "messages": self.historico_conversa
-            }
+        except Exception as e:
+            print_realtime(f"\n❌ Erro: {e}")
+            raise
 
-            if system_param:
-                api_params["system"] = system_param
+    @staticmethod
+    def _aplicar_prazo(api_params: Dict[str, Any], cancelamento: TokenCancelamento) -> Dict[str, Any]:
+        """🆕 Timeout da requisição limitado ao prazo da execução (sem prazo: inalterado)."""
+        restante = cancelamento.restante()
+        if restante is None:
+            return api_params
+        return {**api_params, 'timeout': max(1.0, restante)}
+
+    def _cliente_sem_retentativa(self, cliente):
+        """Cópia do cliente com max_retries=0 (a PoliticaRetentativa decide)."""
+        if hasattr(cliente, 'with_options'):
+            return cliente.with_options(max_retries=0)
+        return cliente
+
+    def _criar_mensagem(self, api_params: Dict[str, Any]) -> Any:
+        """
+        🆕 messages.create() lendo os cabeçalhos de quota da resposta.
 
-            if tools:
-                api_params["tools"] = tools
+        Usa with_raw_response para guardar os cabeçalhos anthropic-ratelimit-*
+        na mensagem; _registrar_resposta_api() sincroniza o RateLimitManager
+        com eles depois de acertar a reserva da requisição.
+        """
+        mensagens = self._cliente_sem_retentativa(self.client).messages
+        if not hasattr(mensagens, 'with_raw_response'):
+            return mensagens.create(**api_params)
+
+        bruta = mensagens.with_raw_response.create(**api_params)
+        response = bruta.parse()
+        response._cabecalhos_rate_limit = bruta.headers
+        return response
+
+    async def _criar_mensagem_async(self, api_params: Dict[str, Any]) -> Any:
+        """Versão asyncio de _criar_mensagem() (AsyncAnthropic)."""
+        mensagens = self._cliente_sem_retentativa(self.client_async).messages
+        if not hasattr(mensagens, 'with_raw_response'):
+            return await mensagens.create(**api_params)
+
+        bruta = await mensagens.with_raw_response.create(**api_params)
+        response = bruta.parse()
+        if asyncio.iscoroutine(response):  # parse() é assíncrono nas versões novas do SDK
+            response = await response
+        response._cabecalhos_rate_limit = bruta.headers
+        return response
+
+    def _executar_chamada_api_streaming(self, api_params: Dict[str, Any], ctx: ExecucaoContexto) -> Any:
+        """
+        🆕 Executa a chamada via messages.stream() com despacho antecipado.
+
+        - Texto é exibido à medida que chega (menor tempo até a primeira saída)
+        - Cada bloco tool_use é enviado ao DespachanteFerramentas assim que seu
+          JSON de input fica completo, sobrepondo a execução da ferramenta com
+          a geração do restante do turno
+        - Ferramentas presas à thread principal (navegador/Playwright) não são
+          antecipadas; a partir delas, o restante do turno também aguarda
+          _processar_uso_ferramentas() para preservar a ordem de execução
+        - Em contextos não interativos (subtarefas paralelas) o texto não é
+          transmitido caractere a caractere, para não intercalar saídas
 
-            # 📊 Telemetria: Medir latência da API
-            import time
-            tempo_inicio_api = time.time()
+        Args:
+            api_params: Parâmetros montados por _montar_parametros_api()
+            ctx: Contexto da execução (guarda as ferramentas antecipadas)
 
-            response = self.client.messages.create(**api_params)
+        Returns:
+            Mensagem final completa (mesmo objeto de messages.create())
+        """
+        ctx.ferramentas_antecipadas = {}
+        antecipar = True
+        texto_exibido = False
 
-            tempo_latencia = time.time() - tempo_inicio_api
+        cliente = self._cliente_sem_retentativa(self.client)
 
-            # Registrar uso (rate limit)
-            self.rate_limit_manager.registrar_uso(
-                response.usage.input_tokens,
-                response.usage.output_tokens
-            )
+        try:
+            with cliente.messages.stream(**api_params) as stream:
+                # 🆕 Cabeçalhos chegam antes do primeiro evento
+                resposta_http = getattr(stream, 'response', None)
+                if resposta_http is not None:
+                    self.rate_limit_manager.sincronizar_com_servidor(resposta_http.headers)
+
+                for event in stream:
+                    # 🆕 Sair do stream fecha a conexão: o modelo para de gerar tokens
+                    ctx.cancelamento.verificar()
+
+                    if event.type == "text":
+                        if not ctx.interativo:
+                            continue
+                        if not texto_exibido:
+                            print("💭 ", end="", flush=True)
+                            texto_exibido = True
+                        print(event.text, end="", flush=True)
+
+                    elif event.type == "content_block_stop":
+                        # SDKs antigos não trazem o bloco completo no evento
+                        block = getattr(event, "content_block", None)
+                        if block is None or block.type != "tool_use" or not antecipar:
+                            continue
+                        if self._pode_despachar_antecipado(block.name):
+                            self._despachar_ferramenta_antecipada(block, ctx)
+                        else:
+                            antecipar = False
+
+                response = stream.get_final_message()
+
+        except Exception as erro:
+            # Não deixar ferramentas antecipadas rodando sobre uma resposta descartada
+            if ctx.ferramentas_antecipadas:
+                # Ferramentas já executadas: repetir o turno as executaria de novo
+                erro.luna_sem_retentativa = True
+            self._aguardar_ferramentas_antecipadas(ctx)
+            raise
 
-            # 💎 Registrar uso de cache (se habilitado)
-            cache_read = 0
-            cache_creation = 0
+        finally:
+            if texto_exibido:
+                print(flush=True)
 
-            if self.usar_cache and self.cache_manager:
-                # A API retorna usage com campos de cache
-                cache_read = getattr(response.usage, 'cache_read_input_tokens', 0)
-                cache_creation = getattr(response.usage, 'cache_creation_input_tokens', 0)
+        response._texto_transmitido = texto_exibido
+        return response
 
-                usage_dict = {
-                    'input_tokens': response.usage.input_tokens,
-                    'output_tokens': response.usage.output_tokens,
-                    'cache_creation_input_tokens': cache_creation,
-                    'cache_read_input_tokens': cache_read
-                }
-                self.cache_manager.registrar_uso(usage_dict)
-
-            # 📊 Telemetria: Registrar requisição API
-            if self.sistema_ferramentas.telemetria_disponivel and self.sistema_ferramentas.telemetria:
-                self.sistema_ferramentas.telemetria.registrar_requisicao_api(
-                    tokens_input=response.usage.input_tokens,
-                    tokens_output=response.usage.output_tokens,
-                    tokens_cache_read=cache_read,
-                    tokens_cache_creation=cache_creation,
-                    tempo_latencia=tempo_latencia,
-                    modelo=self.model_name
-                )
+    def _pode_despachar_antecipado(self, nome: str) -> bool:
+        """Ferramentas de navegador (Playwright sync) só rodam na thread principal."""
+        return self.sistema_ferramentas.obter_seguranca(nome) != SEGURANCA_NAVEGADOR
 
+    def _despachar_ferramenta_antecipada(self, block, ctx: ExecucaoContexto) -> None:
+        """
+        Inicia a execução de um bloco tool_use antes do fim do stream.
+
+        O despachante mantém a ordem do turno (ctx.ordem_ferramentas): leituras
+        podem sobrepor-se, ferramentas que alteram o workspace esperam as anteriores.
+        """
+        print_realtime(f"\n🔧 {block.name} (antecipada)")
+        ctx.ferramentas_antecipadas[block.id] = self.sistema_ferramentas.despachante.submeter(
+            block.name, block.input, ctx.ordem_ferramentas
+        )
+
+    def _aguardar_ferramentas_antecipadas(self, ctx: ExecucaoContexto) -> None:
+        """Espera e descarta ferramentas antecipadas pendentes."""
+        for futuro in ctx.ferramentas_antecipadas.values():
+            try:
+                futuro.result()
+            except Exception:
+                pass
+        ctx.ferramentas_antecipadas = {}
+
+    @rastrear("api", "chamada_api", lambda ctx: {"iteracao": ctx.iteracao})
+    async def _executar_chamada_api_async(self, ctx: ExecucaoContexto) -> Optional[Any]:
+        """
+        Versão asyncio de _executar_chamada_api() usando AsyncAnthropic.
+
+        A espera por rate limit e a requisição HTTP suspendem apenas a
+        corrotina atual, permitindo muitas conversas simultâneas em uma
+        única thread.
+
+        Args:
+            ctx: Contexto desta execução (histórico e system prompt)
+
+        Returns:
+            Response object ou None se o rate limit persistir após as retentativas
+        """
+        from anthropic import RateLimitError
+
+        # 🆕 Compactação pode chamar o modelo de resumo (síncrono) → thread auxiliar
+        await asyncio.to_thread(self.compactador_historico.compactar, ctx.historico)
+
+        api_params = self._montar_parametros_api(ctx.historico, ctx.prompt_sistema)
+        cancelamento = ctx.cancelamento
+
+        async def tentativa():
+            cancelamento.verificar()
+            reserva = await self.rate_limit_manager.aguardar_se_necessario_async(cancelamento=cancelamento)
+            try:
+                tempo_inicio_api = time.time()
+                response = await self._criar_mensagem_async(self._aplicar_prazo(api_params, cancelamento))
+            except Exception:
+                self.rate_limit_manager.liberar_reserva(reserva)
+                cancelamento.verificar()
+                raise
+
+            self._registrar_resposta_api(response, time.time() - tempo_inicio_api, reserva)
             return response
 
+        try:
+            return await self.politica_retentativa.executar_async(tentativa, cancelamento=cancelamento)
+
         except RateLimitError:
-            print_realtime(f"\n⚠️  RATE LIMIT ATINGIDO!")
-            print_realtime(f"   Aguardando 60 segundos...")
-            time.sleep(60)
+            print_realtime(f"\n⚠️  RATE LIMIT persistente após {self.politica_retentativa.max_tentativas} tentativas (async)")
             return None
 
+        except TarefaCancelada:
+            raise
+
         except Exception as e:
             print_realtime(f"\n❌ Erro: {e}")
             raise
 
-    def _processar_resposta_final(self, response, tarefa: str) -> str:
+    def _processar_resposta_final(self, response, tarefa: str, ctx: ExecucaoContexto) -> Optional[str]:
         """
         Processa resposta final quando stop_reason == "end_turn".
 
         Returns:
-            Texto da resposta final
+            Texto da resposta final (None se estava em modo recuperação)
         """
         resposta_final = ""
         for block in response.content:
@@ -4267,10 +7620,10 @@ Comece BUSCANDO aprendizados relevantes, depois execute a tarefa!"""
                 resposta_final += block.text
 
         # Verificar se está em modo recuperação
-        if self.modo_recuperacao:
+        if ctx.modo_recuperacao:
             print_realtime("\n✅ Erro resolvido! Voltando à tarefa principal...")
-            self.modo_recuperacao = False
-            self.tentativas_recuperacao = 0
+            ctx.modo_recuperacao = False
+            ctx.tentativas_recuperacao = 0
             return None  # Continua executando
 
         # Registrar na memória
@@ -4289,18 +7642,23 @@ Comece BUSCANDO aprendizados relevantes, depois execute a tarefa!"""
 
         return resposta_final
 
-    def _processar_uso_ferramentas(self, response, tarefa: str, iteracao: int) -> bool:
+    def _registrar_turno_assistente(self, response, historico: List[Dict]) -> None:
         """
-        Processa uso de ferramentas quando stop_reason == "tool_use".
+        Adiciona a resposta do assistente ao histórico e exibe o pensamento.
 
-        Returns:
-            True se deve continuar loop, False se deve parar
+        Args:
+            response: Resposta da API com blocos tool_use
+            historico: Histórico da conversa a atualizar
         """
-        self.historico_conversa.append({
+        historico.append({
             "role": "assistant",
             "content": response.content
         })
 
+        # Texto já exibido durante o streaming
+        if getattr(response, "_texto_transmitido", False):
+            return
+
         # Extrair pensamento
         pensamento = ""
         for block in response.content:
@@ -4311,79 +7669,101 @@ Comece BUSCANDO aprendizados relevantes, depois execute a tarefa!"""
         if pensamento:
             print_realtime(f"💭 {pensamento}...")
 
-        # Executar ferramentas
-        tool_results = []
-        erro_detectado = False
-        ultimo_erro = None
+    def _avaliar_resultado_ferramenta(
+        self,
+        block,
+        resultado: str,
+        ctx: ExecucaoContexto
+    ) -> Tuple[Dict[str, Any], bool, Optional[str]]:
+        """
+        Detecta erros no resultado de uma ferramenta e monta o tool_result.
 
-        for block in response.content:
-            if block.type == "tool_use":
-                print_realtime(f"🔧 {block.name}")
+        Args:
+            block: Bloco tool_use que originou o resultado
+            resultado: Saída retornada pela ferramenta
+            ctx: Contexto da execução (erros recentes, iteração atual)
 
-                resultado = self.sistema_ferramentas.executar(
-                    block.name, block.input
-                )
+        Returns:
+            Tupla (tool_result, tem_erro, info_erro)
+        """
+        # Detectar erro (com tipo específico)
+        tem_erro, erro_info, tipo_erro = self.detectar_erro(resultado)
+        if tem_erro:
+            ctx.ultimo_tipo_erro = tipo_erro  # Salvar para cálculo dinâmico
 
-                # Detectar erro (com tipo específico)
-                tem_erro, erro_info, tipo_erro = self.detectar_erro(resultado)
-                if tem_erro:
-                    erro_detectado = True
-                    ultimo_erro = erro_info
-                    self.ultimo_tipo_erro = tipo_erro  # Salvar para cálculo dinâmico
+            # Calcular máximo de tentativas dinamicamente
+            max_tentativas_dinamico = self._calcular_max_tentativas(tipo_erro)
 
-                    # Calcular máximo de tentativas dinamicamente
-                    max_tentativas_dinamico = self._calcular_max_tentativas(tipo_erro)
+            # Exibir tipo de erro e limite dinâmico
+            print_realtime(
+                f"  ⚠️  ERRO DETECTADO [{tipo_erro}]: {erro_info[:80]}"
+            )
+            print_realtime(
+                f"     Limite de tentativas para {tipo_erro}: {max_tentativas_dinamico}"
+            )
 
-                    # Exibir tipo de erro e limite dinâmico
-                    print_realtime(
-                        f"  ⚠️  ERRO DETECTADO [{tipo_erro}]: {erro_info[:80]}"
-                    )
-                    print_realtime(
-                        f"     Limite de tentativas para {tipo_erro}: {max_tentativas_dinamico}"
-                    )
+            ctx.erros_recentes.append({
+                'ferramenta': block.name,
+                'erro': erro_info,
+                'tipo': tipo_erro,  # Salvar tipo de erro
+                'max_tentativas': max_tentativas_dinamico,  # Salvar limite calculado
+                'iteracao': ctx.iteracao
+            })
+        else:
+            # ✅ DETECÇÃO AUTOMÁTICA DE MELHORIAS
+            # Ferramenta executou com sucesso - analisar código para oportunidades
+            if self.sistema_ferramentas.detector_melhorias_disponivel:
+                try:
+                    # Obter código fonte da ferramenta (se disponível)
+                    codigo_ferramenta = self._obter_codigo_ferramenta(block.name)
+
+                    if codigo_ferramenta:
+                        # Analisar e detectar melhorias
+                        melhorias = self.sistema_ferramentas.detector_melhorias.analisar_codigo_executado(
+                            block.name,
+                            codigo_ferramenta
+                        )
 
-                    self.erros_recentes.append({
-                        'ferramenta': block.name,
-                        'erro': erro_info,
-                        'tipo': tipo_erro,  # Salvar tipo de erro
-                        'max_tentativas': max_tentativas_dinamico,  # Salvar limite calculado
-                        'iteracao': iteracao
-                    })
-                else:
-                    # ✅ DETECÇÃO AUTOMÁTICA DE MELHORIAS
-                    # Ferramenta executou com sucesso - analisar código para oportunidades
-                    if self.sistema_ferramentas.detector_melhorias_disponivel:
-                        try:
-                            # Obter código fonte da ferramenta (se disponível)
-                            codigo_ferramenta = self._obter_codigo_ferramenta(block.name)
-
-                            if codigo_ferramenta:
-                                # Analisar e detectar melhorias
-                                melhorias = self.sistema_ferramentas.detector_melhorias.analisar_codigo_executado(
-                                    block.name,
-                                    codigo_ferramenta
-                                )
-
-                                # Adicionar melhorias à fila (se houver)
-                                if melhorias and self.sistema_ferramentas.fila_melhorias:
-                                    for melhoria in melhorias:
-                                        self.sistema_ferramentas.fila_melhorias.adicionar(melhoria)
-
-                                    # Notificar usuário discretamente
-                                    print_realtime(
-                                        f"  💡 {len(melhorias)} oportunidade(s) de melhoria detectada(s) em '{block.name}'"
-                                    )
-                        except Exception as e:
-                            # Falha silenciosa - não interromper fluxo
-                            pass
+                        # Adicionar melhorias à fila (se houver)
+                        if melhorias and self.sistema_ferramentas.fila_melhorias:
+                            for melhoria in melhorias:
+                                self.sistema_ferramentas.fila_melhorias.adicionar(melhoria)
 
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": block.id,
-                    "content": resultado
-                })
+                            # Notificar usuário discretamente
+                            print_realtime(
+                                f"  💡 {len(melhorias)} oportunidade(s) de melhoria detectada(s) em '{block.name}'"
+                            )
+                except Exception as e:
+                    # Falha silenciosa - não interromper fluxo
+                    pass
+
+        tool_result = {
+            "type": "tool_result",
+            "tool_use_id": block.id,
+            "content": resultado
+        }
+        return tool_result, tem_erro, erro_info
+
+    def _aplicar_resultados_ferramentas(
+        self,
+        ctx: ExecucaoContexto,
+        tool_results: List[Dict],
+        erro_detectado: bool,
+        ultimo_erro: Optional[str],
+        tarefa: str
+    ) -> None:
+        """
+        Envia os tool_results ao histórico e atualiza o modo de recuperação.
 
-        self.historico_conversa.append({
+        Args:
+            ctx: Contexto da execução a atualizar
+            tool_results: Resultados na mesma ordem dos blocos tool_use
+            erro_detectado: Se alguma ferramenta retornou erro
+            ultimo_erro: Descrição do último erro detectado
+            tarefa: Tarefa original
+        """
+        historico = ctx.historico
+        historico.append({
             "role": "user",
             "content": tool_results
         })
@@ -4391,42 +7771,157 @@ Comece BUSCANDO aprendizados relevantes, depois execute a tarefa!"""
         # ✅ INTEGRAÇÃO COM AUTO-EVOLUÇÃO
         # Detectar erros recorrentes e sugerir melhorias automaticamente
         if erro_detectado and self.sistema_ferramentas.auto_evolucao_disponivel:
-            self._analisar_erro_recorrente(ultimo_erro, iteracao)
+            self._analisar_erro_recorrente(ultimo_erro, ctx)
 
         # Sistema de recuperação
-        if erro_detectado and not self.modo_recuperacao:
+        if erro_detectado and not ctx.modo_recuperacao:
             print_realtime(f"\n🚨 ENTRANDO EM MODO DE RECUPERAÇÃO DE ERRO")
-            self.modo_recuperacao = True
-            self.tentativas_recuperacao = 1
+            ctx.modo_recuperacao = True
+            ctx.tentativas_recuperacao = 1
 
             prompt_recuperacao = self.criar_prompt_recuperacao(
                 ultimo_erro, tarefa
             )
-            self.historico_conversa.append({
+            historico.append({
                 "role": "user",
                 "content": prompt_recuperacao
             })
 
-        elif erro_detectado and self.modo_recuperacao:
-            self.tentativas_recuperacao += 1
+        elif erro_detectado and ctx.modo_recuperacao:
+            ctx.tentativas_recuperacao += 1
 
             # Calcular limite dinâmico baseado no tipo de erro
             max_tentativas = self._calcular_max_tentativas(
-                self.ultimo_tipo_erro or "Desconhecido"
+                ctx.ultimo_tipo_erro or "Desconhecido"
             )
 
-            if self.tentativas_recuperacao >= max_tentativas:
+            if ctx.tentativas_recuperacao >= max_tentativas:
                 print_realtime(
-                    f"\n⚠️  Máximo de tentativas atingido para {self.ultimo_tipo_erro} "
-                    f"({self.tentativas_recuperacao}/{max_tentativas})"
+                    f"\n⚠️  Máximo de tentativas atingido para {ctx.ultimo_tipo_erro} "
+                    f"({ctx.tentativas_recuperacao}/{max_tentativas})"
                 )
                 print_realtime(f"   Continuando com a tarefa mesmo com erro...")
-                self.modo_recuperacao = False
-                self.tentativas_recuperacao = 0
+                ctx.modo_recuperacao = False
+                ctx.tentativas_recuperacao = 0
+
+    @staticmethod
+    def _tem_uso_ferramentas(response) -> bool:
+        """🆕 A resposta traz blocos tool_use (que exigem tool_result no próximo turno)."""
+        return any(block.type == "tool_use" for block in response.content)
+
+    @staticmethod
+    def _ferramenta_nao_executada(response) -> Future:
+        """
+        🆕 Resultado de um tool_use que não rodou porque o turno não terminou em
+        "tool_use" (max_tokens, pause_turn, refusal): o bloco pode estar truncado.
+        """
+        futuro: Future = Future()
+        futuro.set_result(
+            f"Ferramenta não executada: a resposta foi interrompida ({response.stop_reason}). "
+            "Repita a chamada se ainda for necessária."
+        )
+        return futuro
+
+    def _processar_uso_ferramentas(self, response, tarefa: str, ctx: ExecucaoContexto) -> bool:
+        """
+        Processa os blocos tool_use da resposta.
+
+        🆕 Também quando o turno termina em max_tokens/pause_turn/refusal: as
+        ferramentas antecipadas no streaming têm o resultado real; as demais
+        não são executadas (o bloco pode estar incompleto) e recebem um aviso.
+
+        Returns:
+            True se deve continuar loop, False se deve parar
+        """
+        self._registrar_turno_assistente(response, ctx.historico)
+        turno_completo = response.stop_reason == "tool_use"
+
+        # Executar ferramentas (🆕 concorrentes quando a anotação permite)
+        tool_results = []
+        erro_detectado = False
+        ultimo_erro = None
+
+        blocos = [block for block in response.content if block.type == "tool_use"]
+        futuros = []
+        for block in blocos:
+            # Já iniciada durante o streaming?
+            futuro = ctx.ferramentas_antecipadas.pop(block.id, None)
+            if futuro is None and not turno_completo:
+                futuro = self._ferramenta_nao_executada(response)
+            elif futuro is None:
+                print_realtime(f"🔧 {block.name}")
+                futuro = self.sistema_ferramentas.despachante.submeter(
+                    block.name, block.input, ctx.ordem_ferramentas
+                )
+            futuros.append(futuro)
+
+        # Resultados na ordem original dos blocos
+        for block, futuro in zip(blocos, futuros):
+            tool_result, tem_erro, erro_info = self._avaliar_resultado_ferramenta(
+                block, futuro.result(), ctx
+            )
+            if tem_erro:
+                erro_detectado = True
+                ultimo_erro = erro_info
+            tool_results.append(tool_result)
+
+        self._aplicar_resultados_ferramentas(
+            ctx, tool_results, erro_detectado, ultimo_erro, tarefa
+        )
 
         return True  # Continua loop
 
-    def _analisar_erro_recorrente(self, erro: str, iteracao: int) -> None:
+    async def _processar_uso_ferramentas_async(
+        self,
+        response,
+        tarefa: str,
+        ctx: ExecucaoContexto
+    ) -> bool:
+        """
+        Versão asyncio de _processar_uso_ferramentas().
+
+        As ferramentas são síncronas (subprocess, arquivos, Playwright), então
+        o lote do turno roda no DespachanteFerramentas via asyncio.to_thread()
+        para não bloquear o event loop enquanto outras conversas aguardam a API.
+
+        Returns:
+            True se deve continuar loop, False se deve parar
+        """
+        self._registrar_turno_assistente(response, ctx.historico)
+
+        tool_results = []
+        erro_detectado = False
+        ultimo_erro = None
+
+        blocos = [block for block in response.content if block.type == "tool_use"]
+        if response.stop_reason == "tool_use":
+            for block in blocos:
+                print_realtime(f"🔧 {block.name}")
+
+            resultados = await asyncio.to_thread(
+                self.sistema_ferramentas.despachante.executar_lote,
+                [(block.name, block.input) for block in blocos]
+            )
+        else:
+            # 🆕 Turno interrompido: blocos possivelmente truncados não são executados
+            resultados = [self._ferramenta_nao_executada(response).result() for _ in blocos]
+
+        for block, resultado in zip(blocos, resultados):
+            tool_result, tem_erro, erro_info = self._avaliar_resultado_ferramenta(
+                block, resultado, ctx
+            )
+            if tem_erro:
+                erro_detectado = True
+                ultimo_erro = erro_info
+            tool_results.append(tool_result)
+
+        self._aplicar_resultados_ferramentas(
+            ctx, tool_results, erro_detectado, ultimo_erro, tarefa
+        )
+
+        return True
+
+    def _analisar_erro_recorrente(self, erro: str, ctx: ExecucaoContexto) -> None:
         """
         Analisa erro recorrente e automaticamente adiciona melhoria à fila.
 
@@ -4434,11 +7929,11 @@ Comece BUSCANDO aprendizados relevantes, depois execute a tarefa!"""
 
         Args:
             erro: Mensagem de erro
-            iteracao: Iteração atual
+            ctx: Contexto da execução (erros recentes)
         """
         # Contar quantas vezes este tipo de erro ocorreu
         erro_normalizado = erro[:100]  # Primeiros 100 chars para comparação
-        ocorrencias = sum(1 for e in self.erros_recentes
+        ocorrencias = sum(1 for e in ctx.erros_recentes
                          if e['erro'][:100] == erro_normalizado)
 
         # Se erro ocorreu 3+ vezes, adicionar à fila automaticamente
@@ -4447,7 +7942,7 @@ Comece BUSCANDO aprendizados relevantes, depois execute a tarefa!"""
 
             # Extrair informações do erro
             ferramenta_problematica = None
-            for e in self.erros_recentes:
+            for e in ctx.erros_recentes:
                 if e['erro'][:100] == erro_normalizado:
                     ferramenta_problematica = e['ferramenta']
                     break
@@ -5095,6 +8590,9 @@ for item in items:
         """
         Calcula número ideal de workers para processamento paralelo baseado no tier da API.
 
+        🆕 Com a concorrência adaptativa ligada, este valor é o limiar da
+        partida lenta do ControladorConcorrencia (o teto é o dobro).
+
         Lógica:
             - Tier 1 (50 RPM): 3-5 workers conservador
             - Tier 2 (1.000 RPM): 15 workers balanceado, 20 agressivo
@@ -5165,6 +8663,43 @@ for item in items:
 
         return False
 
+    def _requisicao_com_retentativa(self, api_params: Dict[str, Any]) -> Any:
+        """
+        🆕 Chamada avulsa (fora do loop de iterações) com o mesmo tratamento
+        de _executar_chamada_api(): reserva de rate limit por tentativa
+        (liberada se a chamada falhar), PoliticaRetentativa e o token de
+        cancelamento da execução corrente.
+
+        Args:
+            api_params: Parâmetros de messages.create()
+
+        Returns:
+            Response object
+
+        Raises:
+            TarefaCancelada: Execução cancelada
+        """
+        cancelamento = getattr(_CONTEXTO_EXECUCAO.get(), 'cancelamento', None) or self.cancelamento
+
+        def tentativa():
+            cancelamento.verificar()
+            reserva = self.rate_limit_manager.aguardar_se_necessario(cancelamento=cancelamento)
+            params = self._aplicar_prazo(api_params, cancelamento)
+            try:
+                tempo_inicio_api = time.time()
+                response = self._criar_mensagem(params)
+            except Exception:
+                self.rate_limit_manager.liberar_reserva(reserva)
+                cancelamento.verificar()
+                raise
+
+            self._registrar_resposta_api(response, time.time() - tempo_inicio_api, reserva,
+                                         api_params["model"])
+            return response
+
+        return self.politica_retentativa.executar(tentativa, cancelamento=cancelamento)
+
+    @rastrear("api", "requisicao_simples")
     def _executar_requisicao_simples(
         self,
         prompt: str,
@@ -5183,20 +8718,12 @@ for item in items:
         Returns:
             Texto da resposta do modelo
         """
-        self.rate_limit_manager.aguardar_se_necessario()
-
         try:
-            response = self.client.messages.create(
-                model=self.model_name,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}]
-            )
-
-            # Registrar uso de tokens
-            self.rate_limit_manager.registrar_uso(
-                response.usage.input_tokens,
-                response.usage.output_tokens
-            )
+            response = self._requisicao_com_retentativa({
+                "model": self.model_name,
+                "max_tokens": max_tokens,
+                "messages": [{"role": "user", "content": prompt}]
+            })
 
             # Extrair texto
             texto = ""
@@ -5210,10 +8737,179 @@ for item in items:
             print_realtime(f"\n❌ Erro na requisição simples: {e}")
             raise
 
+    def _executar_requisicao_estruturada(
+        self,
+        mensagens: List[Dict[str, Any]],
+        ferramenta: Dict[str, Any],
+        max_tokens: int = 8192
+    ) -> Any:
+        """
+        🆕 Requisição com tool_use forçado: o modelo responde chamando
+        `ferramenta`, com input no formato do input_schema.
+
+        Usado pelo planejamento estruturado (plano inteiro em uma chamada).
+
+        Args:
+            mensagens: Conversa (pedido e eventual rodada de correção)
+            ferramenta: Definição da ferramenta (name, description, input_schema)
+            max_tokens: Limite de tokens para resposta
+
+        Returns:
+            Response object (bloco tool_use em response.content)
+        """
+        return self._requisicao_com_retentativa({
+            "model": self.model_name,
+            "max_tokens": max_tokens,
+            "messages": mensagens,
+            "tools": [ferramenta],
+            "tool_choice": {"type": "tool", "name": ferramenta["name"]},
+        })
+
+    def _resumir_historico(self, transcricao: str) -> str:
+        """
+        Resume mensagens antigas do histórico com o modelo barato (compactação).
+
+        Args:
+            transcricao: Texto das mensagens a resumir
+
+        Returns:
+            Resumo objetivo do progresso
+        """
+        prompt = (
+            "Resuma o progresso desta execução de agente para que ele possa continuar "
+            "a tarefa sem o histórico completo. Inclua: o que já foi feito, arquivos "
+            "criados/alterados, decisões tomadas, erros encontrados e o que falta. "
+            "Seja objetivo (máx. 300 palavras).\n\n"
+            f"{transcricao}"
+        )
+
+        response = self._requisicao_com_retentativa({
+            "model": self.modelo_resumo,
+            "max_tokens": 1024,
+            "messages": [{"role": "user", "content": prompt}]
+        })
+
+        return "".join(block.text for block in response.content if hasattr(block, "text"))
+
+    def _preparar_contexto_planejamento(self, tarefa: str) -> Dict[str, Any]:
+        """
+        Reúne aprendizados relevantes e workspace atual para o planificador.
+
+        Args:
+            tarefa: Descrição da tarefa
+
+        Returns:
+            Dicionário de contexto para PlanificadorAvancado.planejar()
+        """
+        contexto_plan = {}
+        if self.sistema_ferramentas.memoria_disponivel:
+            aprendizados = self.sistema_ferramentas.memoria.buscar_aprendizados(
+                query=tarefa[:100],
+                limite=3
+            )
+            contexto_plan['aprendizados_relevantes'] = aprendizados
+
+        if self.sistema_ferramentas.gerenciador_workspaces_disponivel:
+            ws_atual = self.sistema_ferramentas.gerenciador_workspaces.get_workspace_atual()
+            if ws_atual:
+                contexto_plan['workspace'] = ws_atual
+
+        return contexto_plan
+
+    def _salvar_plano(self, plano: Plano) -> None:
+        """
+        Salva o plano em Luna/planos/ (falha apenas com aviso).
+
+        🆕 Plano reaproveitado sem mudanças continua no arquivo de origem; os
+        demais são salvos e indexados no cache de planos.
+        """
+        cache = self.planificador.cache if self.planificador else None
+        if plano.origem and plano.origem['modo'] == 'reuso':
+            plano.arquivo = plano.origem['caminho']
+            return
+
+        plano_path = f"Luna/planos/plano_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        try:
+            plano.salvar(plano_path)
+            plano.arquivo = plano_path
+            print_realtime(f"\n💾 Plano salvo em: {plano_path}")
+            if cache:
+                cache.registrar(plano_path, plano.tarefa_original, sum(len(o.subtarefas) for o in plano.ondas))
+        except Exception as e:
+            print_realtime(f"\n⚠️  Aviso: Não foi possível salvar plano: {e}")
+
+    def _finalizar_execucao_plano(self, tarefa: str, plano: Plano, resultado_plano: Dict) -> str:
+        """
+        Registra aprendizado, exibe estatísticas e resume a execução de um plano.
+
+        Args:
+            tarefa: Tarefa original
+            plano: Plano executado
+            resultado_plano: Retorno de executar_plano()/executar_plano_async()
+
+        Returns:
+            Resumo textual da execução
+        """
+        # 🆕 Resultado no cache: só planos cuja última execução deu certo são reaproveitados
+        cache = self.planificador.cache if self.planificador else None
+        if cache and plano.arquivo:
+            try:
+                cache.registrar_resultado(plano.arquivo, bool(resultado_plano.get('sucesso')))
+            except Exception as e:
+                print_realtime(f"⚠️  Aviso: resultado do plano fora do cache: {e}")
+
+        # Salvar na memória se bem-sucedido
+        if resultado_plano.get('sucesso') and self.sistema_ferramentas.memoria_disponivel:
+            self.sistema_ferramentas.memoria.salvar_aprendizado(
+                tipo="planejamento_sucesso",
+                titulo=f"Plano para: {tarefa[:50]}...",
+                conteudo=f"Estratégia: {plano.estrategia.get('abordagem', 'N/A')}\n"
+                        f"Ondas: {len(plano.ondas)}\n"
+                        f"Subtarefas: {resultado_plano['total_subtarefas']}\n"
+                        f"Taxa de sucesso: {resultado_plano['concluidas']}/{resultado_plano['total_subtarefas']}",
+                tags=['planejamento', 'sucesso', 'complexo']
+            )
+
+        # Exibir estatísticas finais
+        self._exibir_estatisticas()
+
+        # Verificar melhorias pendentes
+        self._verificar_melhorias_pendentes()
+
+        # Retornar resumo
+        if resultado_plano.get('sucesso'):
+            return f"✅ Plano executado com sucesso!\n\n{resultado_plano['concluidas']}/{resultado_plano['total_subtarefas']} subtarefas concluídas."
+        else:
+            return f"⚠️  Plano parcialmente executado.\n\n{resultado_plano['concluidas']}/{resultado_plano['total_subtarefas']} subtarefas concluídas.\nFalhas: {resultado_plano['falhas']}"
+
+    def cancelar_execucao(self, motivo: str = "cancelada pelo usuário") -> None:
+        """
+        🆕 Cancela todas as execuções em andamento (tarefa principal e subtarefas).
+
+        Cada execução para antes da próxima chamada à API; esperas de rate
+        limit/backoff são interrompidas e sessões bash em uso são encerradas.
+        Tarefas iniciadas depois disto recebem um token novo.
+        """
+        token, self.cancelamento = self.cancelamento, TokenCancelamento()
+        token.cancelar(motivo)
+
+    def _vincular_cancelamento(self, ctx: ExecucaoContexto) -> None:
+        """🆕 Ao cancelar o contexto, encerra a sessão bash dele (mata o comando em execução)."""
+        sessoes = getattr(self.sistema_ferramentas, 'sessoes_bash', None)
+        if sessoes is not None:
+            ctx.cancelamento.ao_cancelar(functools.partial(sessoes.encerrar, id(ctx)))
+
+    def _execucao_cancelada(self, ctx: ExecucaoContexto) -> None:
+        """🆕 Encerra uma execução cancelada (sempre devolve None como resposta)."""
+        print_realtime(f"\n⏹️  Execução cancelada na iteração {ctx.iteracao}: {ctx.cancelamento.motivo}")
+        return None
+
+    @rastrear("tarefa", "tarefa", lambda tarefa, *a, **k: {"tarefa": tarefa[:200]})
     def executar_tarefa(
         self,
         tarefa: str,
-        max_iteracoes: Optional[int] = None
+        max_iteracoes: Optional[int] = None,
+        contexto: Optional[ExecucaoContexto] = None
     ) -> Optional[str]:
         """
         Executa uma tarefa completa.
@@ -5223,24 +8919,45 @@ for item in items:
         Args:
             tarefa: Descrição da tarefa
             max_iteracoes: Limite de iterações (padrão: 40)
+            contexto: 🆕 Estado isolado desta execução. Se None, cria um novo
+                contexto interativo e o torna o contexto principal do agente
+                (exposto via historico_conversa, quality_scores, ...)
 
         Returns:
             Resposta final do agente (ou None se não concluir)
         """
+        # 🆕 Contexto copiado: o _CONTEXTO_EXECUCAO desta execução não sobrevive a ela
+        # (uma tarefa cancelada não deixa as ferramentas seguintes recusadas)
+        return contextvars.copy_context().run(self._executar_tarefa, tarefa, max_iteracoes, contexto)
+
+    def _executar_tarefa(
+        self,
+        tarefa: str,
+        max_iteracoes: Optional[int],
+        contexto: Optional[ExecucaoContexto]
+    ) -> Optional[str]:
+        """Corpo de executar_tarefa() (roda em uma cópia do contexto de ContextVars)."""
+        if contexto is None:
+            contexto = ExecucaoContexto(
+                usar_planejamento=self.usar_planejamento, cancelamento=self.cancelamento.filho()
+            )
+            self.contexto = contexto
+        ctx = contexto
+
         # Configurar max_iteracoes (DINÂMICO)
         if max_iteracoes is None:
             # Calcular dinamicamente baseado na complexidade da tarefa
-            max_iteracoes = self._calcular_max_iteracoes(tarefa, self.modo_recuperacao)
+            max_iteracoes = self._calcular_max_iteracoes(tarefa, ctx.modo_recuperacao)
             print_realtime(f"💡 Limite dinâmico calculado: {max_iteracoes} iterações")
         else:
             # Usuário especificou limite manualmente
             pass
 
         # Atualizar limite atual
-        self.max_iteracoes_atual = max_iteracoes
+        ctx.max_iteracoes = max_iteracoes
 
         # Reset quality tracking (🆕 ITERAÇÃO PROFUNDA)
-        self.quality_scores = []
+        ctx.quality_scores = []
 
         # Header
         print_realtime("\n" + "="*70)
@@ -5252,62 +8969,23 @@ for item in items:
             print_realtime(f"   Meta: Qualidade ≥ {self.quality_threshold:.0f}% ou estagnação detectada")
 
         # ═══ 🆕 DETECÇÃO DE COMPLEXIDADE E PLANEJAMENTO AUTOMÁTICO ═══
-        if self.usar_planejamento and self._tarefa_e_complexa(tarefa):
+        if ctx.usar_planejamento and self.usar_planejamento and self._tarefa_e_complexa(tarefa):
             print_realtime("\n🧠 Tarefa complexa detectada!")
             print_realtime("   Ativando sistema de planejamento avançado...")
 
             try:
-                # Preparar contexto para planejamento
-                contexto_plan = {}
-                if self.sistema_ferramentas.memoria_disponivel:
-                    aprendizados = self.sistema_ferramentas.memoria.buscar_aprendizados(
-                        query=tarefa[:100],
-                        limite=3
-                    )
-                    contexto_plan['aprendizados_relevantes'] = aprendizados
-
-                if self.sistema_ferramentas.gerenciador_workspaces_disponivel:
-                    ws_atual = self.sistema_ferramentas.gerenciador_workspaces.get_workspace_atual()
-                    if ws_atual:
-                        contexto_plan['workspace'] = ws_atual
-
                 # Criar plano
+                contexto_plan = self._preparar_contexto_planejamento(tarefa)
                 plano = self.planificador.planejar(tarefa, contexto=contexto_plan)
+                self._salvar_plano(plano)
 
-                # Salvar plano
-                plano_path = f"Luna/planos/plano_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                try:
-                    plano.salvar(plano_path)
-                    print_realtime(f"\n💾 Plano salvo em: {plano_path}")
-                except Exception as e:
-                    print_realtime(f"\n⚠️  Aviso: Não foi possível salvar plano: {e}")
-
-                # Executar plano
-                resultado_plano = self.planificador.executar_plano(plano)
-
-                # Salvar na memória se bem-sucedido
-                if resultado_plano.get('sucesso') and self.sistema_ferramentas.memoria_disponivel:
-                    self.sistema_ferramentas.memoria.salvar_aprendizado(
-                        tipo="planejamento_sucesso",
-                        titulo=f"Plano para: {tarefa[:50]}...",
-                        conteudo=f"Estratégia: {plano.estrategia.get('abordagem', 'N/A')}\n"
-                                f"Ondas: {len(plano.ondas)}\n"
-                                f"Subtarefas: {resultado_plano['total_subtarefas']}\n"
-                                f"Taxa de sucesso: {resultado_plano['concluidas']}/{resultado_plano['total_subtarefas']}",
-                        tags=['planejamento', 'sucesso', 'complexo']
-                    )
-
-                # Exibir estatísticas finais
-                self._exibir_estatisticas()
-
-                # Verificar melhorias pendentes
-                self._verificar_melhorias_pendentes()
-
-                # Retornar resumo
-                if resultado_plano.get('sucesso'):
-                    return f"✅ Plano executado com sucesso!\n\n{resultado_plano['concluidas']}/{resultado_plano['total_subtarefas']} subtarefas concluídas."
+                # Executar plano (⚡ ondas como corrotinas se LUNA_ASYNC=1)
+                if self.usar_async:
+                    resultado_plano = asyncio.run(self.planificador.executar_plano_async(plano))
                 else:
-                    return f"⚠️  Plano parcialmente executado.\n\n{resultado_plano['concluidas']}/{resultado_plano['total_subtarefas']} subtarefas concluídas.\nFalhas: {resultado_plano['falhas']}"
+                    resultado_plano = self.planificador.executar_plano(plano)
+
+                return self._finalizar_execucao_plano(tarefa, plano, resultado_plano)
 
             except Exception as e:
                 print_realtime(f"\n⚠️  Erro no sistema de planejamento: {e}")
@@ -5324,38 +9002,57 @@ for item in items:
         )
 
         # Inicializar estado
-        self._inicializar_estado_execucao(prompt_sistema)
+        ctx.iniciar(tarefa, prompt_sistema)
+        self._vincular_cancelamento(ctx)
+        self.rate_limit_manager.exibir_status()
 
         # Loop principal (DINÂMICO - permite extensão)
         iteracao = 0
         limite_atual = max_iteracoes
         modo_continuo = False  # Se True, adiciona automaticamente +50 iterações
+        span_iteracao = _SPAN_NULO  # 🆕 Fechado na próxima volta ou junto com o span da tarefa
 
         while iteracao < limite_atual:
+            # 🆕 Prazo esgotado ou Ctrl+C: nenhuma chamada nova à API
+            if ctx.cancelamento.cancelado:
+                return self._execucao_cancelada(ctx)
+
             iteracao += 1
+            ctx.iteracao = iteracao
+            span_iteracao.finalizar()
+            span_iteracao = self.rastreador.iniciar(f"iteração {iteracao}", "iteracao", iteracao=iteracao)
 
             # Verificar se está próximo do limite (80%)
             if iteracao == int(limite_atual * 0.8) and not modo_continuo:
                 print_realtime(f"\n⚠️  Aviso: {iteracao}/{limite_atual} iterações ({int(iteracao/limite_atual*100)}%)")
                 print_realtime("   Aproximando-se do limite de iterações")
 
-            modo_tag = "🔧 RECUPERAÇÃO" if self.modo_recuperacao else f"🔄 Iteração {iteracao}/{limite_atual}"
+            modo_tag = "🔧 RECUPERAÇÃO" if ctx.modo_recuperacao else f"🔄 Iteração {iteracao}/{limite_atual}"
             print_realtime(f"\n{modo_tag}")
 
             # Executar API
-            response = self._executar_chamada_api()
+            try:
+                response = self._executar_chamada_api(ctx)
+            except TarefaCancelada:
+                return self._execucao_cancelada(ctx)
             if response is None:
                 iteracao -= 1  # Não conta iterações de rate limit
                 continue  # Rate limit, tentar novamente
 
             # Processar resposta
-            if response.stop_reason == "end_turn":
-                resposta_final = self._processar_resposta_final(response, tarefa)
+            # 🆕 tool_use na resposta sempre recebe tool_result, qualquer que seja o
+            # stop_reason (max_tokens/pause_turn/refusal): ferramentas antecipadas no
+            # streaming já rodaram e não podem ser repetidas no turno seguinte
+            if self._tem_uso_ferramentas(response):
+                self._processar_uso_ferramentas(response, tarefa, ctx)
+
+            elif response.stop_reason == "end_turn":
+                resposta_final = self._processar_resposta_final(response, tarefa, ctx)
                 if resposta_final is not None:
                     # 🆕 ITERAÇÃO PROFUNDA: Avaliar qualidade
                     if self.usar_iteracao_profunda:
                         quality_score = self._avaliar_qualidade_resultado(resposta_final, tarefa)
-                        self.quality_scores.append(quality_score)
+                        ctx.quality_scores.append(quality_score)
 
                         print_realtime(f"\n💎 Qualidade: {quality_score:.1f}/100")
 
@@ -5366,16 +9063,16 @@ for item in items:
                             self._verificar_melhorias_pendentes()
                             return resposta_final
 
-                        if self._detectar_estagnacao():
+                        if self._detectar_estagnacao(ctx):
                             print_realtime(f"⚠️  Estagnação detectada - Parando antecipadamente")
-                            print_realtime(f"   Melhor qualidade atingida: {max(self.quality_scores):.1f}/100")
+                            print_realtime(f"   Melhor qualidade atingida: {max(ctx.quality_scores):.1f}/100")
                             self._exibir_estatisticas()
                             self._verificar_melhorias_pendentes()
                             return resposta_final
 
                         # Mostrar progresso
-                        if len(self.quality_scores) > 1:
-                            delta = quality_score - self.quality_scores[-2]
+                        if len(ctx.quality_scores) > 1:
+                            delta = quality_score - ctx.quality_scores[-2]
                             trend = "📈" if delta > 0 else "📉" if delta < 0 else "➡️"
                             print_realtime(f"   {trend} Variação: {delta:+.1f} pontos")
 
@@ -5387,9 +9084,6 @@ for item in items:
 
                 # Se None, continua loop (estava em modo recuperação)
 
-            elif response.stop_reason == "tool_use":
-                self._processar_uso_ferramentas(response, tarefa, iteracao)
-
             # Exibir status periodicamente
             if iteracao % 5 == 0:
                 self.rate_limit_manager.exibir_status()
@@ -5401,9 +9095,15 @@ for item in items:
                 # Se modo contínuo, adiciona automaticamente
                 if modo_continuo:
                     limite_atual += 50
+                    ctx.max_iteracoes = limite_atual
                     print_realtime(f"🔄 Modo contínuo ativo - Adicionando +50 iterações (novo limite: {limite_atual})")
                     continue
 
+                # Contextos não interativos (subtarefas) nunca chamam input()
+                if not ctx.interativo:
+                    print_realtime("   Execução não interativa - encerrando")
+                    return None
+
                 # Perguntar ao usuário
                 print_realtime("\n❓ A tarefa não foi concluída. Deseja continuar?")
                 print_realtime("   [1] Adicionar +10 iterações")
@@ -5434,6 +9134,8 @@ for item in items:
                         self._exibir_estatisticas()
                         return None
 
+                    ctx.max_iteracoes = limite_atual
+
                 except (KeyboardInterrupt, EOFError):
                     print_realtime("\n⏹️  Interrompido pelo usuário")
                     self._exibir_estatisticas()
@@ -5444,6 +9146,111 @@ for item in items:
         self._exibir_estatisticas()
         return None
 
+    @rastrear("tarefa", "tarefa_async", lambda tarefa, *a, **k: {"tarefa": tarefa[:200]})
+    async def executar_tarefa_async(
+        self,
+        tarefa: str,
+        max_iteracoes: Optional[int] = None,
+        usar_planejamento: bool = True,
+        cancelamento: Optional[TokenCancelamento] = None
+    ) -> Optional[str]:
+        """
+        🆕 Versão asyncio de executar_tarefa() construída sobre AsyncAnthropic.
+
+        Cada chamada tem o próprio ExecucaoContexto (histórico, system prompt,
+        recuperação), então várias tarefas podem rodar ao mesmo tempo no mesmo
+        event loop (ex.: asyncio.gather) sem uma thread por conversa.
+
+        Diferenças em relação à versão síncrona:
+            - Não interativa: ao atingir o limite de iterações a execução
+              termina (não há input() para estender o limite)
+            - Ferramentas rodam em threads auxiliares via asyncio.to_thread()
+
+        Args:
+            tarefa: Descrição da tarefa
+            max_iteracoes: Limite de iterações (padrão: cálculo dinâmico)
+            usar_planejamento: Se False, nunca aciona o planificador
+                (usado pelas subtarefas de um plano)
+            cancelamento: 🆕 Prazo/cancelamento desta execução (padrão: filho
+                de agente.cancelamento, sem prazo)
+
+        Returns:
+            Resposta final do agente (ou None se não concluir)
+
+        Uso:
+            resposta = asyncio.run(agente.executar_tarefa_async("Liste os arquivos"))
+        """
+        ctx = ExecucaoContexto(
+            interativo=False, usar_planejamento=usar_planejamento,
+            cancelamento=cancelamento or self.cancelamento.filho()
+        )
+
+        if max_iteracoes is None:
+            max_iteracoes = self._calcular_max_iteracoes(tarefa)
+        ctx.max_iteracoes = max_iteracoes
+
+        print_realtime("\n" + "="*70)
+        print_realtime(f"🎯 TAREFA (async): {tarefa}")
+        print_realtime("="*70)
+
+        # ═══ PLANEJAMENTO (ondas executadas como corrotinas) ═══
+        if ctx.usar_planejamento and self.usar_planejamento and self._tarefa_e_complexa(tarefa):
+            print_realtime("\n🧠 Tarefa complexa detectada!")
+            print_realtime("   Ativando sistema de planejamento avançado...")
+
+            try:
+                contexto_plan = self._preparar_contexto_planejamento(tarefa)
+                plano = await asyncio.to_thread(
+                    self.planificador.planejar, tarefa, contexto_plan
+                )
+                self._salvar_plano(plano)
+                resultado_plano = await self.planificador.executar_plano_async(plano)
+                return self._finalizar_execucao_plano(tarefa, plano, resultado_plano)
+
+            except Exception as e:
+                print_realtime(f"\n⚠️  Erro no sistema de planejamento: {e}")
+                print_realtime("   Continuando com execução padrão...")
+
+        # ═══ EXECUÇÃO PADRÃO (estado no contexto desta corrotina) ═══
+        contexto_aprendizados, contexto_workspace = self._preparar_contexto_tarefa(tarefa)
+        prompt_sistema = self._construir_prompt_sistema(
+            tarefa, contexto_aprendizados, contexto_workspace
+        )
+        ctx.iniciar(tarefa, prompt_sistema)
+        self._vincular_cancelamento(ctx)
+
+        iteracao = 0
+        span_iteracao = _SPAN_NULO
+        while iteracao < max_iteracoes:
+            if ctx.cancelamento.cancelado:
+                return self._execucao_cancelada(ctx)
+
+            iteracao += 1
+            ctx.iteracao = iteracao
+            span_iteracao.finalizar()
+            span_iteracao = self.rastreador.iniciar(f"iteração {iteracao}", "iteracao", iteracao=iteracao)
+            print_realtime(f"\n🔄 Iteração {iteracao}/{max_iteracoes} (async)")
+
+            try:
+                response = await self._executar_chamada_api_async(ctx)
+            except TarefaCancelada:
+                return self._execucao_cancelada(ctx)
+            if response is None:
+                iteracao -= 1  # Não conta iterações de rate limit
+                continue
+
+            if self._tem_uso_ferramentas(response):
+                await self._processar_uso_ferramentas_async(response, tarefa, ctx)
+
+            elif response.stop_reason == "end_turn":
+                resposta_final = self._processar_resposta_final(response, tarefa, ctx)
+                if resposta_final is not None:
+                    return resposta_final
+                # Se None, continua loop (estava em modo recuperação)
+
+        print_realtime(f"\n⚠️  Limite de iterações atingido ({iteracao}/{max_iteracoes}) - encerrando (async)")
+        return None
+
     def _exibir_estatisticas(self) -> None:
         """Exibe estatísticas da sessão."""
         stats_rate = self.rate_limit_manager.obter_estatisticas()
@@ -5457,6 +9264,22 @@ for item in items:
                 f"({stats_rate['tempo_total_espera']:.0f}s total)"
             )
 
+        # 🔁 Retentativas de API (backoff)
+        stats_retentativa = self.politica_retentativa.metricas
+        if stats_retentativa['retentativas'] > 0:
+            print_realtime(
+                f"   Retentativas de API: {stats_retentativa['retentativas']} "
+                f"({stats_retentativa['tempo_espera']:.1f}s de backoff)"
+            )
+
+        # 🗜️ Compactação de histórico
+        stats_compactacao = self.compactador_historico.metricas
+        if stats_compactacao['compactacoes'] > 0:
+            print_realtime(
+                f"   Compactações de histórico: {stats_compactacao['compactacoes']} "
+                f"(~{stats_compactacao['tokens_economizados']:,} tokens a menos)"
+            )
+
         # 💎 Mostrar estatísticas de cache (se habilitado)
         if self.usar_cache and self.cache_manager:
             self.cache_manager.exibir_estatisticas()
@@ -5701,7 +9524,7 @@ def main() -> None:
                 agente.sistema_ferramentas.telemetria.finalizar_sessao()
                 print_realtime("\n📊 TELEMETRIA:")
                 print_realtime("   ✅ Sessão salva - Use 'analisar telemetria' na próxima sessão")
-                print_realtime("   ✅ Arquivo: luna_telemetria_ferramentas.jsonl")
+                print_realtime("   ✅ Arquivos: luna_telemetria/ (segmentos diários)")
 
             print_realtime("\n" + "═" * 80)
 
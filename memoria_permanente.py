@@ -11,75 +11,333 @@ Implementa aprendizado contínuo para o agente:
 - Preferências do usuário
 
 Arquitetura:
-- memoria.json: Base de conhecimento
-- Busca semântica (opcional: embeddings)
+- memoria_agente.db: Base de conhecimento em SQLite (🆕)
+  - Índice FTS5 sobre aprendizados (conteúdo, contexto, tags)
+  - Hash de deduplicação com índice único
+  - Atualizações por linha (sem reescrever o arquivo inteiro)
+- Migração automática (única) de memoria_agente.json
 - Categorização automática
 """
 
 import json
 import os
+import re
+import sqlite3
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Any
 import hashlib
 
 
+# Limite de itens mantidos nas tabelas de histórico
+LIMITE_HISTORICO = 100
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS aprendizados (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    conteudo TEXT NOT NULL,
+    contexto TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT '[]',
+    relevancia REAL NOT NULL DEFAULT 1.0,
+    uso_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_aprendizados_categoria ON aprendizados(categoria);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS aprendizados_fts USING fts5(
+    conteudo, contexto, tags,
+    content='aprendizados', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+-- Índice FTS acompanha o conteúdo (uso_count não reindexa)
+CREATE TRIGGER IF NOT EXISTS aprendizados_ai AFTER INSERT ON aprendizados BEGIN
+    INSERT INTO aprendizados_fts(rowid, conteudo, contexto, tags)
+    VALUES (new.rowid, new.conteudo, new.contexto, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS aprendizados_ad AFTER DELETE ON aprendizados BEGIN
+    INSERT INTO aprendizados_fts(aprendizados_fts, rowid, conteudo, contexto, tags)
+    VALUES ('delete', old.rowid, old.conteudo, old.contexto, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS aprendizados_au AFTER UPDATE OF conteudo, contexto, tags ON aprendizados BEGIN
+    INSERT INTO aprendizados_fts(aprendizados_fts, rowid, conteudo, contexto, tags)
+    VALUES ('delete', old.rowid, old.conteudo, old.contexto, old.tags);
+    INSERT INTO aprendizados_fts(rowid, conteudo, contexto, tags)
+    VALUES (new.rowid, new.conteudo, new.contexto, new.tags);
+END;
+
+CREATE TABLE IF NOT EXISTS historico_tarefas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    tarefa TEXT NOT NULL,
+    resultado TEXT NOT NULL,
+    ferramentas_usadas TEXT NOT NULL DEFAULT '[]',
+    sucesso INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ferramentas_criadas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    descricao TEXT NOT NULL,
+    codigo_hash TEXT NOT NULL,
+    uso_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Chave/valor (valores em JSON)
+CREATE TABLE IF NOT EXISTS preferencias_usuario (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contexto (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS estatisticas (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+
+def _estatisticas_iniciais() -> Dict[str, Any]:
+    return {
+        "total_tarefas": 0,
+        "total_aprendizados": 0,
+        "ferramentas_criadas": 0,
+        "primeira_sessao": None,
+        "ultima_sessao": None
+    }
+
+
 class MemoriaPermanente:
     """
     Sistema de memória persistente para o agente
+
+    🆕 Armazenamento em SQLite: cada operação altera só as linhas envolvidas,
+    e a busca textual usa FTS5 em vez de varrer todos os aprendizados.
+    `arquivo_memoria` continua aceitando o caminho .json antigo: o banco fica
+    ao lado (mesmo nome, extensão .db) e o JSON é importado na primeira vez.
     """
-    
+
     def __init__(self, arquivo_memoria: str = "memoria_agente.json"):
         self.arquivo_memoria = arquivo_memoria
-        self.memoria = {
-            "aprendizados": [],
-            "preferencias_usuario": {},
-            "historico_tarefas": [],
-            "ferramentas_criadas": [],
-            "contexto": {},
-            "estatisticas": {
-                "total_tarefas": 0,
-                "total_aprendizados": 0,
-                "ferramentas_criadas": 0,
-                "primeira_sessao": None,
-                "ultima_sessao": None
-            }
-        }
+        caminho = Path(arquivo_memoria)
+        self.arquivo_db = str(caminho if caminho.suffix == ".db" else caminho.with_suffix(".db"))
+
+        # Ferramentas podem rodar em threads do despachante: uma conexão + lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.arquivo_db, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(ESQUEMA)
+
         self._carregar_memoria()
-    
+
+    # ════════════════════════════════════════════════════════════════════
+    # ARMAZENAMENTO
+    # ════════════════════════════════════════════════════════════════════
+
     def _carregar_memoria(self):
-        """Carrega memória do disco"""
-        if os.path.exists(self.arquivo_memoria):
-            try:
-                with open(self.arquivo_memoria, 'r', encoding='utf-8') as f:
-                    dados = json.load(f)
-                    self.memoria.update(dados)
-                print(f"🧠 Memória carregada: {len(self.memoria['aprendizados'])} aprendizados")
-            except Exception as e:
-                print(f"⚠️  Erro ao carregar memória: {e}")
-                print("   Iniciando memória vazia")
-        else:
-            print("🆕 Criando nova memória")
-            self.memoria["estatisticas"]["primeira_sessao"] = datetime.now().isoformat()
-            self._salvar_memoria()
-    
+        """Abre o banco, migrando o JSON antigo se o banco estiver vazio"""
+        with self._lock:
+            vazio = self._obter_estatistica("primeira_sessao") is None
+
+            if vazio and os.path.exists(self.arquivo_memoria) and self.arquivo_memoria != self.arquivo_db:
+                try:
+                    self._migrar_json()
+                except Exception as e:
+                    print(f"⚠️  Erro ao migrar memória JSON: {e}")
+                    print("   Iniciando memória vazia")
+                    vazio = True
+                else:
+                    vazio = False
+
+            if vazio:
+                print("🆕 Criando nova memória")
+                with self._conn:
+                    for chave, valor in _estatisticas_iniciais().items():
+                        self._definir_estatistica(chave, valor)
+                    self._definir_estatistica("primeira_sessao", datetime.now().isoformat())
+            else:
+                print(f"🧠 Memória carregada: {self._contar('aprendizados')} aprendizados")
+
+    def _migrar_json(self):
+        """
+        🆕 Importa memoria_agente.json para o banco (uma única vez).
+
+        O arquivo JSON não é alterado; a origem fica registrada em
+        estatisticas.migrado_de.
+        """
+        with open(self.arquivo_memoria, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+
+        with self._conn:
+            for a in dados.get("aprendizados", []):
+                self._inserir_aprendizado(a)
+
+            for t in dados.get("historico_tarefas", [])[-LIMITE_HISTORICO:]:
+                self._conn.execute(
+                    "INSERT INTO historico_tarefas (timestamp, tarefa, resultado, ferramentas_usadas, sucesso) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (t.get("timestamp", ""), t.get("tarefa", ""), t.get("resultado", ""),
+                     json.dumps(t.get("ferramentas_usadas", []), ensure_ascii=False),
+                     int(bool(t.get("sucesso", True))))
+                )
+
+            for f in dados.get("ferramentas_criadas", [])[-LIMITE_HISTORICO:]:
+                self._conn.execute(
+                    "INSERT INTO ferramentas_criadas (timestamp, nome, descricao, codigo_hash, uso_count) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (f.get("timestamp", ""), f.get("nome", ""), f.get("descricao", ""),
+                     f.get("codigo_hash", ""), f.get("uso_count", 0))
+                )
+
+            for chave, pref in dados.get("preferencias_usuario", {}).items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO preferencias_usuario (chave, valor, timestamp) VALUES (?, ?, ?)",
+                    (chave, json.dumps(pref.get("valor"), ensure_ascii=False), pref.get("timestamp", ""))
+                )
+
+            for chave, valor in dados.get("contexto", {}).items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO contexto (chave, valor) VALUES (?, ?)",
+                    (chave, json.dumps(valor, ensure_ascii=False))
+                )
+
+            estatisticas = _estatisticas_iniciais()
+            estatisticas.update(dados.get("estatisticas", {}))
+            if not estatisticas["primeira_sessao"]:
+                estatisticas["primeira_sessao"] = datetime.now().isoformat()
+            for chave, valor in estatisticas.items():
+                self._definir_estatistica(chave, valor)
+            self._definir_estatistica("migrado_de", os.path.abspath(self.arquivo_memoria))
+
+        print(f"🧠 Memória migrada de {self.arquivo_memoria}: {self._contar('aprendizados')} aprendizados")
+
     def _salvar_memoria(self):
-        """Salva memória no disco"""
-        try:
-            # Atualizar timestamp
-            self.memoria["estatisticas"]["ultima_sessao"] = datetime.now().isoformat()
-            
-            # Salvar com backup
-            if os.path.exists(self.arquivo_memoria):
-                backup = f"{self.arquivo_memoria}.bak"
-                os.replace(self.arquivo_memoria, backup)
-            
-            with open(self.arquivo_memoria, 'w', encoding='utf-8') as f:
-                json.dump(self.memoria, f, indent=2, ensure_ascii=False)
-            
-        except Exception as e:
-            print(f"❌ Erro ao salvar memória: {e}")
-    
+        """
+        Mantido por compatibilidade: cada operação já grava só as linhas
+        alteradas. Apenas atualiza o timestamp da última sessão.
+        """
+        with self._lock, self._conn:
+            self._tocar_sessao()
+
+    def _tocar_sessao(self):
+        self._definir_estatistica("ultima_sessao", datetime.now().isoformat())
+
+    def _obter_estatistica(self, chave: str, padrao=None):
+        linha = self._conn.execute("SELECT valor FROM estatisticas WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(linha["valor"]) if linha else padrao
+
+    def _definir_estatistica(self, chave: str, valor):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO estatisticas (chave, valor) VALUES (?, ?)",
+            (chave, json.dumps(valor, ensure_ascii=False))
+        )
+
+    def _incrementar_estatistica(self, chave: str, delta: int = 1):
+        self._definir_estatistica(chave, (self._obter_estatistica(chave, 0) or 0) + delta)
+
+    def _contar(self, tabela: str) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+    def _podar(self, tabela: str, limite: int = LIMITE_HISTORICO) -> int:
+        """Mantém só as últimas `limite` linhas (por id). Retorna quantas removeu."""
+        cursor = self._conn.execute(
+            f"DELETE FROM {tabela} WHERE id NOT IN "
+            f"(SELECT id FROM {tabela} ORDER BY id DESC LIMIT ?)",
+            (limite,)
+        )
+        return cursor.rowcount
+
+    def _inserir_aprendizado(self, a: Dict) -> bool:
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO aprendizados "
+            "(id, timestamp, categoria, conteudo, contexto, tags, relevancia, uso_count) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (a["id"], a.get("timestamp", ""), a.get("categoria", ""), a.get("conteudo", ""),
+             a.get("contexto") or "", json.dumps(a.get("tags") or [], ensure_ascii=False),
+             a.get("relevancia", 1.0), a.get("uso_count", 0))
+        )
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def _linha_para_aprendizado(linha: sqlite3.Row) -> Dict:
+        return {
+            "id": linha["id"],
+            "timestamp": linha["timestamp"],
+            "categoria": linha["categoria"],
+            "conteudo": linha["conteudo"],
+            "contexto": linha["contexto"],
+            "tags": json.loads(linha["tags"]),
+            "relevancia": linha["relevancia"],
+            "uso_count": linha["uso_count"]
+        }
+
+    @property
+    def memoria(self) -> Dict[str, Any]:
+        """
+        Visão completa da memória no formato antigo (dict do JSON).
+
+        Somente leitura: é montada a partir do banco a cada acesso. Use os
+        métodos da classe para alterar dados.
+        """
+        with self._lock:
+            aprendizados = [
+                self._linha_para_aprendizado(l)
+                for l in self._conn.execute("SELECT * FROM aprendizados ORDER BY rowid")
+            ]
+            tarefas = [
+                {
+                    "timestamp": l["timestamp"],
+                    "tarefa": l["tarefa"],
+                    "resultado": l["resultado"],
+                    "ferramentas_usadas": json.loads(l["ferramentas_usadas"]),
+                    "sucesso": bool(l["sucesso"])
+                }
+                for l in self._conn.execute("SELECT * FROM historico_tarefas ORDER BY id")
+            ]
+            ferramentas = [
+                {k: l[k] for k in ("timestamp", "nome", "descricao", "codigo_hash", "uso_count")}
+                for l in self._conn.execute("SELECT * FROM ferramentas_criadas ORDER BY id")
+            ]
+            preferencias = {
+                l["chave"]: {"valor": json.loads(l["valor"]), "timestamp": l["timestamp"]}
+                for l in self._conn.execute("SELECT * FROM preferencias_usuario")
+            }
+            contexto = {
+                l["chave"]: json.loads(l["valor"])
+                for l in self._conn.execute("SELECT * FROM contexto")
+            }
+            estatisticas = _estatisticas_iniciais()
+            estatisticas.update({
+                chave: self._obter_estatistica(chave) for chave in estatisticas
+            })
+
+        return {
+            "aprendizados": aprendizados,
+            "preferencias_usuario": preferencias,
+            "historico_tarefas": tarefas,
+            "ferramentas_criadas": ferramentas,
+            "contexto": contexto,
+            "estatisticas": estatisticas
+        }
+
+    def fechar(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conn.close()
+
+    # ════════════════════════════════════════════════════════════════════
+    # API PÚBLICA
+    # ════════════════════════════════════════════════════════════════════
+
     def adicionar_aprendizado(self, categoria: str, conteudo: str,
                              contexto: Optional[str] = None, tags: List[str] = None):
         """
@@ -102,11 +360,14 @@ class MemoriaPermanente:
             "uso_count": 0
         }
 
-        # Evitar duplicatas
-        if not any(a["id"] == aprendizado["id"] for a in self.memoria["aprendizados"]):
-            self.memoria["aprendizados"].append(aprendizado)
-            self.memoria["estatisticas"]["total_aprendizados"] += 1
-            self._salvar_memoria()
+        # Evitar duplicatas (índice único no hash do conteúdo)
+        with self._lock, self._conn:
+            inserido = self._inserir_aprendizado(aprendizado)
+            if inserido:
+                self._incrementar_estatistica("total_aprendizados")
+                self._tocar_sessao()
+
+        if inserido:
             print(f"✅ Aprendizado salvo: {categoria}")
             return True
         return False
@@ -128,139 +389,188 @@ class MemoriaPermanente:
             contexto=titulo,
             tags=tags or []
         )
-    
-    def buscar_aprendizados(self, query: str = None, categoria: str = None, 
+
+    @staticmethod
+    def _consulta_fts(query: str) -> Optional[str]:
+        """
+        Converte texto livre em consulta FTS5: cada palavra vira um prefixo
+        entre aspas ("pyth"* casa "python"), todas exigidas (AND).
+        """
+        termos = re.findall(r"\w+", query)
+        if not termos:
+            return None
+        return " AND ".join(f'"{t}"*' for t in termos)
+
+    def buscar_aprendizados(self, query: str = None, categoria: str = None,
                            tags: List[str] = None, limite: int = 10) -> List[Dict]:
         """
         Busca aprendizados relevantes
-        
+
+        🆕 A busca textual usa o índice FTS5 (palavras/prefixos, sem acento
+        e sem diferenciar maiúsculas), ranqueada por bm25. Exige todas as
+        palavras: sem aprendizado que as tenha, retorna [] (como a busca
+        por substring original).
+
         Args:
             query: Texto para buscar
             categoria: Filtrar por categoria
             tags: Filtrar por tags
             limite: Máximo de resultados
         """
-        resultados = self.memoria["aprendizados"]
-        
+        filtros = []
+        parametros: List[Any] = []
+
         # Filtrar por categoria
         if categoria:
-            resultados = [a for a in resultados if a["categoria"] == categoria]
-        
+            filtros.append("a.categoria = ?")
+            parametros.append(categoria)
+
         # Filtrar por tags
         if tags:
-            resultados = [a for a in resultados if any(t in a["tags"] for t in tags)]
-        
-        # Busca textual simples
-        if query:
-            query_lower = query.lower()
-            resultados = [
-                a for a in resultados 
-                if query_lower in a["conteudo"].lower() or 
-                   query_lower in a["contexto"].lower()
-            ]
-        
-        # Ordenar por relevância e uso
-        resultados.sort(key=lambda x: (x["relevancia"], x["uso_count"]), reverse=True)
-        
-        # Incrementar uso dos retornados
-        for r in resultados[:limite]:
+            filtros.append(
+                f"EXISTS (SELECT 1 FROM json_each(a.tags) WHERE value IN ({','.join('?' * len(tags))}))"
+            )
+            parametros.extend(tags)
+
+        with self._lock:
+            linhas = None
+            if query:
+                consulta = self._consulta_fts(query)
+                if consulta is not None:
+                    where = " AND ".join(["aprendizados_fts MATCH ?"] + filtros)
+                    linhas = self._conn.execute(
+                        f"SELECT a.* FROM aprendizados_fts JOIN aprendizados a ON a.rowid = aprendizados_fts.rowid "
+                        f"WHERE {where} "
+                        f"ORDER BY bm25(aprendizados_fts), a.relevancia DESC, a.uso_count DESC LIMIT ?",
+                        [consulta] + parametros + [limite]
+                    ).fetchall()
+                else:
+                    # Consulta sem palavras (só pontuação): substring simples
+                    filtros.append("(instr(lower(a.conteudo), ?) > 0 OR instr(lower(a.contexto), ?) > 0)")
+                    parametros.extend([query.lower(), query.lower()])
+
+            if linhas is None:
+                where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+                # Ordenar por relevância e uso
+                linhas = self._conn.execute(
+                    f"SELECT a.* FROM aprendizados a {where} "
+                    f"ORDER BY a.relevancia DESC, a.uso_count DESC, a.rowid LIMIT ?",
+                    parametros + [limite]
+                ).fetchall()
+
+            # Incrementar uso dos retornados (só essas linhas)
+            if linhas:
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE aprendizados SET uso_count = uso_count + 1 WHERE rowid = ?",
+                        [(l["rowid"],) for l in linhas]
+                    )
+
+        resultados = [self._linha_para_aprendizado(l) for l in linhas]
+        for r in resultados:
             r["uso_count"] += 1
-        
-        self._salvar_memoria()
-        return resultados[:limite]
-    
-    def registrar_tarefa(self, tarefa: str, resultado: str, 
-                        ferramentas_usadas: List[str] = None, 
+        return resultados
+
+    def registrar_tarefa(self, tarefa: str, resultado: str,
+                        ferramentas_usadas: List[str] = None,
                         sucesso: bool = True):
         """Registra tarefa executada"""
-        registro = {
-            "timestamp": datetime.now().isoformat(),
-            "tarefa": tarefa,
-            "resultado": resultado[:500],  # Limitar tamanho
-            "ferramentas_usadas": ferramentas_usadas or [],
-            "sucesso": sucesso
-        }
-        
-        self.memoria["historico_tarefas"].append(registro)
-        self.memoria["estatisticas"]["total_tarefas"] += 1
-        
-        # Manter apenas últimas 100 tarefas
-        if len(self.memoria["historico_tarefas"]) > 100:
-            self.memoria["historico_tarefas"] = self.memoria["historico_tarefas"][-100:]
-        
-        self._salvar_memoria()
-    
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO historico_tarefas (timestamp, tarefa, resultado, ferramentas_usadas, sucesso) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(), tarefa,
+                 resultado[:500],  # Limitar tamanho
+                 json.dumps(ferramentas_usadas or [], ensure_ascii=False), int(sucesso))
+            )
+            self._incrementar_estatistica("total_tarefas")
+
+            # Manter apenas últimas 100 tarefas
+            self._podar("historico_tarefas")
+            self._tocar_sessao()
+
     def registrar_ferramenta_criada(self, nome: str, descricao: str, codigo: str):
         """
         Registra ferramenta criada pelo agente
 
         Mantém apenas as últimas 100 ferramentas para evitar crescimento
-        infinito do arquivo de memória.
+        infinito da memória.
         """
-        ferramenta = {
-            "timestamp": datetime.now().isoformat(),
-            "nome": nome,
-            "descricao": descricao,
-            "codigo_hash": hashlib.md5(codigo.encode()).hexdigest(),
-            "uso_count": 0
-        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO ferramentas_criadas (timestamp, nome, descricao, codigo_hash, uso_count) "
+                "VALUES (?, ?, ?, ?, 0)",
+                (datetime.now().isoformat(), nome, descricao, hashlib.md5(codigo.encode()).hexdigest())
+            )
+            self._incrementar_estatistica("ferramentas_criadas")
 
-        self.memoria["ferramentas_criadas"].append(ferramenta)
-        self.memoria["estatisticas"]["ferramentas_criadas"] += 1
+            # ✅ CORREÇÃO: Podar para evitar crescimento infinito (igual historico_tarefas)
+            podadas = self._podar("ferramentas_criadas")
+            self._tocar_sessao()
 
-        # ✅ CORREÇÃO: Podar para evitar crescimento infinito (igual historico_tarefas)
-        if len(self.memoria["ferramentas_criadas"]) > 100:
-            self.memoria["ferramentas_criadas"] = self.memoria["ferramentas_criadas"][-100:]
-            print(f"⚠️  Memória podada: mantidas últimas 100 ferramentas")
+        if podadas:
+            print(f"⚠️  Memória podada: mantidas últimas {LIMITE_HISTORICO} ferramentas")
 
-        self._salvar_memoria()
-    
     def salvar_preferencia(self, chave: str, valor):
         """Salva preferência do usuário"""
-        self.memoria["preferencias_usuario"][chave] = {
-            "valor": valor,
-            "timestamp": datetime.now().isoformat()
-        }
-        self._salvar_memoria()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO preferencias_usuario (chave, valor, timestamp) VALUES (?, ?, ?)",
+                (chave, json.dumps(valor, ensure_ascii=False), datetime.now().isoformat())
+            )
+            self._tocar_sessao()
         print(f"✅ Preferência salva: {chave}")
-    
+
     def obter_preferencia(self, chave: str, padrao=None):
         """Obtém preferência do usuário"""
-        pref = self.memoria["preferencias_usuario"].get(chave)
-        return pref["valor"] if pref else padrao
-    
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT valor FROM preferencias_usuario WHERE chave = ?", (chave,)
+            ).fetchone()
+        return json.loads(linha["valor"]) if linha else padrao
+
     def obter_contexto_recente(self, limite: int = 5) -> str:
         """Obtém contexto das últimas tarefas"""
-        tarefas = self.memoria["historico_tarefas"][-limite:]
-        
+        with self._lock:
+            tarefas = self._conn.execute(
+                "SELECT tarefa, sucesso FROM (SELECT * FROM historico_tarefas ORDER BY id DESC LIMIT ?) "
+                "ORDER BY id",
+                (limite,)
+            ).fetchall()
+
         if not tarefas:
             return "Primeira interação com o usuário."
-        
+
         contexto = "Histórico recente:\n"
         for t in tarefas:
             contexto += f"- {t['tarefa'][:100]} → {'✅' if t['sucesso'] else '❌'}\n"
-        
+
         return contexto
-    
+
     def obter_estatisticas(self) -> Dict:
         """Retorna estatísticas da memória"""
-        stats = self.memoria["estatisticas"].copy()
-        
-        # Calcular adicionais
-        stats["aprendizados_unicos"] = len(self.memoria["aprendizados"])
-        stats["categorias"] = len(set(a["categoria"] for a in self.memoria["aprendizados"]))
-        
+        with self._lock:
+            stats = _estatisticas_iniciais()
+            stats.update({chave: self._obter_estatistica(chave) for chave in stats})
+
+            # Calcular adicionais
+            stats["aprendizados_unicos"] = self._contar("aprendizados")
+            stats["categorias"] = self._conn.execute(
+                "SELECT COUNT(DISTINCT categoria) FROM aprendizados"
+            ).fetchone()[0]
+
         if stats["primeira_sessao"]:
             primeira = datetime.fromisoformat(stats["primeira_sessao"])
             dias = (datetime.now() - primeira).days
             stats["dias_uso"] = dias
-        
+
         return stats
-    
+
     def exportar_relatorio(self, arquivo: str = "relatorio_memoria.md"):
         """Exporta relatório de memória em Markdown"""
         stats = self.obter_estatisticas()
-        
+        memoria = self.memoria
+
         relatorio = f"""# 🧠 RELATÓRIO DE MEMÓRIA DO AGENTE
 
 Data: {datetime.now().strftime("%Y-%m-%d %H:%M")}
@@ -279,141 +589,106 @@ Data: {datetime.now().strftime("%Y-%m-%d %H:%M")}
 """
         # Agrupar por categoria
         categorias = {}
-        for a in self.memoria["aprendizados"]:
+        for a in memoria["aprendizados"]:
             cat = a["categoria"]
             if cat not in categorias:
                 categorias[cat] = []
             categorias[cat].append(a)
-        
+
         for cat, aprendizados in sorted(categorias.items()):
             relatorio += f"\n### {cat.upper()} ({len(aprendizados)} aprendizados)\n\n"
             for a in sorted(aprendizados, key=lambda x: x["uso_count"], reverse=True)[:10]:
                 relatorio += f"- **[Uso: {a['uso_count']}x]** {a['conteudo']}\n"
-        
+
         relatorio += f"\n## 🛠️ FERRAMENTAS CRIADAS\n\n"
-        for f in self.memoria["ferramentas_criadas"][-20:]:
+        for f in memoria["ferramentas_criadas"][-20:]:
             relatorio += f"- **{f['nome']}**: {f['descricao']} (Uso: {f['uso_count']}x)\n"
-        
+
         relatorio += f"\n## 📋 ÚLTIMAS TAREFAS\n\n"
-        for t in self.memoria["historico_tarefas"][-10:]:
+        for t in memoria["historico_tarefas"][-10:]:
             emoji = "✅" if t["sucesso"] else "❌"
             relatorio += f"- {emoji} {t['tarefa'][:100]}\n"
-        
+
         relatorio += f"\n## ⚙️ PREFERÊNCIAS DO USUÁRIO\n\n"
-        for chave, pref in self.memoria["preferencias_usuario"].items():
+        for chave, pref in memoria["preferencias_usuario"].items():
             relatorio += f"- **{chave}**: {pref['valor']}\n"
-        
+
         with open(arquivo, 'w', encoding='utf-8') as f:
             f.write(relatorio)
-        
+
         print(f"✅ Relatório exportado: {arquivo}")
         return arquivo
-    
+
     def limpar_memoria(self, confirmar: bool = False):
         """Limpa toda a memória (CUIDADO!)"""
         if not confirmar:
             print("⚠️  Use confirmar=True para limpar a memória")
             return False
-        
+
         # Backup antes de limpar
         backup = f"memoria_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         self.exportar_backup(backup)
-        
-        self.memoria = {
-            "aprendizados": [],
-            "preferencias_usuario": {},
-            "historico_tarefas": [],
-            "ferramentas_criadas": [],
-            "contexto": {},
-            "estatisticas": {
-                "total_tarefas": 0,
-                "total_aprendizados": 0,
-                "ferramentas_criadas": 0,
-                "primeira_sessao": datetime.now().isoformat(),
-                "ultima_sessao": None
-            }
-        }
-        
-        self._salvar_memoria()
+
+        with self._lock, self._conn:
+            for tabela in ("aprendizados", "historico_tarefas", "ferramentas_criadas",
+                           "preferencias_usuario", "contexto", "estatisticas"):
+                self._conn.execute(f"DELETE FROM {tabela}")
+            for chave, valor in _estatisticas_iniciais().items():
+                self._definir_estatistica(chave, valor)
+            self._definir_estatistica("primeira_sessao", datetime.now().isoformat())
+
         print(f"✅ Memória limpa. Backup salvo em: {backup}")
         return True
 
     def compactar_memoria(self):
         """
-        Compacta memória removendo duplicatas e mantendo apenas itens relevantes.
+        Compacta memória mantendo apenas itens relevantes.
 
-        Útil quando memoria_agente.json fica muito grande (>500KB).
         Remove:
-        - Aprendizados duplicados (mesmo ID)
-        - Ferramentas nunca usadas
-        - Tarefas antigas não relevantes
-
-        Mantém:
-        - Aprendizados com uso_count > 0
-        - Últimas 100 tarefas
-        - Últimas 100 ferramentas
+        - Ferramentas e tarefas além das últimas 100
+        - Espaço livre do banco (VACUUM) e segmentos do índice FTS5
+
+        Duplicatas de aprendizados não existem mais: o hash tem índice único.
         """
         print("\n🗜️  Compactando memória...")
 
-        # Remove aprendizados duplicados (por ID)
-        aprendizados_unicos = {}
-        for a in self.memoria["aprendizados"]:
-            if a["id"] not in aprendizados_unicos:
-                aprendizados_unicos[a["id"]] = a
-            else:
-                # Mantém o que tem maior uso_count
-                if a["uso_count"] > aprendizados_unicos[a["id"]]["uso_count"]:
-                    aprendizados_unicos[a["id"]] = a
-
-        antes_aprendizados = len(self.memoria["aprendizados"])
-        self.memoria["aprendizados"] = list(aprendizados_unicos.values())
-        depois_aprendizados = len(self.memoria["aprendizados"])
-
-        # Podar ferramentas (manter últimas 100)
-        antes_ferramentas = len(self.memoria["ferramentas_criadas"])
-        if antes_ferramentas > 100:
-            self.memoria["ferramentas_criadas"] = self.memoria["ferramentas_criadas"][-100:]
-        depois_ferramentas = len(self.memoria["ferramentas_criadas"])
-
-        # Podar tarefas (manter últimas 100)
-        antes_tarefas = len(self.memoria["historico_tarefas"])
-        if antes_tarefas > 100:
-            self.memoria["historico_tarefas"] = self.memoria["historico_tarefas"][-100:]
-        depois_tarefas = len(self.memoria["historico_tarefas"])
-
-        self._salvar_memoria()
+        with self._lock:
+            with self._conn:
+                ferramentas_removidas = self._podar("ferramentas_criadas")
+                tarefas_removidas = self._podar("historico_tarefas")
+                self._conn.execute("INSERT INTO aprendizados_fts(aprendizados_fts) VALUES ('optimize')")
+            self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
         print(f"✅ Compactação concluída:")
-        print(f"   Aprendizados: {antes_aprendizados} → {depois_aprendizados} ({antes_aprendizados - depois_aprendizados} removidos)")
-        print(f"   Ferramentas: {antes_ferramentas} → {depois_ferramentas} ({antes_ferramentas - depois_ferramentas} removidas)")
-        print(f"   Tarefas: {antes_tarefas} → {depois_tarefas} ({antes_tarefas - depois_tarefas} removidas)")
+        print(f"   Ferramentas removidas: {ferramentas_removidas}")
+        print(f"   Tarefas removidas: {tarefas_removidas}")
 
         # Calcular tamanho do arquivo
-        import os
-        tamanho_kb = os.path.getsize(self.arquivo_memoria) / 1024
-        print(f"   Tamanho do arquivo: {tamanho_kb:.1f} KB")
+        tamanho_kb = os.path.getsize(self.arquivo_db) / 1024
+        print(f"   Tamanho do banco: {tamanho_kb:.1f} KB")
 
         return {
-            "aprendizados_removidos": antes_aprendizados - depois_aprendizados,
-            "ferramentas_removidas": antes_ferramentas - depois_ferramentas,
-            "tarefas_removidas": antes_tarefas - depois_tarefas,
+            "aprendizados_removidos": 0,
+            "ferramentas_removidas": ferramentas_removidas,
+            "tarefas_removidas": tarefas_removidas,
             "tamanho_kb": tamanho_kb
         }
 
     def exportar_backup(self, arquivo: str):
-        """Exporta backup completo"""
-        import shutil
-        shutil.copy2(self.arquivo_memoria, arquivo)
+        """Exporta backup completo (JSON no formato antigo)"""
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            json.dump(self.memoria, f, indent=2, ensure_ascii=False)
         print(f"✅ Backup criado: {arquivo}")
-    
+
     def _gerar_id(self, texto: str) -> str:
         """Gera ID único para aprendizado"""
         return hashlib.md5(texto.encode()).hexdigest()[:16]
-    
+
     def mostrar_resumo(self):
         """Mostra resumo da memória"""
         stats = self.obter_estatisticas()
-        
+
         print("\n" + "="*70)
         print("🧠 MEMÓRIA DO AGENTE")
         print("="*70)
@@ -421,14 +696,17 @@ Data: {datetime.now().strftime("%Y-%m-%d %H:%M")}
         print(f"🎯 Aprendizados: {stats['total_aprendizados']}")
         print(f"🛠️  Ferramentas criadas: {stats['ferramentas_criadas']}")
         print(f"📅 Dias de uso: {stats.get('dias_uso', 0)}")
-        
-        if self.memoria["aprendizados"]:
+
+        with self._lock:
+            top = self._conn.execute(
+                "SELECT conteudo, uso_count FROM aprendizados ORDER BY uso_count DESC, rowid LIMIT 5"
+            ).fetchall()
+
+        if top:
             print(f"\n🏆 Top 5 Aprendizados Mais Usados:")
-            top = sorted(self.memoria["aprendizados"], 
-                        key=lambda x: x["uso_count"], reverse=True)[:5]
             for i, a in enumerate(top, 1):
                 print(f"  {i}. [{a['uso_count']}x] {a['conteudo'][:60]}...")
-        
+
         print("="*70 + "\n")
 
 
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark - Despacho de ferramentas (frio vs. quente)
+==========================================================
+
+Mede o custo por chamada de SistemaFerramentasCompleto.executar():
+
+- frio:   cache de compilação esvaziado antes de cada chamada (equivale ao
+          comportamento anterior: validação AST + safe_builtins + exec a cada vez)
+- quente: ferramenta já compilada no registro (caminho normal)
+
+A ferramenta medida é trivial, então o tempo é praticamente todo overhead
+de despacho. Roda em um diretório temporário para não tocar no workspace.
+
+Uso:
+    python scripts/benchmark_ferramentas.py
+    python scripts/benchmark_ferramentas.py --chamadas 20000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from luna_v3_FINAL_OTIMIZADA import SistemaFerramentasCompleto
+
+
+def medir(sistema, nome: str, parametros: dict, chamadas: int, frio: bool) -> float:
+    """Retorna µs por chamada."""
+    cache = sistema._ferramentas_compiladas
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        if frio:
+            cache.clear()
+            sistema._safe_builtins = None
+        sistema.executar(nome, parametros)
+    return (time.perf_counter() - inicio) / chamadas * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--chamadas", type=int, default=5000,
+                        help="Chamadas medidas por cenário")
+    args = parser.parse_args()
+
+    dir_original = os.getcwd()
+    dir_temp = tempfile.mkdtemp()
+    os.chdir(dir_temp)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sistema = SistemaFerramentasCompleto(usar_memoria=False)
+        sistema.telemetria = None  # Mede só o despacho, sem I/O de telemetria
+
+        cenarios = [
+            ("trivial", "def trivial(n):\n    return n + 1", {"n": 1}),
+            # Ferramenta real de tamanho médio (fonte maior → validação/exec mais caros)
+            ("ler_arquivo", None, {"caminho": "inexistente.txt"}),
+        ]
+
+        print("📊 SistemaFerramentasCompleto.executar() - µs por chamada")
+        print(f"   {args.chamadas} chamadas por cenário\n")
+        print(f"   {'Ferramenta':>14} | {'frio (µs)':>10} | {'quente (µs)':>11} | {'ganho':>7}")
+        print(f"   {'-' * 14}-+-{'-' * 10}-+-{'-' * 11}-+-{'-' * 7}")
+
+        for nome, codigo, parametros in cenarios:
+            if codigo:
+                sistema.adicionar_ferramenta(nome, codigo)
+            with contextlib.redirect_stdout(io.StringIO()):
+                sistema.executar(nome, parametros)  # Aquecimento
+                frio = medir(sistema, nome, parametros, args.chamadas, frio=True)
+                quente = medir(sistema, nome, parametros, args.chamadas, frio=False)
+            print(f"   {nome:>14} | {frio:>10.1f} | {quente:>11.1f} | {frio / quente:>6.1f}x")
+    finally:
+        os.chdir(dir_original)
+        shutil.rmtree(dir_temp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
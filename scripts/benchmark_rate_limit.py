@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark - Janela deslizante do RateLimitManager
+======================================================
+
+Mede o custo de registrar_uso() + calcular_uso_atual() com a janela de
+1 minuto já cheia, em volumes até acima do tier 4 (4.000 RPM).
+
+Compara a implementação atual (deques + totais acumulados) com a anterior
+(listas reconstruídas por list comprehension + sum a cada consulta).
+O custo por operação da versão com deques deve ficar estável conforme a
+janela cresce; o da versão com listas cresce linearmente.
+
+Uso:
+    python scripts/benchmark_rate_limit.py
+    python scripts/benchmark_rate_limit.py --operacoes 5000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from luna_v3_FINAL_OTIMIZADA import RateLimitManager
+
+
+class JanelaListasLegado:
+    """Implementação anterior (listas de datetime), mantida só para comparação."""
+
+    def __init__(self):
+        self.janela_tempo = timedelta(minutes=1)
+        self.historico_requisicoes = []
+        self.historico_tokens_input = []
+        self.historico_tokens_output = []
+
+    def registrar_uso(self, tokens_input, tokens_output):
+        agora = datetime.now()
+        self.historico_requisicoes.append(agora)
+        self.historico_tokens_input.append((agora, tokens_input))
+        self.historico_tokens_output.append((agora, tokens_output))
+        self._limpar_historico_antigo(agora)
+
+    def _limpar_historico_antigo(self, agora):
+        limite_tempo = agora - self.janela_tempo
+        self.historico_requisicoes = [t for t in self.historico_requisicoes if t > limite_tempo]
+        self.historico_tokens_input = [(t, n) for t, n in self.historico_tokens_input if t > limite_tempo]
+        self.historico_tokens_output = [(t, n) for t, n in self.historico_tokens_output if t > limite_tempo]
+
+    def calcular_uso_atual(self):
+        self._limpar_historico_antigo(datetime.now())
+        return (
+            len(self.historico_requisicoes),
+            sum(n for _, n in self.historico_tokens_input),
+            sum(n for _, n in self.historico_tokens_output),
+        )
+
+
+def medir(janela, tamanho: int, operacoes: int) -> float:
+    """Preenche a janela com `tamanho` entradas e retorna µs por operação."""
+    for _ in range(tamanho):
+        janela.registrar_uso(1000, 200)
+
+    inicio = time.perf_counter()
+    for _ in range(operacoes):
+        janela.registrar_uso(1000, 200)
+        janela.calcular_uso_atual()
+    return (time.perf_counter() - inicio) / operacoes * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--operacoes", type=int, default=2000,
+                        help="Operações medidas por tamanho de janela")
+    args = parser.parse_args()
+
+    tamanhos = [100, 1000, 4000, 16000]
+
+    print("📊 registrar_uso() + calcular_uso_atual() com janela cheia")
+    print(f"   {args.operacoes} operações por linha | tier 4 = 4.000 RPM\n")
+    print(f"   {'Entradas na janela':>20} | {'deque (µs/op)':>14} | {'listas (µs/op)':>15}")
+    print(f"   {'-' * 20}-+-{'-' * 14}-+-{'-' * 15}")
+
+    for tamanho in tamanhos:
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager = RateLimitManager(tier="tier4", modo="agressivo")
+        us_deque = medir(manager, tamanho, args.operacoes)
+        # A versão legada é lenta demais para muitas operações em janelas grandes
+        us_listas = medir(JanelaListasLegado(), tamanho, max(50, args.operacoes // 20))
+        print(f"   {tamanho:>20,} | {us_deque:>14.2f} | {us_listas:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
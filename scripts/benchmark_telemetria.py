@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark - Custo por evento de telemetria
+===============================================
+
+Compara o custo no caminho quente de TelemetriaManager.registrar_uso_ferramenta():
+
+- direto:    abrir/anexar/fechar o JSONL a cada evento (comportamento anterior)
+- em lote:   enfileirar para o EscritorTelemetria (thread dedicada)
+
+O tempo "em lote" é medido só na thread chamadora; o flush final é
+reportado à parte. Roda em um diretório temporário.
+
+Uso:
+    python scripts/benchmark_telemetria.py
+    python scripts/benchmark_telemetria.py --eventos 50000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetria_manager import TelemetriaManager, EventoFerramenta
+
+
+def medir_direto(caminho: str, eventos: int) -> float:
+    """Reproduz a gravação antiga (open/append/close por evento). Retorna µs/evento."""
+    inicio = time.perf_counter()
+    for i in range(eventos):
+        evento = EventoFerramenta(
+            timestamp=datetime.now().isoformat(), ferramenta="ler_arquivo",
+            parametros={"caminho": f"a{i}.txt"}, resultado_tipo="sucesso", tempo_execucao=0.01
+        )
+        with open(caminho, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(evento.to_dict(), ensure_ascii=False) + '\n')
+    return (time.perf_counter() - inicio) / eventos * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--eventos", type=int, default=20000, help="Eventos por cenário")
+    args = parser.parse_args()
+
+    dir_temp = tempfile.mkdtemp()
+    try:
+        direto = medir_direto(os.path.join(dir_temp, "direto.jsonl"), args.eventos)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            telemetria = TelemetriaManager(base_dir=dir_temp)
+        inicio = time.perf_counter()
+        for i in range(args.eventos):
+            telemetria.registrar_uso_ferramenta("ler_arquivo", {"caminho": f"a{i}.txt"}, "ok", 0.01)
+        lote = (time.perf_counter() - inicio) / args.eventos * 1e6
+
+        inicio = time.perf_counter()
+        telemetria.fechar()
+        drenagem = (time.perf_counter() - inicio) * 1000
+
+        print("📊 Telemetria - custo por evento na thread chamadora")
+        print(f"   {args.eventos} eventos por cenário\n")
+        print(f"   direto (open/append/close): {direto:8.1f} µs/evento")
+        print(f"   em lote (fila):             {lote:8.1f} µs/evento  ({direto / lote:.1f}x)")
+        print(f"   drenagem final:             {drenagem:8.1f} ms "
+              f"({telemetria.escritor.metricas['lotes_escritos']} lotes)")
+    finally:
+        shutil.rmtree(dir_temp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
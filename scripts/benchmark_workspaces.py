@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark - Operações de workspace (rglob vs. índice persistente)
+======================================================================
+
+Cria um workspace sintético em diretório temporário e mede:
+
+- rglob:       uma varredura completa rglob("*") + stat (o que cada método
+               fazia antes; analisar_workspace fazia várias)
+- índice frio: primeira chamada (indexa a árvore inteira)
+- índice:      chamadas seguintes (só stat dos diretórios)
+- conteúdo:    leitura de todos os arquivos de texto vs. busca pelo índice
+               de trigramas (literal e regex)
+
+Uso:
+    python scripts/benchmark_workspaces.py
+    python scripts/benchmark_workspaces.py --arquivos 50000 --diretorios 500
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gerenciador_workspaces import GerenciadorWorkspaces
+
+
+def cronometrar(funcao, repeticoes: int = 1) -> float:
+    """Retorna ms por chamada."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--arquivos", type=int, default=20000, help="Total de arquivos")
+    parser.add_argument("--diretorios", type=int, default=200, help="Total de diretórios")
+    parser.add_argument("--repeticoes", type=int, default=20, help="Repetições do caso quente")
+    args = parser.parse_args()
+
+    dir_temp = tempfile.mkdtemp()
+    try:
+        gerenciador = GerenciadorWorkspaces(base_dir=dir_temp)
+        gerenciador.criar_workspace("bench")
+        raiz = gerenciador.get_caminho_workspace("bench")
+
+        extensoes = [".py", ".md", ".json", ".txt", ".csv", ".tmp"]
+        for d in range(args.diretorios):
+            (raiz / f"pasta_{d:04d}").mkdir()
+        for i in range(args.arquivos):
+            pasta = raiz / f"pasta_{i % args.diretorios:04d}"
+            # 1 em 100 arquivos cita o identificador procurado
+            marcador = f"\ndef processar_pedido_{i}(dados):\n" if i % 100 == 0 else "\n"
+            (pasta / f"arquivo_{i}{extensoes[i % len(extensoes)]}").write_text(
+                f"linha {i} " * (i % 50) + marcador + "x" * (i % 500)
+            )
+
+        def varredura_rglob():
+            return [(f, f.stat().st_size) for f in Path(raiz).rglob("*") if f.is_file()]
+
+        def leitura_completa():
+            textos = (f.read_text(encoding="utf-8", errors="ignore") for f in Path(raiz).rglob("*")
+                      if f.suffix in (".py", ".md", ".json", ".txt", ".csv"))
+            return [t for t in textos if re.search(r"processar_pedido_\d+\(", t)]
+
+        print(f"📊 Workspace com {args.arquivos} arquivos em {args.diretorios} diretórios\n")
+        print(f"   {'Operação':>22} | {'ms/chamada':>10}")
+        print(f"   {'-' * 22}-+-{'-' * 10}")
+        print(f"   {'rglob + stat (1x)':>22} | {cronometrar(varredura_rglob, 3):>10.1f}")
+        print(f"   {'rglob + leitura (1x)':>22} | {cronometrar(leitura_completa, 3):>10.1f}")
+        print(f"   {'índice frio':>22} | {cronometrar(lambda: gerenciador.analisar_workspace('bench')):>10.1f}")
+
+        for nome, funcao in [
+            ("analisar_workspace", lambda: gerenciador.analisar_workspace("bench")),
+            ("sugerir_limpeza", lambda: gerenciador.sugerir_limpeza("bench")),
+            ("listar_workspaces", gerenciador.listar_workspaces),
+            ("obter_recentes", lambda: gerenciador.obter_arquivos_recentes("bench")),
+            ("busca conteúdo", lambda: gerenciador.buscar_arquivos("bench", "processar_pedido", True)),
+            ("busca regex", lambda: gerenciador.buscar_arquivos(
+                "bench", r"processar_pedido_\d+\(", True, regex=True)),
+        ]:
+            print(f"   {nome:>22} | {cronometrar(funcao, args.repeticoes):>10.1f}")
+
+        gerenciador.fechar()
+    finally:
+        shutil.rmtree(dir_temp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,646 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🐚 SESSÃO BASH PERSISTENTE - LUNA
+=================================
+
+Mantém um processo bash de longa duração por contexto de execução, em vez
+de um subprocess.run(shell=True) novo a cada comando. Diretório atual,
+variáveis exportadas e virtualenvs ativados continuam valendo entre as
+chamadas de bash_avancado da mesma tarefa.
+
+Protocolo:
+- Cada comando é enviado como `eval $'...' </dev/null` (um erro de sintaxe
+  no comando não desalinha a sessão e nada consome o stdin do bash)
+- Em seguida o bash imprime um marcador único no stdout (com o código de
+  saída e o $PWD) e outro no stderr; tudo antes deles é a saída do comando
+- Timeout: o grupo de processos inteiro é encerrado e a próxima chamada
+  abre uma sessão nova no último diretório conhecido
+- Sessão que morreu (ex.: `exit`) é reiniciada do mesmo jeito
+
+Sandbox:
+- Ambiente sem variáveis com cara de segredo (KEY, TOKEN, SECRET, ...)
+- bash sem profile/rc, sem paginação (PAGER=cat) e sem prompts do git
+- Processo em sessão própria (POSIX): o kill alcança os filhos
+
+Captura da saída (🆕 CapturaSaida):
+- Lida incrementalmente; em memória ficam só o começo (cabeça) e um buffer
+  circular com o final (cauda), onde costumam estar os erros
+- O que passa do buffer vai para um arquivo de log temporário; o texto
+  devolvido ao modelo traz o caminho dele no lugar das linhas omitidas
+- Na renderização: códigos ANSI removidos, barras de progresso (\r)
+  reduzidas ao último estado e linhas repetidas em sequência agrupadas
+"""
+
+import os
+import re
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# Variáveis de ambiente removidas da sessão (nome, sem diferenciar maiúsculas)
+PADRAO_VARIAVEIS_SECRETAS = re.compile(r"KEY|TOKEN|SECRET|PASSWORD|PASSWD|SENHA|CREDENTIAL", re.IGNORECASE)
+
+# Ajustes aplicados ao ambiente da sessão
+AMBIENTE_SESSAO = {
+    "PAGER": "cat",
+    "GIT_PAGER": "cat",
+    "GIT_TERMINAL_PROMPT": "0",
+    "TERM": "dumb",
+}
+
+TAMANHO_LEITURA = 65536
+
+# Captura: bytes mantidos em memória por stream e caracteres devolvidos ao modelo
+LIMITE_CABECA = 16 * 1024
+LIMITE_CAUDA = 64 * 1024
+LIMITE_CARACTERES = 3000
+
+# Logs completos das saídas grandes (mantidos os mais recentes)
+DIRETORIO_LOGS = Path(tempfile.gettempdir()) / "luna_bash"
+MAX_LOGS = 50
+
+# Sequências CSI/OSC e escapes de 2 bytes; demais caracteres de controle (exceto \t)
+PADRAO_ANSI = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[@-Z\\-_]")
+PADRAO_CONTROLE = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+
+
+def _linhas_limpas(dados: bytes, descartar_primeira: bool = False) -> List[Tuple[str, int]]:
+    """
+    Bytes → [(linha, repetições)] sem ANSI, com \\r resolvido e repetidas agrupadas.
+
+    Args:
+        dados: Trecho da saída
+        descartar_primeira: Ignora a primeira linha (incompleta no início da cauda)
+    """
+    texto = PADRAO_ANSI.sub("", dados.decode("utf-8", errors="replace"))
+    linhas = texto.split("\n")
+    if linhas and linhas[-1] == "":
+        linhas.pop()
+    if descartar_primeira and linhas:
+        linhas.pop(0)
+
+    agrupadas: List[Tuple[str, int]] = []
+    for linha in linhas:
+        # Barra de progresso: só o que foi escrito depois do último \r
+        linha = linha.rstrip("\r")
+        if "\r" in linha:
+            linha = linha.rsplit("\r", 1)[1]
+        linha = PADRAO_CONTROLE.sub("", linha)
+        if agrupadas and agrupadas[-1][0] == linha:
+            agrupadas[-1] = (linha, agrupadas[-1][1] + 1)
+        else:
+            agrupadas.append((linha, 1))
+    return agrupadas
+
+
+def _formatar_linha(linha: str, repeticoes: int) -> str:
+    return f"{linha}  [×{repeticoes}]" if repeticoes > 1 else linha
+
+
+def _tamanho_legivel(num_bytes: int) -> str:
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.1f} MB"
+    if num_bytes >= 1024:
+        return f"{num_bytes / 1024:.1f} KB"
+    return f"{num_bytes} B"
+
+
+class CapturaSaida:
+    """
+    Saída de um stream com memória limitada: cabeça + cauda circular + log em disco.
+
+    Uso:
+        captura = CapturaSaida()
+        captura.escrever(bloco)          # a cada leitura do pipe
+        captura.texto(limite=2000)       # começo, "[N linhas omitidas — log]", final
+    """
+
+    def __init__(self, limite_cabeca: int = LIMITE_CABECA, limite_cauda: int = LIMITE_CAUDA,
+                 diretorio_logs: Optional[Path] = None):
+        """
+        Args:
+            limite_cabeca: Bytes iniciais guardados
+            limite_cauda: Bytes finais guardados (o buffer chega ao dobro antes de podar)
+            diretorio_logs: Onde gravar o log completo (padrão: DIRETORIO_LOGS)
+        """
+        self.limite_cabeca = limite_cabeca
+        self.limite_cauda = limite_cauda
+        self.diretorio_logs = Path(diretorio_logs) if diretorio_logs else DIRETORIO_LOGS
+        self.cabeca = bytearray()
+        self.cauda = bytearray()
+        self.total = 0       # Bytes recebidos
+        self.quebras = 0     # b"\n" recebidos
+        self.arquivo: Optional[str] = None
+        self._log = None
+
+    @property
+    def descartados(self) -> int:
+        """Bytes do meio que não estão mais em memória (só no log)."""
+        return self.total - len(self.cabeca) - len(self.cauda)
+
+    @property
+    def linhas(self) -> int:
+        if not self.total:
+            return 0
+        ultimo = self.cauda[-1:] or self.cabeca[-1:]
+        return self.quebras + (0 if ultimo == b"\n" else 1)
+
+    def escrever(self, bloco: bytes) -> None:
+        """Acrescenta um bloco lido do pipe."""
+        self.total += len(bloco)
+        self.quebras += bloco.count(b"\n")
+        if self._log is not None:
+            self._log.write(bloco)
+
+        espaco = self.limite_cabeca - len(self.cabeca)
+        if espaco > 0:
+            self.cabeca += bloco[:espaco]
+            bloco = bloco[espaco:]
+        self.cauda += bloco
+
+        if len(self.cauda) > 2 * self.limite_cauda:
+            self._abrir_log()  # Antes de descartar: o log recebe tudo até aqui
+            del self.cauda[:len(self.cauda) - self.limite_cauda]
+
+    def ultimos(self, n: int) -> bytes:
+        """Últimos `n` bytes em memória (para achar os marcadores de fim)."""
+        if len(self.cauda) >= n or self.descartados:
+            return bytes(self.cauda[-n:])
+        return bytes(self.cabeca[-(n - len(self.cauda)):] + self.cauda)
+
+    def descartar_final(self, n: int) -> None:
+        """Remove os últimos `n` bytes (o marcador de fim do comando)."""
+        if n <= 0:
+            return
+        da_cauda = min(n, len(self.cauda))
+        removidos = bytes(self.cauda[len(self.cauda) - da_cauda:])
+        del self.cauda[len(self.cauda) - da_cauda:]
+        if n > da_cauda:
+            removidos = bytes(self.cabeca[len(self.cabeca) - (n - da_cauda):]) + removidos
+            del self.cabeca[len(self.cabeca) - (n - da_cauda):]
+        self.total -= n
+        self.quebras -= removidos.count(b"\n")
+        if self._log is not None:
+            self._log.flush()
+            self._log.truncate(self.total)
+
+    def _abrir_log(self) -> None:
+        """Cria o log completo (com tudo que ainda está em memória)."""
+        if self._log is not None:
+            return
+        self.diretorio_logs.mkdir(parents=True, exist_ok=True)
+        logs = sorted(self.diretorio_logs.glob("saida_*.log"), key=lambda c: c.stat().st_mtime)
+        for antigo in logs[:max(0, len(logs) - MAX_LOGS + 1)]:
+            try:
+                antigo.unlink()
+            except OSError:
+                pass
+
+        descritor, self.arquivo = tempfile.mkstemp(prefix="saida_", suffix=".log", dir=self.diretorio_logs)
+        self._log = os.fdopen(descritor, "wb")
+        self._log.write(bytes(self.cabeca))
+        self._log.write(bytes(self.cauda))
+
+    def fechar(self) -> None:
+        if self._log is not None:
+            self._log.close()
+
+    def texto(self, limite: int = LIMITE_CARACTERES) -> str:
+        """
+        Saída pronta para o modelo, com no máximo ~`limite` caracteres.
+
+        Cabe inteira → devolvida (limpa). Senão: ~1/3 do limite para o
+        começo, o resto para o final e, no meio, quantas linhas foram
+        omitidas e o caminho do log completo.
+        """
+        if not self.descartados:
+            linhas = _linhas_limpas(bytes(self.cabeca + self.cauda))
+            completo = "".join(_formatar_linha(l, n) + "\n" for l, n in linhas)
+            if self.total and self.linhas > self.quebras:
+                completo = completo[:-1]  # Sem quebra final, como a saída original
+            if len(completo) <= limite:
+                return completo
+            cabeca, cauda = linhas, linhas
+        else:
+            cabeca = _linhas_limpas(bytes(self.cabeca))
+            if len(cabeca) > 1 and not self.cabeca.endswith(b"\n"):
+                cabeca.pop()  # Linha cortada no limite da cabeça
+            cauda = _linhas_limpas(bytes(self.cauda), descartar_primeira=True)
+
+        self._abrir_log()
+        self._log.flush()
+        aviso_modelo = "… [{} linhas omitidas de {} — saída completa em {}] …\n"
+        orcamento = max(0, limite - 1 - len(aviso_modelo.format(self.linhas, _tamanho_legivel(self.total), self.arquivo)))
+
+        inicio, usadas_inicio, custo = [], 0, 0
+        for linha, repeticoes in cabeca:
+            formatada = _formatar_linha(linha, repeticoes)
+            if custo + len(formatada) + 1 > orcamento // 3:
+                if not inicio:
+                    inicio.append(formatada[:orcamento // 3] + "…")
+                break
+            inicio.append(formatada)
+            usadas_inicio += repeticoes
+            custo += len(formatada) + 1
+
+        # No caso contíguo, o final não pode repetir linhas já mostradas
+        minimo = len(inicio) if cauda is cabeca else 0
+        fim, usadas_fim, restante = [], 0, orcamento - sum(len(l) + 1 for l in inicio)
+        for indice in range(len(cauda) - 1, minimo - 1, -1):
+            linha, repeticoes = cauda[indice]
+            formatada = _formatar_linha(linha, repeticoes)
+            if len(formatada) + 1 > restante:
+                if not fim:
+                    fim.append("…" + formatada[-max(0, restante - 2):])
+                break
+            fim.append(formatada)
+            usadas_fim += repeticoes
+            restante -= len(formatada) + 1
+        fim.reverse()
+
+        omitidas = max(0, self.linhas - usadas_inicio - usadas_fim)
+        aviso = aviso_modelo.format(omitidas, _tamanho_legivel(self.total), self.arquivo)
+        quebra_final = "\n" if self.linhas == self.quebras else ""
+        return "".join(l + "\n" for l in inicio) + aviso + "\n".join(fim) + quebra_final
+
+
+def _renderizar(saida: CapturaSaida, erros: CapturaSaida, limite: int) -> Tuple[str, str]:
+    """Divide `limite` entre stdout (prioridade, 2/3) e stderr; sobra de um vai para o outro."""
+    texto_saida = saida.texto(limite * 2 // 3)
+    texto_erros = erros.texto(limite - len(texto_saida))
+    if len(texto_saida) + len(texto_erros) < limite:
+        texto_saida = saida.texto(limite - len(texto_erros))
+    saida.fechar()
+    erros.fechar()
+    return texto_saida, texto_erros
+
+
+def _citar_ansi_c(texto: str) -> str:
+    """Texto como literal $'...' do bash (sobrevive a aspas e quebras de linha)."""
+    partes = []
+    for caractere in texto:
+        if caractere == "\\":
+            partes.append("\\\\")
+        elif caractere == "'":
+            partes.append("\\'")
+        elif caractere == "\n":
+            partes.append("\\n")
+        elif ord(caractere) < 32 or ord(caractere) == 127:
+            partes.append(f"\\x{ord(caractere):02x}")
+        else:
+            partes.append(caractere)
+    return "$'" + "".join(partes) + "'"
+
+
+def ambiente_sandbox(base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Cópia do ambiente sem segredos e com os ajustes da sessão."""
+    ambiente = {
+        nome: valor for nome, valor in (base if base is not None else os.environ).items()
+        if not PADRAO_VARIAVEIS_SECRETAS.search(nome)
+    }
+    ambiente.update(AMBIENTE_SESSAO)
+    ambiente.pop("PS1", None)
+    ambiente.pop("PROMPT_COMMAND", None)
+    return ambiente
+
+
+class SessaoBash:
+    """
+    Um processo bash persistente com limites de comando por marcador.
+
+    Uso:
+        sessao = SessaoBash(cwd="/projeto")
+        sessao.executar("cd src && export MODO=teste")
+        resultado = sessao.executar("pwd; echo $MODO", timeout=10)
+        resultado.stdout  # "/projeto/src\\nteste\\n"
+
+    stdout/stderr do resultado já vêm compactados (CapturaSaida.texto), com
+    no máximo ~`limite_caracteres` somados.
+    """
+
+    # Janela (bytes finais) onde os marcadores de fim são procurados
+    JANELA_MARCADOR = 8192
+
+    def __init__(self, cwd: Optional[str] = None, executavel: Optional[str] = None,
+                 ambiente: Optional[Dict[str, str]] = None,
+                 limite_caracteres: int = LIMITE_CARACTERES):
+        """
+        Args:
+            cwd: Diretório inicial (padrão: diretório atual do processo)
+            executavel: Caminho do bash (padrão: bash do PATH)
+            ambiente: Ambiente base, filtrado por ambiente_sandbox()
+            limite_caracteres: Tamanho máximo de stdout + stderr devolvidos
+        """
+        self.executavel = executavel or shutil.which("bash")
+        self.cwd = os.path.abspath(cwd or os.getcwd())
+        self.ambiente = ambiente_sandbox(ambiente)
+        self.limite_caracteres = limite_caracteres
+        self.reinicios = 0
+
+        self._processo: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()           # Um comando por vez
+        self._condicao = threading.Condition()  # Leitores → executar()
+        self._saida = CapturaSaida()
+        self._erros = CapturaSaida()
+        self._fechados = 0                      # Pipes que chegaram ao EOF
+
+    @property
+    def ativa(self) -> bool:
+        return self._processo is not None and self._processo.poll() is None
+
+    def _iniciar(self) -> None:
+        """Abre o processo bash (no último diretório conhecido)."""
+        if not self.executavel:
+            raise FileNotFoundError("bash não encontrado no PATH")
+        if not os.path.isdir(self.cwd):
+            self.cwd = os.getcwd()
+
+        self._processo = subprocess.Popen(
+            [self.executavel, "--noprofile", "--norc"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=self.cwd, env=self.ambiente,
+            start_new_session=(os.name != "nt")
+        )
+        with self._condicao:
+            self._saida = CapturaSaida()
+            self._erros = CapturaSaida()
+            self._fechados = 0
+        for pipe, destino in ((self._processo.stdout, "_saida"), (self._processo.stderr, "_erros")):
+            threading.Thread(
+                target=self._ler, args=(self._processo, pipe, destino),
+                name="luna-bash-leitor", daemon=True
+            ).start()
+
+        # Sem core dumps nem histórico; falha aqui não impede a sessão
+        self._processo.stdin.write(b"ulimit -c 0 2>/dev/null; unset HISTFILE\n")
+        self._processo.stdin.flush()
+
+    def _ler(self, processo: subprocess.Popen, pipe, destino: str) -> None:
+        """Thread leitora: acumula o pipe no buffer e acorda executar()."""
+        while True:
+            try:
+                bloco = os.read(pipe.fileno(), TAMANHO_LEITURA)
+            except (OSError, ValueError):
+                bloco = b""
+            with self._condicao:
+                if processo is not self._processo:
+                    return  # Sessão já substituída
+                if not bloco:
+                    self._fechados += 1
+                    self._condicao.notify_all()
+                    return
+                getattr(self, destino).escrever(bloco)
+                self._condicao.notify_all()
+
+    def executar(self, comando: str, timeout: float = 60) -> subprocess.CompletedProcess:
+        """
+        Executa um comando na sessão.
+
+        Args:
+            comando: Linha(s) de shell
+            timeout: Segundos até encerrar o comando (e a sessão)
+
+        Returns:
+            CompletedProcess(args, returncode, stdout, stderr), como subprocess.run
+
+        Raises:
+            subprocess.TimeoutExpired: Comando passou do timeout (sessão reiniciada
+                na próxima chamada, no mesmo diretório)
+            FileNotFoundError: bash indisponível
+        """
+        with self._lock:
+            if not self.ativa:
+                if self._processo is not None:
+                    self.reinicios += 1
+                self._iniciar()
+
+            marcador = f"__LUNA_FIM_{uuid.uuid4().hex}__"
+            with self._condicao:
+                self._saida = CapturaSaida()
+                self._erros = CapturaSaida()
+
+            roteiro = (
+                f"eval {_citar_ansi_c(comando)} </dev/null\n"
+                f"printf '\\n{marcador} %d %s\\n' \"$?\" \"$PWD\"\n"
+                f"printf '\\n{marcador}\\n' >&2\n"
+            )
+            try:
+                self._processo.stdin.write(roteiro.encode("utf-8"))
+                self._processo.stdin.flush()
+            except (BrokenPipeError, OSError):
+                pass  # Processo morreu; tratado abaixo como sessão encerrada
+
+            fim_saida = f"\n{marcador} ".encode()
+            fim_erros = f"\n{marcador}\n".encode()
+            limite = time.monotonic() + timeout
+
+            with self._condicao:
+                while True:
+                    # Só o final da saída é examinado: custo constante por bloco lido
+                    final = self._saida.ultimos(self.JANELA_MARCADOR)
+                    posicao = final.find(fim_saida)
+                    fim_linha = final.find(b"\n", posicao + len(fim_saida)) if posicao != -1 else -1
+                    final_erros = self._erros.ultimos(self.JANELA_MARCADOR)
+                    posicao_erros = final_erros.find(fim_erros)
+                    if fim_linha != -1 and posicao_erros != -1:
+                        codigo, _, pwd = final[posicao + len(fim_saida):fim_linha].decode(
+                            "utf-8", errors="replace"
+                        ).partition(" ")
+                        if pwd:
+                            self.cwd = pwd
+                        self._saida.descartar_final(len(final) - posicao)
+                        self._erros.descartar_final(len(final_erros) - posicao_erros)
+                        return self._resultado(comando, int(codigo))
+                    if self._fechados == 2:
+                        return self._resultado(comando, self._processo.wait(), encerrada=True)
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._condicao.wait(restante)
+
+            self._matar()
+            with self._condicao:
+                saida, erros = _renderizar(self._saida, self._erros, self.limite_caracteres)
+            raise subprocess.TimeoutExpired(comando, timeout, output=saida, stderr=erros)
+
+    def _resultado(self, comando: str, codigo: int, encerrada: bool = False) -> subprocess.CompletedProcess:
+        """CompletedProcess com as saídas compactadas (chamado com _condicao)."""
+        saida, erros = _renderizar(self._saida, self._erros, self.limite_caracteres)
+        if encerrada:
+            # O bash saiu no meio do comando (ex.: `exit 3`)
+            erros += f"\n[sessão bash encerrada com código {codigo}; a próxima chamada abre uma nova]\n"
+        return subprocess.CompletedProcess(comando, codigo, saida, erros)
+
+    def _matar(self) -> None:
+        """Encerra o bash e todos os processos filhos dele."""
+        processo = self._processo
+        if processo is None or processo.poll() is not None:
+            return
+        try:
+            if os.name != "nt":
+                os.killpg(processo.pid, signal.SIGKILL)
+            else:
+                processo.kill()
+        except (ProcessLookupError, PermissionError, OSError):
+            processo.kill()
+        try:
+            processo.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+    def encerrar(self) -> None:
+        """Fecha a sessão (pode ser chamado de outra thread)."""
+        processo = self._processo
+        if processo is None:
+            return
+        self._matar()
+        for pipe in (processo.stdin, processo.stdout, processo.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+
+def executar_avulso(comando: str, timeout: float = 60, cwd: Optional[str] = None,
+                    limite_caracteres: int = LIMITE_CARACTERES) -> subprocess.CompletedProcess:
+    """
+    Um comando em shell novo (sem sessão), com a mesma captura incremental.
+
+    Usado quando a sessão persistente está desligada ou não há bash
+    (ex.: cmd.exe no Windows). Ambiente herdado, como no subprocess.run.
+
+    Raises:
+        subprocess.TimeoutExpired: Com a saída parcial já compactada
+    """
+    processo = subprocess.Popen(
+        comando, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        cwd=cwd or os.getcwd(), start_new_session=(os.name != "nt")
+    )
+    capturas = (CapturaSaida(), CapturaSaida())
+
+    def ler(pipe, captura):
+        for bloco in iter(lambda: pipe.read1(TAMANHO_LEITURA), b""):
+            captura.escrever(bloco)
+
+    leitores = [threading.Thread(target=ler, args=(pipe, captura), daemon=True)
+                for pipe, captura in zip((processo.stdout, processo.stderr), capturas)]
+    for leitor in leitores:
+        leitor.start()
+
+    try:
+        codigo = processo.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            if os.name != "nt":
+                os.killpg(processo.pid, signal.SIGKILL)
+            else:
+                processo.kill()
+        except OSError:
+            processo.kill()
+        processo.wait()
+        codigo = None
+
+    for leitor in leitores:
+        leitor.join(timeout=5)
+    saida, erros = _renderizar(*capturas, limite_caracteres)
+    if codigo is None:
+        raise subprocess.TimeoutExpired(comando, timeout, output=saida, stderr=erros)
+    return subprocess.CompletedProcess(comando, codigo, saida, erros)
+
+
+class GerenciadorSessoesBash:
+    """
+    Uma SessaoBash por contexto de execução (ex.: cada subtarefa de uma onda
+    paralela tem o próprio diretório e variáveis).
+
+    A sessão de um contexto é encerrada quando o objeto de contexto é
+    coletado; acima de `max_sessoes`, a usada há mais tempo é encerrada.
+    Sem bash (ou com persistente=False), cada comando roda em
+    executar_avulso(), com a mesma captura de saída.
+
+    Uso:
+        sessoes = GerenciadorSessoesBash(contexto_atual=lambda: _CONTEXTO.get())
+        resultado = sessoes.executar("ls -la", timeout=30)
+    """
+
+    def __init__(self, contexto_atual: Callable[[], Any] = lambda: None, max_sessoes: int = 8,
+                 cwd_inicial: Optional[str] = None, persistente: bool = True,
+                 limite_caracteres: int = LIMITE_CARACTERES):
+        """
+        Args:
+            contexto_atual: Devolve o objeto do contexto atual (None = sessão padrão)
+            max_sessoes: Máximo de sessões abertas ao mesmo tempo
+            cwd_inicial: Diretório das sessões novas (padrão: diretório atual)
+            persistente: False = um shell novo por comando
+            limite_caracteres: Tamanho máximo de stdout + stderr devolvidos
+        """
+        self.contexto_atual = contexto_atual
+        self.max_sessoes = max(1, max_sessoes)
+        self.cwd_inicial = cwd_inicial
+        self.persistente = persistente
+        self.limite_caracteres = limite_caracteres
+        self.executavel = shutil.which("bash")
+        self._sessoes: "OrderedDict[Optional[int], SessaoBash]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def disponivel(self) -> bool:
+        """Sessões persistentes em uso (bash encontrado e não desligadas)."""
+        return self.persistente and self.executavel is not None
+
+    def sessao(self) -> SessaoBash:
+        """Sessão do contexto atual (criada na primeira chamada)."""
+        contexto = self.contexto_atual()
+        chave = id(contexto) if contexto is not None else None
+        excedentes = []
+
+        with self._lock:
+            sessao = self._sessoes.get(chave)
+            if sessao is None:
+                sessao = SessaoBash(cwd=self.cwd_inicial, executavel=self.executavel,
+                                    limite_caracteres=self.limite_caracteres)
+                self._sessoes[chave] = sessao
+                if contexto is not None:
+                    weakref.finalize(contexto, self.encerrar, chave)
+                while len(self._sessoes) > self.max_sessoes:
+                    excedentes.append(self._sessoes.popitem(last=False)[1])
+            else:
+                self._sessoes.move_to_end(chave)
+
+        for excedente in excedentes:
+            excedente.encerrar()
+        return sessao
+
+    def executar(self, comando: str, timeout: float = 60) -> subprocess.CompletedProcess:
+        """Executa `comando` na sessão do contexto atual (ver SessaoBash.executar)."""
+        if not self.disponivel:
+            return executar_avulso(comando, timeout=timeout, limite_caracteres=self.limite_caracteres)
+        return self.sessao().executar(comando, timeout=timeout)
+
+    def encerrar(self, chave: Optional[int] = None) -> None:
+        """Fecha a sessão de um contexto (chave = id do contexto)."""
+        with self._lock:
+            sessao = self._sessoes.pop(chave, None)
+        if sessao is not None:
+            sessao.encerrar()
+
+    def encerrar_todas(self) -> None:
+        """Fecha todas as sessões abertas."""
+        with self._lock:
+            sessoes = list(self._sessoes.values())
+            self._sessoes.clear()
+        for sessao in sessoes:
+            sessao.encerrar()
+
+    def __len__(self) -> int:
+        return len(self._sessoes)
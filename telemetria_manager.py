@@ -14,6 +14,7 @@ Funcionalidades:
 - Sugestões de otimização baseadas em dados
 - Detecção de regressões de performance
 - Dashboard de métricas em tempo real
+- 🆕 Escrita em lote por thread dedicada (fila limitada, flush periódico)
 
 Criado: 2025-10-20
 Parte do sistema de melhorias Luna V3
@@ -22,11 +23,16 @@ Parte do sistema de melhorias Luna V3
 import json
 import time
 import os
+import math
+import gzip
+import zlib
+import atexit
+import threading
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
-from collections import defaultdict, Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple, Deque
+from dataclasses import dataclass, asdict, field
+from collections import defaultdict, Counter, deque
 import statistics
 
 # ============================================================================
@@ -54,7 +60,8 @@ class EventoFerramenta:
     erro_msg: Optional[str] = None
 
     def to_dict(self) -> Dict:
-        return asdict(self)
+        # Campos planos: cópia rasa evita o deepcopy de asdict() no caminho quente
+        return dict(self.__dict__)
 
 
 @dataclass
@@ -70,7 +77,8 @@ class EventoAPI:
     modelo: str
 
     def to_dict(self) -> Dict:
-        return asdict(self)
+        # Campos planos: cópia rasa evita o deepcopy de asdict() no caminho quente
+        return dict(self.__dict__)
 
 
 @dataclass
@@ -87,6 +95,7 @@ class EventoSessao:
     taxa_cache_hit: float
     economia_tokens: int
     erros_count: int
+    concorrencia: Optional[Dict[str, Any]] = None  # 🆕 Estado do controlador AIMD no fim da sessão
 
     def to_dict(self) -> Dict:
         return asdict(self)
@@ -112,6 +121,933 @@ class Sugestao:
     codigo_exemplo: Optional[str] = None
 
 
+# ============================================================================
+# AGREGADOS INCREMENTAIS - Sketches de quantis mescláveis (🆕)
+# ============================================================================
+
+class SketchQuantis:
+    """
+    Sketch de quantis mesclável com erro relativo limitado (estilo DDSketch).
+
+    Valores positivos caem em baldes logarítmicos de razão gamma, então
+    qualquer quantil sai com erro relativo <= `precisao` usando memória
+    proporcional à faixa de valores (não ao número de eventos). Dois
+    sketches de mesma precisão se mesclam somando contagens, o que permite
+    combinar agregados diários em janelas de N dias sem reler eventos.
+    """
+
+    MAX_BALDES = 2048
+    VALOR_MINIMO = 1e-9  # Abaixo disso (inclui zero e negativos) conta como zero
+
+    def __init__(self, precisao: float = 0.01):
+        self.precisao = precisao
+        self.gamma = (1 + precisao) / (1 - precisao)
+        self._log_gamma = math.log(self.gamma)
+        self.baldes: Dict[int, int] = {}
+        self.zeros = 0
+        self.contagem = 0
+        self.soma = 0.0
+        self.minimo: Optional[float] = None
+        self.maximo: Optional[float] = None
+
+    def adicionar(self, valor: float) -> None:
+        self.contagem += 1
+        self.soma += valor
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+
+        if valor <= self.VALOR_MINIMO:
+            self.zeros += 1
+            return
+        indice = math.ceil(math.log(valor) / self._log_gamma)
+        self.baldes[indice] = self.baldes.get(indice, 0) + 1
+        if len(self.baldes) > self.MAX_BALDES:
+            self._colapsar()
+
+    def _colapsar(self) -> None:
+        """Junta os baldes mais baixos (preserva a precisão da cauda alta)"""
+        chaves = sorted(self.baldes)
+        excesso = len(chaves) - self.MAX_BALDES
+        destino = chaves[excesso]
+        for chave in chaves[:excesso]:
+            self.baldes[destino] += self.baldes.pop(chave)
+
+    def mesclar(self, outro: 'SketchQuantis') -> 'SketchQuantis':
+        if abs(outro.precisao - self.precisao) > 1e-12:
+            raise ValueError(f"Precisões diferentes: {self.precisao} e {outro.precisao}")
+        for chave, n in outro.baldes.items():
+            self.baldes[chave] = self.baldes.get(chave, 0) + n
+        if len(self.baldes) > self.MAX_BALDES:
+            self._colapsar()
+        self.zeros += outro.zeros
+        self.contagem += outro.contagem
+        self.soma += outro.soma
+        for valor in (outro.minimo, outro.maximo):
+            if valor is not None:
+                self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+                self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+        return self
+
+    def quantil(self, q: float) -> Optional[float]:
+        """Valor aproximado do quantil q (0..1); None se vazio"""
+        if self.contagem == 0:
+            return None
+        posicao = q * (self.contagem - 1)
+        if posicao < self.zeros:
+            return 0.0 if self.minimo > 0 else self.minimo
+
+        acumulado = self.zeros
+        for chave in sorted(self.baldes):
+            acumulado += self.baldes[chave]
+            if acumulado > posicao:
+                valor = 2 * self.gamma ** chave / (self.gamma + 1)
+                return min(max(valor, self.minimo), self.maximo)
+        return self.maximo
+
+    @property
+    def media(self) -> Optional[float]:
+        return self.soma / self.contagem if self.contagem else None
+
+    def to_dict(self) -> Dict:
+        return {
+            'precisao': self.precisao,
+            'baldes': {str(k): v for k, v in self.baldes.items()},
+            'zeros': self.zeros,
+            'contagem': self.contagem,
+            'soma': self.soma,
+            'minimo': self.minimo,
+            'maximo': self.maximo,
+        }
+
+    @classmethod
+    def from_dict(cls, dados: Dict) -> 'SketchQuantis':
+        sketch = cls(dados.get('precisao', 0.01))
+        sketch.baldes = {int(k): v for k, v in dados.get('baldes', {}).items()}
+        sketch.zeros = dados.get('zeros', 0)
+        sketch.contagem = dados.get('contagem', 0)
+        sketch.soma = dados.get('soma', 0.0)
+        sketch.minimo = dados.get('minimo')
+        sketch.maximo = dados.get('maximo')
+        return sketch
+
+
+@dataclass
+class Agregado:
+    """Contadores e sketches de uma ferramenta (ou de um modelo, para a API)"""
+    eventos: int = 0
+    erros: int = 0
+    cache_hits: int = 0
+    tempo: SketchQuantis = field(default_factory=SketchQuantis)  # Execução ou latência (s)
+    tokens: SketchQuantis = field(default_factory=SketchQuantis)
+    por_hora: Dict[str, int] = field(default_factory=dict)
+
+    def observar(self, tipo: str, evento: Dict[str, Any]) -> None:
+        self.eventos += 1
+        if tipo == 'api':
+            self.tempo.adicionar(float(evento.get('tempo_latencia') or 0))
+            self.tokens.adicionar(float((evento.get('tokens_input') or 0) + (evento.get('tokens_output') or 0)))
+            if evento.get('cache_hit'):
+                self.cache_hits += 1
+        else:
+            self.tempo.adicionar(float(evento.get('tempo_execucao') or 0))
+            self.tokens.adicionar(float(evento.get('tokens_estimados') or 0))
+            if evento.get('resultado_tipo') == 'erro':
+                self.erros += 1
+
+        hora = str(evento.get('timestamp', ''))[11:13]
+        if hora.isdigit():
+            self.por_hora[hora] = self.por_hora.get(hora, 0) + 1
+
+    def mesclar(self, outro: 'Agregado') -> 'Agregado':
+        self.eventos += outro.eventos
+        self.erros += outro.erros
+        self.cache_hits += outro.cache_hits
+        self.tempo.mesclar(outro.tempo)
+        self.tokens.mesclar(outro.tokens)
+        for hora, n in outro.por_hora.items():
+            self.por_hora[hora] = self.por_hora.get(hora, 0) + n
+        return self
+
+    def resumo(self) -> Dict[str, Any]:
+        """Métricas prontas para relatório (tempos em segundos)"""
+        def arredondar(valor):
+            return round(valor, 3) if valor is not None else None
+
+        return {
+            'eventos': self.eventos,
+            'erros': self.erros,
+            'taxa_erro': round(self.erros / self.eventos * 100, 1) if self.eventos else 0.0,
+            'taxa_cache_hit': round(self.cache_hits / self.eventos * 100, 1) if self.eventos else 0.0,
+            'tempo_medio': arredondar(self.tempo.media),
+            'tempo_p50': arredondar(self.tempo.quantil(0.50)),
+            'tempo_p95': arredondar(self.tempo.quantil(0.95)),
+            'tempo_p99': arredondar(self.tempo.quantil(0.99)),
+            'tempo_max': arredondar(self.tempo.maximo),
+            'tokens_p50': arredondar(self.tokens.quantil(0.50)),
+            'tokens_p95': arredondar(self.tokens.quantil(0.95)),
+            'tokens_p99': arredondar(self.tokens.quantil(0.99)),
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'eventos': self.eventos,
+            'erros': self.erros,
+            'cache_hits': self.cache_hits,
+            'tempo': self.tempo.to_dict(),
+            'tokens': self.tokens.to_dict(),
+            'por_hora': self.por_hora,
+        }
+
+    @classmethod
+    def from_dict(cls, dados: Dict) -> 'Agregado':
+        return cls(
+            eventos=dados.get('eventos', 0),
+            erros=dados.get('erros', 0),
+            cache_hits=dados.get('cache_hits', 0),
+            tempo=SketchQuantis.from_dict(dados.get('tempo', {})),
+            tokens=SketchQuantis.from_dict(dados.get('tokens', {})),
+            por_hora=dict(dados.get('por_hora', {})),
+        )
+
+
+class AgregadosTelemetria:
+    """
+    Agregados diários por ferramenta e por modelo (tipo de chamada da API).
+
+    Atualizados pela thread do escritor a cada lote gravado e persistidos
+    em luna_telemetria/agregados-AAAA-MM-DD.json - só o arquivo do dia do
+    lote é reescrito. Relatórios mesclam os últimos N dias (custo
+    proporcional a N e ao número de ferramentas, não ao de eventos).
+    """
+
+    VERSAO = 1
+    TIPOS = ('ferramentas', 'api')
+
+    def __init__(self, diretorio: Path):
+        self.diretorio = Path(diretorio)
+        self._lock = threading.Lock()
+        self._dias: Dict[str, Dict[str, Any]] = {}  # Dias em uso pelo escritor (em memória)
+        self._cache_leitura: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    def caminho_dia(self, dia: str) -> Path:
+        return self.diretorio / f"agregados-{dia}.json"
+
+    # ----- Escrita (thread do EscritorTelemetria) -----
+
+    @staticmethod
+    def chave_evento(tipo: str, evento: Dict[str, Any]) -> str:
+        if tipo == 'api':
+            return str(evento.get('modelo') or 'desconhecido')
+        return str(evento.get('ferramenta') or 'desconhecida')
+
+    def _dia_em_memoria(self, dia: str) -> Dict[str, Any]:
+        dados = self._dias.get(dia)
+        if dados is None:
+            dados = self._ler_dia(dia)
+            # O escritor só avança no tempo: basta manter o dia atual e o anterior
+            if len(self._dias) >= 2:
+                self._dias.pop(min(self._dias))
+            self._dias[dia] = dados
+        return dados
+
+    def eventos(self, tipo: str, dia: str) -> int:
+        with self._lock:
+            return self._dia_em_memoria(dia)[tipo]['eventos']
+
+    def observar(self, tipo: str, dia: str, eventos: List[Dict[str, Any]]) -> None:
+        """Incorpora um lote gravado e persiste o arquivo do dia"""
+        with self._lock:
+            dados = self._dia_em_memoria(dia)
+            chaves = dados[tipo]['chaves']
+            for evento in eventos:
+                chave = self.chave_evento(tipo, evento)
+                agregado = chaves.get(chave)
+                if agregado is None:
+                    agregado = chaves[chave] = Agregado()
+                agregado.observar(tipo, evento)
+            dados[tipo]['eventos'] += len(eventos)
+            self._salvar_dia(dia, dados)
+
+    def reconstruir(self, tipo: str, dia: str, eventos: List[Dict[str, Any]]) -> None:
+        """Refaz o agregado de um tipo/dia a partir dos eventos do segmento"""
+        with self._lock:
+            self._dia_em_memoria(dia)[tipo] = {'eventos': 0, 'chaves': {}}
+        self.observar(tipo, dia, eventos)
+
+    def _salvar_dia(self, dia: str, dados: Dict[str, Any]) -> None:
+        serializado = {'versao': self.VERSAO, 'dia': dia}
+        for tipo in self.TIPOS:
+            serializado[tipo] = {
+                'eventos': dados[tipo]['eventos'],
+                'chaves': {k: a.to_dict() for k, a in dados[tipo]['chaves'].items()},
+            }
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        caminho = self.caminho_dia(dia)
+        temporario = caminho.with_name(caminho.name + '.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(serializado, f, separators=(',', ':'))
+        os.replace(temporario, caminho)
+
+    # ----- Leitura -----
+
+    def _ler_dia(self, dia: str) -> Dict[str, Any]:
+        dados = {tipo: {'eventos': 0, 'chaves': {}} for tipo in self.TIPOS}
+        try:
+            with open(self.caminho_dia(dia), 'r', encoding='utf-8') as f:
+                bruto = json.load(f)
+        except (OSError, ValueError):
+            return dados
+        if bruto.get('versao') != self.VERSAO:
+            return dados
+        for tipo in self.TIPOS:
+            secao = bruto.get(tipo, {})
+            dados[tipo] = {
+                'eventos': secao.get('eventos', 0),
+                'chaves': {k: Agregado.from_dict(v) for k, v in secao.get('chaves', {}).items()},
+            }
+        return dados
+
+    def existe_dia(self, dia: str) -> bool:
+        return self.caminho_dia(dia).exists()
+
+    def carregar_dia(self, dia: str) -> Dict[str, Any]:
+        """Agregados de um dia (cópia; dias antigos ficam em cache pelo mtime)"""
+        with self._lock:
+            if dia in self._dias:
+                # Cópia profunda: o escritor continua alterando os originais
+                return {t: {'eventos': d['eventos'],
+                            'chaves': {k: Agregado.from_dict(a.to_dict()) for k, a in d['chaves'].items()}}
+                        for t, d in self._dias[dia].items()}
+        caminho = self.caminho_dia(dia)
+        try:
+            mtime = caminho.stat().st_mtime
+        except OSError:
+            return self._ler_dia(dia)
+        em_cache = self._cache_leitura.get(dia)
+        if em_cache is None or em_cache[0] != mtime:
+            em_cache = (mtime, self._ler_dia(dia))
+            self._cache_leitura[dia] = em_cache
+        return em_cache[1]
+
+    @staticmethod
+    def de_eventos(tipo: str, eventos: List[Dict[str, Any]]) -> Dict[str, Agregado]:
+        """Agregados em memória de uma lista de eventos (consultas por últimos N)"""
+        chaves: Dict[str, Agregado] = {}
+        for evento in eventos:
+            chave = AgregadosTelemetria.chave_evento(tipo, evento)
+            chaves.setdefault(chave, Agregado()).observar(tipo, evento)
+        return chaves
+
+
+# ============================================================================
+# SEGMENTOS DIÁRIOS - Armazenamento indexado por tempo (🆕)
+# ============================================================================
+
+class _ArquivoJSONL:
+    """Destino simples do escritor: um único arquivo JSONL em modo append."""
+
+    def __init__(self, caminho: Path):
+        self.caminho = Path(caminho)
+        self._arquivo = None
+
+    def gravar(self, eventos: List[Dict[str, Any]], linhas: List[str]) -> int:
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+        dados = ''.join(linhas)
+        self._arquivo.write(dados)
+        self._arquivo.flush()
+        return len(dados)
+
+    def sincronizar(self) -> None:
+        if self._arquivo is not None:
+            os.fsync(self._arquivo.fileno())
+
+    def fechar(self) -> None:
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+class SegmentosTelemetria:
+    """
+    Eventos de um tipo ("ferramentas", "api") em segmentos diários indexados.
+
+    Arquivos em `diretorio`:
+    - {tipo}-AAAA-MM-DD.jsonl (ou .jsonl.gz com compressão)
+    - {segmento}.idx: índice lateral (JSON) do segmento
+      {"versao": 1, "tamanho": bytes indexados, "eventos": n,
+       "blocos": [[offset, primeiro_ts, ultimo_ts, eventos], ...]}
+
+    Cada lote gravado é anexado ao último bloco até ele passar de
+    TAMANHO_BLOCO bytes. Com gzip, cada lote vira um membro gzip próprio
+    (membros concatenados formam um .gz válido), então um bloco é lido a
+    partir do seu offset sem descomprimir o segmento inteiro.
+
+    Consultas (ler) só abrem os segmentos e faixas de bytes necessários:
+    - limite=N: do bloco mais novo para o mais antigo até juntar N eventos
+    - desde=T: segmentos com data >= T e blocos com ultimo_ts >= T
+    """
+
+    TAMANHO_BLOCO = 64 * 1024
+    VERSAO_INDICE = 1
+
+    def __init__(
+        self,
+        diretorio: Path,
+        tipo: str,
+        comprimir: bool = False,
+        agregados: Optional[AgregadosTelemetria] = None
+    ):
+        """
+        Args:
+            diretorio: Pasta dos segmentos
+            tipo: Prefixo dos arquivos ("ferramentas", "api")
+            comprimir: Gravar novos segmentos em gzip
+            agregados: Agregados a atualizar com cada lote gravado (opcional)
+        """
+        self.diretorio = Path(diretorio)
+        self.tipo = tipo
+        self.comprimir = comprimir
+        self.agregados = agregados
+        self._dias_verificados: set = set()
+
+        self._lock = threading.Lock()
+        self._arquivo = None
+        self._segmento_atual: Optional[Path] = None
+        self._indice_atual: Optional[Dict[str, Any]] = None
+
+    # ----- Caminhos -----
+
+    def caminho_segmento(self, dia: str) -> Path:
+        sufixo = '.jsonl.gz' if self.comprimir else '.jsonl'
+        return self.diretorio / f"{self.tipo}-{dia}{sufixo}"
+
+    @staticmethod
+    def caminho_indice(segmento: Path) -> Path:
+        return segmento.with_name(segmento.name + '.idx')
+
+    def _dia(self, segmento: Path) -> str:
+        return segmento.name[len(self.tipo) + 1:len(self.tipo) + 11]
+
+    def listar_segmentos(self) -> List[Path]:
+        """Segmentos existentes em ordem cronológica (a data está no nome)"""
+        if not self.diretorio.exists():
+            return []
+        segmentos = [
+            p for p in self.diretorio.glob(f"{self.tipo}-*.jsonl*")
+            if p.name.endswith(('.jsonl', '.jsonl.gz'))
+        ]
+        return sorted(segmentos, key=lambda p: (self._dia(p), p.name))
+
+    # ----- Escrita (thread do EscritorTelemetria) -----
+
+    def gravar(self, eventos: List[Dict[str, Any]], linhas: List[str]) -> int:
+        """
+        Anexa um lote já serializado ao segmento do dia de cada evento.
+
+        Returns:
+            Bytes gravados em disco
+        """
+        por_dia: Dict[str, List[int]] = {}
+        hoje = None
+        for i, evento in enumerate(eventos):
+            dia = str(evento.get('timestamp', ''))[:10]
+            if len(dia) != 10 or dia[4] != '-':
+                hoje = hoje or datetime.now().date().isoformat()
+                dia = hoje
+            por_dia.setdefault(dia, []).append(i)
+
+        total = 0
+        with self._lock:
+            for dia, indices in por_dia.items():
+                total += self._anexar(
+                    self.caminho_segmento(dia),
+                    [eventos[i] for i in indices],
+                    [linhas[i] for i in indices]
+                )
+        return total
+
+    def _anexar(self, segmento: Path, eventos: List[Dict[str, Any]], linhas: List[str]) -> int:
+        prefixo = b''
+        if segmento != self._segmento_atual:
+            self._fechar_segmento()
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+            self._indice_atual = self._carregar_indice(segmento)
+            self._arquivo = open(segmento, 'ab')
+            self._segmento_atual = segmento
+            # Linha incompleta deixada por uma queda não pode colar no próximo evento
+            if not self.comprimir and self._indice_atual['tamanho'] > 0:
+                with open(segmento, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        prefixo = b'\n'
+
+        dados = prefixo + ''.join(linhas).encode('utf-8')
+        if segmento.name.endswith('.gz'):
+            dados = gzip.compress(dados)
+
+        offset = self._arquivo.tell()
+        eventos_antes = self._indice_atual['eventos']
+        self._arquivo.write(dados)
+        self._arquivo.flush()
+
+        timestamps = [str(e.get('timestamp', '')) for e in eventos]
+        indice = self._indice_atual
+        blocos = indice['blocos']
+        if blocos and offset - blocos[-1][0] < self.TAMANHO_BLOCO:
+            bloco = blocos[-1]
+            bloco[1] = min(bloco[1], min(timestamps))
+            bloco[2] = max(bloco[2], max(timestamps))
+            bloco[3] += len(eventos)
+        else:
+            blocos.append([offset, min(timestamps), max(timestamps), len(eventos)])
+        indice['tamanho'] = offset + len(dados)
+        indice['eventos'] += len(eventos)
+        self._salvar_indice(segmento, indice)
+
+        if self.agregados is not None:
+            self._atualizar_agregados(segmento, offset, eventos_antes, eventos)
+        return len(dados)
+
+    def _atualizar_agregados(
+        self,
+        segmento: Path,
+        offset: int,
+        eventos_antes: int,
+        eventos: List[Dict[str, Any]]
+    ) -> None:
+        dia = self._dia(segmento)
+        if dia not in self._dias_verificados:
+            # Primeiro lote do dia neste processo: o agregado persistido precisa
+            # bater com o que já está nos segmentos do dia (queda, versão antiga)
+            outros = [s for s in self.listar_segmentos() if self._dia(s) == dia and s != segmento]
+            anteriores = sum(self._carregar_indice(s)['eventos'] for s in outros) + eventos_antes
+            if self.agregados.eventos(self.tipo, dia) != anteriores:
+                existentes = [e for s in outros for e in self._ler_bloco(s, 0, s.stat().st_size)]
+                existentes += self._ler_bloco(segmento, 0, offset)
+                self.agregados.reconstruir(self.tipo, dia, existentes)
+            self._dias_verificados.add(dia)
+        self.agregados.observar(self.tipo, dia, eventos)
+
+    def sincronizar(self) -> None:
+        """fsync do segmento aberto"""
+        with self._lock:
+            if self._arquivo is not None:
+                os.fsync(self._arquivo.fileno())
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._fechar_segmento()
+
+    def _fechar_segmento(self) -> None:
+        if self._arquivo is not None:
+            self._arquivo.close()
+        self._arquivo = None
+        self._segmento_atual = None
+        self._indice_atual = None
+
+    def importar_legado(self, arquivo: Path, tamanho_lote: int = 1000) -> int:
+        """
+        Importa (uma única vez) um JSONL monolítico do formato antigo.
+
+        O arquivo original fica intacto; um marcador {tipo}.migrado evita
+        reimportar.
+
+        Returns:
+            Eventos importados (0 se já importado ou inexistente)
+        """
+        marcador = self.diretorio / f"{self.tipo}.migrado"
+        if marcador.exists() or not arquivo.exists() or arquivo.stat().st_size == 0:
+            return 0
+
+        total = 0
+        eventos: List[Dict[str, Any]] = []
+        linhas: List[str] = []
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    evento = json.loads(linha)
+                except ValueError:
+                    continue
+                eventos.append(evento)
+                linhas.append(linha if linha.endswith('\n') else linha + '\n')
+                if len(eventos) >= tamanho_lote:
+                    self.gravar(eventos, linhas)
+                    total += len(eventos)
+                    eventos, linhas = [], []
+        if eventos:
+            self.gravar(eventos, linhas)
+            total += len(eventos)
+        self.fechar()
+
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        with open(marcador, 'w', encoding='utf-8') as f:
+            json.dump({'origem': str(arquivo), 'eventos': total,
+                       'timestamp': datetime.now().isoformat()}, f)
+        return total
+
+    # ----- Índice lateral -----
+
+    def _indice_vazio(self) -> Dict[str, Any]:
+        return {'versao': self.VERSAO_INDICE, 'tamanho': 0, 'eventos': 0, 'blocos': []}
+
+    def _carregar_indice(self, segmento: Path) -> Dict[str, Any]:
+        """
+        Lê o índice lateral e indexa os bytes que ainda não estão nele
+        (queda antes de salvar o .idx, segmento copiado sem índice).
+        """
+        indice = None
+        try:
+            with open(self.caminho_indice(segmento), 'r', encoding='utf-8') as f:
+                indice = json.load(f)
+            if indice.get('versao') != self.VERSAO_INDICE:
+                indice = None
+        except (OSError, ValueError):
+            pass
+
+        tamanho = segmento.stat().st_size if segmento.exists() else 0
+        if indice is None or tamanho < indice['tamanho']:
+            indice = self._indice_vazio()
+        if tamanho > indice['tamanho']:
+            self._indexar_cauda(segmento, indice, tamanho)
+        return indice
+
+    def _indexar_cauda(self, segmento: Path, indice: Dict[str, Any], tamanho: int) -> None:
+        with open(segmento, 'rb') as f:
+            f.seek(indice['tamanho'])
+            dados = f.read(tamanho - indice['tamanho'])
+
+        if segmento.name.endswith('.gz'):
+            # Sem limites de linha em bytes comprimidos: um bloco para a cauda toda
+            eventos = self._decodificar(self._descomprimir(dados))
+            timestamps = [str(e.get('timestamp', '')) for e in eventos] or ['']
+            indice['blocos'].append([indice['tamanho'], min(timestamps), max(timestamps), len(eventos)])
+            indice['eventos'] += len(eventos)
+        else:
+            offset = indice['tamanho']
+            bloco = None
+            for linha in dados.splitlines(keepends=True):
+                try:
+                    timestamp = str(json.loads(linha).get('timestamp', ''))
+                except (ValueError, AttributeError):
+                    offset += len(linha)
+                    continue
+                if bloco is None or offset - bloco[0] >= self.TAMANHO_BLOCO:
+                    bloco = [offset, timestamp, timestamp, 0]
+                    indice['blocos'].append(bloco)
+                bloco[1] = min(bloco[1], timestamp)
+                bloco[2] = max(bloco[2], timestamp)
+                bloco[3] += 1
+                indice['eventos'] += 1
+                offset += len(linha)
+        indice['tamanho'] = tamanho
+
+    def _salvar_indice(self, segmento: Path, indice: Dict[str, Any]) -> None:
+        """Gravação atômica (leitores nunca veem um .idx pela metade)"""
+        caminho = self.caminho_indice(segmento)
+        temporario = caminho.with_name(caminho.name + '.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(indice, f, separators=(',', ':'))
+        os.replace(temporario, caminho)
+
+    def _indice_para_leitura(self, segmento: Path) -> Dict[str, Any]:
+        with self._lock:
+            if segmento == self._segmento_atual and self._indice_atual is not None:
+                return {
+                    'tamanho': self._indice_atual['tamanho'],
+                    'blocos': [list(b) for b in self._indice_atual['blocos']]
+                }
+        return self._carregar_indice(segmento)
+
+    # ----- Leitura -----
+
+    @staticmethod
+    def _descomprimir(dados: bytes) -> bytes:
+        """Descomprime membros gzip concatenados, tolerando um membro truncado no fim"""
+        saida = []
+        while dados:
+            descompressor = zlib.decompressobj(wbits=31)
+            try:
+                saida.append(descompressor.decompress(dados))
+            except zlib.error:
+                break
+            if not descompressor.eof:
+                break
+            dados = descompressor.unused_data
+        return b''.join(saida)
+
+    @staticmethod
+    def _decodificar(dados: bytes) -> List[Dict[str, Any]]:
+        eventos = []
+        for linha in dados.splitlines():
+            if not linha.strip():
+                continue
+            try:
+                eventos.append(json.loads(linha))
+            except ValueError:
+                continue  # Linha incompleta (queda no meio de uma escrita)
+        return eventos
+
+    def _ler_bloco(self, segmento: Path, inicio: int, fim: int) -> List[Dict[str, Any]]:
+        with open(segmento, 'rb') as f:
+            f.seek(inicio)
+            dados = f.read(fim - inicio)
+        if segmento.name.endswith('.gz'):
+            dados = self._descomprimir(dados)
+        return self._decodificar(dados)
+
+    def ler_dia(self, dia: str) -> List[Dict[str, Any]]:
+        """Todos os eventos dos segmentos de um dia (AAAA-MM-DD)"""
+        eventos = []
+        for segmento in self.listar_segmentos():
+            if self._dia(segmento) == dia:
+                indice = self._indice_para_leitura(segmento)
+                eventos.extend(self._ler_bloco(segmento, 0, indice['tamanho']))
+        return eventos
+
+    def ler(self, limite: Optional[int] = None, desde: Optional[Any] = None) -> List[Dict[str, Any]]:
+        """
+        Eventos em ordem cronológica.
+
+        Args:
+            limite: Só os N eventos mais recentes
+            desde: Só eventos com timestamp >= desde (datetime ou ISO 8601)
+        """
+        if isinstance(desde, datetime):
+            desde = desde.isoformat()
+
+        segmentos = self.listar_segmentos()
+        if desde:
+            segmentos = [s for s in segmentos if self._dia(s) >= desde[:10]]
+
+        resultado: Deque[Dict[str, Any]] = deque()
+        for segmento in reversed(segmentos):
+            indice = self._indice_para_leitura(segmento)
+            blocos = indice['blocos']
+            for i in range(len(blocos) - 1, -1, -1):
+                if desde and blocos[i][2] < desde:
+                    continue
+                fim = blocos[i + 1][0] if i + 1 < len(blocos) else indice['tamanho']
+                eventos = self._ler_bloco(segmento, blocos[i][0], fim)
+                if desde:
+                    eventos = [e for e in eventos if str(e.get('timestamp', '')) >= desde]
+                resultado.extendleft(reversed(eventos))
+                if limite and len(resultado) >= limite:
+                    break
+            if limite and len(resultado) >= limite:
+                break
+
+        eventos = list(resultado)
+        return eventos[-limite:] if limite else eventos
+
+
+# ============================================================================
+# ESCRITOR EM LOTE - Thread dedicada de gravação (🆕)
+# ============================================================================
+
+class EscritorTelemetria:
+    """
+    Grava eventos JSONL em uma thread dedicada, em lotes.
+
+    O caminho quente (registrar_*) só anexa o evento a uma fila limitada
+    (deque, sem I/O nem troca de thread); a thread acorda a cada
+    `intervalo_flush` segundos - ou antes, quando a fila junta
+    `tamanho_lote` eventos - e faz uma escrita sequencial por destino,
+    com os arquivos mantidos abertos.
+
+    Destinos: um Path (arquivo JSONL único) ou qualquer objeto com
+    gravar(eventos, linhas), sincronizar() e fechar(), como
+    SegmentosTelemetria.
+
+    Política de fsync:
+    - "nunca": só flush do buffer do Python (o SO decide quando ir ao disco)
+    - "lote": fsync após cada lote gravado
+    - "fechar": fsync apenas em fechar() (padrão)
+
+    Se a fila encher (disco muito lento), o evento é descartado e contado
+    em metricas['eventos_descartados'], para nunca travar o agente.
+    """
+
+    POLITICAS_FSYNC = ('nunca', 'lote', 'fechar')
+
+    def __init__(
+        self,
+        intervalo_flush: float = 1.0,
+        politica_fsync: str = 'fechar',
+        tamanho_fila: int = 10000,
+        tamanho_lote: int = 1000
+    ):
+        """
+        Args:
+            intervalo_flush: Tempo máximo (s) que um evento espera na fila
+            politica_fsync: "nunca", "lote" ou "fechar"
+            tamanho_fila: Máximo de eventos pendentes
+            tamanho_lote: Eventos pendentes que antecipam a gravação
+        """
+        if politica_fsync not in self.POLITICAS_FSYNC:
+            raise ValueError(f"politica_fsync inválida: {politica_fsync} (use {self.POLITICAS_FSYNC})")
+
+        self.intervalo_flush = intervalo_flush
+        self.politica_fsync = politica_fsync
+        self.tamanho_fila = tamanho_fila
+        self.tamanho_lote = tamanho_lote
+
+        # deque.append/popleft são atômicos: produtores não precisam de lock
+        self._fila: Deque[Any] = deque()
+        self._acordar = threading.Event()
+        self._destinos: Dict[Any, Any] = {}
+        self._fechado = False
+        self._lock = threading.Lock()
+
+        self.metricas = {
+            'eventos_escritos': 0,
+            'lotes_escritos': 0,
+            'bytes_escritos': 0,
+            'eventos_descartados': 0,
+        }
+
+        self._thread = threading.Thread(target=self._loop, name="luna-telemetria", daemon=True)
+        self._thread.start()
+
+    def enviar(self, destino: Any, evento: Dict[str, Any]) -> bool:
+        """
+        Enfileira um evento para gravação (thread-safe, não bloqueia, não faz I/O).
+
+        Depois de fechar(), grava direto no arquivo (eventos tardios do atexit).
+
+        Returns:
+            False se o evento foi descartado por fila cheia
+        """
+        if self._fechado:
+            with self._lock:
+                alvo = self._destino(destino)
+                alvo.gravar([evento], [json.dumps(evento, ensure_ascii=False, default=str) + '\n'])
+                alvo.fechar()
+            return True
+
+        pendentes = len(self._fila)
+        if pendentes >= self.tamanho_fila:
+            with self._lock:
+                self.metricas['eventos_descartados'] += 1
+            return False
+
+        self._fila.append((destino, evento))
+        if pendentes + 1 == self.tamanho_lote:
+            self._acordar.set()
+        return True
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """
+        Espera até que tudo o que foi enfileirado antes desta chamada esteja gravado.
+
+        Returns:
+            True se concluiu dentro do timeout
+        """
+        if self._fechado or not self._thread.is_alive():
+            return True
+        marcador = threading.Event()
+        self._fila.append(marcador)
+        self._acordar.set()
+        return marcador.wait(timeout)
+
+    def fechar(self, timeout: Optional[float] = 5.0) -> None:
+        """Drena a fila, grava o que falta, aplica fsync (se configurado) e fecha os arquivos."""
+        if self._fechado:
+            return
+        if self._thread.is_alive():
+            self._fila.append(None)  # Sentinela de parada
+            self._acordar.set()
+            self._thread.join(timeout)
+        self._fechado = True
+
+        # Eventos que chegaram depois da sentinela: gravação direta
+        while self._fila:
+            item = self._fila.popleft()
+            if isinstance(item, tuple):
+                self.enviar(*item)
+
+    def _loop(self) -> None:
+        """Thread de escrita: a cada intervalo (ou ao ser acordada), grava tudo o que está pendente."""
+        while True:
+            self._acordar.wait(self.intervalo_flush)
+            self._acordar.clear()
+
+            eventos = []
+            marcadores = []
+            parar = False
+            while self._fila:
+                item = self._fila.popleft()
+                if item is None:
+                    parar = True
+                elif isinstance(item, threading.Event):
+                    # Marcador de flush: grava o que veio antes dele
+                    if eventos:
+                        self._gravar_lote(eventos)
+                        eventos = []
+                    marcadores.append(item)
+                else:
+                    eventos.append(item)
+
+            if eventos:
+                self._gravar_lote(eventos)
+            for marcador in marcadores:
+                marcador.set()
+
+            if parar:
+                self._fechar_destinos()
+                return
+
+    def _destino(self, chave: Any) -> Any:
+        """Destino com interface gravar/sincronizar/fechar (Path vira _ArquivoJSONL)"""
+        if hasattr(chave, 'gravar'):
+            return chave
+        destino = self._destinos.get(chave)
+        if destino is None:
+            destino = _ArquivoJSONL(chave)
+            self._destinos[chave] = destino
+        return destino
+
+    def _gravar_lote(self, eventos: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        """Uma escrita sequencial por destino com todas as linhas do lote."""
+        por_destino: Dict[Any, Tuple[List[Dict[str, Any]], List[str]]] = {}
+        for chave, evento in eventos:
+            try:
+                linha = json.dumps(evento, ensure_ascii=False) + '\n'
+            except (TypeError, ValueError):
+                # Evento não serializável não derruba a thread
+                linha = json.dumps(evento, ensure_ascii=False, default=str) + '\n'
+            grupo = por_destino.setdefault(chave, ([], []))
+            grupo[0].append(evento)
+            grupo[1].append(linha)
+
+        for chave, (eventos_destino, linhas) in por_destino.items():
+            destino = self._destino(chave)
+            self._destinos[chave] = destino
+            try:
+                gravados = destino.gravar(eventos_destino, linhas)
+                if self.politica_fsync == 'lote':
+                    destino.sincronizar()
+            except OSError as e:
+                print(f"⚠️  Telemetria: erro ao gravar {getattr(destino, 'caminho', chave)}: {e}")
+                continue
+
+            with self._lock:
+                self.metricas['eventos_escritos'] += len(linhas)
+                self.metricas['bytes_escritos'] += gravados
+        with self._lock:
+            self.metricas['lotes_escritos'] += 1
+
+    def _fechar_destinos(self) -> None:
+        for destino in self._destinos.values():
+            try:
+                if self.politica_fsync in ('lote', 'fechar'):
+                    destino.sincronizar()
+                destino.fechar()
+            except OSError:
+                pass
+        self._destinos.clear()
+
+
 # ============================================================================
 # TELEMETRIA MANAGER - Registro de Eventos
 # ============================================================================
@@ -121,25 +1057,50 @@ class TelemetriaManager:
     Gerencia registro de eventos de telemetria em arquivos JSONL.
 
     Arquivos gerados:
-    - luna_telemetria_ferramentas.jsonl: Uso de ferramentas
-    - luna_telemetria_api.jsonl: Requisições API
+    - luna_telemetria/ferramentas-AAAA-MM-DD.jsonl[.gz]: Uso de ferramentas (🆕 diário)
+    - luna_telemetria/api-AAAA-MM-DD.jsonl[.gz]: Requisições API (🆕 diário)
     - luna_performance.json: Métricas de sessões
+
+    Os JSONL monolíticos antigos (luna_telemetria_*.jsonl) são importados
+    para os segmentos uma única vez.
+
+    🆕 Eventos são gravados pelo EscritorTelemetria (thread dedicada).
+    Configuração por ambiente: LUNA_TELEMETRIA_FLUSH (segundos, padrão 1.0),
+    LUNA_TELEMETRIA_FSYNC ("nunca", "lote" ou "fechar") e
+    LUNA_TELEMETRIA_GZIP=1 (segmentos comprimidos).
     """
 
-    def __init__(self, base_dir: str = "."):
+    def __init__(
+        self,
+        base_dir: str = ".",
+        intervalo_flush: Optional[float] = None,
+        politica_fsync: Optional[str] = None,
+        comprimir: Optional[bool] = None
+    ):
         """
         Inicializa o gerenciador de telemetria.
 
         Args:
             base_dir: Diretório base para salvar logs
+            intervalo_flush: Segundos máximos de espera antes de gravar (padrão: env ou 1.0)
+            politica_fsync: "nunca", "lote" ou "fechar" (padrão: env ou "fechar")
+            comprimir: Segmentos em gzip (padrão: env LUNA_TELEMETRIA_GZIP)
         """
         self.base_dir = Path(base_dir)
 
         # Arquivos de log
-        self.log_ferramentas = self.base_dir / "luna_telemetria_ferramentas.jsonl"
-        self.log_api = self.base_dir / "luna_telemetria_api.jsonl"
+        self.log_ferramentas = self.base_dir / "luna_telemetria_ferramentas.jsonl"  # Legado (só importação)
+        self.log_api = self.base_dir / "luna_telemetria_api.jsonl"  # Legado (só importação)
         self.log_sessoes = self.base_dir / "luna_performance.json"
 
+        # 🆕 Segmentos diários com índice lateral
+        if comprimir is None:
+            comprimir = os.getenv('LUNA_TELEMETRIA_GZIP', '0') == '1'
+        self.dir_segmentos = self.base_dir / "luna_telemetria"
+        self.agregados = AgregadosTelemetria(self.dir_segmentos)
+        self.segmentos_ferramentas = SegmentosTelemetria(self.dir_segmentos, 'ferramentas', comprimir, self.agregados)
+        self.segmentos_api = SegmentosTelemetria(self.dir_segmentos, 'api', comprimir, self.agregados)
+
         # Métricas da sessão atual (em memória)
         self.sessao_inicio: Optional[float] = None
         self.sessao_metricas = {
@@ -153,15 +1114,28 @@ class TelemetriaManager:
             'erros': 0,
             'tempo_total_ferramentas': 0
         }
+        # Ferramentas podem registrar eventos de várias threads ao mesmo tempo
+        self._lock_metricas = threading.Lock()
+
+        # 🆕 Último estado do limite de concorrência adaptativo dos planos
+        self.concorrencia: Optional[Dict[str, Any]] = None
 
         # Criar arquivos se não existirem
         self._inicializar_logs()
 
+        # 🆕 Gravação assíncrona em lote (drenada em fechar()/atexit/InterruptHandler)
+        self.escritor = EscritorTelemetria(
+            intervalo_flush=intervalo_flush if intervalo_flush is not None
+            else float(os.getenv('LUNA_TELEMETRIA_FLUSH', '1.0')),
+            politica_fsync=politica_fsync or os.getenv('LUNA_TELEMETRIA_FSYNC', 'fechar')
+        )
+        atexit.register(self.fechar)
+
     def _inicializar_logs(self):
         """Cria arquivos de log se não existirem"""
-        for log_file in [self.log_ferramentas, self.log_api]:
-            if not log_file.exists():
-                log_file.touch()
+        self.dir_segmentos.mkdir(parents=True, exist_ok=True)
+        self.segmentos_ferramentas.importar_legado(self.log_ferramentas)
+        self.segmentos_api.importar_legado(self.log_api)
 
         if not self.log_sessoes.exists():
             with open(self.log_sessoes, 'w', encoding='utf-8') as f:
@@ -215,15 +1189,15 @@ class TelemetriaManager:
             erro_msg=erro
         )
 
-        # Salvar em JSONL (uma linha por evento)
-        with open(self.log_ferramentas, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(evento.to_dict(), ensure_ascii=False) + '\n')
+        # Salvar em JSONL (uma linha por evento) - 🆕 via fila do escritor
+        self.escritor.enviar(self.segmentos_ferramentas, evento.to_dict())
 
         # Atualizar métricas da sessão
-        self.sessao_metricas['ferramentas_usadas'].append(nome)
-        self.sessao_metricas['tempo_total_ferramentas'] += tempo_execucao
-        if erro:
-            self.sessao_metricas['erros'] += 1
+        with self._lock_metricas:
+            self.sessao_metricas['ferramentas_usadas'].append(nome)
+            self.sessao_metricas['tempo_total_ferramentas'] += tempo_execucao
+            if erro:
+                self.sessao_metricas['erros'] += 1
 
     def registrar_requisicao_api(
         self,
@@ -258,18 +1232,37 @@ class TelemetriaManager:
             modelo=modelo
         )
 
-        # Salvar em JSONL
-        with open(self.log_api, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(evento.to_dict(), ensure_ascii=False) + '\n')
+        # Salvar em JSONL - 🆕 via fila do escritor
+        self.escritor.enviar(self.segmentos_api, evento.to_dict())
 
         # Atualizar métricas da sessão
-        self.sessao_metricas['requisicoes'] += 1
-        self.sessao_metricas['tokens_input'] += tokens_input
-        self.sessao_metricas['tokens_output'] += tokens_output
-        self.sessao_metricas['tokens_cache_read'] += tokens_cache_read
-        self.sessao_metricas['tokens_cache_creation'] += tokens_cache_creation
-        if cache_hit:
-            self.sessao_metricas['cache_hits'] += 1
+        with self._lock_metricas:
+            self.sessao_metricas['requisicoes'] += 1
+            self.sessao_metricas['tokens_input'] += tokens_input
+            self.sessao_metricas['tokens_output'] += tokens_output
+            self.sessao_metricas['tokens_cache_read'] += tokens_cache_read
+            self.sessao_metricas['tokens_cache_creation'] += tokens_cache_creation
+            if cache_hit:
+                self.sessao_metricas['cache_hits'] += 1
+
+    def registrar_concorrencia(self, estado: Dict[str, Any]) -> None:
+        """
+        Guarda o estado atual do controlador de concorrência (limite, sinais,
+        últimos ajustes); aparece em obter_metricas_sessao() e na sessão salva.
+
+        Args:
+            estado: ControladorConcorrencia.estado()
+        """
+        with self._lock_metricas:
+            self.concorrencia = dict(estado)
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Espera a gravação de todos os eventos já registrados"""
+        return self.escritor.flush(timeout)
+
+    def fechar(self) -> None:
+        """Drena a fila de eventos e fecha os arquivos (idempotente)"""
+        self.escritor.fechar()
 
     def finalizar_sessao(self):
         """Finaliza sessão e salva métricas consolidadas"""
@@ -302,7 +1295,8 @@ class TelemetriaManager:
             ferramentas_por_tipo=dict(ferramentas_count),
             taxa_cache_hit=round(taxa_cache, 1),
             economia_tokens=economia_tokens,
-            erros_count=self.sessao_metricas['erros']
+            erros_count=self.sessao_metricas['erros'],
+            concorrencia=self.concorrencia
         )
 
         # Salvar no arquivo de sessões
@@ -350,7 +1344,7 @@ class TelemetriaManager:
             if total_req > 0 else 0
         )
 
-        return {
+        metricas = {
             'duracao_sessao': round(duracao, 2),
             'total_requisicoes': total_req,
             'total_tokens': self.sessao_metricas['tokens_input'] + self.sessao_metricas['tokens_output'],
@@ -359,6 +1353,9 @@ class TelemetriaManager:
             'total_ferramentas': len(self.sessao_metricas['ferramentas_usadas']),
             'erros': self.sessao_metricas['erros']
         }
+        if self.concorrencia is not None:
+            metricas['concorrencia'] = self.concorrencia
+        return metricas
 
 
 # ============================================================================
@@ -370,50 +1367,108 @@ class AnalisadorTelemetria:
     Analisa logs de telemetria e gera insights, detecta gargalos e sugere otimizações.
     """
 
-    def __init__(self, base_dir: str = "."):
+    def __init__(
+        self,
+        base_dir: str = ".",
+        telemetria: Optional[TelemetriaManager] = None,
+        janela_dias: int = 7
+    ):
         """
         Inicializa o analisador.
 
         Args:
             base_dir: Diretório com os arquivos de log
+            telemetria: Manager da sessão atual (opcional); seus eventos
+                pendentes são gravados antes de cada leitura
+            janela_dias: Dias de agregados considerados nos relatórios
         """
         self.base_dir = Path(base_dir)
-        self.log_ferramentas = self.base_dir / "luna_telemetria_ferramentas.jsonl"
-        self.log_api = self.base_dir / "luna_telemetria_api.jsonl"
+        self.telemetria = telemetria
+        self.janela_dias = janela_dias
         self.log_sessoes = self.base_dir / "luna_performance.json"
 
-    def carregar_eventos_ferramentas(self, limite: Optional[int] = None) -> List[Dict]:
-        """Carrega eventos de ferramentas do JSONL"""
-        eventos = []
+        # 🆕 Leitura pelos segmentos diários (os do manager, se houver, já
+        # conhecem o índice do segmento aberto)
+        if telemetria is not None:
+            self.segmentos_ferramentas = telemetria.segmentos_ferramentas
+            self.segmentos_api = telemetria.segmentos_api
+            self.agregados = telemetria.agregados
+        else:
+            diretorio = self.base_dir / "luna_telemetria"
+            self.segmentos_ferramentas = SegmentosTelemetria(diretorio, 'ferramentas')
+            self.segmentos_api = SegmentosTelemetria(diretorio, 'api')
+            self.agregados = AgregadosTelemetria(diretorio)
 
-        if not self.log_ferramentas.exists():
-            return eventos
+    def _sincronizar(self):
+        """Garante que eventos ainda na fila do escritor estejam no disco"""
+        if self.telemetria is not None:
+            self.telemetria.flush()
 
-        with open(self.log_ferramentas, 'r', encoding='utf-8') as f:
-            for linha in f:
-                if linha.strip():
-                    eventos.append(json.loads(linha))
+    def carregar_eventos_ferramentas(
+        self,
+        limite: Optional[int] = None,
+        desde: Optional[Any] = None
+    ) -> List[Dict]:
+        """
+        Carrega eventos de ferramentas (mais recentes por último).
 
-        # Retornar os mais recentes
-        if limite:
-            return eventos[-limite:]
-        return eventos
+        Args:
+            limite: Só os N mais recentes
+            desde: Só eventos a partir deste instante (datetime ou ISO 8601)
+        """
+        self._sincronizar()
+        return self.segmentos_ferramentas.ler(limite=limite, desde=desde)
 
-    def carregar_eventos_api(self, limite: Optional[int] = None) -> List[Dict]:
-        """Carrega eventos de API do JSONL"""
-        eventos = []
+    def carregar_eventos_api(
+        self,
+        limite: Optional[int] = None,
+        desde: Optional[Any] = None
+    ) -> List[Dict]:
+        """Carrega eventos de API (mesmos filtros de carregar_eventos_ferramentas)"""
+        self._sincronizar()
+        return self.segmentos_api.ler(limite=limite, desde=desde)
+
+    def agregados_janela(self, dias: Optional[int] = None) -> Dict[str, Dict[str, Agregado]]:
+        """
+        Agregados persistidos dos últimos `dias` dias, mesclados por chave.
+
+        Dias com segmentos mas sem arquivo de agregados (gravados antes dos
+        agregados existirem) são calculados a partir dos eventos do dia.
+        """
+        self._sincronizar()
+        dias = dias or self.janela_dias
+        hoje = datetime.now().date()
+        segmentos = {'ferramentas': self.segmentos_ferramentas, 'api': self.segmentos_api}
+        janela: Dict[str, Dict[str, Agregado]] = {tipo: {} for tipo in segmentos}
+
+        for n in range(dias):
+            dia = (hoje - timedelta(days=n)).isoformat()
+            if self.agregados.existe_dia(dia):
+                do_dia = {t: d['chaves'] for t, d in self.agregados.carregar_dia(dia).items()}
+            else:
+                do_dia = {t: AgregadosTelemetria.de_eventos(t, s.ler_dia(dia)) for t, s in segmentos.items()}
 
-        if not self.log_api.exists():
-            return eventos
+            for tipo, chaves in do_dia.items():
+                for chave, agregado in chaves.items():
+                    # Mescla em um Agregado novo: os carregados ficam em cache
+                    janela[tipo].setdefault(chave, Agregado()).mesclar(agregado)
+        return janela
 
-        with open(self.log_api, 'r', encoding='utf-8') as f:
-            for linha in f:
-                if linha.strip():
-                    eventos.append(json.loads(linha))
+    def resumo_agregado(self, limite_eventos: Optional[int] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Contagens, taxa de erro e p50/p95/p99 por ferramenta e por modelo da API"""
+        return {
+            tipo: {chave: agregado.resumo() for chave, agregado in chaves.items()}
+            for tipo, chaves in self._agregados(limite_eventos).items()
+        }
 
-        if limite:
-            return eventos[-limite:]
-        return eventos
+    def _agregados(self, limite_eventos: Optional[int]) -> Dict[str, Dict[str, Agregado]]:
+        if limite_eventos:
+            return {
+                'ferramentas': AgregadosTelemetria.de_eventos(
+                    'ferramentas', self.carregar_eventos_ferramentas(limite_eventos)),
+                'api': AgregadosTelemetria.de_eventos('api', self.carregar_eventos_api(limite_eventos)),
+            }
+        return self.agregados_janela()
 
     def carregar_sessoes(self, limite: Optional[int] = None) -> List[Dict]:
         """Carrega histórico de sessões"""
@@ -428,191 +1483,172 @@ class AnalisadorTelemetria:
         except (FileNotFoundError, json.JSONDecodeError):
             return []
 
-    def detectar_gargalos(self, limite_eventos: int = 1000) -> List[Gargalo]:
+    def detectar_gargalos(self, limite_eventos: Optional[int] = None) -> List[Gargalo]:
         """
         Detecta gargalos de performance.
 
         Analisa:
-        - Ferramentas lentas (tempo > 5s)
-        - Requisições API lentas (latência > 10s)
+        - Ferramentas lentas (média > 5s ou p95 > 15s)
+        - Requisições API lentas (latência média > 10s ou p95 > 30s)
         - Erros frequentes (mesma ferramenta falhando)
         - Cache hit rate baixo (< 30%)
 
         Args:
-            limite_eventos: Número de eventos recentes a analisar
+            limite_eventos: Analisar só os N eventos recentes; por padrão usa
+                os agregados persistidos da janela de `janela_dias` dias
 
         Returns:
             Lista de gargalos identificados
         """
         gargalos = []
+        agregados = self._agregados(limite_eventos)
 
         # Analisar ferramentas
-        eventos_ferramentas = self.carregar_eventos_ferramentas(limite_eventos)
-
-        if eventos_ferramentas:
-            # 1. Ferramentas lentas
-            ferramentas_tempo = defaultdict(list)
-            for evento in eventos_ferramentas:
-                ferramentas_tempo[evento['ferramenta']].append(evento['tempo_execucao'])
-
-            for ferramenta, tempos in ferramentas_tempo.items():
-                tempo_medio = statistics.mean(tempos)
-                tempo_max = max(tempos)
-
-                if tempo_medio > 5.0:  # Mais de 5 segundos em média
-                    severidade = 'alta' if tempo_medio > 15 else 'media'
-
-                    gargalos.append(Gargalo(
-                        tipo='ferramenta_lenta',
-                        descricao=f"Ferramenta '{ferramenta}' está lenta",
-                        metricas={
-                            'tempo_medio': round(tempo_medio, 2),
-                            'tempo_max': round(tempo_max, 2),
-                            'execucoes': len(tempos)
-                        },
-                        severidade=severidade,
-                        sugestao_otimizacao=(
-                            f"Considere otimizar '{ferramenta}' ou executar em paralelo. "
-                            f"Tempo médio: {tempo_medio:.1f}s"
-                        )
-                    ))
+        for ferramenta, agregado in agregados['ferramentas'].items():
+            r = agregado.resumo()
+
+            # 1. Ferramentas lentas (média ou cauda)
+            if r['tempo_medio'] > 5.0 or r['tempo_p95'] > 15.0:
+                severidade = 'alta' if r['tempo_medio'] > 15 or r['tempo_p99'] > 60 else 'media'
+
+                gargalos.append(Gargalo(
+                    tipo='ferramenta_lenta',
+                    descricao=f"Ferramenta '{ferramenta}' está lenta",
+                    metricas={
+                        'tempo_medio': round(r['tempo_medio'], 2),
+                        'tempo_p50': round(r['tempo_p50'], 2),
+                        'tempo_p95': round(r['tempo_p95'], 2),
+                        'tempo_p99': round(r['tempo_p99'], 2),
+                        'tempo_max': round(r['tempo_max'], 2),
+                        'execucoes': r['eventos']
+                    },
+                    severidade=severidade,
+                    sugestao_otimizacao=(
+                        f"Considere otimizar '{ferramenta}' ou executar em paralelo. "
+                        f"Tempo médio: {r['tempo_medio']:.1f}s, p95: {r['tempo_p95']:.1f}s"
+                    )
+                ))
 
             # 2. Erros frequentes
-            erros_por_ferramenta = defaultdict(int)
-            total_por_ferramenta = defaultdict(int)
-
-            for evento in eventos_ferramentas:
-                ferramenta = evento['ferramenta']
-                total_por_ferramenta[ferramenta] += 1
-                if evento['resultado_tipo'] == 'erro':
-                    erros_por_ferramenta[ferramenta] += 1
-
-            for ferramenta, erros in erros_por_ferramenta.items():
-                total = total_por_ferramenta[ferramenta]
-                taxa_erro = (erros / total * 100) if total > 0 else 0
-
-                if taxa_erro > 20 and erros >= 3:  # Mais de 20% de erros e pelo menos 3 erros
-                    severidade = 'critica' if taxa_erro > 50 else 'alta'
-
-                    gargalos.append(Gargalo(
-                        tipo='erro_frequente',
-                        descricao=f"Ferramenta '{ferramenta}' falha frequentemente",
-                        metricas={
-                            'taxa_erro': round(taxa_erro, 1),
-                            'total_erros': erros,
-                            'total_execucoes': total
-                        },
-                        severidade=severidade,
-                        sugestao_otimizacao=(
-                            f"Revisar implementação de '{ferramenta}'. "
-                            f"Taxa de erro: {taxa_erro:.1f}%"
-                        )
-                    ))
-
-        # Analisar API
-        eventos_api = self.carregar_eventos_api(limite_eventos)
-
-        if eventos_api:
+            if r['taxa_erro'] > 20 and r['erros'] >= 3:  # Mais de 20% de erros e pelo menos 3 erros
+                severidade = 'critica' if r['taxa_erro'] > 50 else 'alta'
+
+                gargalos.append(Gargalo(
+                    tipo='erro_frequente',
+                    descricao=f"Ferramenta '{ferramenta}' falha frequentemente",
+                    metricas={
+                        'taxa_erro': r['taxa_erro'],
+                        'total_erros': r['erros'],
+                        'total_execucoes': r['eventos']
+                    },
+                    severidade=severidade,
+                    sugestao_otimizacao=(
+                        f"Revisar implementação de '{ferramenta}'. "
+                        f"Taxa de erro: {r['taxa_erro']:.1f}%"
+                    )
+                ))
+
+        # Analisar API (todos os modelos juntos)
+        if agregados['api']:
+            api = Agregado()
+            for agregado in agregados['api'].values():
+                api.mesclar(agregado)
+            r = api.resumo()
+
             # 3. API lenta
-            latencias = [e['tempo_latencia'] for e in eventos_api if e['tempo_latencia'] > 0]
-
-            if latencias:
-                latencia_media = statistics.mean(latencias)
-                latencia_max = max(latencias)
-
-                if latencia_media > 10.0:  # Mais de 10s em média
-                    gargalos.append(Gargalo(
-                        tipo='api_lenta',
-                        descricao="Latência da API está alta",
-                        metricas={
-                            'latencia_media': round(latencia_media, 2),
-                            'latencia_max': round(latencia_max, 2),
-                            'requisicoes': len(latencias)
-                        },
-                        severidade='media',
-                        sugestao_otimizacao=(
-                            f"Latência média: {latencia_media:.1f}s. "
-                            "Verifique conexão ou use batching para reduzir requisições."
-                        )
-                    ))
+            if r['tempo_medio'] > 10.0 or r['tempo_p95'] > 30.0:
+                gargalos.append(Gargalo(
+                    tipo='api_lenta',
+                    descricao="Latência da API está alta",
+                    metricas={
+                        'latencia_media': round(r['tempo_medio'], 2),
+                        'latencia_p50': round(r['tempo_p50'], 2),
+                        'latencia_p95': round(r['tempo_p95'], 2),
+                        'latencia_p99': round(r['tempo_p99'], 2),
+                        'latencia_max': round(r['tempo_max'], 2),
+                        'requisicoes': r['eventos']
+                    },
+                    severidade='alta' if r['tempo_p99'] > 60 else 'media',
+                    sugestao_otimizacao=(
+                        f"Latência média: {r['tempo_medio']:.1f}s, p95: {r['tempo_p95']:.1f}s. "
+                        "Verifique conexão ou use batching para reduzir requisições."
+                    )
+                ))
 
             # 4. Cache hit rate baixo
-            total_requisicoes = len(eventos_api)
-            cache_hits = sum(1 for e in eventos_api if e['cache_hit'])
-            cache_rate = (cache_hits / total_requisicoes * 100) if total_requisicoes > 0 else 0
-
-            if cache_rate < 30 and total_requisicoes >= 10:  # Menos de 30% de cache hit
+            if r['taxa_cache_hit'] < 30 and r['eventos'] >= 10:  # Menos de 30% de cache hit
                 gargalos.append(Gargalo(
                     tipo='cache_baixo',
                     descricao="Taxa de cache hit está baixa",
                     metricas={
-                        'taxa_cache_hit': round(cache_rate, 1),
-                        'cache_hits': cache_hits,
-                        'total_requisicoes': total_requisicoes
+                        'taxa_cache_hit': r['taxa_cache_hit'],
+                        'cache_hits': api.cache_hits,
+                        'total_requisicoes': r['eventos']
                     },
                     severidade='media',
                     sugestao_otimizacao=(
-                        f"Taxa de cache: {cache_rate:.1f}%. "
+                        f"Taxa de cache: {r['taxa_cache_hit']:.1f}%. "
                         "Considere usar prompt caching em contextos repetidos."
                     )
                 ))
 
         return gargalos
 
-    def identificar_padroes_uso(self, limite_eventos: int = 1000) -> Dict[str, Any]:
+    def identificar_padroes_uso(self, limite_eventos: Optional[int] = None) -> Dict[str, Any]:
         """
         Identifica padrões de uso das ferramentas.
 
+        Args:
+            limite_eventos: Analisar só os N eventos recentes; por padrão usa
+                os agregados persistidos da janela de `janela_dias` dias
+
         Returns:
             Dict com:
             - ferramentas_mais_usadas: Top 10 ferramentas
-            - ferramentas_mais_lentas: Top 5 mais lentas
+            - ferramentas_mais_lentas: Top 5 por p95 (com média e p99)
             - horarios_pico: Distribuição por hora do dia
-            - tendencias: Mudanças ao longo do tempo
         """
-        eventos = self.carregar_eventos_ferramentas(limite_eventos)
+        ferramentas = self._agregados(limite_eventos)['ferramentas']
 
-        if not eventos:
+        if not ferramentas:
             return {}
 
         # 1. Ferramentas mais usadas
-        contador_uso = Counter(e['ferramenta'] for e in eventos)
+        contador_uso = Counter({f: a.eventos for f, a in ferramentas.items()})
         ferramentas_mais_usadas = [
             {'ferramenta': f, 'usos': count}
             for f, count in contador_uso.most_common(10)
         ]
 
-        # 2. Ferramentas mais lentas
-        tempos_por_ferramenta = defaultdict(list)
-        for evento in eventos:
-            tempos_por_ferramenta[evento['ferramenta']].append(evento['tempo_execucao'])
-
-        ferramentas_tempo_medio = [
-            {'ferramenta': f, 'tempo_medio': round(statistics.mean(tempos), 2)}
-            for f, tempos in tempos_por_ferramenta.items()
-        ]
+        # 2. Ferramentas mais lentas (pela cauda, não só pela média)
+        ferramentas_tempo = []
+        for f, agregado in ferramentas.items():
+            r = agregado.resumo()
+            ferramentas_tempo.append({
+                'ferramenta': f,
+                'tempo_medio': round(r['tempo_medio'], 2),
+                'tempo_p95': round(r['tempo_p95'], 2),
+                'tempo_p99': round(r['tempo_p99'], 2)
+            })
         ferramentas_mais_lentas = sorted(
-            ferramentas_tempo_medio,
-            key=lambda x: x['tempo_medio'],
+            ferramentas_tempo,
+            key=lambda x: x['tempo_p95'],
             reverse=True
         )[:5]
 
-        # 3. Distribuição por hora (se houver timestamps)
-        horarios = defaultdict(int)
-        for evento in eventos:
-            try:
-                dt = datetime.fromisoformat(evento['timestamp'])
-                horarios[dt.hour] += 1
-            except (ValueError, KeyError):
-                pass
+        # 3. Distribuição por hora
+        horarios = Counter()
+        for agregado in ferramentas.values():
+            for hora, n in agregado.por_hora.items():
+                horarios[int(hora)] += n
 
-        horarios_pico = dict(sorted(horarios.items(), key=lambda x: x[1], reverse=True)[:5])
+        horarios_pico = dict(horarios.most_common(5))
 
         return {
             'ferramentas_mais_usadas': ferramentas_mais_usadas,
             'ferramentas_mais_lentas': ferramentas_mais_lentas,
             'horarios_pico': horarios_pico,
-            'total_eventos_analisados': len(eventos)
+            'total_eventos_analisados': sum(contador_uso.values())
         }
 
     def sugerir_otimizacoes(self) -> List[Sugestao]:
@@ -742,7 +1778,7 @@ class AnalisadorTelemetria:
         Returns:
             Lista de regressões detectadas
         """
-        eventos = self.carregar_eventos_ferramentas()
+        eventos = self.carregar_eventos_ferramentas(janela_antiga + janela_nova)
 
         if len(eventos) < janela_antiga + janela_nova:
             return []
@@ -833,10 +1869,24 @@ class AnalisadorTelemetria:
             if padroes.get('ferramentas_mais_lentas'):
                 linhas.append("\n⏱️  Top 5 Ferramentas Mais Lentas:")
                 for i, f in enumerate(padroes['ferramentas_mais_lentas'][:5], 1):
-                    linhas.append(f"   {i}. {f['ferramenta']}: {f['tempo_medio']:.2f}s médio")
+                    linhas.append(
+                        f"   {i}. {f['ferramenta']}: {f['tempo_medio']:.2f}s médio | "
+                        f"p95 {f['tempo_p95']:.2f}s | p99 {f['tempo_p99']:.2f}s"
+                    )
 
             linhas.append(f"\n📊 Total de eventos analisados: {padroes['total_eventos_analisados']}")
 
+        # 🆕 Latência de cauda da API (agregados da janela)
+        api = self.resumo_agregado()['api']
+        if api:
+            linhas.append("\n🌐 Latência da API por modelo:")
+            for modelo, r in sorted(api.items(), key=lambda x: -x[1]['eventos']):
+                linhas.append(
+                    f"   • {modelo}: {r['eventos']} req | p50 {r['tempo_p50']:.2f}s | "
+                    f"p95 {r['tempo_p95']:.2f}s | p99 {r['tempo_p99']:.2f}s | "
+                    f"tokens p95 {r['tokens_p95']:.0f}"
+                )
+
         linhas.append("")
 
         # 3. Sugestões de otimização
@@ -955,7 +2005,7 @@ if __name__ == '__main__':
 
     # 5. Analisar
     print("\nAnalise de telemetria:")
-    analisador = AnalisadorTelemetria()
+    analisador = AnalisadorTelemetria(telemetria=telemetria)
 
     # Padrões de uso
     padroes = analisador.identificar_padroes_uso()
@@ -969,6 +2019,5 @@ if __name__ == '__main__':
 
     print("\nSistema de telemetria funcionando!")
     print(f"\nArquivos criados:")
-    print(f"  - {telemetria.log_ferramentas}")
-    print(f"  - {telemetria.log_api}")
+    print(f"  - {telemetria.dir_segmentos}/ (segmentos diários + índices .idx)")
     print(f"  - {telemetria.log_sessoes}")
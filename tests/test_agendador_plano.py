@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - AGENDADOR DE SUBTAREFAS (DAG)
+=========================================
+
+Valida as arestas do grafo (dependências declaradas, onda anterior,
+ondas sequenciais), o início imediato quando as dependências terminam,
+a prioridade pelo caminho crítico, a tolerância a ciclos e os tempos de
+fila/execução reportados por executar_plano / executar_plano_async.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import AgendadorPlano, PlanificadorAvancado, Subtarefa, Onda, Plano
+
+
+def _st(id_, tempo="1s", deps=None):
+    return Subtarefa(id=id_, titulo=f"Subtarefa {id_}", descricao="teste", ferramentas=[],
+                     input_esperado="-", output_esperado="-", criterio_sucesso="-",
+                     tokens_estimados=100, tempo_estimado=tempo, prioridade="importante",
+                     dependencias=list(deps or []))
+
+
+def _plano_desigual():
+    """A (lenta) e B (rápida); C só depende de B, D depende de A."""
+    return [
+        Onda(1, "preparação", [_st("A", "0.4s"), _st("B", "0.05s")], True),
+        Onda(2, "uso", [_st("C", "0.05s", ["B"]), _st("D", "0.05s", ["A"])], True),
+    ]
+
+
+def _dormir(st):
+    time.sleep(AgendadorPlano.estimar_segundos(st.tempo_estimado))
+    return {'sucesso': True, 'output': st.id}
+
+
+class TestGrafo(unittest.TestCase):
+    """Arestas e prioridades (sem executar)"""
+
+    def test_arestas_implicitas(self):
+        """Sem dependências → onda anterior; onda sequencial → encadeada"""
+        agendador = AgendadorPlano([
+            Onda(1, "a", [_st("1.1"), _st("1.2")], True),
+            Onda(2, "b", [_st("2.1"), _st("2.2", deps=["1.2"]), _st("2.3", deps=["inexistente"])], False),
+        ])
+
+        self.assertEqual(agendador.dependencias["1.1"], [])
+        self.assertEqual(agendador.dependencias["2.1"], ["1.1", "1.2"])
+        self.assertEqual(agendador.dependencias["2.2"], ["1.2", "2.1"])
+        self.assertEqual(agendador.dependencias["2.3"], ["1.1", "1.2", "2.2"])
+
+    def test_caminho_critico_e_estimativas(self):
+        agendador = AgendadorPlano(_plano_desigual())
+
+        self.assertEqual(agendador.caminho_critico, ["A", "D"])
+        self.assertAlmostEqual(agendador.prioridade["A"], 0.45)
+        self.assertEqual(AgendadorPlano.estimar_segundos("5-10 minutos"), 450)
+        self.assertEqual(AgendadorPlano.estimar_segundos("1h"), 3600)
+        self.assertEqual(AgendadorPlano.estimar_segundos("desconhecido"), 30)
+
+
+class TestExecucao(unittest.TestCase):
+    """AgendadorPlano.executar / executar_async"""
+
+    def test_dependente_comeca_sem_esperar_a_onda(self):
+        """C começa quando B termina, enquanto A ainda roda"""
+        agendador = AgendadorPlano(_plano_desigual())
+
+        inicio = time.time()
+        resultados = agendador.executar(_dormir, max_workers=4)
+        duracao = time.time() - inicio
+
+        self.assertEqual(set(resultados), {"A", "B", "C", "D"})
+        self.assertLess(agendador.tempos["C"]["inicio"], 0.3)
+        self.assertGreaterEqual(agendador.tempos["D"]["inicio"], 0.4)
+        self.assertLess(duracao, 0.7)  # ≈ caminho crítico A → D (0.45s), não 0.4 + 0.05 por onda
+
+    def test_caminho_critico_sai_primeiro(self):
+        """Com um worker, a cadeia mais longa passa na frente da subtarefa curta"""
+        ordem = []
+        agendador = AgendadorPlano([
+            Onda(1, "a", [_st("curta", "1s"), _st("longa", "1s")], True),
+            Onda(2, "b", [_st("fim", "10s", ["longa"])], True),
+        ])
+
+        agendador.executar(lambda st: ordem.append(st.id) or {'sucesso': True}, max_workers=1)
+
+        self.assertEqual(ordem, ["longa", "fim", "curta"])
+        self.assertGreater(agendador.tempos["curta"]["espera_fila"], 0)
+
+    def test_ciclo_nao_trava(self):
+        agendador = AgendadorPlano([Onda(1, "a", [_st("x", deps=["y"]), _st("y", deps=["x"])], True)])
+
+        resultados = agendador.executar(lambda st: {'sucesso': True}, max_workers=2)
+
+        self.assertEqual(set(resultados), {"x", "y"})
+
+    def test_excecao_vira_falha(self):
+        def explodir(st):
+            raise RuntimeError("boom")
+
+        resultados = AgendadorPlano([Onda(1, "a", [_st("1")], True)]).executar(explodir)
+
+        self.assertEqual(resultados["1"]['erro'], "boom")
+
+    def test_async_respeita_limite(self):
+        ativas = {"agora": 0, "pico": 0}
+
+        async def executar(st):
+            ativas["agora"] += 1
+            ativas["pico"] = max(ativas["pico"], ativas["agora"])
+            await asyncio.sleep(AgendadorPlano.estimar_segundos(st.tempo_estimado))
+            ativas["agora"] -= 1
+            return {'sucesso': True}
+
+        agendador = AgendadorPlano(_plano_desigual())
+        asyncio.run(agendador.executar_async(executar, max_concorrencia=2))
+
+        self.assertEqual(ativas["pico"], 2)
+        self.assertLess(agendador.tempos["C"]["inicio"], 0.3)
+
+
+class TestPlanificadorDAG(unittest.TestCase):
+    """executar_plano() com o agendador (padrão)"""
+
+    def test_metricas_de_agendamento(self):
+        lock = threading.Lock()
+        chamadas = []
+
+        def executar_tarefa(prompt, max_iteracoes=None, contexto=None):
+            id_ = prompt.split(":")[0].replace("SUBTAREFA ", "")
+            with lock:
+                chamadas.append(id_)
+            time.sleep({"A": 0.3}.get(id_, 0.02))
+            return "ok"
+
+        planificador = PlanificadorAvancado(SimpleNamespace(executar_tarefa=executar_tarefa),
+                                            max_workers_paralelos=4, usar_dag=True)
+        plano = Plano(tarefa_original="t", analise={}, estrategia={}, decomposicao={}, ondas=_plano_desigual())
+
+        resultado = planificador.executar_plano(plano)
+
+        self.assertTrue(resultado['sucesso'])
+        self.assertEqual(resultado['concluidas'], 4)
+        agendamento = resultado['metricas']['agendamento']
+        self.assertEqual(agendamento['caminho_critico'], ["A", "D"])
+        self.assertLess(agendamento['subtarefas']["C"]["inicio"], 0.2)
+        self.assertIn('espera_fila', resultado['resultados']["C"])
+        self.assertLess(chamadas.index("C"), chamadas.index("D"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - LOOP ASYNCIO DO AGENTE
+==================================
+
+Valida a execução de planos como corrotinas (executar_plano_async) e a
+espera assíncrona do RateLimitManager, sem chamar a API real.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import (
+    PlanificadorAvancado, RateLimitManager, Subtarefa, Onda, Plano
+)
+
+
+def _subtarefa(id_: str) -> Subtarefa:
+    return Subtarefa(
+        id=id_, titulo=f"Subtarefa {id_}", descricao="teste",
+        ferramentas=[], input_esperado="-", output_esperado="-",
+        criterio_sucesso="-", tokens_estimados=100, tempo_estimado="1s",
+        prioridade="importante"
+    )
+
+
+class AgenteFalso:
+    """Agente mínimo: cada subtarefa 'dorme' 0.2s como se aguardasse a API."""
+
+    def __init__(self, falhar=None):
+        self.falhar = set(falhar or [])
+        self.chamadas = []
+        self.ativas = 0
+        self.pico_concorrencia = 0
+
+    async def executar_tarefa_async(self, prompt, max_iteracoes=None, usar_planejamento=True, cancelamento=None):
+        self.chamadas.append((prompt.split(':')[0], usar_planejamento))
+        self.ativas += 1
+        self.pico_concorrencia = max(self.pico_concorrencia, self.ativas)
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            self.ativas -= 1
+        if any(prompt.startswith(f"SUBTAREFA {i}:") for i in self.falhar):
+            raise RuntimeError("falha simulada")
+        return "ok"
+
+
+def _plano(paralelo: bool, n: int = 4) -> Plano:
+    onda = Onda(
+        numero=1, descricao="onda de teste",
+        subtarefas=[_subtarefa(f"1.{i}") for i in range(1, n + 1)],
+        pode_executar_paralelo=paralelo
+    )
+    return Plano(tarefa_original="teste", analise={}, estrategia={},
+                 decomposicao={}, ondas=[onda])
+
+
+class TestExecucaoPlanoAsync(unittest.TestCase):
+    """Testes de PlanificadorAvancado.executar_plano_async()"""
+
+    def test_onda_paralela_executa_concorrentemente(self):
+        """Subtarefas de onda paralela rodam ao mesmo tempo no event loop"""
+        agente = AgenteFalso()
+        planificador = PlanificadorAvancado(agente, max_workers_paralelos=4)
+
+        inicio = time.time()
+        resultado = asyncio.run(planificador.executar_plano_async(_plano(True)))
+        duracao = time.time() - inicio
+
+        self.assertTrue(resultado['sucesso'])
+        self.assertEqual(resultado['concluidas'], 4)
+        self.assertEqual(agente.pico_concorrencia, 4)
+        self.assertLess(duracao, 0.6)  # sequencial levaria ~0.8s
+
+    def test_semaforo_limita_concorrencia(self):
+        """max_workers_paralelos limita subtarefas simultâneas"""
+        agente = AgenteFalso()
+        planificador = PlanificadorAvancado(agente, max_workers_paralelos=2)
+
+        asyncio.run(planificador.executar_plano_async(_plano(True)))
+
+        self.assertEqual(agente.pico_concorrencia, 2)
+
+    def test_onda_sequencial_uma_por_vez(self):
+        """Ondas sem paralelismo executam uma subtarefa por vez"""
+        agente = AgenteFalso()
+        planificador = PlanificadorAvancado(agente, max_workers_paralelos=4)
+
+        resultado = asyncio.run(planificador.executar_plano_async(_plano(False, n=2)))
+
+        self.assertEqual(agente.pico_concorrencia, 1)
+        self.assertEqual(resultado['concluidas'], 2)
+
+    def test_subtarefas_nao_replanejam(self):
+        """Subtarefas são executadas com usar_planejamento=False"""
+        agente = AgenteFalso()
+        planificador = PlanificadorAvancado(agente)
+
+        asyncio.run(planificador.executar_plano_async(_plano(True, n=2)))
+
+        self.assertTrue(all(not usar for _, usar in agente.chamadas))
+
+    def test_falha_isolada_por_subtarefa(self):
+        """Exceção em uma subtarefa não cancela as demais"""
+        agente = AgenteFalso(falhar=["1.2"])
+        planificador = PlanificadorAvancado(agente)
+
+        resultado = asyncio.run(planificador.executar_plano_async(_plano(True)))
+
+        self.assertFalse(resultado['sucesso'])
+        self.assertEqual(resultado['concluidas'], 3)
+        self.assertEqual(resultado['detalhes_falhas'][0]['subtarefa_id'], "1.2")
+
+
+class TestRateLimitAsync(unittest.TestCase):
+    """Testes de RateLimitManager.aguardar_se_necessario_async()"""
+
+    def test_sem_espera_abaixo_do_limite(self):
+        """Com uso baixo, a corrotina retorna imediatamente"""
+        manager = RateLimitManager(tier="tier2", modo="balanceado")
+
+        inicio = time.time()
+        asyncio.run(manager.aguardar_se_necessario_async())
+
+        self.assertLess(time.time() - inicio, 0.5)
+        self.assertEqual(manager.total_esperas, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
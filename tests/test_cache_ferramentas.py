@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - CACHE DE COMPILAÇÃO DE FERRAMENTAS
+==============================================
+
+Valida que as ferramentas são validadas e compiladas uma única vez no
+registro, que o cache é invalidado quando o código muda e que o estado do
+sistema continua sendo injetado/devolvido a cada chamada.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import SistemaFerramentasCompleto, ExecucaoContexto, _CONTEXTO_EXECUCAO
+
+
+class TestCacheFerramentas(unittest.TestCase):
+    """Testes do cache de FerramentaCompilada"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir_original = os.getcwd()
+        cls.dir_temp = tempfile.mkdtemp()
+        os.chdir(cls.dir_temp)
+        cls.sistema = SistemaFerramentasCompleto(usar_memoria=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.dir_original)
+        shutil.rmtree(cls.dir_temp, ignore_errors=True)
+
+    def test_valida_uma_vez_no_registro(self):
+        """Chamadas repetidas não repetem validação AST nem exec"""
+        with mock.patch.object(self.sistema, "_validar_codigo_seguro",
+                               wraps=self.sistema._validar_codigo_seguro) as validar:
+            self.sistema.adicionar_ferramenta("dobro", "def dobro(n):\n    return n * 2")
+            resultados = [self.sistema.executar("dobro", {"n": i}) for i in range(5)]
+
+        self.assertEqual(resultados, ["0", "2", "4", "6", "8"])
+        self.assertEqual(validar.call_count, 1)
+
+    def test_novo_codigo_invalida_cache(self):
+        """Registrar de novo com outro código usa a nova versão"""
+        self.sistema.adicionar_ferramenta("versao", "def versao():\n    return 'v1'")
+        self.assertEqual(self.sistema.executar("versao", {}), "v1")
+
+        self.sistema.adicionar_ferramenta("versao", "def versao():\n    return 'v2'")
+        self.assertEqual(self.sistema.executar("versao", {}), "v2")
+
+    def test_alteracao_direta_do_codigo_recompila(self):
+        """Mudanças feitas direto em ferramentas_codigo também invalidam"""
+        self.sistema.adicionar_ferramenta("direta", "def direta():\n    return 'a'")
+        self.sistema.ferramentas_codigo["direta"] = "def direta():\n    return 'b'"
+
+        self.assertEqual(self.sistema.executar("direta", {}), "b")
+
+    def test_codigo_bloqueado_continua_bloqueado(self):
+        """Código reprovado no sandbox retorna erro de segurança em toda chamada"""
+        self.sistema.adicionar_ferramenta("perigosa", "def perigosa():\n    return eval('1')")
+
+        for _ in range(2):
+            self.assertTrue(self.sistema.executar("perigosa", {}).startswith("ERRO DE SEGURANÇA"))
+
+    def test_estado_injetado_e_devolvido(self):
+        """Ferramentas veem o estado atual e o que alteram volta ao sistema"""
+        self.sistema.adicionar_ferramenta(
+            "abrir", "def abrir():\n    global _page\n    _page = 'pagina-nova'\n    return 'ok'"
+        )
+        self.sistema.adicionar_ferramenta("ver_pagina", "def ver_pagina():\n    return str(_page)")
+
+        self.sistema.page = "pagina-antiga"
+        self.assertEqual(self.sistema.executar("ver_pagina", {}), "pagina-antiga")
+
+        self.sistema.executar("abrir", {})
+        self.assertEqual(self.sistema.page, "pagina-nova")
+        self.assertEqual(self.sistema.executar("ver_pagina", {}), "pagina-nova")
+
+        # Ferramenta que só lê não sobrescreve o estado alterado por outra
+        self.sistema.page = "pagina-externa"
+        self.sistema.executar("ver_pagina", {})
+        self.assertEqual(self.sistema.page, "pagina-externa")
+
+    def test_chamadas_concorrentes_nao_trocam_estado(self):
+        """Cada chamada vê o próprio _cancelamento, inclusive nas funções auxiliares"""
+        self.sistema.adicionar_ferramenta("quem", (
+            "import time\n"
+            "def _meu():\n"
+            "    return _cancelamento.motivo\n"
+            "def quem():\n"
+            "    antes = _meu()\n"
+            "    time.sleep(0.2)\n"
+            "    return antes + ':' + _meu()\n"
+        ))
+        resultados = {}
+        inicio = threading.Barrier(2)
+
+        def chamar(nome):
+            ctx = ExecucaoContexto(tarefa=nome,
+                                   cancelamento=SimpleNamespace(motivo=nome, cancelado=False))
+            _CONTEXTO_EXECUCAO.set(ctx)
+            inicio.wait()
+            resultados[nome] = self.sistema.executar("quem", {})
+
+        threads = [threading.Thread(target=chamar, args=(nome,)) for nome in "AB"]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(resultados, {"A": "A:A", "B": "B:B"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - CACHE DE PLANOS
+===========================
+
+Valida a impressão digital e a similaridade das tarefas, as trocas de
+entidades da adaptação leve, a indexação de Luna/planos (planos antigos,
+resultados, arquivos apagados), os planos com ferramentas que não existem
+mais e o reaproveitamento no planejar() e no ciclo salvar → executar →
+registrar resultado do agente.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_planos import (
+    CachePlanos, ARQUIVO_INDICE, impressao_digital, vetor_lexico, similaridade, substituicoes
+)
+from luna_v3_FINAL_OTIMIZADA import AgenteCompletoV3, PlanificadorAvancado, Plano, Onda, Subtarefa
+
+
+TAREFA = "Gere um relatório de vendas.csv em PDF e envie por email"
+
+
+def _plano(tarefa=TAREFA):
+    st = Subtarefa(id="1.1", titulo="Ler vendas.csv", descricao="Carregar vendas.csv com pandas",
+                   ferramentas=["ler_arquivo"], input_esperado="vendas.csv", output_esperado="DataFrame",
+                   criterio_sucesso="linhas > 0", tokens_estimados=1000, tempo_estimado="30s",
+                   prioridade="critica", concluida=True, resultado="ok")
+    return Plano(tarefa_original=tarefa, analise={"requisitos_explicitos": ["ler vendas.csv"]},
+                 estrategia={"abordagem": "pandas + reportlab"}, decomposicao={"total_subtarefas": 1},
+                 ondas=[Onda(1, "leitura", [st], False, concluida=True)])
+
+
+class TestTexto(unittest.TestCase):
+    """Impressão digital, vetor e trocas (sem disco)"""
+
+    def test_impressao_ignora_forma(self):
+        self.assertEqual(impressao_digital("Organize os arquivos da pasta Downloads"),
+                         impressao_digital("organize  pasta downloads, arquivos!"))
+        self.assertNotEqual(impressao_digital("organize a pasta"), impressao_digital("apague a pasta"))
+
+    def test_similaridade(self):
+        base = vetor_lexico(TAREFA)
+        parecida = vetor_lexico("gerar relatorio de compras.csv em PDF e enviar por e-mail")
+        outra = vetor_lexico("crie uma API REST com autenticação JWT")
+
+        self.assertAlmostEqual(similaridade(base, base), 1.0, places=4)
+        self.assertGreater(similaridade(base, parecida), 0.5)  # Flexões e outro arquivo
+        self.assertLess(similaridade(base, outra), 0.2)
+
+    def test_substituicoes(self):
+        self.assertEqual(substituicoes(TAREFA, "gere o relatório de compras.csv em PDF e envie por email"),
+                         {"vendas.csv": "compras.csv"})
+        self.assertEqual(substituicoes("Crie uma API REST", "criar a API REST"), {})  # Flexão/stopwords
+        self.assertIsNone(substituicoes("crie API REST", "crie API REST com testes"))  # Requisito a mais
+        self.assertEqual(substituicoes("leia arquivo1", "leia arquivo2"), {"arquivo1": "arquivo2"})
+
+    def test_so_entidades_sao_trocadas(self):
+        """Verbo ou objeto diferente é outro pedido; arquivo, número e texto citado não"""
+        self.assertIsNone(substituicoes("instalar o pacote requests", "desinstalar o pacote requests"))
+        self.assertIsNone(substituicoes("criar a pasta build", "remover a pasta build"))
+        self.assertIsNone(substituicoes("leia vendas.csv", "leia relatorio"))
+        self.assertEqual(substituicoes("copie src/app para 2023", "copie src/api para 2024"),
+                         {"src/app": "src/api", "2023": "2024"})
+        self.assertEqual(substituicoes('crie o relatório "Vendas Norte"', 'crie o relatório "Vendas Sul"'),
+                         {"Norte": "Sul"})
+
+
+class TestCachePlanos(unittest.TestCase):
+    """Índice em disco"""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+    def _salvar(self, nome, plano=None, resultado=None):
+        plano = plano or _plano()
+        plano.resultado = resultado
+        caminho = os.path.join(self.diretorio, nome)
+        plano.salvar(caminho)
+        return caminho
+
+    def test_planos_antigos_indexados_com_resultado(self):
+        self._salvar("plano_ok.json", resultado={"sucesso": True})
+        self._salvar("plano_sem_execucao.json", _plano("limpar a pasta temp"))
+        with open(os.path.join(self.diretorio, "plano_quebrado.json"), "w") as f:
+            f.write("{")
+
+        cache = CachePlanos(self.diretorio)
+
+        self.assertEqual(set(cache.entradas), {"plano_ok.json", "plano_sem_execucao.json"})
+        self.assertEqual(cache.buscar(TAREFA)["arquivo"], "plano_ok.json")
+        self.assertIsNone(cache.buscar("limpar a pasta temp"))  # Nunca executado: não reaproveita
+        self.assertTrue(os.path.exists(os.path.join(self.diretorio, ARQUIVO_INDICE)))
+
+    def test_resultado_decide_e_persiste(self):
+        caminho = self._salvar("plano_1.json")
+        cache = CachePlanos(self.diretorio)
+        cache.registrar(caminho, TAREFA, 1)
+        self.assertIsNone(cache.buscar(TAREFA))
+
+        cache.registrar_resultado(caminho, True)
+        self.assertEqual(cache.buscar(TAREFA.upper())["modo"], "reuso")
+
+        cache.registrar_resultado(caminho, False)  # Última execução falhou
+        self.assertIsNone(cache.buscar(TAREFA))
+
+        cache.registrar_resultado(caminho, True)
+        reaberto = CachePlanos(self.diretorio)
+        self.assertEqual(reaberto.entradas["plano_1.json"]["execucoes"], 3)
+        self.assertEqual(reaberto.entradas["plano_1.json"]["sucessos"], 2)
+
+        os.remove(caminho)
+        reaberto.sincronizar()
+        self.assertEqual(reaberto.entradas, {})
+
+    def test_adaptacao_troca_palavras_e_zera_estado(self):
+        self._salvar("plano_ok.json", resultado={"sucesso": True})
+        cache = CachePlanos(self.diretorio)
+
+        acerto = cache.buscar("Gere um relatório de compras.csv em PDF e envie por email")
+        dados = cache.carregar(acerto)
+
+        self.assertEqual(acerto["modo"], "adaptacao")
+        subtarefa = dados["ondas"][0]["subtarefas"][0]
+        self.assertEqual(subtarefa["descricao"], "Carregar compras.csv com pandas")
+        self.assertEqual(dados["analise"]["requisitos_explicitos"], ["ler compras.csv"])
+        self.assertFalse(subtarefa["concluida"])
+        self.assertIsNone(subtarefa["resultado"])
+        self.assertEqual(cache.estatisticas()["reaproveitamentos"], 1)
+
+        self.assertIsNone(cache.buscar(TAREFA + " e gere gráficos"))  # Pedido diferente
+
+    def test_plano_com_ferramenta_removida_ignorado(self):
+        self._salvar("plano_ok.json", resultado={"sucesso": True})
+        cache = CachePlanos(self.diretorio)
+
+        self.assertIsNotNone(cache.buscar(TAREFA, {"ler_arquivo", "bash_avancado"}))
+        self.assertIsNone(cache.buscar(TAREFA, {"bash_avancado"}))
+
+    def test_planejar_sem_chamadas_a_api(self):
+        self._salvar("plano_ok.json", resultado={"sucesso": True})
+        planificador = PlanificadorAvancado(SimpleNamespace(), cache=CachePlanos(self.diretorio))
+
+        plano = planificador.planejar("gere relatório de compras.csv em PDF e envie por email")
+
+        self.assertEqual(plano.ondas[0].subtarefas[0].input_esperado, "compras.csv")
+        self.assertEqual(plano.origem["arquivo"], "plano_ok.json")
+        self.assertEqual(planificador.metricas["planos_reaproveitados"], 1)
+        self.assertEqual(planificador.metricas["planos_criados"], 0)
+
+    def test_planejar_verifica_ferramentas_do_agente(self):
+        self._salvar("plano_ok.json", resultado={"sucesso": True})
+        agente = SimpleNamespace(sistema_ferramentas=SimpleNamespace(ferramentas_codigo={"bash_avancado": ""}))
+        planificador = PlanificadorAvancado(agente, cache=CachePlanos(self.diretorio))
+
+        self.assertIsNone(planificador._plano_do_cache(TAREFA))
+        self.assertEqual(planificador.metricas["planos_reaproveitados"], 0)
+
+
+class TestAgenteCachePlanos(unittest.TestCase):
+    """_salvar_plano / _finalizar_execucao_plano alimentam o cache"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir_original = os.getcwd()
+        cls.dir_temp = tempfile.mkdtemp()
+        os.chdir(cls.dir_temp)
+        cls.agente = AgenteCompletoV3("sk-teste", usar_memoria=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.dir_original)
+        shutil.rmtree(cls.dir_temp, ignore_errors=True)
+
+    def test_ciclo_salvar_executar_reaproveitar(self):
+        cache = self.agente.planificador.cache
+        plano = _plano()
+
+        self.agente._salvar_plano(plano)
+        self.assertIn(os.path.basename(plano.arquivo), cache.entradas)
+
+        resultado = {'sucesso': True, 'concluidas': 1, 'total_subtarefas': 1, 'falhas': 0}
+        self.agente._finalizar_execucao_plano(TAREFA, plano, resultado)
+
+        reaproveitado = self.agente.planificador.planejar(TAREFA)
+        self.assertEqual(reaproveitado.origem["modo"], "reuso")
+
+        self.agente._salvar_plano(reaproveitado)  # Sem arquivo novo: continua no de origem
+        self.assertEqual(reaproveitado.arquivo, plano.arquivo)
+        self.assertEqual(len([n for n in os.listdir("Luna/planos") if n != ARQUIVO_INDICE]), 1)
+
+        self.agente._finalizar_execucao_plano(TAREFA, reaproveitado, resultado)
+        with open(os.path.join("Luna/planos", ARQUIVO_INDICE), encoding="utf-8") as f:
+            entrada = json.load(f)["planos"][os.path.basename(plano.arquivo)]
+        self.assertEqual((entrada["execucoes"], entrada["reaproveitamentos"]), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - CANCELAMENTO COOPERATIVO E PRAZOS
+=============================================
+
+Valida o TokenCancelamento (prazo, hierarquia, callbacks, espera
+interrompível), a interrupção das esperas de rate limit e de backoff,
+o loop de executar_tarefa parando sem novas chamadas à API, as
+ferramentas recusadas/encerradas e o prazo por subtarefa do plano.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import contextvars
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import (
+    AgenteCompletoV3, ExecucaoContexto, PlanificadorAvancado, PoliticaRetentativa, RateLimitManager,
+    TarefaCancelada, TokenCancelamento, Subtarefa, Onda, Plano, SEGURANCA_SOMENTE_LEITURA
+)
+
+
+class Relogio:
+    """Tempo controlado pelo teste."""
+
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _cancelar_depois(token, segundos, motivo="teste"):
+    threading.Timer(segundos, token.cancelar, args=(motivo,)).start()
+
+
+class TestTokenCancelamento(unittest.TestCase):
+    """TokenCancelamento isolado"""
+
+    def test_prazo_e_restante(self):
+        relogio = Relogio()
+        token = TokenCancelamento(prazo=10, relogio=relogio)
+
+        relogio.agora = 4
+        self.assertFalse(token.cancelado)
+        self.assertEqual(token.restante(), 6)
+        self.assertEqual(token.limitar(60), 6)
+
+        relogio.agora = 10
+        self.assertTrue(token.cancelado)
+        self.assertIn("prazo de 10s", token.motivo)
+        with self.assertRaises(TarefaCancelada):
+            token.verificar()
+
+    def test_filho_herda_prazo_e_cancelamento(self):
+        relogio = Relogio()
+        raiz = TokenCancelamento(relogio=relogio)
+        tarefa = raiz.filho(prazo=5)
+        subtarefa = tarefa.filho(prazo=100)
+        chamados = []
+        subtarefa.ao_cancelar(lambda: chamados.append("bash"))
+
+        self.assertEqual(subtarefa.restante(), 5)  # O prazo do pai vence antes
+
+        raiz.cancelar("Ctrl+C")
+
+        self.assertTrue(subtarefa.cancelado)
+        self.assertEqual(subtarefa.motivo, "Ctrl+C")
+        self.assertEqual(chamados, ["bash"])
+        self.assertTrue(raiz.filho().cancelado)  # Filho de token cancelado já nasce cancelado
+
+    def test_aguardar_acorda_no_cancelamento(self):
+        token = TokenCancelamento()
+        _cancelar_depois(token, 0.1)
+
+        inicio = time.monotonic()
+        self.assertTrue(token.aguardar(10))
+        self.assertLess(time.monotonic() - inicio, 2)
+        self.assertFalse(TokenCancelamento().aguardar(0.01))
+
+
+class ErroSobrecarga(Exception):
+    status_code = 529
+
+
+class TestEsperasInterrompidas(unittest.TestCase):
+    """Backoff e rate limit não seguram uma execução cancelada"""
+
+    def test_backoff_interrompido(self):
+        politica = PoliticaRetentativa(max_tentativas=5)
+        politica.calcular_espera = lambda tentativa, erro: 10.0
+        token = TokenCancelamento()
+        _cancelar_depois(token, 0.1)
+        chamadas = []
+
+        def falhar():
+            chamadas.append(1)
+            raise ErroSobrecarga("overloaded")
+
+        inicio = time.monotonic()
+        with self.assertRaises(TarefaCancelada):
+            politica.executar(falhar, cancelamento=token)
+        self.assertLess(time.monotonic() - inicio, 2)
+        self.assertEqual(len(chamadas), 1)
+
+    def test_espera_de_rate_limit_interrompida(self):
+        manager = RateLimitManager(tier="tier1", modo="conservador")
+        manager.pausar(10)
+        token = TokenCancelamento(prazo=0.2)
+
+        inicio = time.monotonic()
+        with self.assertRaises(TarefaCancelada):
+            manager.aguardar_se_necessario(1000, 100, cancelamento=token)
+
+        self.assertLess(time.monotonic() - inicio, 2)
+        self.assertEqual(len(manager._reservas_pendentes), 0)  # Reserva devolvida
+
+
+def _resposta(stop_reason, *blocos):
+    return SimpleNamespace(
+        stop_reason=stop_reason,
+        content=list(blocos),
+        usage=SimpleNamespace(input_tokens=10, output_tokens=5,
+                              cache_read_input_tokens=0, cache_creation_input_tokens=0)
+    )
+
+
+class MensagensInfinitas:
+    """Sempre pede mais uma ferramenta (a tarefa nunca termina sozinha)."""
+
+    def __init__(self):
+        self.chamadas = []
+
+    def create(self, **params):
+        self.chamadas.append((time.monotonic(), params.get("timeout")))
+        time.sleep(0.05)
+        return _resposta("tool_use", SimpleNamespace(
+            type="tool_use", id=f"t{len(self.chamadas)}", name="eco", input={"texto": "x"}
+        ))
+
+
+class TestAgenteCancelamento(unittest.TestCase):
+    """executar_tarefa e ferramentas com token"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir_original = os.getcwd()
+        cls.dir_temp = tempfile.mkdtemp()
+        os.chdir(cls.dir_temp)
+        cls.agente = AgenteCompletoV3("sk-teste", usar_memoria=False)
+        cls.agente.usar_streaming = False
+        cls.agente.sistema_ferramentas.adicionar_ferramenta(
+            "eco", "def eco(texto: str) -> str:\n    return 'eco ' + texto",
+            seguranca=SEGURANCA_SOMENTE_LEITURA
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.dir_original)
+        shutil.rmtree(cls.dir_temp, ignore_errors=True)
+
+    def test_prazo_encerra_e_limita_timeout_da_api(self):
+        mensagens = MensagensInfinitas()
+        self.agente.client = SimpleNamespace(messages=mensagens)
+        ctx = ExecucaoContexto(interativo=False, usar_planejamento=False,
+                               cancelamento=TokenCancelamento(prazo=0.3))
+
+        resultado = self.agente.executar_tarefa("tarefa sem fim", max_iteracoes=100, contexto=ctx)
+
+        self.assertIsNone(resultado)
+        self.assertLess(ctx.iteracao, 20)
+        self.assertLessEqual(mensagens.chamadas[0][1], 0.3 + 1)  # timeout da requisição ≤ prazo (piso 1s)
+
+    def test_cancelar_execucao_para_em_uma_iteracao(self):
+        mensagens = MensagensInfinitas()
+        self.agente.client = SimpleNamespace(messages=mensagens)
+        ctx = ExecucaoContexto(interativo=False, usar_planejamento=False,
+                               cancelamento=self.agente.cancelamento.filho())
+        cancelado_em = []
+
+        def cancelar():
+            cancelado_em.append(time.monotonic())
+            self.agente.cancelar_execucao("Ctrl+C")
+
+        threading.Timer(0.2, cancelar).start()
+
+        resultado = self.agente.executar_tarefa("tarefa sem fim", max_iteracoes=100, contexto=ctx)
+
+        self.assertIsNone(resultado)
+        self.assertEqual(ctx.cancelamento.motivo, "Ctrl+C")
+        self.assertIsNone(mensagens.chamadas[0][1])  # Sem prazo: timeout padrão do cliente
+        # Nenhuma chamada nova depois do cancelamento (no máximo uma já a caminho)
+        self.assertLessEqual(sum(1 for instante, _ in mensagens.chamadas if instante > cancelado_em[0]), 1)
+        self.assertFalse(self.agente.cancelamento.cancelado)  # Tarefas novas recebem um token novo
+
+    def test_ferramenta_nao_executa_em_contexto_cancelado(self):
+        ctx = ExecucaoContexto(interativo=False, cancelamento=TokenCancelamento())
+        ctx.cancelamento.cancelar("prazo")
+
+        def executar():
+            ctx.iniciar("t", "p")
+            return self.agente.sistema_ferramentas.executar("eco", {"texto": "x"})
+
+        saida = contextvars.copy_context().run(executar)
+
+        self.assertTrue(saida.startswith("ERRO: execução cancelada (prazo)"))
+
+    def test_cancelamento_encerra_comando_bash(self):
+        sessoes = self.agente.sistema_ferramentas.sessoes_bash
+        if sessoes is None or not sessoes.disponivel:
+            self.skipTest("bash indisponível")
+        ctx = ExecucaoContexto(interativo=False, cancelamento=TokenCancelamento())
+
+        def executar():
+            ctx.iniciar("t", "p")
+            self.agente._vincular_cancelamento(ctx)
+            return self.agente.sistema_ferramentas.executar("bash_avancado", {"comando": "sleep 30", "timeout": 60})
+
+        _cancelar_depois(ctx.cancelamento, 0.5)
+        inicio = time.monotonic()
+        contextvars.copy_context().run(executar)
+
+        self.assertLess(time.monotonic() - inicio, 10)
+
+
+def _st(id_, tempo="1s"):
+    return Subtarefa(id=id_, titulo=f"Subtarefa {id_}", descricao="teste", ferramentas=[],
+                     input_esperado="-", output_esperado="-", criterio_sucesso="-",
+                     tokens_estimados=100, tempo_estimado=tempo, prioridade="importante")
+
+
+class TestPrazoSubtarefas(unittest.TestCase):
+    """Prazo por subtarefa vindo da estimativa do plano"""
+
+    def _planificador(self, usar_dag):
+        iteracoes = {}
+
+        def executar_tarefa(prompt, max_iteracoes=None, contexto=None):
+            id_ = prompt.split(":")[0].replace("SUBTAREFA ", "")
+            iteracoes[id_] = 0
+            while id_ == "lenta" and iteracoes[id_] < 1000:  # "Iterações" até o token parar
+                if contexto.cancelamento.cancelado:
+                    return None
+                iteracoes[id_] += 1
+                time.sleep(0.01)
+            return "ok"
+
+        planificador = PlanificadorAvancado(SimpleNamespace(executar_tarefa=executar_tarefa),
+                                            max_workers_paralelos=4, usar_dag=usar_dag, fator_prazo=0.2)
+        planificador.PRAZO_MINIMO_SUBTAREFA = 0
+        return planificador, iteracoes
+
+    def test_subtarefa_atrasada_cancelada_sem_derrubar_a_onda(self):
+        for usar_dag in (False, True):
+            with self.subTest(usar_dag=usar_dag):
+                planificador, iteracoes = self._planificador(usar_dag)
+                plano = Plano(tarefa_original="t", analise={}, estrategia={}, decomposicao={}, ondas=[
+                    Onda(1, "a", [_st("lenta"), _st("rapida"), _st("outra")], True)
+                ])
+
+                inicio = time.monotonic()
+                resultado = planificador.executar_plano(plano)
+
+                self.assertLess(time.monotonic() - inicio, 3)
+                self.assertLess(iteracoes["lenta"], 100)  # ~0.2s de prazo (1s × 0.2)
+                self.assertEqual(resultado['concluidas'], 2)
+                self.assertEqual(resultado['metricas']['canceladas'], 1)
+                falha = resultado['detalhes_falhas'][0]
+                self.assertTrue(falha['cancelada'])
+                self.assertTrue(falha['erro'].startswith("Cancelada: prazo"))
+
+    def test_sem_prazo_com_fator_zero(self):
+        planificador, _ = self._planificador(False)
+        planificador.fator_prazo = 0
+
+        self.assertIsNone(planificador._token_subtarefa(_st("x")).restante())
+
+    def test_prazo_padrao_folgado(self):
+        """Estimativa curta ("30s") não vira prazo apertado: piso de 10 min, fator 10"""
+        os.environ.pop('LUNA_PRAZO_SUBTAREFA_FATOR', None)
+        planificador = PlanificadorAvancado(SimpleNamespace())
+
+        self.assertAlmostEqual(planificador._token_subtarefa(_st("c", "30s")).restante(), 600, delta=1)
+        self.assertAlmostEqual(planificador._token_subtarefa(_st("l", "2 minutos")).restante(), 1200, delta=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - COMPACTAÇÃO DE HISTÓRICO
+====================================
+
+Valida que o CompactadorHistorico respeita o orçamento de tokens sem
+quebrar pares tool_use/tool_result.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import CompactadorHistorico
+
+
+def _historico(turnos: int, tamanho_resultado: int = 4000):
+    """Tarefa + N turnos (assistant com tool_use, user com tool_result)."""
+    historico = [{"role": "user", "content": "TAREFA: gerar relatório"}]
+    for i in range(turnos):
+        historico.append({"role": "assistant", "content": [
+            {"type": "text", "text": f"Passo {i}"},
+            {"type": "tool_use", "id": f"t{i}", "name": "ler_arquivo", "input": {"caminho": f"arq{i}.txt"}},
+        ]})
+        historico.append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": f"t{i}", "content": "x" * tamanho_resultado},
+        ]})
+    return historico
+
+
+def _pares_validos(historico) -> bool:
+    """Todo tool_result referencia um tool_use da mensagem anterior."""
+    for i, mensagem in enumerate(historico):
+        if not isinstance(mensagem["content"], list):
+            continue
+        for bloco in mensagem["content"]:
+            if bloco.get("type") != "tool_result":
+                continue
+            anterior = historico[i - 1]
+            ids = {b.get("id") for b in anterior["content"] if isinstance(anterior["content"], list)}
+            if anterior["role"] != "assistant" or bloco["tool_use_id"] not in ids:
+                return False
+    return True
+
+
+class TestCompactadorHistorico(unittest.TestCase):
+    """Testes do CompactadorHistorico"""
+
+    def test_abaixo_do_orcamento_nao_altera(self):
+        """Histórico pequeno fica intacto"""
+        compactador = CompactadorHistorico(orcamento_tokens=100000)
+        historico = _historico(3)
+        copia = list(historico)
+
+        self.assertFalse(compactador.compactar(historico))
+        self.assertEqual(historico, copia)
+
+    def test_omite_resultados_antigos_primeiro(self):
+        """Etapa 1 encurta tool_results antigos e preserva os recentes"""
+        compactador = CompactadorHistorico(orcamento_tokens=6000, manter_mensagens_recentes=4)
+        historico = _historico(10)
+
+        self.assertTrue(compactador.compactar(historico))
+
+        self.assertLessEqual(compactador.estimar_tokens(historico), 6000)
+        self.assertIn("omitidos", historico[2]["content"][0]["content"])
+        self.assertEqual(historico[-1]["content"][0]["content"], "x" * 4000)
+        self.assertTrue(_pares_validos(historico))
+
+    def test_resume_turnos_antigos(self):
+        """Etapa 2 resume mensagens antigas e anexa à tarefa original"""
+        resumos = []
+
+        def resumidor(texto):
+            resumos.append(texto)
+            return "Lidos arquivos 0..N"
+
+        compactador = CompactadorHistorico(orcamento_tokens=1500, manter_mensagens_recentes=4,
+                                           resumidor=resumidor)
+        historico = _historico(30)
+
+        self.assertTrue(compactador.compactar(historico))
+
+        self.assertEqual(len(resumos), 1)
+        self.assertTrue(historico[0]["content"].startswith("TAREFA: gerar relatório"))
+        self.assertIn("Lidos arquivos 0..N", historico[0]["content"])
+        self.assertEqual(historico[1]["role"], "assistant")
+        self.assertTrue(_pares_validos(historico))
+
+    def test_resumidor_falho_usa_resumo_local(self):
+        """Falha na chamada do modelo barato cai no resumo extrativo"""
+        def resumidor(texto):
+            raise RuntimeError("API indisponível")
+
+        compactador = CompactadorHistorico(orcamento_tokens=1500, manter_mensagens_recentes=4,
+                                           resumidor=resumidor)
+        historico = _historico(30)
+
+        compactador.compactar(historico)
+
+        self.assertIn("Ferramentas já executadas: ler_arquivo", historico[0]["content"])
+        self.assertTrue(_pares_validos(historico))
+
+    def test_recompactacao_substitui_resumo(self):
+        """Resumo anterior é incorporado, não duplicado"""
+        compactador = CompactadorHistorico(orcamento_tokens=1500, manter_mensagens_recentes=4,
+                                           resumidor=lambda texto: f"resumo com {len(texto)} chars")
+        historico = _historico(30)
+        compactador.compactar(historico)
+        historico.extend(_historico(30)[1:])
+        compactador.compactar(historico)
+
+        self.assertEqual(historico[0]["content"].count(CompactadorHistorico.MARCADOR_RESUMO), 1)
+        self.assertEqual(compactador.metricas["compactacoes"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
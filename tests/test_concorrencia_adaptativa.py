@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - CONCORRÊNCIA ADAPTATIVA (AIMD)
+==========================================
+
+Valida a partida lenta e o aumento aditivo do ControladorConcorrencia,
+as reduções por 429, espera de rate limit e latência, os sinais vindos
+do RateLimitManager, o limite dinâmico no AgendadorPlano e o estado
+exposto na telemetria.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import (
+    ControladorConcorrencia, RateLimitManager, AgendadorPlano, Subtarefa, Onda
+)
+
+
+class Relogio:
+    """Tempo controlado pelo teste."""
+
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _janela(controlador, relogio, duracao=1.0, tokens=1000, intervalo=1.0):
+    """Uma janela cheia: `atual` subtarefas simultâneas terminando juntas."""
+    n = controlador.atual
+    for _ in range(n):
+        controlador.iniciar()
+    relogio.agora += intervalo
+    for _ in range(n):
+        controlador.registrar_conclusao(duracao, tokens)
+    return n
+
+
+class TestControladorConcorrencia(unittest.TestCase):
+    """Regras AIMD com relógio falso"""
+
+    def setUp(self):
+        self.relogio = Relogio()
+        self.ajustes = []
+        self.controlador = ControladorConcorrencia(
+            maximo=20, inicial=2, limiar=8, relogio=self.relogio, ao_mudar=self.ajustes.append
+        )
+
+    def test_partida_lenta_e_aumento_aditivo(self):
+        """Vazão crescendo: 2 → 4 → 8 (dobra até o limiar), depois +1"""
+        limites = []
+        for _ in range(5):
+            _janela(self.controlador, self.relogio)  # n subtarefas/s: vazão cresce com o limite
+            limites.append(self.controlador.atual)
+
+        self.assertEqual(limites, [4, 8, 9, 10, 11])
+        self.assertEqual(self.ajustes[-1]["limite"], 11)
+        self.assertEqual(self.ajustes[-1]["ajustes"][0]["motivo"], "vazão subiu")
+
+    def test_vazao_parada_mantem(self):
+        """Mais concorrência sem mais vazão: o limite fica onde está"""
+        _janela(self.controlador, self.relogio)  # 2 → 4
+        _janela(self.controlador, self.relogio, intervalo=2.0)  # 4 em 2s: mesma vazão
+
+        self.assertEqual(self.controlador.atual, 4)
+
+    def test_sem_ocupacao_nao_cresce(self):
+        """Janela que não usou o limite todo não prova nada"""
+        for _ in range(3):
+            self.controlador.iniciar()
+            self.relogio.agora += 1
+            self.controlador.registrar_conclusao(1.0, 1000)
+
+        self.assertEqual(self.controlador.atual, 2)
+
+    def test_429_reduz_pela_metade_uma_vez(self):
+        for _ in range(3):
+            _janela(self.controlador, self.relogio)  # 2 → 4 → 8 → 9
+
+        self.controlador.sinalizar_limite("429", 5)
+        self.controlador.sinalizar_limite("429", 5)  # Mesmo surto: ignorado
+
+        self.assertEqual(self.controlador.atual, 4)
+        self.assertEqual(self.controlador.sinais["429"], 2)
+
+        self.relogio.agora += 10
+        self.controlador.sinalizar_limite("429", 5)
+        self.assertEqual(self.controlador.atual, 2)
+
+    def test_espera_curta_ignorada_longa_reduz(self):
+        controlador = ControladorConcorrencia(maximo=20, inicial=8, relogio=self.relogio)
+
+        controlador.sinalizar_limite("espera", 0.2)
+        self.assertEqual(controlador.atual, 8)
+
+        controlador.sinalizar_limite("espera", 3.0)
+        self.assertEqual(controlador.atual, 6)
+
+    def test_latencia_inflada_reduz(self):
+        _janela(self.controlador, self.relogio)  # base: 1s por 1k tokens; 2 → 4
+        self.relogio.agora += 10
+        _janela(self.controlador, self.relogio, duracao=3.0, intervalo=3.0)
+
+        self.assertEqual(self.controlador.atual, 3)
+        self.assertEqual(self.controlador.sinais["latencia"], 1)
+
+    def test_latencia_normalizada_pelo_tamanho(self):
+        """Subtarefa 4x maior e 4x mais lenta não é congestionamento"""
+        _janela(self.controlador, self.relogio)  # 2 → 4
+        _janela(self.controlador, self.relogio, duracao=4.0, tokens=4000, intervalo=1.0)
+
+        self.assertEqual(self.controlador.sinais["latencia"], 0)
+        self.assertEqual(self.controlador.atual, 8)
+
+
+class TestSinaisRateLimit(unittest.TestCase):
+    """RateLimitManager avisa os observadores"""
+
+    def test_pausa_e_espera_notificadas(self):
+        manager = RateLimitManager(tier="tier1", modo="conservador")
+        sinais = []
+        manager.adicionar_observador(lambda motivo, segundos: sinais.append(motivo))
+
+        manager.pausar(2.0)
+        manager.reservar(1000, 100)  # Pausa ainda vale: reserva com espera
+
+        self.assertEqual(sinais, ["429", "espera"])
+
+    def test_observador_com_erro_nao_afeta_a_requisicao(self):
+        manager = RateLimitManager(tier="tier2", modo="balanceado")
+        manager.adicionar_observador(lambda motivo, segundos: 1 / 0)
+
+        manager.pausar(0.01)  # Não levanta
+
+
+class TestAgendadorComControlador(unittest.TestCase):
+    """O agendador consulta o limite a cada despacho"""
+
+    def test_limite_dinamico_respeitado(self):
+        controlador = ControladorConcorrencia(maximo=8, inicial=2)
+        ativas = {"agora": 0, "pico": 0}
+        lock = threading.Lock()
+
+        def executar(st):
+            with lock:
+                ativas["agora"] += 1
+                ativas["pico"] = max(ativas["pico"], ativas["agora"])
+            time.sleep(0.02)
+            with lock:
+                ativas["agora"] -= 1
+            if st.id == "1.3":
+                controlador.sinalizar_limite("429", 1)  # Cai para 1
+            return {'sucesso': True}
+
+        subtarefas = [Subtarefa(id=f"1.{i}", titulo="t", descricao="d", ferramentas=[], input_esperado="",
+                                output_esperado="", criterio_sucesso="", tokens_estimados=1000,
+                                tempo_estimado="1s", prioridade="importante") for i in range(1, 13)]
+        AgendadorPlano([Onda(1, "a", subtarefas, True)]).executar(executar, controlador=controlador)
+
+        self.assertLessEqual(ativas["pico"], 8)
+        self.assertEqual(controlador.em_execucao, 0)
+        self.assertEqual(controlador.sinais["429"], 1)
+
+
+class TestTelemetriaConcorrencia(unittest.TestCase):
+    """Estado do limite visível nas métricas da sessão"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_estado_nas_metricas_e_na_sessao_salva(self):
+        from telemetria_manager import TelemetriaManager
+        telemetria = TelemetriaManager(base_dir=self.temp_dir)
+        self.addCleanup(telemetria.fechar)
+        telemetria.iniciar_sessao()
+        controlador = ControladorConcorrencia(maximo=10, inicial=4, ao_mudar=telemetria.registrar_concorrencia)
+
+        controlador.sinalizar_limite("429", 1)
+
+        self.assertEqual(telemetria.obter_metricas_sessao()["concorrencia"]["limite"], 2)
+        telemetria.finalizar_sessao()
+        with open(telemetria.log_sessoes, encoding="utf-8") as f:
+            sessao = json.load(f)["sessoes"][-1]
+        self.assertEqual(sessao["concorrencia"]["sinais"]["429"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - EDIÇÃO PONTUAL DE ARQUIVOS
+======================================
+
+Valida as substituições exatas (âncora única, ambígua, ausente), a
+aplicação de unified diffs com linhas deslocadas, o tudo-ou-nada, a
+preservação de CRLF/BOM/permissões e o editar_arquivo do sistema de
+ferramentas.
+"""
+
+import os
+import sys
+import stat
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from editor_arquivos import EditorArquivos, ErroEdicao, aplicar_substituicoes, aplicar_diff
+
+
+CODIGO = """def soma(a, b):
+    return a + b
+
+
+def subtrai(a, b):
+    return a - b
+
+
+def principal():
+    print(soma(1, 2))
+    print(subtrai(3, 1))
+"""
+
+
+class TestSubstituicoes(unittest.TestCase):
+    """aplicar_substituicoes (sem disco)"""
+
+    def test_ancora_unica_e_sequencia(self):
+        """Cada edição vê o resultado da anterior"""
+        texto = aplicar_substituicoes(CODIGO, [
+            {"buscar": "def soma(a, b):\n    return a + b", "substituir": "def soma(a, b, c=0):\n    return a + b + c"},
+            {"buscar": "soma(1, 2)", "substituir": "soma(1, 2, 3)"},
+        ])
+
+        self.assertIn("return a + b + c", texto)
+        self.assertIn("print(soma(1, 2, 3))", texto)
+
+    def test_ancora_ambigua_lista_linhas(self):
+        with self.assertRaises(ErroEdicao) as ctx:
+            aplicar_substituicoes(CODIGO, [{"buscar": "(a, b):", "substituir": "(x, y):"}])
+        self.assertIn("2 vezes (linhas 1, 5)", str(ctx.exception))
+
+        texto = aplicar_substituicoes(CODIGO, [{"buscar": "(a, b):", "substituir": "(x, y):", "todas": True}])
+        self.assertEqual(texto.count("(x, y):"), 2)
+
+    def test_ancora_ausente_aponta_indentacao(self):
+        """Trecho com indentação errada: a mensagem indica a linha certa"""
+        with self.assertRaises(ErroEdicao) as ctx:
+            aplicar_substituicoes(CODIGO, [{"buscar": "\treturn a - b", "substituir": "x"}])
+        self.assertIn("linha 6", str(ctx.exception))
+
+
+class TestDiff(unittest.TestCase):
+    """aplicar_diff (sem disco)"""
+
+    def test_hunks_com_linhas_deslocadas(self):
+        """Números de linha desatualizados: o contexto localiza o hunk"""
+        diff = """--- a/mod.py
++++ b/mod.py
+@@ -3,3 +3,3 @@
+ def subtrai(a, b):
+-    return a - b
++    return a - b  # diferença
+
+@@ -8,2 +8,3 @@
+     print(soma(1, 2))
++    print("meio")
+     print(subtrai(3, 1))
+"""
+        texto = aplicar_diff(CODIGO, diff)
+
+        self.assertIn("return a - b  # diferença\n", texto)
+        self.assertIn('print(soma(1, 2))\n    print("meio")\n    print(subtrai', texto)
+        self.assertTrue(texto.endswith("\n"))
+
+    def test_contexto_que_nao_confere(self):
+        with self.assertRaises(ErroEdicao):
+            aplicar_diff(CODIGO, "@@ -1,2 +1,2 @@\n def soma(a, b):\n-    return a * b\n+    return 0\n")
+
+    def test_sem_numeros_exige_contexto_unico(self):
+        """'@@ @@' vale para contexto único; repetido, o número da linha decide"""
+        self.assertIn("def main():", aplicar_diff(CODIGO, "@@ @@\n-def principal():\n+def main():\n"))
+
+        with self.assertRaises(ErroEdicao) as ctx:
+            aplicar_diff("x\ny\nx\n", "@@ @@\n-x\n+z\n")
+        self.assertIn("2 vezes", str(ctx.exception))
+        self.assertEqual(aplicar_diff("x\ny\nx\n", "@@ -3 +3 @@\n-x\n+z\n"), "x\ny\nz\n")
+
+    def test_remocao_de_comentario_sql(self):
+        """Linha removida que começa com '-- ' não é confundida com cabeçalho"""
+        texto = aplicar_diff("SELECT 1;\n-- antigo\nSELECT 2;\n", "@@ -1,3 +1,2 @@\n SELECT 1;\n--- antigo\n SELECT 2;\n")
+        self.assertEqual(texto, "SELECT 1;\nSELECT 2;\n")
+
+
+class TestEditorArquivos(unittest.TestCase):
+    """Edição em disco"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.caminho = os.path.join(self.temp_dir, "mod.py")
+        with open(self.caminho, "w", encoding="utf-8", newline="") as f:
+            f.write(CODIGO)
+        self.editor = EditorArquivos()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _ler(self) -> bytes:
+        with open(self.caminho, "rb") as f:
+            return f.read()
+
+    def test_resposta_e_diff_compacto(self):
+        resultado = self.editor.editar(self.caminho, [{"buscar": "a - b", "substituir": "b - a"}])
+
+        self.assertTrue(resultado.startswith(f"Arquivo '{self.caminho}' editado: +1 -1 linhas"))
+        self.assertIn("-    return a - b\n+    return b - a", resultado)
+        self.assertNotIn("def principal", resultado)  # Só o entorno, não o arquivo
+        self.assertIn(b"return b - a", self._ler())
+
+    def test_tudo_ou_nada(self):
+        """Segunda edição inválida: a primeira também não é gravada"""
+        with self.assertRaises(ErroEdicao):
+            self.editor.editar(self.caminho, [
+                {"buscar": "a - b", "substituir": "b - a"},
+                {"buscar": "nao_existe", "substituir": "x"},
+            ])
+
+        self.assertEqual(self._ler(), CODIGO.encode())
+        self.assertEqual([n for n in os.listdir(self.temp_dir) if n != "mod.py"], [])  # Sem temporários
+
+    def test_preserva_crlf_bom_e_permissoes(self):
+        with open(self.caminho, "wb") as f:
+            f.write(b"\xef\xbb\xbf" + CODIGO.replace("\n", "\r\n").encode())
+        os.chmod(self.caminho, 0o755)
+
+        self.editor.editar(self.caminho, [{"buscar": "soma(a, b):\n    return", "substituir": "soma(a, b):\n    # ok\n    return"}])
+
+        dados = self._ler()
+        self.assertTrue(dados.startswith(b"\xef\xbb\xbfdef soma(a, b):\r\n    # ok\r\n    return"))
+        self.assertEqual(dados.count(b"\r\n"), dados.count(b"\n"))
+        self.assertEqual(stat.S_IMODE(os.stat(self.caminho).st_mode), 0o755)
+
+    def test_arquivo_inexistente_e_sem_alteracao(self):
+        with self.assertRaises(ErroEdicao):
+            self.editor.editar(os.path.join(self.temp_dir, "novo.py"), [{"buscar": "x", "substituir": "y"}])
+
+        self.assertIn("Nenhuma alteração", self.editor.editar(self.caminho, [{"buscar": "a + b", "substituir": "a + b"}]))
+
+
+class TestEditarArquivoFerramenta(unittest.TestCase):
+    """editar_arquivo do SistemaFerramentasCompleto"""
+
+    @classmethod
+    def setUpClass(cls):
+        from luna_v3_FINAL_OTIMIZADA import SistemaFerramentasCompleto
+        cls.dir_original = os.getcwd()
+        cls.temp_dir = tempfile.mkdtemp()
+        os.chdir(cls.temp_dir)
+        cls.sistema = SistemaFerramentasCompleto(usar_memoria=False)
+        cls.sistema.gerenciador_workspaces = None  # Caminhos relativos ao diretório atual
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.dir_original)
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def setUp(self):
+        with open("mod.py", "w", encoding="utf-8") as f:
+            f.write(CODIGO)
+
+    def test_buscar_substituir(self):
+        saida = self.sistema.executar("editar_arquivo", {"caminho": "mod.py", "buscar": "print(soma(1, 2))",
+                                                         "substituir": "print(soma(2, 2))"})
+
+        self.assertIn("editado: +1 -1 linhas", saida)
+        with open("mod.py", encoding="utf-8") as f:
+            self.assertIn("print(soma(2, 2))", f.read())
+
+    def test_erro_volta_como_texto(self):
+        saida = self.sistema.executar("editar_arquivo", {"caminho": "mod.py", "buscar": "return",
+                                                         "substituir": "yield"})
+
+        self.assertTrue(saida.startswith("ERRO: edição: trecho aparece 2 vezes"))
+
+
+if __name__ == "__main__":
+    unittest.main()
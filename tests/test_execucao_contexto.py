@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - CONTEXTOS DE EXECUÇÃO ISOLADOS
+==========================================
+
+Executa várias tarefas em paralelo no mesmo AgenteCompletoV3 (cliente da
+API falso) e valida que cada ExecucaoContexto mantém seu próprio histórico
+e que contextos não interativos nunca chamam input().
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import (
+    AgenteCompletoV3, ExecucaoContexto, SEGURANCA_SOMENTE_LEITURA
+)
+
+
+def _resposta(stop_reason, *blocos):
+    return SimpleNamespace(
+        stop_reason=stop_reason,
+        content=list(blocos),
+        usage=SimpleNamespace(input_tokens=10, output_tokens=5,
+                              cache_read_input_tokens=0, cache_creation_input_tokens=0)
+    )
+
+
+class MensagensFalsas:
+    """
+    Roteiro por conversa: 1ª chamada pede a ferramenta eco(<tag>),
+    2ª chamada encerra com "fim <tag>". Com sempre_ferramenta=True nunca encerra.
+    """
+
+    def __init__(self, sempre_ferramenta=False):
+        self.sempre_ferramenta = sempre_ferramenta
+        self.contador = 0
+        self._lock = threading.Lock()
+
+    def create(self, **params):
+        time.sleep(0.05)  # Força intercalação entre threads
+        historico = params["messages"]
+        tag = re.search(r"TAG-(\w+)", historico[0]["content"]).group(1)
+        with self._lock:
+            self.contador += 1
+            id_ = f"t{self.contador}"
+
+        if self.sempre_ferramenta or len(historico) == 1:
+            return _resposta("tool_use", SimpleNamespace(
+                type="tool_use", id=id_, name="eco", input={"texto": tag}
+            ))
+        return _resposta("end_turn", SimpleNamespace(type="text", text=f"fim {tag}"))
+
+
+class TestExecucaoContexto(unittest.TestCase):
+    """Testes de isolamento do ExecucaoContexto"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir_original = os.getcwd()
+        cls.dir_temp = tempfile.mkdtemp()
+        os.chdir(cls.dir_temp)
+        cls.agente = AgenteCompletoV3("sk-teste", usar_memoria=False)
+        cls.agente.usar_streaming = False
+        cls.agente.sistema_ferramentas.adicionar_ferramenta(
+            "eco", "def eco(texto: str) -> str:\n    return 'eco ' + texto",
+            seguranca=SEGURANCA_SOMENTE_LEITURA
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.dir_original)
+        shutil.rmtree(cls.dir_temp, ignore_errors=True)
+
+    def test_execucoes_paralelas_nao_compartilham_historico(self):
+        """Cada thread vê apenas o próprio histórico"""
+        self.agente.client = SimpleNamespace(messages=MensagensFalsas())
+        contextos = {tag: ExecucaoContexto(interativo=False, usar_planejamento=False)
+                     for tag in ("A", "B", "C", "D")}
+        resultados = {}
+
+        def executar(tag):
+            resultados[tag] = self.agente.executar_tarefa(
+                f"TAG-{tag}", max_iteracoes=5, contexto=contextos[tag]
+            )
+
+        threads = [threading.Thread(target=executar, args=(tag,)) for tag in contextos]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for tag, ctx in contextos.items():
+            self.assertEqual(resultados[tag], f"fim {tag}")
+            self.assertEqual(len(ctx.historico), 3)
+            resultado_ferramenta = ctx.historico[2]["content"][0]["content"]
+            self.assertEqual(resultado_ferramenta, f"eco {tag}")
+
+    def test_contexto_nao_interativo_nao_pede_input(self):
+        """Ao atingir o limite, contexto não interativo encerra sem input()"""
+        self.agente.client = SimpleNamespace(messages=MensagensFalsas(sempre_ferramenta=True))
+        ctx = ExecucaoContexto(interativo=False, usar_planejamento=False)
+
+        with mock.patch("builtins.input", side_effect=AssertionError("input() chamado")):
+            resultado = self.agente.executar_tarefa("TAG-X", max_iteracoes=2, contexto=ctx)
+
+        self.assertIsNone(resultado)
+        self.assertEqual(ctx.iteracao, 2)
+
+    def test_execucao_principal_exposta_por_propriedades(self):
+        """Sem contexto explícito, historico_conversa aponta para a execução principal"""
+        self.agente.client = SimpleNamespace(messages=MensagensFalsas())
+
+        self.agente.executar_tarefa("TAG-P", max_iteracoes=5)
+
+        self.assertIs(self.agente.historico_conversa, self.agente.contexto.historico)
+        self.assertIn("TAG-P", self.agente.historico_conversa[0]["content"])
+        self.assertFalse(self.agente.modo_recuperacao)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - EXECUÇÃO CONCORRENTE DE TOOL_USE
+============================================
+
+Valida o DespachanteFerramentas e as anotações de segurança registradas
+em SistemaFerramentasCompleto.
+"""
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import (
+    DespachanteFerramentas, SistemaFerramentasCompleto,
+    SEGURANCA_SOMENTE_LEITURA, SEGURANCA_ALTERA_WORKSPACE, SEGURANCA_NAVEGADOR
+)
+
+
+class SistemaFalso:
+    """Ferramentas falsas: cada chamada dorme 0.2s e registra início/fim."""
+
+    def __init__(self, anotacoes):
+        self.anotacoes = anotacoes
+        self.eventos = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def obter_seguranca(self, nome):
+        return self.anotacoes.get(nome, SEGURANCA_ALTERA_WORKSPACE)
+
+    def executar(self, nome, parametros):
+        with self._lock:
+            self.eventos.append(("inicio", nome))
+            self.threads[nome] = threading.current_thread()
+        time.sleep(0.2)
+        with self._lock:
+            self.eventos.append(("fim", nome))
+        return f"ok:{nome}"
+
+
+ANOTACOES = {
+    "ler_a": SEGURANCA_SOMENTE_LEITURA,
+    "ler_b": SEGURANCA_SOMENTE_LEITURA,
+    "ler_c": SEGURANCA_SOMENTE_LEITURA,
+    "escrever": SEGURANCA_ALTERA_WORKSPACE,
+    "navegar": SEGURANCA_NAVEGADOR,
+}
+
+
+class TestDespachanteFerramentas(unittest.TestCase):
+    """Testes das regras de concorrência do despachante"""
+
+    def test_leituras_em_paralelo_resultados_em_ordem(self):
+        """Leituras independentes rodam juntas e voltam na ordem pedida"""
+        sistema = SistemaFalso(ANOTACOES)
+        despachante = DespachanteFerramentas(sistema, max_workers=4)
+
+        inicio = time.time()
+        resultados = despachante.executar_lote([("ler_a", {}), ("ler_b", {}), ("ler_c", {})])
+
+        self.assertEqual(resultados, ["ok:ler_a", "ok:ler_b", "ok:ler_c"])
+        self.assertEqual(despachante.pico_concorrencia, 3)
+        self.assertLess(time.time() - inicio, 0.5)
+
+    def test_escrita_e_barreira(self):
+        """Escrita espera leituras anteriores e bloqueia as seguintes"""
+        sistema = SistemaFalso(ANOTACOES)
+        despachante = DespachanteFerramentas(sistema, max_workers=4)
+
+        despachante.executar_lote([("ler_a", {}), ("escrever", {}), ("ler_b", {})])
+
+        eventos = sistema.eventos
+        self.assertLess(eventos.index(("fim", "ler_a")), eventos.index(("inicio", "escrever")))
+        self.assertLess(eventos.index(("fim", "escrever")), eventos.index(("inicio", "ler_b")))
+
+    def test_navegador_roda_na_thread_chamadora(self):
+        """Ferramentas de navegador rodam na thread que submeteu, em ordem"""
+        sistema = SistemaFalso(ANOTACOES)
+        despachante = DespachanteFerramentas(sistema, max_workers=4)
+
+        despachante.executar_lote([("ler_a", {}), ("navegar", {}), ("ler_b", {})])
+
+        self.assertIs(sistema.threads["navegar"], threading.current_thread())
+        eventos = sistema.eventos
+        self.assertLess(eventos.index(("fim", "ler_a")), eventos.index(("inicio", "navegar")))
+        self.assertLess(eventos.index(("fim", "navegar")), eventos.index(("inicio", "ler_b")))
+
+    def test_sem_deadlock_com_pool_pequeno(self):
+        """Pool de 1 worker processa lote misto sem travar"""
+        sistema = SistemaFalso(ANOTACOES)
+        despachante = DespachanteFerramentas(sistema, max_workers=1)
+
+        resultados = despachante.executar_lote(
+            [("ler_a", {}), ("escrever", {}), ("ler_b", {}), ("ler_c", {})]
+        )
+
+        self.assertEqual(len(resultados), 4)
+
+    def test_contextos_com_ordens_independentes(self):
+        """Escrita de um contexto não é barreira para as leituras de outro"""
+        liberar = threading.Event()
+
+        class SistemaEscritaPresa(SistemaFalso):
+            def executar(self, nome, parametros):
+                if nome == "escrever":
+                    liberar.wait(timeout=5)
+                return super().executar(nome, parametros)
+
+        sistema = SistemaEscritaPresa(ANOTACOES)
+        despachante = DespachanteFerramentas(sistema, max_workers=1)
+        despachante.dimensionar(2)
+        ordem_a, ordem_b = despachante.nova_ordem(), despachante.nova_ordem()
+
+        escrita = despachante.submeter("escrever", {}, ordem_a)
+        depois_a = despachante.submeter("ler_a", {}, ordem_a)
+        leitura_b = despachante.submeter("ler_b", {}, ordem_b)
+
+        self.assertEqual(leitura_b.result(timeout=2), "ok:ler_b")  # Não esperou a escrita de A
+        self.assertFalse(escrita.done())
+        self.assertFalse(depois_a.done())
+
+        liberar.set()
+        self.assertEqual(depois_a.result(timeout=2), "ok:ler_a")
+        eventos = sistema.eventos
+        self.assertLess(eventos.index(("fim", "escrever")), eventos.index(("inicio", "ler_a")))
+
+
+class TestAnotacoesSeguranca(unittest.TestCase):
+    """Testes das anotações registradas no SistemaFerramentasCompleto"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sistema = SistemaFerramentasCompleto(usar_memoria=False)
+
+    def test_anotacoes_padrao(self):
+        """Ferramentas base recebem anotações coerentes"""
+        self.assertEqual(self.sistema.obter_seguranca("ler_arquivo"), SEGURANCA_SOMENTE_LEITURA)
+        self.assertEqual(self.sistema.obter_seguranca("criar_arquivo"), SEGURANCA_ALTERA_WORKSPACE)
+        self.assertEqual(self.sistema.obter_seguranca("bash_avancado"), SEGURANCA_ALTERA_WORKSPACE)
+        self.assertEqual(self.sistema.obter_seguranca("navegar_url"), SEGURANCA_NAVEGADOR)
+        self.assertEqual(self.sistema.obter_seguranca("nao_existe"), SEGURANCA_ALTERA_WORKSPACE)
+
+    def test_anotacao_explicita(self):
+        """adicionar_ferramenta aceita anotação explícita e definir_seguranca valida"""
+        self.sistema.adicionar_ferramenta(
+            "contar_linhas_teste", "def contar_linhas_teste():\n    return '0'",
+            seguranca=SEGURANCA_SOMENTE_LEITURA
+        )
+        self.assertEqual(self.sistema.obter_seguranca("contar_linhas_teste"), SEGURANCA_SOMENTE_LEITURA)
+
+        with self.assertRaises(ValueError):
+            self.sistema.definir_seguranca("contar_linhas_teste", "qualquer")
+
+
+if __name__ == "__main__":
+    unittest.main()
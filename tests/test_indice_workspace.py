@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - ÍNDICE PERSISTENTE DE WORKSPACE
+===========================================
+
+Valida a atualização incremental do IndiceWorkspace (poda por mtime de
+diretório, remoções, edições no lugar, persistência), a busca de conteúdo
+pelo índice de trigramas e os métodos do GerenciadorWorkspaces servidos a
+partir dele.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indice_workspace import IndiceWorkspace, literais_obrigatorios
+from gerenciador_workspaces import GerenciadorWorkspaces
+
+
+def _escrever(caminho, conteudo=""):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+
+
+class TestIndiceWorkspace(unittest.TestCase):
+    """Testes da atualização incremental"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.raiz = os.path.join(self.temp_dir, "ws")
+        self.db = os.path.join(self.temp_dir, "indice.db")
+        _escrever(os.path.join(self.raiz, "main.py"), "print('oi')")
+        _escrever(os.path.join(self.raiz, "src", "util.py"), "x = 1")
+        _escrever(os.path.join(self.raiz, "docs", "guia.md"), "# Guia")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _indice(self):
+        indice = IndiceWorkspace(self.raiz, self.db, categorizar=lambda c: "code",
+                                 intervalo_verificacao=3600)
+        self.addCleanup(indice.fechar)
+        return indice
+
+    def test_diretorios_inalterados_nao_sao_relidos(self):
+        """Segunda atualização sem mudanças não lista nenhum diretório"""
+        indice = self._indice()
+        self.assertEqual(indice.atualizar()["novos"], 3)
+
+        stats = indice.atualizar()
+
+        self.assertEqual(stats["diretorios_lidos"], 0)
+        self.assertEqual(indice.total()[0], 3)
+
+    def test_arquivo_novo_rele_so_o_diretorio_dele(self):
+        """Criar arquivo em src/ relê apenas src/"""
+        indice = self._indice()
+        indice.atualizar()
+
+        _escrever(os.path.join(self.raiz, "src", "novo.py"), "y = 2")
+        stats = indice.atualizar()
+
+        self.assertEqual((stats["novos"], stats["diretorios_lidos"]), (1, 1))
+        self.assertIn(os.path.join("src", "novo.py"), [a["caminho"] for a in indice.arquivos()])
+
+    def test_remocao_de_subdiretorio(self):
+        """Arquivos de uma pasta apagada saem do índice"""
+        indice = self._indice()
+        indice.atualizar()
+
+        shutil.rmtree(os.path.join(self.raiz, "src"))
+        stats = indice.atualizar()
+
+        self.assertEqual(stats["removidos"], 1)
+        self.assertEqual(sorted(a["nome"] for a in indice.arquivos()), ["guia.md", "main.py"])
+
+    def test_edicao_no_lugar_na_verificacao_completa(self):
+        """Edição sem mudar o diretório aparece na verificação completa"""
+        indice = self._indice()
+        indice.atualizar()
+
+        caminho = os.path.join(self.raiz, "main.py")
+        with open(caminho, "a", encoding="utf-8") as f:
+            f.write("\nprint('mais')")
+        os.utime(caminho, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+        self.assertEqual(indice.atualizar(completa=True)["alterados"], 1)
+        tamanho = [a["tamanho_bytes"] for a in indice.arquivos() if a["nome"] == "main.py"][0]
+        self.assertEqual(tamanho, os.path.getsize(caminho))
+
+    def test_indice_persistido_entre_sessoes(self):
+        """Reabrir o banco não reindexa arquivos inalterados"""
+        indice = self._indice()
+        indice.atualizar()
+        indice.fechar()
+
+        reaberto = self._indice()
+        stats = reaberto.atualizar()
+
+        self.assertEqual(stats["novos"] + stats["alterados"], 0)
+        self.assertEqual(reaberto.total()[0], 3)
+
+
+class TestBuscaConteudo(unittest.TestCase):
+    """Busca de conteúdo pelo índice de trigramas"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.raiz = os.path.join(self.temp_dir, "ws")
+        _escrever(os.path.join(self.raiz, "api.py"), "def buscar_usuario(id):\n    return id\n")
+        _escrever(os.path.join(self.raiz, "cliente.py"),
+                  "from api import buscar_usuario\n\nbuscar_usuario(1)\nbuscar_usuario(2)\n")
+        _escrever(os.path.join(self.raiz, "notas.md"), "Nada relevante aqui")
+        _escrever(os.path.join(self.raiz, "imagem.png"), "buscar_usuario")  # Não é texto indexável
+        self.indice = IndiceWorkspace(self.raiz, os.path.join(self.temp_dir, "indice.db"),
+                                      categorizar=lambda c: "code", intervalo_verificacao=3600)
+        self.addCleanup(self.indice.fechar)
+        self.indice.atualizar()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_literais_obrigatorios(self):
+        """Trechos fixos da regex; alternativas e opcionais não contam"""
+        self.assertEqual(literais_obrigatorios(r"def\s+buscar_\w+\("), ["def", "buscar_"])
+        self.assertEqual(literais_obrigatorios(r"(foo|bar)bazz?"), ["baz"])
+        self.assertEqual(literais_obrigatorios(r"(?:classe)+ x"), ["classe"])
+        self.assertEqual(literais_obrigatorios(r"a.b"), [])
+
+    def test_ranking_e_trechos(self):
+        """Mais ocorrências primeiro, com número e texto da linha"""
+        resultados = self.indice.buscar_conteudo("BUSCAR_USUARIO")
+
+        self.assertEqual([r["nome"] for r in resultados], ["cliente.py", "api.py"])
+        self.assertEqual(resultados[0]["ocorrencias"], 3)
+        self.assertEqual(resultados[1]["trechos"], [(1, "def buscar_usuario(id):")])
+
+    def test_regex(self):
+        """Regex verificada sobre os candidatos do índice"""
+        resultados = self.indice.buscar_conteudo(r"buscar_usuario\(\d\)", regex=True)
+
+        self.assertEqual([(r["nome"], r["ocorrencias"]) for r in resultados], [("cliente.py", 2)])
+        self.assertEqual(len(self.indice.buscar_conteudo(r"def\s+\w+\(id\)", regex=True)), 1)
+
+    def test_indice_acompanha_edicao_e_remocao(self):
+        """Conteúdo regravado ou apagado sai do índice na atualização"""
+        os.remove(os.path.join(self.raiz, "cliente.py"))
+        _escrever(os.path.join(self.raiz, "api.py"), "def obter_usuario(id):\n    return id\n")
+        self.indice.atualizar(completa=True)
+
+        self.assertEqual(self.indice.buscar_conteudo("buscar_usuario"), [])
+        self.assertEqual([r["nome"] for r in self.indice.buscar_conteudo("obter_usuario")], ["api.py"])
+
+    def test_candidatos_filtrados_pelo_indice(self):
+        """Só arquivos com todos os trigramas chegam à verificação"""
+        if not self.indice.busca_indexada:
+            self.skipTest("SQLite sem tokenizer trigram")
+        candidatos = [linha["nome"] for linha, _ in self.indice._candidatos(["buscar_usuario"])]
+        self.assertEqual(sorted(candidatos), ["api.py", "cliente.py"])
+
+
+class TestGerenciadorComIndice(unittest.TestCase):
+    """Métodos do GerenciadorWorkspaces servidos pelo índice"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.gerenciador = GerenciadorWorkspaces(base_dir=self.temp_dir)
+        self.addCleanup(self.gerenciador.fechar)
+        self.gerenciador.criar_workspace("proj", "teste")
+        self.ws = str(self.gerenciador.get_caminho_workspace("proj"))
+
+        _escrever(os.path.join(self.ws, "app.py"), "from flask import Flask\n")
+        _escrever(os.path.join(self.ws, "dados.csv"), "a,b\n" * 1000)
+        _escrever(os.path.join(self.ws, "cache.tmp"), "x")
+        _escrever(os.path.join(self.ws, "a", "config.json"), "{}")
+        _escrever(os.path.join(self.ws, "b", "config.json"), "{}")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_analise_completa(self):
+        """Totais, distribuições, maiores e tech stack"""
+        analise = self.gerenciador.analisar_workspace("proj")
+
+        self.assertEqual(analise["estatisticas"]["total_arquivos"], 6)  # + README.md do workspace
+        self.assertEqual(analise["distribuicao_categorias"]["config"], 2)
+        self.assertEqual(analise["distribuicao_extensoes"][".json"], 2)
+        self.assertEqual(analise["arquivos_maiores"][0]["nome"], "dados.csv")
+        self.assertIn("Flask", analise["tech_stack_detectado"])
+        self.assertIn("Python", analise["tech_stack_detectado"])
+
+    def test_tech_stack_acompanha_edicao(self):
+        """Arquivo regravado com outro conteúdo atualiza as marcas"""
+        self.assertIn("Flask", self.gerenciador.detectar_tech_stack("proj"))
+
+        os.remove(os.path.join(self.ws, "app.py"))
+        _escrever(os.path.join(self.ws, "app.py"), "import pandas\n")
+
+        tech = self.gerenciador.detectar_tech_stack("proj")
+        self.assertIn("Pandas", tech)
+        self.assertNotIn("Flask", tech)
+
+    def test_sugerir_limpeza(self):
+        """Temporários e duplicados (mesmo nome e tamanho)"""
+        sugestoes = self.gerenciador.sugerir_limpeza("proj")
+
+        self.assertEqual([t["nome"] for t in sugestoes["temporarios"]], ["cache.tmp"])
+        self.assertEqual(sugestoes["duplicados"][0]["nome"], "config.json")
+        self.assertEqual(sugestoes["duplicados"][0]["ocorrencias"], 2)
+
+    def test_listagens_e_busca_por_nome(self):
+        """listar_workspaces, recentes e busca usam o mesmo índice"""
+        info = [w for w in self.gerenciador.listar_workspaces() if w["nome"] == "proj"][0]
+        self.assertEqual(info["arquivos"], 6)
+
+        recente = os.path.join(self.ws, "b", "config.json")
+        os.utime(recente, (time.time() + 60, time.time() + 60))
+        self.gerenciador._indice("proj").atualizar(completa=True)
+        self.assertEqual(self.gerenciador.obter_arquivos_recentes("proj", limite=1)[0]["caminho_completo"], recente)
+
+        encontrados = self.gerenciador.buscar_arquivos("proj", "CONFIG")
+        self.assertEqual(len(encontrados), 2)
+        self.assertTrue(all(r["match_score"] == 15 for r in encontrados))
+
+    def test_busca_por_conteudo_e_regex(self):
+        """Conteúdo soma ao score; regex casa nome e conteúdo"""
+        encontrados = self.gerenciador.buscar_arquivos("proj", "flask", buscar_conteudo=True)
+        self.assertEqual([(r["nome"], r["match_score"]) for r in encontrados], [("app.py", 3)])
+        self.assertEqual(encontrados[0]["trechos"], [(1, "from flask import Flask")])
+
+        encontrados = self.gerenciador.buscar_arquivos("proj", r"^(app|dados)\.", regex=True)
+        self.assertEqual(sorted(r["nome"] for r in encontrados), ["app.py", "dados.csv"])
+        self.assertEqual(self.gerenciador.buscar_arquivos("proj", "(", regex=True), [])
+
+    def test_deletar_remove_indice(self):
+        """Índice do workspace deletado é apagado"""
+        self.gerenciador.listar_workspaces()
+        arquivo_db = os.path.join(self.temp_dir, ".indices", "proj.db")
+        self.assertTrue(os.path.exists(arquivo_db))
+
+        self.gerenciador.deletar_workspace("proj", confirmar=True)
+
+        self.assertFalse(os.path.exists(arquivo_db))
+
+
+if __name__ == "__main__":
+    unittest.main()
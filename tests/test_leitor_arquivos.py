@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - LEITURA PAGINADA DE ARQUIVOS
+========================================
+
+Valida o índice esparso de linhas (contra uma leitura ingênua), as
+leituras por offset e por intervalo de linhas, a busca dentro do arquivo,
+a invalidação do índice quando o arquivo muda e o ler_arquivo do sistema
+de ferramentas.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leitor_arquivos import LeitorArquivos, IndiceLinhas, PASSO_INDICE
+
+
+class TestIndiceLinhas(unittest.TestCase):
+    """Índice esparso confere com split() em todas as linhas"""
+
+    def test_offsets_e_linhas(self):
+        for total in (0, 1, PASSO_INDICE - 1, PASSO_INDICE, PASSO_INDICE + 1, 5 * PASSO_INDICE + 3):
+            for final in ("", "\n"):
+                linhas = [f"linha {i}" + "x" * (i % 7) for i in range(1, total + 1)]
+                dados = ("\n".join(linhas) + (final if total else "")).encode()
+                indice = IndiceLinhas(dados, (len(dados), 0))
+
+                self.assertEqual(indice.total_linhas, total)
+                for numero, esperada in enumerate(linhas, 1):
+                    offset = indice.offset_da_linha(dados, numero)
+                    self.assertEqual(dados[offset:].split(b"\n")[0].decode(), esperada)
+                    self.assertEqual(indice.linha_do_offset(dados, offset + 1), numero)
+
+
+class TestLeitorArquivos(unittest.TestCase):
+    """Leituras e busca sobre um arquivo de log"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.caminho = os.path.join(self.temp_dir, "app.log")
+        with open(self.caminho, "w", encoding="utf-8") as f:
+            for i in range(1, 10001):
+                f.write(f"INFO item {i} ação concluída\n" if i % 2500 else f"ERRO item {i} falhou\n")
+        self.leitor = LeitorArquivos()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_intervalo_de_linhas(self):
+        """Linhas numeradas, direto do meio do arquivo"""
+        linhas, total = self.leitor.ler_linhas(self.caminho, 4999, 5001)
+
+        self.assertEqual(total, 10000)
+        self.assertEqual(linhas, [(4999, "INFO item 4999 ação concluída"), (5000, "ERRO item 5000 falhou"),
+                                  (5001, "INFO item 5001 ação concluída")])
+
+    def test_paginas_por_offset_cobrem_o_arquivo(self):
+        """Páginas consecutivas remontam o arquivo sem cortar caracteres UTF-8"""
+        partes, offset = [], 0
+        while True:
+            texto, offset, tamanho = self.leitor.ler(self.caminho, offset=offset, limite=1001)
+            partes.append(texto)
+            if offset >= tamanho:
+                break
+
+        with open(self.caminho, encoding="utf-8") as f:
+            self.assertEqual("".join(partes), f.read())
+        self.assertNotIn("�", "".join(partes))
+
+    def test_busca_com_contexto(self):
+        """Uma entrada por linha, contexto ao redor, sem diferenciar maiúsculas"""
+        resultado = self.leitor.buscar(self.caminho, "erro", contexto=1)
+
+        self.assertEqual(resultado["total"], 4)
+        self.assertEqual(resultado["trechos"][0], [
+            (2499, "INFO item 2499 ação concluída", False),
+            (2500, "ERRO item 2500 falhou", True),
+            (2501, "INFO item 2501 ação concluída", False),
+        ])
+        self.assertEqual(self.leitor.buscar(self.caminho, r"item \d+00 falhou", regex=True)["total"], 4)
+
+    def test_indice_refeito_quando_arquivo_muda(self):
+        """Arquivo reescrito (tamanho/mtime novos) não usa o índice antigo"""
+        self.assertEqual(self.leitor.info(self.caminho)["total_linhas"], 10000)
+
+        with open(self.caminho, "a", encoding="utf-8") as f:
+            f.write("linha nova\n")
+        os.utime(self.caminho, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+        self.assertEqual(self.leitor.info(self.caminho)["total_linhas"], 10001)
+        self.assertEqual(self.leitor.ler_linhas(self.caminho, 10001)[0], [(10001, "linha nova")])
+
+    def test_consultar_rodapes(self):
+        """Saída para o modelo indica como continuar"""
+        pagina = self.leitor.consultar(self.caminho, limite=200)
+        self.assertIn("próxima página: offset=", pagina)
+
+        intervalo = self.leitor.consultar(self.caminho, linha_inicio=10, linha_fim=11)
+        self.assertEqual(intervalo.splitlines()[0], "    10| INFO item 10 ação concluída")
+        self.assertIn("[linhas 10-11 de 10000]", intervalo)
+
+        busca = self.leitor.consultar(self.caminho, buscar="falhou")
+        self.assertIn("  2500: ERRO item 2500 falhou", busca)
+
+
+class TestLerArquivoFerramenta(unittest.TestCase):
+    """ler_arquivo do SistemaFerramentasCompleto"""
+
+    @classmethod
+    def setUpClass(cls):
+        from luna_v3_FINAL_OTIMIZADA import SistemaFerramentasCompleto
+        cls.dir_original = os.getcwd()
+        cls.temp_dir = tempfile.mkdtemp()
+        os.chdir(cls.temp_dir)
+        cls.sistema = SistemaFerramentasCompleto(usar_memoria=False)
+        cls.sistema.gerenciador_workspaces = None  # Caminhos relativos ao diretório atual
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.dir_original)
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def test_arquivo_pequeno_inalterado(self):
+        with open("curto.txt", "w", encoding="utf-8") as f:
+            f.write("olá\nmundo\n")
+
+        self.assertEqual(self.sistema.executar("ler_arquivo", {"caminho": "curto.txt"}), "olá\nmundo\n")
+
+    def test_intervalo_em_arquivo_grande(self):
+        with open("grande.txt", "w", encoding="utf-8") as f:
+            f.writelines(f"linha {i}\n" for i in range(1, 100001))
+
+        saida = self.sistema.executar("ler_arquivo", {"caminho": "grande.txt", "linha_inicio": 90000,
+                                                      "linha_fim": 90001})
+
+        self.assertTrue(saida.startswith(" 90000| linha 90000\n 90001| linha 90001"))
+
+
+if __name__ == "__main__":
+    unittest.main()
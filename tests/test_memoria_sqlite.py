@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - MEMÓRIA PERMANENTE EM SQLITE
+========================================
+
+Valida a migração única do JSON antigo, a busca FTS5, a deduplicação
+por hash e as atualizações por linha (uso_count, podas).
+"""
+
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memoria_permanente import MemoriaPermanente
+
+
+class TestMemoriaSQLite(unittest.TestCase):
+    """Testes do armazenamento SQLite da MemoriaPermanente"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.arquivo_json = os.path.join(self.temp_dir, "memoria_agente.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _memoria(self):
+        memoria = MemoriaPermanente(arquivo_memoria=self.arquivo_json)
+        self.addCleanup(memoria.fechar)
+        return memoria
+
+    def test_migracao_unica_do_json(self):
+        """JSON existente é importado uma vez e permanece intacto"""
+        dados = {
+            "aprendizados": [{
+                "id": "abc123", "timestamp": "2025-10-14T12:00:00", "categoria": "tecnica",
+                "conteudo": "Usar pathlib para caminhos", "contexto": "", "tags": ["python"],
+                "relevancia": 1.0, "uso_count": 7
+            }],
+            "preferencias_usuario": {"idioma": {"valor": "pt-BR", "timestamp": "2025-10-14T12:00:00"}},
+            "historico_tarefas": [{"timestamp": "t", "tarefa": "listar arquivos", "resultado": "ok",
+                                   "ferramentas_usadas": ["bash_avancado"], "sucesso": True}],
+            "ferramentas_criadas": [],
+            "contexto": {},
+            "estatisticas": {"total_tarefas": 1, "total_aprendizados": 1, "ferramentas_criadas": 0,
+                             "primeira_sessao": "2025-10-14T12:00:00", "ultima_sessao": None}
+        }
+        with open(self.arquivo_json, "w", encoding="utf-8") as f:
+            json.dump(dados, f)
+
+        memoria = self._memoria()
+        self.assertEqual(memoria.memoria["aprendizados"][0]["uso_count"], 7)
+        self.assertEqual(memoria.obter_preferencia("idioma"), "pt-BR")
+        self.assertIn("listar arquivos", memoria.obter_contexto_recente())
+        memoria.adicionar_aprendizado("tecnica", "Outro aprendizado")
+        memoria.fechar()
+
+        # Segunda abertura não reimporta (sem duplicar nem sobrescrever)
+        memoria = self._memoria()
+        self.assertEqual(len(memoria.memoria["aprendizados"]), 2)
+        self.assertEqual(memoria.obter_estatisticas()["primeira_sessao"], "2025-10-14T12:00:00")
+        with open(self.arquivo_json, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), dados)
+
+    def test_deduplicacao_por_hash(self):
+        """Mesmo conteúdo não é inserido duas vezes"""
+        memoria = self._memoria()
+
+        self.assertTrue(memoria.adicionar_aprendizado("bug", "Fechar arquivos com with"))
+        self.assertFalse(memoria.adicionar_aprendizado("bug", "Fechar arquivos com with"))
+        self.assertEqual(memoria.obter_estatisticas()["total_aprendizados"], 1)
+
+    def test_busca_fts_por_prefixo_e_sem_acento(self):
+        """Busca ignora acentos/maiúsculas e casa prefixos de palavras"""
+        memoria = self._memoria()
+        memoria.adicionar_aprendizado("tecnica", "Integração com APIs REST usando requests")
+        memoria.adicionar_aprendizado("tecnica", "Recursão em Python precisa de caso base")
+
+        self.assertEqual(len(memoria.buscar_aprendizados(query="integracao")), 1)
+        self.assertEqual(len(memoria.buscar_aprendizados(query="RECURS")), 1)
+        self.assertEqual(memoria.buscar_aprendizados(query="pyth")[0]["conteudo"],
+                         "Recursão em Python precisa de caso base")
+
+    def test_sem_correspondencia_retorna_vazio(self):
+        """Consulta sem aprendizado com todas as palavras não traz nada nem conta uso"""
+        memoria = self._memoria()
+        memoria.adicionar_aprendizado("tecnica", "Calcular fatorial de forma iterativa")
+        memoria.adicionar_aprendizado("tecnica", "Erro de encoding: abrir com utf-8")
+
+        self.assertEqual(memoria.buscar_aprendizados(query="crie um programa que calcule o fatorial de 10"), [])
+        self.assertEqual(memoria.buscar_aprendizados(query="erro de sintaxe"), [])
+
+        conn = sqlite3.connect(memoria.arquivo_db)
+        self.addCleanup(conn.close)
+        self.assertEqual({uso for (uso,) in conn.execute("SELECT uso_count FROM aprendizados")}, {0})
+
+    def test_filtros_de_categoria_e_tags(self):
+        """Categoria e tags continuam filtrando (tags por elemento exato)"""
+        memoria = self._memoria()
+        memoria.adicionar_aprendizado("tecnica", "Python usa listas", tags=["python"])
+        memoria.adicionar_aprendizado("bug", "Python indent é importante", tags=["python"])
+        memoria.adicionar_aprendizado("bug", "JavaScript usa arrays", tags=["js"])
+
+        self.assertEqual(len(memoria.buscar_aprendizados(categoria="bug")), 2)
+        self.assertEqual(len(memoria.buscar_aprendizados(tags=["js"])), 1)
+        self.assertEqual(len(memoria.buscar_aprendizados(query="python", categoria="bug")), 1)
+
+    def test_uso_count_atualizado_por_linha(self):
+        """Busca incrementa uso_count só dos retornados, persistido no banco"""
+        memoria = self._memoria()
+        memoria.adicionar_aprendizado("tecnica", "Usar venv por projeto")
+        memoria.adicionar_aprendizado("tecnica", "Usar git para versionar")
+
+        self.assertEqual(memoria.buscar_aprendizados(query="venv")[0]["uso_count"], 1)
+        memoria.buscar_aprendizados(query="venv")
+
+        conn = sqlite3.connect(memoria.arquivo_db)
+        self.addCleanup(conn.close)
+        usos = dict(conn.execute("SELECT conteudo, uso_count FROM aprendizados"))
+        self.assertEqual(usos, {"Usar venv por projeto": 2, "Usar git para versionar": 0})
+
+    def test_historico_podado_em_100(self):
+        """Tarefas além das últimas 100 são removidas do banco"""
+        memoria = self._memoria()
+        for i in range(105):
+            memoria.registrar_tarefa(f"tarefa {i}", "ok")
+
+        tarefas = memoria.memoria["historico_tarefas"]
+        self.assertEqual(len(tarefas), 100)
+        self.assertEqual(tarefas[0]["tarefa"], "tarefa 5")
+        self.assertEqual(memoria.obter_estatisticas()["total_tarefas"], 105)
+
+
+if __name__ == "__main__":
+    unittest.main()
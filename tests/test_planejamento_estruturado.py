@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - PLANEJAMENTO ESTRUTURADO (tool_use forçado)
+=======================================================
+
+Valida o plano completo em uma única chamada com tool_choice forçado,
+a validação pelo JSON schema, a rodada de correção com tool_result de
+erro, o ErroPlanoEstruturado no lugar do plano padrão e o modo
+clássico em três fases.
+"""
+
+import os
+import sys
+import copy
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import luna_v3_FINAL_OTIMIZADA as luna
+from luna_v3_FINAL_OTIMIZADA import (
+    AgenteCompletoV3, PlanificadorAvancado, ErroPlanoEstruturado, RateLimitManager, _erros_esquema
+)
+
+
+def _subtarefa(id_, deps=()):
+    return {
+        "id": id_, "titulo": f"Subtarefa {id_}", "descricao": "fazer algo", "ferramentas": [],
+        "input": "-", "output_esperado": "arquivo", "criterio_sucesso": "arquivo existe",
+        "tokens_estimados": 2000, "tempo_estimado": "30s", "prioridade": "importante",
+        "dependencias": list(deps),
+    }
+
+
+PLANO = {
+    "analise": {
+        "requisitos_explicitos": ["criar API"],
+        "requisitos_implicitos": ["testes"],
+        "dependencias": {"ferramentas": [], "bibliotecas": ["flask"], "arquivos": []},
+        "riscos": [{"descricao": "porta ocupada", "probabilidade": "baixa", "impacto": "medio",
+                    "mitigacao": "usar outra porta"}],
+        "estimativa_complexidade": "complexa",
+        "tempo_estimado": "5 minutos",
+    },
+    "estrategia": {
+        "abordagem": "API em camadas",
+        "justificativa": "simples de testar",
+        "sequencia_otima": [{"ordem": 1, "acao": "modelos", "razao": "base"}],
+        "oportunidades_paralelizacao": [{"acoes": ["rotas", "testes"], "ganho_estimado": "30%"}],
+        "pontos_validacao": [{"apos": "rotas", "validar": "respostas", "criterio_sucesso": "200 OK"}],
+        "planos_contingencia": ["usar http.server"],
+    },
+    "decomposicao": {
+        "ondas": [
+            {"numero": 1, "descricao": "base", "subtarefas": [_subtarefa("1.1"), _subtarefa("1.2")],
+             "pode_executar_paralelo": True},
+            {"numero": 2, "descricao": "rotas", "subtarefas": [_subtarefa("2.1", ["1.1"])],
+             "pode_executar_paralelo": False},
+        ],
+        "tempo_estimado_sequencial": "90s",
+        "tempo_estimado_paralelo": "60s",
+    },
+}
+
+
+def _resposta(entrada, stop_reason="tool_use"):
+    return SimpleNamespace(
+        stop_reason=stop_reason,
+        content=[SimpleNamespace(type="tool_use", id="toolu_1", name="registrar_plano", input=entrada)],
+        usage=SimpleNamespace(input_tokens=100, output_tokens=50,
+                              cache_read_input_tokens=0, cache_creation_input_tokens=0)
+    )
+
+
+class Mensagens:
+    """messages.create que devolve as respostas programadas, em ordem."""
+
+    def __init__(self, *respostas):
+        self.respostas = list(respostas)
+        self.chamadas = []
+
+    def create(self, **params):
+        self.chamadas.append(params)
+        return self.respostas.pop(0)
+
+
+class TestEsquema(unittest.TestCase):
+    """_erros_esquema (sem API)"""
+
+    def test_plano_valido(self):
+        planificador = PlanificadorAvancado(SimpleNamespace())
+        self.assertEqual(_erros_esquema(PLANO, planificador._esquema_plano()), [])
+
+    def test_problemas_com_caminho(self):
+        esquema = PlanificadorAvancado(SimpleNamespace())._esquema_plano()
+        plano = copy.deepcopy(PLANO)
+        del plano["estrategia"]["abordagem"]
+        plano["decomposicao"]["ondas"][0]["subtarefas"][1]["prioridade"] = "urgente"
+        plano["decomposicao"]["ondas"][1]["subtarefas"] = []
+        plano["decomposicao"]["ondas"][0]["pode_executar_paralelo"] = "sim"
+
+        erros = _erros_esquema(plano, esquema)
+
+        self.assertIn("plano.estrategia.abordagem: campo obrigatório ausente", erros)
+        self.assertTrue(any(e.startswith("plano.decomposicao.ondas[0].subtarefas[1].prioridade: 'urgente'")
+                            for e in erros))
+        self.assertIn("plano.decomposicao.ondas[1].subtarefas: mínimo de 1 item(ns)", erros)
+        self.assertIn("plano.decomposicao.ondas[0].pode_executar_paralelo: esperado boolean, recebido str", erros)
+
+    def test_bool_nao_e_inteiro(self):
+        self.assertEqual(len(_erros_esquema(True, {"type": "integer"})), 1)
+
+
+class TestPlanejamentoEstruturado(unittest.TestCase):
+    """planejar() com o agente real e cliente falso"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir_original = os.getcwd()
+        cls.dir_temp = tempfile.mkdtemp()
+        os.chdir(cls.dir_temp)
+        cls.agente = AgenteCompletoV3("sk-teste", usar_memoria=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.dir_original)
+        shutil.rmtree(cls.dir_temp, ignore_errors=True)
+
+    def _planificador(self, *respostas, **kwargs):
+        mensagens = Mensagens(*respostas)
+        self.agente.client = SimpleNamespace(messages=mensagens)
+        return PlanificadorAvancado(self.agente, **kwargs), mensagens
+
+    def test_uma_chamada_gera_plano(self):
+        planificador, mensagens = self._planificador(_resposta(PLANO), estruturado=True)
+
+        plano = planificador.planejar("Criar API REST completa")
+
+        self.assertEqual(len(mensagens.chamadas), 1)
+        chamada = mensagens.chamadas[0]
+        self.assertEqual(chamada["tool_choice"], {"type": "tool", "name": "registrar_plano"})
+        enum = chamada["tools"][0]["input_schema"]["properties"]["decomposicao"]["properties"]["ondas"][
+            "items"]["properties"]["subtarefas"]["items"]["properties"]["ferramentas"]["items"]["enum"]
+        self.assertIn("bash_avancado", enum)  # Só ferramentas existentes
+
+        self.assertEqual([len(onda.subtarefas) for onda in plano.ondas], [2, 1])
+        self.assertEqual(plano.ondas[1].subtarefas[0].dependencias, ["1.1"])
+        self.assertEqual(plano.decomposicao["total_subtarefas"], 3)
+        self.assertEqual(plano.estrategia["abordagem"], "API em camadas")
+
+    def test_plano_invalido_recebe_uma_correcao(self):
+        invalido = copy.deepcopy(PLANO)
+        del invalido["decomposicao"]["ondas"][0]["subtarefas"][0]["criterio_sucesso"]
+        planificador, mensagens = self._planificador(_resposta(invalido), _resposta(PLANO), estruturado=True)
+
+        plano = planificador.planejar("Criar API REST completa")
+
+        self.assertEqual(len(mensagens.chamadas), 2)
+        retorno = mensagens.chamadas[1]["messages"][-1]["content"][0]
+        self.assertEqual(retorno["type"], "tool_result")
+        self.assertTrue(retorno["is_error"])
+        self.assertIn("subtarefas[0].criterio_sucesso: campo obrigatório ausente", retorno["content"])
+        self.assertEqual(plano.decomposicao["total_subtarefas"], 3)
+
+    def test_sem_plano_padrao_silencioso(self):
+        """Inválido duas vezes (ou truncado): erro, não um plano de fallback"""
+        truncado = {"analise": PLANO["analise"]}
+        planificador, mensagens = self._planificador(_resposta(truncado, "max_tokens"), _resposta({}),
+                                                     estruturado=True)
+
+        with self.assertRaises(ErroPlanoEstruturado) as ctx:
+            planificador.planejar("Criar API REST completa")
+
+        self.assertEqual(len(mensagens.chamadas), 2)
+        self.assertIn("max_tokens", mensagens.chamadas[1]["messages"][-1]["content"][0]["content"])
+        self.assertIn("plano.analise: campo obrigatório ausente", ctx.exception.erros)
+        self.assertEqual(planificador.historico_planos, [])
+
+    def test_modo_em_fases_pela_variavel(self):
+        os.environ['LUNA_PLANEJAMENTO_ESTRUTURADO'] = '0'
+        self.addCleanup(os.environ.pop, 'LUNA_PLANEJAMENTO_ESTRUTURADO')
+        chamadas = []
+
+        def requisicao_simples(prompt, max_tokens=4096):
+            chamadas.append(prompt)
+            return '{"ondas": []}' if "DECOMPOSIÇÃO" in prompt else "{}"
+
+        agente = SimpleNamespace(_executar_requisicao_simples=requisicao_simples)
+        planificador = PlanificadorAvancado(agente)
+
+        planificador.planejar("Criar API REST completa")
+
+        self.assertFalse(planificador.estruturado)
+        self.assertEqual(len(chamadas), 3)
+
+
+class Sobrecarga(Exception):
+    """Mesma forma de anthropic.APIStatusError 529."""
+    status_code = 529
+    response = SimpleNamespace(headers={})
+
+
+class TestFallbackSemMetodosDoAgente(unittest.TestCase):
+    """Agente só com client: chamadas com reserva e retentativa"""
+
+    def _agente(self, *respostas):
+        mensagens = Mensagens(*respostas)
+        create = mensagens.create
+
+        def create_instavel(**params):
+            resposta = create(**params)
+            if isinstance(resposta, Exception):
+                raise resposta
+            return resposta
+
+        mensagens.create = create_instavel
+        return SimpleNamespace(client=SimpleNamespace(messages=mensagens), model_name="modelo",
+                               rate_limit_manager=RateLimitManager(),
+                               sistema_ferramentas=SimpleNamespace(ferramentas_codigo={})), mensagens
+
+    def test_ferramenta_plano_retentada(self):
+        agente, mensagens = self._agente(Sobrecarga(), _resposta(PLANO))
+        planificador = PlanificadorAvancado(agente, estruturado=True)
+
+        with mock.patch.object(luna.time, "sleep"):
+            plano = planificador.planejar("Criar API REST completa")
+
+        self.assertEqual(len(mensagens.chamadas), 2)
+        self.assertEqual(plano.decomposicao["total_subtarefas"], 3)
+        self.assertEqual(len(agente.rate_limit_manager._reservas_pendentes), 0)
+        self.assertEqual(agente.rate_limit_manager.total_requisicoes, 1)
+
+    def test_fase_em_texto_retentada(self):
+        texto = SimpleNamespace(content=[SimpleNamespace(type="text", text="{}")],
+                                usage=SimpleNamespace(input_tokens=10, output_tokens=5))
+        agente, mensagens = self._agente(Sobrecarga(), texto)
+        planificador = PlanificadorAvancado(agente, estruturado=False)
+
+        with mock.patch.object(luna.time, "sleep"):
+            self.assertEqual(planificador._executar_fase_planejamento("analise"), "{}")
+
+        self.assertEqual(len(mensagens.chamadas), 2)
+        self.assertEqual(len(agente.rate_limit_manager._reservas_pendentes), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - RASTREAMENTO DE SPANS (LUNA_TRACE)
+==============================================
+
+Valida o aninhamento dos spans (inclusive entre threads e tasks asyncio),
+a soma de tokens nos ancestrais, a exportação em Chrome trace-event JSON
+e a instrumentação de PlanificadorAvancado.executar_plano().
+"""
+
+import os
+import sys
+import json
+import asyncio
+import shutil
+import tempfile
+import contextvars
+import unittest
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import (
+    RastreadorSpans, PlanificadorAvancado, Plano, Onda, Subtarefa
+)
+
+
+def _por_nome(eventos):
+    return {e["name"]: e for e in eventos if e["ph"] == "X"}
+
+
+def _subtarefa(id_):
+    return Subtarefa(id=id_, titulo=f"Subtarefa {id_}", descricao="", ferramentas=[],
+                     input_esperado="", output_esperado="", criterio_sucesso="",
+                     tokens_estimados=0, tempo_estimado="1min", prioridade="importante")
+
+
+class TestRastreadorSpans(unittest.TestCase):
+    """Testes do RastreadorSpans"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_aninhamento_e_json_chrome(self):
+        """Filhos apontam para o pai e cabem dentro dele na mesma thread"""
+        rastreador = RastreadorSpans(ativo=True)
+        with rastreador.span("tarefa", "tarefa"):
+            with rastreador.span("onda 1", "onda", subtarefas=2):
+                with rastreador.span("chamada_api", "api"):
+                    pass
+
+        caminho = rastreador.exportar_chrome(os.path.join(self.temp_dir, "trace.json"))
+        with open(caminho, encoding="utf-8") as f:
+            documento = json.load(f)
+
+        eventos = _por_nome(documento["traceEvents"])
+        tarefa, onda, api = eventos["tarefa"], eventos["onda 1"], eventos["chamada_api"]
+        self.assertEqual(onda["args"]["pai_id"], tarefa["args"]["span_id"])
+        self.assertEqual(api["args"]["pai_id"], onda["args"]["span_id"])
+        self.assertEqual(onda["args"]["subtarefas"], 2)
+        self.assertEqual(api["tid"], tarefa["tid"])
+        self.assertLessEqual(tarefa["ts"], api["ts"])
+        self.assertLessEqual(api["ts"] + api["dur"], tarefa["ts"] + tarefa["dur"])
+        self.assertTrue(any(e["ph"] == "M" for e in documento["traceEvents"]))
+        self.assertEqual(rastreador.spans, [])  # Exportados saem da memória
+
+    def test_fechar_pai_fecha_filho_aberto(self):
+        """Iteração deixada aberta é fechada junto com a tarefa"""
+        rastreador = RastreadorSpans(ativo=True)
+        with rastreador.span("tarefa", "tarefa"):
+            rastreador.iniciar("iteração 1", "iteracao")
+        with rastreador.span("depois", "tarefa"):
+            pass
+
+        spans = {s.nome: s for s in rastreador.spans}
+        self.assertIsNotNone(spans["iteração 1"].fim)
+        self.assertLessEqual(spans["iteração 1"].fim, spans["tarefa"].fim)
+        self.assertIsNone(spans["depois"].pai)  # Span atual voltou para a raiz
+
+    def test_propagacao_entre_threads(self):
+        """Com copy_context, spans do worker ficam sob o span que submeteu"""
+        rastreador = RastreadorSpans(ativo=True)
+
+        def worker(i):
+            with rastreador.span(f"subtarefa {i}", "subtarefa"):
+                pass
+
+        with rastreador.span("onda 1", "onda"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futuros = [executor.submit(contextvars.copy_context().run, worker, i) for i in range(2)]
+                [futuro.result() for futuro in futuros]
+
+        eventos = rastreador.eventos_chrome()
+        onda = _por_nome(eventos)["onda 1"]
+        for i in range(2):
+            sub = _por_nome(eventos)[f"subtarefa {i}"]
+            self.assertEqual(sub["args"]["pai_id"], onda["args"]["span_id"])
+            self.assertNotEqual(sub["tid"], onda["tid"])
+        fluxos = [e for e in eventos if e["ph"] in ("s", "f")]
+        self.assertEqual(len(fluxos), 4)
+        self.assertTrue(all(e["tid"] == onda["tid"] for e in fluxos if e["ph"] == "s"))
+
+    def test_tasks_asyncio_em_threads_virtuais(self):
+        """Corrotinas concorrentes têm pilhas separadas (tid virtual por task)"""
+        rastreador = RastreadorSpans(ativo=True)
+
+        async def subtarefa(i):
+            with rastreador.span(f"sub {i}", "subtarefa"):
+                await asyncio.sleep(0.01)
+                with rastreador.span(f"api {i}", "api"):
+                    await asyncio.sleep(0.01)
+
+        async def plano():
+            with rastreador.span("plano", "plano"):
+                await asyncio.gather(subtarefa(0), subtarefa(1))
+
+        asyncio.run(plano())
+
+        eventos = _por_nome(rastreador.eventos_chrome())
+        self.assertNotEqual(eventos["sub 0"]["tid"], eventos["sub 1"]["tid"])
+        for i in range(2):
+            self.assertEqual(eventos[f"api {i}"]["tid"], eventos[f"sub {i}"]["tid"])
+            self.assertEqual(eventos[f"api {i}"]["args"]["pai_id"], eventos[f"sub {i}"]["args"]["span_id"])
+            self.assertEqual(eventos[f"sub {i}"]["args"]["pai_id"], eventos["plano"]["args"]["span_id"])
+
+    def test_tokens_somados_nos_ancestrais(self):
+        """somar() acumula na chamada e em iteração/tarefa"""
+        rastreador = RastreadorSpans(ativo=True)
+        with rastreador.span("tarefa", "tarefa"):
+            for _ in range(2):
+                with rastreador.span("chamada_api", "api"):
+                    rastreador.somar(tokens_input=100, tokens_output=10)
+
+        spans = [s for s in rastreador.spans]
+        tarefa = next(s for s in spans if s.nome == "tarefa")
+        self.assertEqual(tarefa.args["tokens_input"], 200)
+        self.assertEqual(tarefa.args["tokens_output"], 20)
+        self.assertTrue(all(s.args["tokens_input"] == 100 for s in spans if s.nome == "chamada_api"))
+
+    def test_inativo_nao_registra(self):
+        """Desligado, span()/somar() não guardam nada"""
+        rastreador = RastreadorSpans(ativo=False)
+        with rastreador.span("tarefa", "tarefa") as span:
+            span.anotar(x=1)
+            rastreador.somar(tokens_input=1)
+
+        self.assertEqual(rastreador.spans, [])
+
+    def test_exportacao_automatica_da_raiz(self):
+        """Span raiz concluído gera um arquivo só com a própria árvore"""
+        rastreador = RastreadorSpans(ativo=True, diretorio=self.temp_dir)
+        with rastreador.span("tarefa A", "tarefa"):
+            with rastreador.span("api", "api"):
+                pass
+
+        self.assertTrue(os.path.exists(rastreador.ultimo_arquivo))
+        with open(rastreador.ultimo_arquivo, encoding="utf-8") as f:
+            nomes = {e["name"] for e in json.load(f)["traceEvents"] if e["ph"] == "X"}
+        self.assertEqual(nomes, {"tarefa A", "api"})
+        self.assertEqual(rastreador.spans, [])
+
+
+class TestInstrumentacaoPlano(unittest.TestCase):
+    """executar_plano() gera plano → (onda →) subtarefa → tarefa"""
+
+    def _executar(self, usar_dag):
+        rastreador = RastreadorSpans(ativo=True)
+
+        def executar_tarefa(prompt, max_iteracoes=None, contexto=None):
+            with rastreador.span("tarefa", "tarefa"):
+                rastreador.somar(tokens_input=50)
+            return "ok"
+
+        agente = SimpleNamespace(rastreador=rastreador, executar_tarefa=executar_tarefa)
+        planificador = PlanificadorAvancado(agente, max_workers_paralelos=2, usar_dag=usar_dag)
+        plano = Plano(
+            tarefa_original="teste", analise={}, estrategia={}, decomposicao={},
+            ondas=[
+                Onda(1, "paralela", [_subtarefa("1.1"), _subtarefa("1.2")], True),
+                Onda(2, "sequencial", [_subtarefa("2.1")], False),
+            ]
+        )
+
+        planificador.executar_plano(plano)
+
+        return {s.nome: s for s in rastreador.spans}
+
+    def test_plano_agendado_por_dependencias(self):
+        """DAG: subtarefas direto sob o plano, vindas de threads do pool"""
+        spans = self._executar(usar_dag=True)
+
+        self.assertIsNone(spans["executar_plano"].pai)
+        self.assertNotIn("onda 1", spans)
+        self.assertEqual(spans["1.1"].pai, spans["executar_plano"])
+        self.assertEqual(spans["2.1"].pai, spans["executar_plano"])
+        self.assertEqual(spans["executar_plano"].args["tokens_input"], 150)
+
+    def test_plano_com_onda_paralela(self):
+        spans = self._executar(usar_dag=False)
+
+        self.assertIsNone(spans["executar_plano"].pai)
+        self.assertEqual(spans["onda 1"].pai, spans["executar_plano"])
+        self.assertEqual(spans["onda 1"].args["modo"], "paralelo")
+        self.assertEqual(spans["1.1"].pai, spans["onda 1"])
+        self.assertEqual(spans["2.1"].pai, spans["onda 2"])
+        self.assertEqual(spans["executar_plano"].args["tokens_input"], 150)
+
+
+if __name__ == "__main__":
+    unittest.main()
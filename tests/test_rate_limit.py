@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - RATE LIMIT MANAGER
+==============================
+
+Valida a janela deslizante de 1 minuto (deques + totais acumulados) e os
+baldes de tokens com espera exata e reservas FIFO.
+O relógio monotônico é simulado para não depender de sleeps reais.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import luna_v3_FINAL_OTIMIZADA as luna
+from luna_v3_FINAL_OTIMIZADA import BaldeTokens, RateLimitManager
+
+
+class RelogioFalso:
+    def __init__(self, inicio: float = 1000.0):
+        self.agora = inicio
+
+    def __call__(self) -> float:
+        return self.agora
+
+    def avancar(self, segundos: float) -> None:
+        self.agora += segundos
+
+
+class TestJanelaDeslizante(unittest.TestCase):
+    """Testes da contabilização em janela de 1 minuto"""
+
+    def setUp(self):
+        self.relogio = RelogioFalso()
+        self.patch = mock.patch.object(luna.time, "monotonic", self.relogio)
+        self.patch.start()
+        self.manager = RateLimitManager(tier="tier1", modo="balanceado")
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_totais_acumulados(self):
+        """Uso atual soma requisições e tokens dentro da janela"""
+        self.manager.registrar_uso(1000, 200)
+        self.relogio.avancar(10)
+        self.manager.registrar_uso(500, 100)
+
+        uso = self.manager.calcular_uso_atual()
+
+        self.assertEqual(uso["rpm_atual"], 2)
+        self.assertEqual(uso["itpm_atual"], 1500)
+        self.assertEqual(uso["otpm_atual"], 300)
+
+    def test_entradas_expiram_apos_um_minuto(self):
+        """Entradas com mais de 60s saem da janela e dos totais"""
+        self.manager.registrar_uso(1000, 200)
+        self.relogio.avancar(30)
+        self.manager.registrar_uso(500, 100)
+        self.relogio.avancar(31)  # Primeira entrada com 61s
+
+        uso = self.manager.calcular_uso_atual()
+
+        self.assertEqual(uso["rpm_atual"], 1)
+        self.assertEqual(uso["itpm_atual"], 500)
+        self.assertEqual(uso["otpm_atual"], 100)
+
+        self.relogio.avancar(30)
+        self.assertEqual(self.manager.calcular_uso_atual()["itpm_atual"], 0)
+
+    def test_estimativa_usa_ultimas_cinco(self):
+        """Estimativa da próxima requisição usa a média das últimas 5"""
+        for tokens in (100, 100, 100, 100, 100, 600):
+            self.manager.registrar_uso(tokens, tokens // 10)
+
+        entrada, saida = self.manager.estimar_tokens_proxima_req()
+
+        self.assertEqual(entrada, 200)
+        self.assertEqual(saida, 20)
+
+    def test_totais_globais_preservados(self):
+        """Estatísticas da sessão não dependem da janela"""
+        self.manager.registrar_uso(1000, 200)
+        self.relogio.avancar(120)
+        self.manager.registrar_uso(1000, 200)
+
+        stats = self.manager.obter_estatisticas()
+
+        self.assertEqual(stats["total_requisicoes"], 2)
+        self.assertEqual(stats["total_tokens"], 2400)
+
+
+class TestBaldeTokens(unittest.TestCase):
+    """Testes da espera exata e da ordem FIFO das reservas"""
+
+    def setUp(self):
+        self.relogio = RelogioFalso()
+        self.patch = mock.patch.object(luna.time, "monotonic", self.relogio)
+        self.patch.start()
+        self.manager = RateLimitManager(tier="tier1", modo="balanceado")
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_espera_exata_quando_balde_esvazia(self):
+        """Esgotado o RPM, a espera é o tempo de recompor 1 requisição"""
+        capacidade = self.manager.balde_rpm.capacidade  # 50 × 0.85 = 42.5
+        for _ in range(42):
+            self.assertEqual(self.manager.reservar(10, 10).espera, 0.0)
+
+        reserva = self.manager.reservar(10, 10)
+
+        # Falta 0.5 requisição; taxa = 42.5 / 60 por segundo
+        self.assertAlmostEqual(reserva.espera, 0.5 / (capacidade / 60), places=6)
+        self.assertIn("RPM", reserva.motivo)
+
+    def test_reservas_seguintes_esperam_em_fila(self):
+        """Cada reserva seguinte acorda um intervalo depois da anterior"""
+        for _ in range(42):
+            self.manager.reservar(10, 10)
+
+        esperas = [self.manager.reservar(10, 10).espera for _ in range(3)]
+        intervalo = 60 / self.manager.balde_rpm.capacidade
+
+        self.assertAlmostEqual(esperas[1] - esperas[0], intervalo, places=6)
+        self.assertAlmostEqual(esperas[2] - esperas[1], intervalo, places=6)
+
+    def test_balde_recompoe_com_o_tempo(self):
+        """Após a espera calculada, nova consulta não pede espera"""
+        reserva = self.manager.reservar(30000, 100)  # Acima do ITPM × threshold
+        self.assertEqual(reserva.espera, 0.0)
+
+        precisa, segundos, motivo = self.manager.precisa_esperar(1000, 100)
+        self.assertTrue(precisa)
+        self.assertIn("ITPM", motivo)
+
+        self.relogio.avancar(segundos)
+        self.assertFalse(self.manager.precisa_esperar(1000, 100)[0])
+
+    def test_uso_real_corrige_estimativa(self):
+        """registrar_uso devolve ao balde o que foi reservado a mais"""
+        reserva = self.manager.reservar(20000, 100)
+        antes = self.manager.balde_itpm.tokens
+
+        self.manager.registrar_uso(5000, 100, reserva)
+
+        self.assertAlmostEqual(self.manager.balde_itpm.tokens - antes, 15000)
+        self.assertEqual(len(self.manager._reservas_pendentes), 0)
+
+    def test_cada_requisicao_acerta_a_propria_reserva(self):
+        """Workers concorrentes: ordem de término não troca as reservas"""
+        grande = self.manager.reservar(20000, 100)
+        pequena = self.manager.reservar(1000, 100)
+        antes = self.manager.balde_itpm.tokens
+
+        self.manager.registrar_uso(1000, 100, pequena)  # A menor termina primeiro
+        self.assertAlmostEqual(self.manager.balde_itpm.tokens, antes)
+        self.assertEqual(self.manager._reservas_pendentes, {grande})
+
+        self.manager.liberar_reserva(pequena)  # Já acertada: nada a devolver
+        self.assertAlmostEqual(self.manager.balde_itpm.tokens, antes)
+
+        self.manager.registrar_uso(3000, 100)  # Sem reserva: debita o uso real
+        self.assertAlmostEqual(self.manager.balde_itpm.tokens, antes - 3000)
+        self.assertEqual(self.manager._reservas_pendentes, {grande})
+
+        self.manager.liberar_reserva(grande)
+        self.assertAlmostEqual(self.manager.balde_itpm.tokens, antes - 3000 + 20000)
+        self.assertEqual(len(self.manager._reservas_pendentes), 0)
+
+
+class TestReservasConcorrentes(unittest.TestCase):
+    """Workers reais (threads e corrotinas) com balde pequeno e rápido"""
+
+    def _manager(self):
+        manager = RateLimitManager(tier="tier4", modo="balanceado")
+        # 2 requisições de rajada, recompostas a 20/s (1 a cada 50ms)
+        manager.balde_rpm = BaldeTokens(2, periodo=0.1)
+        return manager
+
+    def test_threads_acordam_em_ordem_de_chegada(self):
+        """Threads bloqueadas são liberadas uma por intervalo, em FIFO"""
+        manager = self._manager()
+        ordem = []
+        lock = threading.Lock()
+
+        def worker(i):
+            manager.aguardar_se_necessario(10, 10)
+            with lock:
+                ordem.append(i)
+
+        threads = []
+        for i in range(6):
+            t = threading.Thread(target=worker, args=(i,))
+            t.start()
+            threads.append(t)
+            time.sleep(0.005)  # Garante a ordem de chegada
+        inicio = time.monotonic()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(ordem, list(range(6)))
+        self.assertEqual(manager.total_esperas, 4)
+        # 4 reservas além da rajada × 50ms, sem dormir segundos inteiros
+        self.assertLess(time.monotonic() - inicio, 0.5)
+
+    def test_corrotinas_compartilham_fila(self):
+        """A versão awaitable usa os mesmos baldes e a mesma ordem"""
+        manager = self._manager()
+        ordem = []
+
+        async def worker(i):
+            await manager.aguardar_se_necessario_async(10, 10)
+            ordem.append(i)
+
+        async def principal():
+            await asyncio.gather(*(worker(i) for i in range(5)))
+
+        inicio = time.monotonic()
+        asyncio.run(principal())
+        duracao = time.monotonic() - inicio
+
+        self.assertEqual(ordem, list(range(5)))
+        self.assertGreaterEqual(duracao, 0.14)  # 3 × 50ms
+        self.assertLess(duracao, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - RETENTATIVAS GUIADAS POR CABEÇALHOS DA API
+======================================================
+
+Valida a PoliticaRetentativa (retry-after, backoff exponencial com jitter)
+e a sincronização do RateLimitManager com os cabeçalhos anthropic-ratelimit-*.
+Os erros da API são simulados (status_code + response.headers), sem rede.
+"""
+
+import os
+import sys
+import shutil
+import asyncio
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import luna_v3_FINAL_OTIMIZADA as luna
+from luna_v3_FINAL_OTIMIZADA import AgenteCompletoV3, PoliticaRetentativa, RateLimitManager
+
+
+class ErroApiFalso(Exception):
+    """Mesma forma de anthropic.APIStatusError (status_code + response.headers)."""
+
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FuncaoInstavel:
+    """Falha com os erros dados, depois retorna 'ok'."""
+
+    def __init__(self, *erros):
+        self.erros = list(erros)
+        self.chamadas = 0
+
+    def __call__(self):
+        self.chamadas += 1
+        if self.erros:
+            raise self.erros.pop(0)
+        return "ok"
+
+
+class TestCalculoEspera(unittest.TestCase):
+    """Testes da espera entre tentativas"""
+
+    def setUp(self):
+        self.politica = PoliticaRetentativa()
+
+    def test_retry_after_em_segundos(self):
+        """retry-after numérico define a espera (com jitter pequeno)"""
+        espera = self.politica.calcular_espera(0, ErroApiFalso(429, {"retry-after": "3"}))
+
+        self.assertGreaterEqual(espera, 3.0)
+        self.assertLessEqual(espera, 4.0)
+
+    def test_retry_after_ms_tem_prioridade(self):
+        """retry-after-ms é mais preciso que retry-after"""
+        erro = ErroApiFalso(529, {"retry-after-ms": "250", "retry-after": "1"})
+
+        self.assertLess(self.politica.calcular_espera(0, erro), 1.0)
+
+    def test_retry_after_como_data_http(self):
+        """retry-after também pode ser uma data HTTP"""
+        data = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True)
+
+        espera = self.politica.calcular_espera(0, ErroApiFalso(429, {"retry-after": data}))
+
+        self.assertGreater(espera, 7.0)
+        self.assertLess(espera, 12.0)
+
+    def test_backoff_exponencial_com_jitter(self):
+        """Sem retry-after, a espera é uniforme em [0, base × 2^n]"""
+        with mock.patch.object(luna.random, "uniform", side_effect=lambda a, b: b):
+            esperas = [self.politica.calcular_espera(n, ErroApiFalso(503)) for n in range(8)]
+
+        self.assertEqual(esperas[:4], [1.0, 2.0, 4.0, 8.0])
+        self.assertEqual(esperas[-1], self.politica.espera_maxima)
+
+
+class TestExecucaoComRetentativa(unittest.TestCase):
+    """Testes de PoliticaRetentativa.executar()/executar_async()"""
+
+    def setUp(self):
+        self.sleep = mock.patch.object(luna.time, "sleep")
+        self.dormidas = self.sleep.start()
+
+    def tearDown(self):
+        self.sleep.stop()
+
+    def test_retenta_sobrecarga_e_erros_5xx(self):
+        """529 e 500 são retentados até o sucesso"""
+        politica = PoliticaRetentativa()
+        funcao = FuncaoInstavel(ErroApiFalso(529), ErroApiFalso(500))
+
+        self.assertEqual(politica.executar(funcao), "ok")
+        self.assertEqual(funcao.chamadas, 3)
+        self.assertEqual(politica.metricas["por_status"], {"529": 1, "500": 1})
+
+    def test_erro_de_requisicao_nao_e_retentado(self):
+        """400 sobe imediatamente, sem espera"""
+        funcao = FuncaoInstavel(ErroApiFalso(400))
+
+        with self.assertRaises(ErroApiFalso):
+            PoliticaRetentativa().executar(funcao)
+
+        self.assertEqual(funcao.chamadas, 1)
+        self.dormidas.assert_not_called()
+
+    def test_x_should_retry_do_servidor(self):
+        """x-should-retry: false prevalece sobre o status"""
+        funcao = FuncaoInstavel(ErroApiFalso(503, {"x-should-retry": "false"}))
+
+        with self.assertRaises(ErroApiFalso):
+            PoliticaRetentativa().executar(funcao)
+
+    def test_tentativas_esgotadas(self):
+        """Após max_tentativas, a última exceção é propagada"""
+        politica = PoliticaRetentativa(max_tentativas=3)
+        funcao = FuncaoInstavel(*[ErroApiFalso(529) for _ in range(5)])
+
+        with self.assertRaises(ErroApiFalso):
+            politica.executar(funcao)
+
+        self.assertEqual(funcao.chamadas, 3)
+        self.assertEqual(politica.metricas["esgotadas"], 1)
+
+    def test_execucao_async(self):
+        """executar_async retenta criando nova corrotina por tentativa"""
+        politica = PoliticaRetentativa()
+        funcao = FuncaoInstavel(ErroApiFalso(429, {"retry-after": "0"}))
+
+        async def chamada():
+            return funcao()
+
+        self.assertEqual(asyncio.run(politica.executar_async(chamada)), "ok")
+        self.assertEqual(funcao.chamadas, 2)
+
+
+class TestSincronizacaoServidor(unittest.TestCase):
+    """Testes de RateLimitManager.sincronizar_com_servidor() e pausar()"""
+
+    def setUp(self):
+        self.manager = RateLimitManager(tier="tier2", modo="balanceado")
+
+    def test_remaining_restringe_balde_local(self):
+        """Saldo local não passa do 'remaining' do servidor (menos a margem)"""
+        self.manager.sincronizar_com_servidor({
+            "anthropic-ratelimit-input-tokens-limit": "450000",
+            "anthropic-ratelimit-input-tokens-remaining": "100000",
+        })
+
+        margem = 450000 * (1 - self.manager.threshold)
+        self.assertAlmostEqual(self.manager.balde_itpm.tokens, 100000 - margem, delta=10)
+        self.assertEqual(self.manager.sincronizacoes_servidor, 1)
+
+    def test_reserva_em_andamento_descontada_do_remaining(self):
+        """Reserva aberta durante a sincronização continua valendo contra o saldo do servidor"""
+        reserva = self.manager.reservar(20000, 100)
+
+        self.manager.sincronizar_com_servidor({
+            "anthropic-ratelimit-input-tokens-limit": "450000",
+            "anthropic-ratelimit-input-tokens-remaining": "100000",
+        })
+
+        margem = 450000 * (1 - self.manager.threshold)
+        self.assertAlmostEqual(self.manager.balde_itpm.tokens, 100000 - margem - 20000, delta=10)
+
+        # Uso real menor que o estimado: só a diferença volta ao balde
+        self.manager.registrar_uso(5000, 100, reserva)
+        self.assertAlmostEqual(self.manager.balde_itpm.tokens, 100000 - margem - 5000, delta=10)
+
+    def test_adota_limite_real_do_servidor(self):
+        """Limite diferente do tier configurado é adotado"""
+        self.manager.sincronizar_com_servidor({"anthropic-ratelimit-requests-limit": "50"})
+
+        self.assertEqual(self.manager.limite_rpm, 50)
+        self.assertAlmostEqual(self.manager.balde_rpm.capacidade, 50 * self.manager.threshold)
+
+    def test_429_pausa_todos_os_workers(self):
+        """retry-after de um 429 bloqueia novas reservas"""
+        politica = PoliticaRetentativa(self.manager)
+        funcao = FuncaoInstavel(ErroApiFalso(429, {"retry-after": "5"}))
+
+        with mock.patch.object(luna.time, "sleep"):
+            politica.executar(funcao)
+
+        precisa, segundos, motivo = self.manager.precisa_esperar(10, 10)
+        self.assertTrue(precisa)
+        self.assertIn("SERVIDOR", motivo)
+        self.assertGreater(segundos, 4.0)
+
+    def test_falha_devolve_tokens_reservados(self):
+        """liberar_reserva() devolve os tokens estimados de uma tentativa falha"""
+        antes = self.manager.balde_itpm.tokens
+        reserva = self.manager.reservar(5000, 100)
+
+        self.manager.liberar_reserva(reserva)
+
+        self.assertAlmostEqual(self.manager.balde_itpm.tokens, antes, delta=10)
+        self.assertEqual(len(self.manager._reservas_pendentes), 0)
+
+
+class TestRequisicaoSimples(unittest.TestCase):
+    """Chamadas avulsas (requisição simples, resumo) com retentativa e reserva por tentativa"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir_original = os.getcwd()
+        cls.dir_temp = tempfile.mkdtemp()
+        os.chdir(cls.dir_temp)
+        cls.agente = AgenteCompletoV3("sk-teste", usar_memoria=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.dir_original)
+        shutil.rmtree(cls.dir_temp, ignore_errors=True)
+
+    def _cliente(self, *erros):
+        resposta = SimpleNamespace(
+            content=[SimpleNamespace(type="text", text="ok")],
+            usage=SimpleNamespace(input_tokens=100, output_tokens=10)
+        )
+        funcao = FuncaoInstavel(*erros)
+        funcao.parametros = []
+
+        def chamar(**params):
+            funcao.parametros.append(params)
+            funcao()
+            return resposta
+
+        self.agente.client = SimpleNamespace(messages=SimpleNamespace(create=chamar))
+        return funcao
+
+    def test_sobrecarga_retentada(self):
+        """529 é retentado; nenhuma reserva fica pendente"""
+        funcao = self._cliente(ErroApiFalso(529))
+
+        with mock.patch.object(luna.time, "sleep"):
+            self.assertEqual(self.agente._executar_requisicao_simples("oi"), "ok")
+
+        self.assertEqual(funcao.chamadas, 2)
+        self.assertEqual(len(self.agente.rate_limit_manager._reservas_pendentes), 0)
+
+    def test_falha_libera_reserva(self):
+        """Erro definitivo devolve a reserva antes de subir"""
+        antes = self.agente.rate_limit_manager.balde_itpm.tokens
+        self._cliente(ErroApiFalso(400))
+
+        with self.assertRaises(ErroApiFalso):
+            self.agente._executar_requisicao_simples("oi")
+
+        self.assertEqual(len(self.agente.rate_limit_manager._reservas_pendentes), 0)
+        self.assertAlmostEqual(self.agente.rate_limit_manager.balde_itpm.tokens, antes, delta=50)
+
+    def test_resumo_do_historico_com_retentativa(self):
+        """A compactação usa o modelo de resumo com a mesma reserva/retentativa"""
+        funcao = self._cliente(ErroApiFalso(529))
+
+        with mock.patch.object(luna.time, "sleep"):
+            self.assertEqual(self.agente._resumir_historico("passo 1: ok"), "ok")
+
+        self.assertEqual(funcao.chamadas, 2)
+        self.assertEqual(funcao.parametros[-1]["model"], self.agente.modelo_resumo)
+        self.assertEqual(len(self.agente.rate_limit_manager._reservas_pendentes), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - SESSÃO BASH PERSISTENTE
+===================================
+
+Valida o estado mantido entre comandos (cd, export), os marcadores de fim
+de comando, timeout e reinício da sessão, o ambiente sem segredos, uma
+sessão por ExecucaoContexto, a captura limitada da saída (cabeça, cauda,
+log completo) e o contrato de saída de bash_avancado.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import contextvars
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sessao_bash
+from sessao_bash import SessaoBash, GerenciadorSessoesBash, CapturaSaida, executar_avulso
+
+
+class TestCapturaSaida(unittest.TestCase):
+    """Testes da CapturaSaida (sem processo)"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _captura(self, **kwargs):
+        captura = CapturaSaida(diretorio_logs=self.temp_dir, **kwargs)
+        self.addCleanup(captura.fechar)
+        return captura
+
+    def test_saida_pequena_intacta(self):
+        """Cabe no limite: devolvida como veio, sem log em disco"""
+        captura = self._captura()
+        captura.escrever(b"linha 1\nlinha 2")
+
+        self.assertEqual(captura.texto(100), "linha 1\nlinha 2")
+        self.assertIsNone(captura.arquivo)
+
+    def test_memoria_limitada_cabeca_cauda_e_log(self):
+        """Saída grande: começo + final no texto, tudo no log"""
+        captura = self._captura(limite_cabeca=1024, limite_cauda=1024)
+        esperado = b"".join(f"linha {i}\n".encode() for i in range(50000))
+        for inicio in range(0, len(esperado), 4096):
+            captura.escrever(esperado[inicio:inicio + 4096])
+            self.assertLessEqual(len(captura.cabeca) + len(captura.cauda), 1024 + 2 * 1024)
+
+        texto = captura.texto(600)
+
+        self.assertTrue(texto.startswith("linha 0\nlinha 1\n"))
+        self.assertTrue(texto.endswith("linha 49999\n"))
+        self.assertIn("linhas omitidas", texto)
+        self.assertIn(captura.arquivo, texto)
+        self.assertLessEqual(len(texto), 600)
+        with open(captura.arquivo, "rb") as f:
+            self.assertEqual(f.read(), esperado)
+
+    def test_ansi_progresso_e_repeticoes(self):
+        """ANSI removido, \\r fica no último estado, repetidas agrupadas"""
+        captura = self._captura()
+        captura.escrever(b"\x1b[1;31mERRO\x1b[0m\n10%\r50%\r100%\naviso\naviso\naviso\nfim\n")
+
+        self.assertEqual(captura.texto(1000), "ERRO\n100%\naviso  [×3]\nfim\n")
+
+    def test_descartar_final_trunca_log(self):
+        """Marcador removido da memória e do log"""
+        captura = self._captura(limite_cabeca=8, limite_cauda=8)
+        captura.escrever(b"x" * 100 + b"\nMARCADOR\n")
+
+        captura.descartar_final(len(b"\nMARCADOR\n"))
+
+        self.assertEqual(captura.total, 100)
+        self.assertNotIn(b"MARCADOR", captura.ultimos(64))
+        with open(captura.arquivo, "rb") as f:
+            self.assertEqual(f.read(), b"x" * 100)
+
+
+@unittest.skipIf(shutil.which("bash") is None, "bash não disponível")
+class TestSessaoBash(unittest.TestCase):
+    """Testes da SessaoBash"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, "sub"))
+        self.sessao = SessaoBash(cwd=self.temp_dir)
+        self.addCleanup(self.sessao.encerrar)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_estado_mantido_entre_comandos(self):
+        """cd e export valem para o comando seguinte"""
+        self.sessao.executar("cd sub && export MODO=teste")
+
+        resultado = self.sessao.executar("pwd; echo $MODO")
+
+        self.assertEqual(resultado.stdout.split(), [os.path.join(os.path.realpath(self.temp_dir), "sub"), "teste"])
+        self.assertEqual(resultado.returncode, 0)
+
+    def test_saida_codigo_e_stderr_separados(self):
+        """Saída sem quebra final, stderr e código de saída"""
+        resultado = self.sessao.executar("echo -n abc; echo erro >&2; (exit 7)")
+
+        self.assertEqual((resultado.stdout, resultado.stderr, resultado.returncode), ("abc", "erro\n", 7))
+
+    def test_comando_invalido_e_stdin_fechado(self):
+        """Aspas abertas não desalinham a sessão; cat não espera stdin"""
+        self.assertEqual(self.sessao.executar('echo "sem fim').returncode, 2)
+
+        resultado = self.sessao.executar("cat; echo \"it's ok\"", timeout=5)
+
+        self.assertEqual(resultado.stdout, "it's ok\n")
+
+    def test_timeout_reinicia_no_mesmo_diretorio(self):
+        """Comando lento levanta TimeoutExpired; a sessão volta no último cwd"""
+        self.sessao.executar("cd sub")
+
+        with self.assertRaises(subprocess.TimeoutExpired):
+            self.sessao.executar("sleep 10", timeout=0.3)
+
+        resultado = self.sessao.executar("pwd")
+        self.assertTrue(resultado.stdout.strip().endswith("sub"))
+        self.assertEqual(self.sessao.reinicios, 1)
+
+    def test_exit_encerra_e_proxima_chamada_reinicia(self):
+        """`exit` devolve o código e a sessão é recriada"""
+        resultado = self.sessao.executar("echo antes; exit 3")
+        self.assertEqual((resultado.stdout, resultado.returncode), ("antes\n", 3))
+        self.assertIn("sessão bash encerrada", resultado.stderr)
+
+        self.assertEqual(self.sessao.executar("echo depois").stdout, "depois\n")
+
+    def test_saida_grande_preserva_o_final(self):
+        """Erro no fim de uma saída longa chega ao modelo; log completo em disco"""
+        diretorio_logs = os.path.join(self.temp_dir, "logs")
+        original = sessao_bash.DIRETORIO_LOGS
+        sessao_bash.DIRETORIO_LOGS = sessao_bash.Path(diretorio_logs)
+        self.addCleanup(setattr, sessao_bash, "DIRETORIO_LOGS", original)
+
+        resultado = self.sessao.executar("seq 1 200000; echo 'Error: build falhou'")
+
+        self.assertLessEqual(len(resultado.stdout), sessao_bash.LIMITE_CARACTERES)
+        self.assertTrue(resultado.stdout.startswith("1\n2\n3\n"))
+        self.assertTrue(resultado.stdout.endswith("200000\nError: build falhou\n"))
+        log = os.path.join(diretorio_logs, os.listdir(diretorio_logs)[0])
+        self.assertIn(log, resultado.stdout)
+        with open(log, encoding="utf-8") as f:
+            self.assertEqual(f.read().count("\n"), 200001)  # Sem o marcador de fim
+
+    def test_ambiente_sem_segredos(self):
+        """Variáveis com cara de segredo não chegam à sessão"""
+        sessao = SessaoBash(cwd=self.temp_dir, ambiente={"PATH": os.environ["PATH"],
+                                                         "ANTHROPIC_API_KEY": "sk-x", "LUNA_MODO": "ok"})
+        self.addCleanup(sessao.encerrar)
+
+        resultado = sessao.executar("echo \"[$ANTHROPIC_API_KEY][$LUNA_MODO]\"")
+
+        self.assertEqual(resultado.stdout, "[][ok]\n")
+
+
+@unittest.skipIf(shutil.which("bash") is None, "bash não disponível")
+class TestGerenciadorSessoesBash(unittest.TestCase):
+    """Uma sessão por contexto de execução"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.contexto = contextvars.ContextVar("contexto", default=None)
+        self.sessoes = GerenciadorSessoesBash(contexto_atual=self.contexto.get, max_sessoes=2,
+                                              cwd_inicial=self.temp_dir)
+        self.addCleanup(self.sessoes.encerrar_todas)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _em_contexto(self, contexto, comando):
+        def rodar():
+            self.contexto.set(contexto)
+            return self.sessoes.executar(comando).stdout.strip()
+        return contextvars.copy_context().run(rodar)
+
+    def test_contextos_isolados(self):
+        """Subtarefas paralelas não compartilham variáveis"""
+        Ctx = type("Ctx", (), {})
+        a, b = Ctx(), Ctx()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda par: self._em_contexto(*par), [(a, "export X=a"), (b, "export X=b")]))
+
+        self.assertEqual(self._em_contexto(a, "echo $X"), "a")
+        self.assertEqual(self._em_contexto(b, "echo $X"), "b")
+
+    def test_sessao_encerrada_com_o_contexto_e_lru(self):
+        """Contexto coletado fecha a sessão; acima do limite sai a mais antiga"""
+        Ctx = type("Ctx", (), {})
+        contexto = Ctx()
+        self._em_contexto(contexto, "true")
+        self.assertEqual(len(self.sessoes), 1)
+
+        del contexto
+        self.assertEqual(len(self.sessoes), 0)
+
+        contextos = [Ctx() for _ in range(3)]
+        for c in contextos:
+            self._em_contexto(c, "true")
+        self.assertEqual(len(self.sessoes), 2)
+
+
+@unittest.skipIf(shutil.which("bash") is None, "bash não disponível")
+class TestBashAvancado(unittest.TestCase):
+    """bash_avancado mantém o contrato STDOUT/STDERR/CODE"""
+
+    @classmethod
+    def setUpClass(cls):
+        from luna_v3_FINAL_OTIMIZADA import SistemaFerramentasCompleto, ExecucaoContexto
+        cls.sistema = SistemaFerramentasCompleto(usar_memoria=False)
+        cls.ExecucaoContexto = ExecucaoContexto
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sistema.sessoes_bash.encerrar_todas()
+
+    def test_contrato_e_persistencia(self):
+        def tarefa():
+            self.ExecucaoContexto(interativo=False).iniciar("t", "p")
+            self.sistema.executar("bash_avancado", {"comando": "export LUNA_TESTE=42"})
+            return self.sistema.executar("bash_avancado", {"comando": "echo $LUNA_TESTE; echo x >&2"})
+
+        saida = contextvars.copy_context().run(tarefa)
+
+        self.assertEqual(saida, "STDOUT:\n42\n\nSTDERR:\nx\n\nCODE: 0")
+
+    def test_timeout(self):
+        saida = self.sistema.executar("bash_avancado", {"comando": "sleep 5", "timeout": 1})
+
+        self.assertEqual(saida, "ERRO: Command 'sleep 5' timed out after 1 seconds")
+
+    def test_timeout_com_saida_parcial(self):
+        """O que o comando imprimiu antes de travar volta junto com o erro"""
+        saida = self.sistema.executar("bash_avancado", {"comando": "echo compilando; sleep 5", "timeout": 1})
+
+        self.assertTrue(saida.startswith("ERRO: Command"))
+        self.assertIn("STDOUT:\ncompilando\n", saida)
+
+    def test_sem_sessao_mesma_captura(self):
+        """executar_avulso (LUNA_BASH_PERSISTENTE=0) também compacta a saída"""
+        resultado = executar_avulso("seq 1 100000", timeout=10)
+
+        self.assertLessEqual(len(resultado.stdout), sessao_bash.LIMITE_CARACTERES)
+        self.assertTrue(resultado.stdout.endswith("100000\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
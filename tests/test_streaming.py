@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - STREAMING COM DESPACHO ANTECIPADO DE FERRAMENTAS
+============================================================
+
+Usa um cliente falso (sem rede) que emite eventos no formato de
+messages.stream() para validar que cada tool_use começa a executar antes
+do fim do stream e que os resultados voltam na ordem original.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from luna_v3_FINAL_OTIMIZADA import (
+    AgenteCompletoV3, DespachanteFerramentas, ExecucaoContexto, FERRAMENTAS_NAVEGADOR,
+    SEGURANCA_NAVEGADOR, SEGURANCA_SOMENTE_LEITURA
+)
+
+
+def _tool(id_, nome, entrada=None):
+    return SimpleNamespace(type="tool_use", id=id_, name=nome, input=entrada or {})
+
+
+class StreamFalso:
+    """Context manager no formato de MessageStream."""
+
+    def __init__(self, eventos, final):
+        self.eventos = eventos
+        self.final = final
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __iter__(self):
+        for evento in self.eventos:
+            if callable(evento):
+                evento()  # Ponto de sincronização dentro do stream
+            else:
+                yield evento
+
+    def get_final_message(self):
+        return self.final
+
+
+class FerramentasFalsas:
+    def __init__(self):
+        self.executadas = []
+        self.threads = {}
+        self.iniciou = threading.Event()
+        self.despachante = DespachanteFerramentas(self)
+
+    def obter_seguranca(self, nome):
+        return SEGURANCA_NAVEGADOR if nome in FERRAMENTAS_NAVEGADOR else SEGURANCA_SOMENTE_LEITURA
+
+    def executar(self, nome, parametros):
+        self.executadas.append(nome)
+        self.threads[nome] = threading.current_thread().name
+        self.iniciou.set()
+        return f"resultado de {nome}"
+
+
+def _agente(eventos, blocos):
+    """AgenteCompletoV3 mínimo (sem __init__) com cliente e ferramentas falsos."""
+    agente = AgenteCompletoV3.__new__(AgenteCompletoV3)
+    final = SimpleNamespace(content=blocos, stop_reason="tool_use")
+    agente.client = SimpleNamespace(messages=SimpleNamespace(
+        stream=lambda **kw: StreamFalso(eventos, final)
+    ))
+    agente.sistema_ferramentas = FerramentasFalsas()
+    return agente
+
+
+class TestStreamingAntecipado(unittest.TestCase):
+    """Testes de _executar_chamada_api_streaming()"""
+
+    def test_ferramenta_inicia_antes_do_fim_do_stream(self):
+        """tool_use completo é executado enquanto o stream continua"""
+        bloco = _tool("t1", "ler_arquivo", {"caminho": "a.txt"})
+        sobreposicao = {}
+        agente = None
+
+        def aguardar_ferramenta():
+            sobreposicao['ok'] = agente.sistema_ferramentas.iniciou.wait(timeout=2)
+
+        eventos = [
+            SimpleNamespace(type="text", text="Lendo "),
+            SimpleNamespace(type="content_block_stop", content_block=bloco),
+            aguardar_ferramenta,
+            SimpleNamespace(type="text", text="arquivo..."),
+        ]
+        agente = _agente(eventos, [bloco])
+
+        ctx = ExecucaoContexto()
+        response = agente._executar_chamada_api_streaming({}, ctx)
+
+        self.assertTrue(sobreposicao['ok'])
+        self.assertIn("t1", ctx.ferramentas_antecipadas)
+        self.assertEqual(ctx.ferramentas_antecipadas["t1"].result(), "resultado de ler_arquivo")
+        self.assertTrue(response._texto_transmitido)
+
+    def test_navegador_nao_e_antecipado(self):
+        """Ferramentas de navegador e as seguintes esperam o fim do turno"""
+        blocos = [
+            _tool("t1", "ler_arquivo"),
+            _tool("t2", "navegar_url", {"url": "http://x"}),
+            _tool("t3", "criar_arquivo"),
+        ]
+        eventos = [SimpleNamespace(type="content_block_stop", content_block=b) for b in blocos]
+        agente = _agente(eventos, blocos)
+
+        ctx = ExecucaoContexto()
+        agente._executar_chamada_api_streaming({}, ctx)
+
+        self.assertEqual(list(ctx.ferramentas_antecipadas), ["t1"])
+
+    def test_evento_sem_bloco_nao_despacha(self):
+        """SDKs antigos (content_block_stop sem bloco) apenas não antecipam"""
+        bloco = _tool("t1", "ler_arquivo")
+        eventos = [SimpleNamespace(type="content_block_stop", index=0)]
+        agente = _agente(eventos, [bloco])
+
+        ctx = ExecucaoContexto()
+        agente._executar_chamada_api_streaming({}, ctx)
+
+        self.assertEqual(ctx.ferramentas_antecipadas, {})
+
+    def test_contexto_nao_interativo_nao_transmite_texto(self):
+        """Subtarefas paralelas não intercalam texto no terminal"""
+        eventos = [SimpleNamespace(type="text", text="oi")]
+        agente = _agente(eventos, [])
+
+        response = agente._executar_chamada_api_streaming({}, ExecucaoContexto(interativo=False))
+
+        self.assertFalse(response._texto_transmitido)
+
+
+class TestTurnoInterrompido(unittest.TestCase):
+    """Turno que termina em max_tokens com tool_use já antecipado"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir_original = os.getcwd()
+        cls.dir_temp = tempfile.mkdtemp()
+        os.chdir(cls.dir_temp)
+        cls.agente = AgenteCompletoV3("sk-teste", usar_memoria=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.dir_original)
+        shutil.rmtree(cls.dir_temp, ignore_errors=True)
+
+    def test_ferramenta_antecipada_roda_uma_vez(self):
+        """max_tokens: o tool_use antecipado recebe tool_result e não é repetido"""
+        usage = SimpleNamespace(input_tokens=10, output_tokens=10)
+        criar = _tool("t1", "criar_arquivo", {"caminho": "a.txt", "conteudo": "x"})
+        truncado = _tool("t2", "bash_avancado", {"comando": "rm"})
+        turnos = [
+            StreamFalso([SimpleNamespace(type="content_block_stop", content_block=criar)],
+                        SimpleNamespace(content=[criar, truncado], stop_reason="max_tokens", usage=usage)),
+            StreamFalso([], SimpleNamespace(content=[SimpleNamespace(type="text", text="Pronto")],
+                                            stop_reason="end_turn", usage=usage)),
+        ]
+        self.agente.client = SimpleNamespace(messages=SimpleNamespace(stream=lambda **kw: turnos.pop(0)))
+        self.agente.usar_streaming = True
+        executadas = []
+        sistema = self.agente.sistema_ferramentas
+
+        with mock.patch.object(sistema, "executar", side_effect=lambda nome, p: executadas.append(nome) or "ok"), \
+                mock.patch.object(self.agente, "_verificar_melhorias_pendentes"):
+            resposta = self.agente.executar_tarefa("crie a.txt", max_iteracoes=3)
+
+        self.assertEqual(resposta, "Pronto")
+        self.assertEqual(executadas, ["criar_arquivo"])
+        resultados = self.agente.contexto.historico[2]["content"]
+        self.assertEqual([r["tool_use_id"] for r in resultados], ["t1", "t2"])
+        self.assertEqual(resultados[0]["content"], "ok")
+        self.assertIn("max_tokens", resultados[1]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - AGREGADOS INCREMENTAIS DE TELEMETRIA
+================================================
+
+Valida o SketchQuantis (precisão e mescla), a manutenção dos agregados
+diários pelo escritor, a reconstrução após perda do arquivo de agregados
+e os relatórios do AnalisadorTelemetria sem releitura de eventos.
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetria_manager import (
+    SketchQuantis, AgregadosTelemetria, TelemetriaManager, AnalisadorTelemetria
+)
+
+
+def quantil_exato(valores, q):
+    ordenados = sorted(valores)
+    return ordenados[int(q * (len(ordenados) - 1))]
+
+
+class TestSketchQuantis(unittest.TestCase):
+    """Testes do sketch de quantis"""
+
+    def setUp(self):
+        gerador = random.Random(42)
+        self.valores = [gerador.lognormvariate(0, 1.5) for _ in range(20000)]
+
+    def test_erro_relativo_limitado(self):
+        """p50/p95/p99 ficam dentro da precisão configurada"""
+        sketch = SketchQuantis(precisao=0.01)
+        for valor in self.valores:
+            sketch.adicionar(valor)
+
+        for q in (0.5, 0.95, 0.99):
+            exato = quantil_exato(self.valores, q)
+            self.assertAlmostEqual(sketch.quantil(q) / exato, 1.0, delta=0.011)
+
+    def test_mescla_equivale_a_sketch_unico(self):
+        """Mesclar sketches parciais dá o mesmo resultado que um sketch só"""
+        unico, a, b = SketchQuantis(), SketchQuantis(), SketchQuantis()
+        for i, valor in enumerate(self.valores):
+            unico.adicionar(valor)
+            (a if i % 3 else b).adicionar(valor)
+
+        a.mesclar(b)
+
+        self.assertEqual(a.contagem, unico.contagem)
+        for q in (0.5, 0.95, 0.99):
+            self.assertEqual(a.quantil(q), unico.quantil(q))
+
+    def test_serializacao_e_zeros(self):
+        """to_dict/from_dict preserva quantis; zeros não quebram o log"""
+        sketch = SketchQuantis()
+        for valor in [0, 0, 0.5, 2.0]:
+            sketch.adicionar(valor)
+
+        copia = SketchQuantis.from_dict(sketch.to_dict())
+
+        self.assertEqual(copia.quantil(0.0), 0.0)
+        self.assertEqual(copia.quantil(0.99), sketch.quantil(0.99))
+        self.assertAlmostEqual(copia.media, 0.625)
+
+
+class TestAgregadosTelemetria(unittest.TestCase):
+    """Agregados mantidos pelo escritor e usados pelos relatórios"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _registrar(self, rapidas=90, lentas=10):
+        telemetria = TelemetriaManager(base_dir=self.temp_dir, intervalo_flush=60.0)
+        for _ in range(rapidas):
+            telemetria.registrar_uso_ferramenta("buscar", {}, "ok", 0.1)
+        for _ in range(lentas):
+            telemetria.registrar_uso_ferramenta("buscar", {}, "ok", 20.0)
+        telemetria.registrar_uso_ferramenta("editar", {}, "", 0.2, erro="falhou")
+        telemetria.registrar_requisicao_api(1000, 200, tempo_latencia=2.0, modelo="m1")
+        telemetria.fechar()
+
+    def test_cauda_aparece_nos_relatorios(self):
+        """Média baixa com p95 alto ainda gera gargalo, com p50/p95/p99"""
+        self._registrar()
+        analisador = AnalisadorTelemetria(base_dir=self.temp_dir)
+
+        resumo = analisador.resumo_agregado()
+        self.assertEqual(resumo['ferramentas']['buscar']['eventos'], 100)
+        self.assertLess(resumo['ferramentas']['buscar']['tempo_medio'], 5.0)
+        self.assertAlmostEqual(resumo['ferramentas']['buscar']['tempo_p99'], 20.0, delta=0.2)
+        self.assertEqual(resumo['ferramentas']['editar']['taxa_erro'], 100.0)
+        self.assertEqual(resumo['api']['m1']['tokens_p50'], 1200)
+
+        gargalos = analisador.detectar_gargalos()
+        lenta = [g for g in gargalos if g.tipo == 'ferramenta_lenta']
+        self.assertEqual(len(lenta), 1)
+        self.assertGreater(lenta[0].metricas['tempo_p95'], 15.0)
+
+    def test_relatorios_nao_releem_eventos(self):
+        """Com agregados persistidos, gargalos e padrões não tocam nos segmentos"""
+        self._registrar()
+        analisador = AnalisadorTelemetria(base_dir=self.temp_dir)
+
+        with mock.patch.object(analisador.segmentos_ferramentas, "_ler_bloco", side_effect=AssertionError), \
+                mock.patch.object(analisador.segmentos_api, "_ler_bloco", side_effect=AssertionError):
+            padroes = analisador.identificar_padroes_uso()
+            analisador.sugerir_otimizacoes()
+
+        self.assertEqual(padroes['total_eventos_analisados'], 101)
+        self.assertEqual(padroes['ferramentas_mais_lentas'][0]['ferramenta'], 'buscar')
+
+    def test_agregado_perdido_e_reconstruido(self):
+        """Sem o arquivo de agregados, o próximo lote do dia refaz a partir do segmento"""
+        self._registrar(rapidas=5, lentas=0)
+        hoje = datetime.now().date().isoformat()
+        agregados = AgregadosTelemetria(os.path.join(self.temp_dir, "luna_telemetria"))
+        os.remove(agregados.caminho_dia(hoje))
+
+        self._registrar(rapidas=5, lentas=0)
+
+        self.assertEqual(agregados.carregar_dia(hoje)['ferramentas']['chaves']['buscar'].eventos, 10)
+
+    def test_janela_mescla_dias(self):
+        """Relatórios mesclam os dias da janela configurada"""
+        self._registrar(rapidas=3, lentas=0)
+        ontem = (datetime.now() - timedelta(days=1)).date().isoformat()
+        agregados = AgregadosTelemetria(os.path.join(self.temp_dir, "luna_telemetria"))
+        agregados.observar('ferramentas', ontem, [
+            {"timestamp": f"{ontem}T10:00:00", "ferramenta": "buscar", "tempo_execucao": 1.0}
+        ])
+
+        semana = AnalisadorTelemetria(base_dir=self.temp_dir).resumo_agregado()
+        hoje = AnalisadorTelemetria(base_dir=self.temp_dir, janela_dias=1).resumo_agregado()
+
+        self.assertEqual(semana['ferramentas']['buscar']['eventos'], 4)
+        self.assertEqual(hoje['ferramentas']['buscar']['eventos'], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - ESCRITOR DE TELEMETRIA EM LOTE
+==========================================
+
+Valida que os eventos passam pela fila do EscritorTelemetria, são gravados
+em lotes, ficam visíveis após flush() e são drenados no fechamento
+(inclusive pelo InterruptHandler).
+"""
+
+import os
+import sys
+import json
+import shutil
+import signal
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telemetria_manager
+from telemetria_manager import EscritorTelemetria, TelemetriaManager, AnalisadorTelemetria
+
+
+def ler_jsonl(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+class TestEscritorTelemetria(unittest.TestCase):
+    """Testes do EscritorTelemetria isolado"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.arquivo = Path(self.temp_dir) / "eventos.jsonl"
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _escritor(self, **kwargs):
+        escritor = EscritorTelemetria(**kwargs)
+        self.addCleanup(escritor.fechar)
+        return escritor
+
+    def test_flush_torna_eventos_visiveis_em_ordem(self):
+        """flush() espera a gravação de tudo o que foi enfileirado antes"""
+        escritor = self._escritor(intervalo_flush=30.0)
+        for i in range(50):
+            escritor.enviar(self.arquivo, {"i": i})
+
+        self.assertTrue(escritor.flush())
+
+        self.assertEqual([e["i"] for e in ler_jsonl(self.arquivo)], list(range(50)))
+
+    def test_eventos_agrupados_em_lotes(self):
+        """Vários eventos viram poucas escritas"""
+        escritor = self._escritor(intervalo_flush=0.5)
+        for i in range(200):
+            escritor.enviar(self.arquivo, {"i": i})
+        escritor.flush()
+
+        self.assertEqual(escritor.metricas["eventos_escritos"], 200)
+        self.assertLess(escritor.metricas["lotes_escritos"], 10)
+
+    def test_fechar_drena_a_fila(self):
+        """fechar() grava o que falta mesmo com intervalo longo"""
+        escritor = self._escritor(intervalo_flush=60.0)
+        escritor.enviar(self.arquivo, {"ultimo": True})
+
+        escritor.fechar()
+
+        self.assertEqual(ler_jsonl(self.arquivo), [{"ultimo": True}])
+        # Eventos tardios (ex.: atexit) são gravados direto
+        escritor.enviar(self.arquivo, {"tardio": True})
+        self.assertEqual(len(ler_jsonl(self.arquivo)), 2)
+
+    def test_politica_fsync_lote(self):
+        """Com politica 'lote', cada lote gravado chama os.fsync"""
+        with mock.patch.object(telemetria_manager.os, "fsync") as fsync:
+            escritor = self._escritor(intervalo_flush=0.0, politica_fsync="lote")
+            escritor.enviar(self.arquivo, {"a": 1})
+            escritor.flush()
+
+            self.assertGreaterEqual(fsync.call_count, 1)
+
+    def test_politica_invalida(self):
+        """Política de fsync desconhecida é rejeitada"""
+        with self.assertRaises(ValueError):
+            EscritorTelemetria(politica_fsync="sempre")
+
+    def test_fila_cheia_descarta_e_conta(self):
+        """Sem espaço na fila, o evento é descartado sem bloquear o chamador"""
+        escritor = self._escritor(intervalo_flush=60.0, tamanho_fila=2)
+
+        resultados = [escritor.enviar(self.arquivo, {"i": i}) for i in range(3)]
+
+        self.assertEqual(resultados, [True, True, False])
+        self.assertEqual(escritor.metricas["eventos_descartados"], 1)
+        escritor.fechar()
+        self.assertEqual(len(ler_jsonl(self.arquivo)), 2)
+
+
+class TestTelemetriaManagerBufferizado(unittest.TestCase):
+    """Integração do escritor com TelemetriaManager/AnalisadorTelemetria"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.telemetria = TelemetriaManager(base_dir=self.temp_dir, intervalo_flush=60.0)
+        self.addCleanup(self.telemetria.fechar)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_analisador_ve_eventos_da_sessao_atual(self):
+        """O analisador faz flush do manager antes de ler"""
+        self.telemetria.registrar_uso_ferramenta("ler_arquivo", {"caminho": "x"}, "ok", 0.01)
+        self.telemetria.registrar_requisicao_api(10, 5, tempo_latencia=0.5)
+
+        analisador = AnalisadorTelemetria(base_dir=self.temp_dir, telemetria=self.telemetria)
+
+        self.assertEqual(len(analisador.carregar_eventos_ferramentas()), 1)
+        self.assertEqual(len(analisador.carregar_eventos_api()), 1)
+        self.assertEqual(self.telemetria.sessao_metricas["requisicoes"], 1)
+
+    def test_interrupt_handler_drena_telemetria(self):
+        """cleanup_gracioso() grava os eventos pendentes"""
+        from luna_v3_FINAL_OTIMIZADA import InterruptHandler
+
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(signal.signal, sinal, signal.getsignal(sinal))
+        handler = InterruptHandler(
+            sistema_ferramentas=SimpleNamespace(browser=None, telemetria=self.telemetria)
+        )
+
+        self.telemetria.registrar_uso_ferramenta("bash_avancado", {}, "ok", 0.2)
+        handler.cleanup_gracioso()
+
+        self.assertEqual(len(self.telemetria.segmentos_ferramentas.ler()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 TESTES - SEGMENTOS DIÁRIOS DE TELEMETRIA
+===========================================
+
+Valida a divisão dos eventos em segmentos diários (texto e gzip), o índice
+lateral de blocos, as consultas "últimos N" / "desde T" lendo só o
+necessário e a importação única dos JSONL monolíticos antigos.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetria_manager import SegmentosTelemetria, TelemetriaManager, AnalisadorTelemetria
+
+
+def evento(dia, i):
+    return {"timestamp": f"2025-10-{dia:02d}T12:{i // 60:02d}:{i % 60:02d}", "i": i}
+
+
+def linhas(eventos):
+    return [json.dumps(e) + "\n" for e in eventos]
+
+
+class TestSegmentosTelemetria(unittest.TestCase):
+    """Testes de SegmentosTelemetria isolado"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _gravar_dias(self, segmentos, dias, por_dia=100, por_lote=10):
+        for dia in dias:
+            eventos = [evento(dia, i) for i in range(por_dia)]
+            for j in range(0, por_dia, por_lote):
+                segmentos.gravar(eventos[j:j + por_lote], linhas(eventos[j:j + por_lote]))
+        segmentos.fechar()
+
+    def test_um_segmento_e_um_indice_por_dia(self):
+        """Eventos vão para o arquivo do dia do seu timestamp"""
+        segmentos = SegmentosTelemetria(self.temp_dir, "api")
+        self._gravar_dias(segmentos, [1, 2])
+
+        nomes = sorted(p.name for p in self.temp_dir.iterdir())
+        self.assertEqual(nomes, ["api-2025-10-01.jsonl", "api-2025-10-01.jsonl.idx",
+                                 "api-2025-10-02.jsonl", "api-2025-10-02.jsonl.idx"])
+        with open(self.temp_dir / "api-2025-10-02.jsonl.idx", encoding="utf-8") as f:
+            indice = json.load(f)
+        self.assertEqual(indice["eventos"], 100)
+        self.assertEqual(indice["blocos"][0][1], "2025-10-02T12:00:00")
+
+    def test_ultimos_n_le_so_os_blocos_finais(self):
+        """limite=N não abre segmentos antigos"""
+        segmentos = SegmentosTelemetria(self.temp_dir, "api")
+        self._gravar_dias(segmentos, [1, 2, 3])
+
+        with mock.patch.object(segmentos, "_ler_bloco", wraps=segmentos._ler_bloco) as ler_bloco:
+            eventos = segmentos.ler(limite=5)
+
+        self.assertEqual([e["i"] for e in eventos], [95, 96, 97, 98, 99])
+        self.assertTrue(all(e["timestamp"].startswith("2025-10-03") for e in eventos))
+        self.assertEqual({c.args[0].name for c in ler_bloco.call_args_list}, {"api-2025-10-03.jsonl"})
+
+    def test_desde_filtra_por_segmento_e_bloco(self):
+        """desde=T pula segmentos e blocos anteriores a T"""
+        segmentos = SegmentosTelemetria(self.temp_dir, "api")
+        segmentos.TAMANHO_BLOCO = 500  # Vários blocos por segmento
+        self._gravar_dias(segmentos, [1, 2])
+
+        with mock.patch.object(segmentos, "_ler_bloco", wraps=segmentos._ler_bloco) as ler_bloco:
+            eventos = segmentos.ler(desde="2025-10-02T12:01:30")
+
+        self.assertEqual([e["i"] for e in eventos], list(range(90, 100)))
+        lidos = [c.args[0].name for c in ler_bloco.call_args_list]
+        self.assertEqual(set(lidos), {"api-2025-10-02.jsonl"})
+        self.assertLess(len(lidos), 3)
+
+    def test_segmentos_gzip(self):
+        """Com compressão, cada lote é um membro gzip legível por bloco"""
+        segmentos = SegmentosTelemetria(self.temp_dir, "ferramentas", comprimir=True)
+        segmentos.TAMANHO_BLOCO = 200
+        self._gravar_dias(segmentos, [5])
+
+        self.assertTrue((self.temp_dir / "ferramentas-2025-10-05.jsonl.gz").exists())
+        self.assertEqual([e["i"] for e in segmentos.ler(limite=3)], [97, 98, 99])
+        self.assertEqual(len(segmentos.ler(desde="2025-10-05T12:01:00")), 40)
+        self.assertEqual(len(segmentos.ler()), 100)
+
+    def test_cauda_sem_indice_e_reindexada(self):
+        """Bytes gravados sem .idx (queda) continuam legíveis e a escrita segue"""
+        segmentos = SegmentosTelemetria(self.temp_dir, "api")
+        self._gravar_dias(segmentos, [1], por_dia=10)
+        with open(self.temp_dir / "api-2025-10-01.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(evento(1, 10)) + "\n" + '{"timestamp": "2025-10-01T1')
+
+        novos = SegmentosTelemetria(self.temp_dir, "api")
+        self.assertEqual(len(novos.ler()), 11)
+
+        novos.gravar([evento(1, 11)], linhas([evento(1, 11)]))
+        novos.fechar()
+        self.assertEqual([e["i"] for e in novos.ler(limite=2)], [10, 11])
+
+
+class TestTelemetriaSegmentada(unittest.TestCase):
+    """Integração com TelemetriaManager/AnalisadorTelemetria"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_importa_jsonl_legado_uma_vez(self):
+        """O JSONL monolítico antigo vira segmentos diários na primeira execução"""
+        legado = Path(self.temp_dir) / "luna_telemetria_ferramentas.jsonl"
+        with open(legado, "w", encoding="utf-8") as f:
+            f.writelines(linhas([evento(1, i) for i in range(3)] + [evento(2, 0)]))
+
+        for _ in range(2):
+            telemetria = TelemetriaManager(base_dir=self.temp_dir)
+            telemetria.fechar()
+
+        analisador = AnalisadorTelemetria(base_dir=self.temp_dir)
+        self.assertEqual(len(analisador.carregar_eventos_ferramentas()), 4)
+        self.assertEqual(len(analisador.carregar_eventos_ferramentas(desde="2025-10-02")), 1)
+        self.assertTrue(legado.exists())
+
+    def test_analisador_le_segmentos_do_manager(self):
+        """Eventos registrados aparecem nas consultas por limite"""
+        telemetria = TelemetriaManager(base_dir=self.temp_dir, intervalo_flush=60.0)
+        self.addCleanup(telemetria.fechar)
+        for i in range(20):
+            telemetria.registrar_uso_ferramenta(f"f{i}", {}, "ok", 0.01)
+
+        analisador = AnalisadorTelemetria(base_dir=self.temp_dir, telemetria=telemetria)
+
+        self.assertEqual([e["ferramenta"] for e in analisador.carregar_eventos_ferramentas(2)],
+                         ["f18", "f19"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -61,8 +61,8 @@ class TestMemoriaPermanente(unittest.TestCase):
         self.assertIn("historico_tarefas", memoria.memoria)
         self.assertIn("preferencias_usuario", memoria.memoria)
 
-        # Verificar que arquivo foi criado
-        self.assertTrue(os.path.exists(self.memoria_file))
+        # Verificar que o banco foi criado (memória em SQLite ao lado do .json)
+        self.assertTrue(os.path.exists(memoria.arquivo_db))
 
     def test_adicionar_aprendizado(self):
         """Teste: Adicionar aprendizado à memória"""